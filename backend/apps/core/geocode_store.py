@@ -0,0 +1,289 @@
+"""
+Stockage persistant des géocodages Nominatim et limiteur de débit partagé
+
+Nominatim impose 1 requête/seconde pour toute l'application. Avant ce module,
+chaque process (workers gunicorn, Celery) appliquait sa propre limite avec
+time.sleep dans le thread de la requête HTTP : la limite globale était
+dépassée et les workers web restaient bloqués. Ce module fournit :
+- `normalize_query` : clé de requête stable (minuscules, sans accents ni
+  ponctuation, espaces compactés) ;
+- `NominatimRateLimiter` : token bucket commun à tout le cluster (script Lua
+  atomique dans Redis, horloge du serveur Redis). Sans Redis (développement,
+  tests), un bucket en mémoire du process ;
+- `GeocodeStore` : table GeocodeEntry (app pricing) devant Nominatim. Les
+  résultats trouvés n'expirent pas ; les requêtes introuvables sont
+  réessayées après NOMINATIM_NOT_FOUND_RETRY_HOURS. Un miss crée une entrée
+  'pending' et planifie la tâche pricing.resolve_geocode : la requête web
+  répond tout de suite, et chaque requête n'est résolue qu'une fois.
+
+Usage:
+    lookup = geocode_store.lookup('address', 'Rue des Jardins, Abidjan', {...})
+    if lookup.status == GeocodeStore.FOUND: ...
+    wait = nominatim_limiter.acquire()  # 0 = jeton obtenu, sinon secondes à attendre
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import unicodedata
+from collections import namedtuple
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+GeocodeLookup = namedtuple('GeocodeLookup', ['status', 'result'])
+
+
+def normalize_query(text: str) -> str:
+    """
+    Forme canonique d'une requête de géocodage
+
+    >>> normalize_query("  Rivièra-2,  COCODY ")
+    'riviera 2 cocody'
+    """
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(c for c in text if not unicodedata.combining(c)).lower()
+    return ' '.join(re.sub(r"[^\w]+", ' ', text).split())
+
+
+# KEYS[1] = bucket ; ARGV = débit (jetons/s), capacité
+# Retourne "0" si un jeton a été pris, sinon le nombre de secondes à attendre
+TOKEN_BUCKET_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class _LocalBucket:
+    """Token bucket en mémoire du process (sans Redis)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = None
+        self._ts = 0.0
+
+    def acquire(self, rate: float, capacity: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if self._tokens is None:
+                self._tokens, self._ts = capacity, now
+            self._tokens = min(capacity, self._tokens + (now - self._ts) * rate)
+            self._ts = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / rate
+
+
+class _RedisBucket:
+    """Token bucket partagé par tous les process via Redis"""
+
+    def __init__(self, connection, key: str):
+        self.redis = connection
+        self.key = key
+        self._script = connection.register_script(TOKEN_BUCKET_LUA)
+
+    def acquire(self, rate: float, capacity: float) -> float:
+        return float(self._script(keys=[self.key], args=[rate, capacity]))
+
+
+class NominatimRateLimiter:
+    """
+    Limiteur de débit des appels Nominatim commun à tout le cluster
+
+    `acquire()` ne bloque jamais : il retourne 0 si un jeton a été pris, sinon
+    le délai avant le prochain jeton. À l'appelant de décider d'attendre
+    (worker Celery) ou de renoncer (requête web).
+    """
+    KEY = 'nominatim:token_bucket'
+
+    def __init__(self):
+        self._bucket = None
+        self._bucket_lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return float(getattr(settings, 'NOMINATIM_RATE_PER_SECOND', 1.0))
+
+    @property
+    def capacity(self) -> float:
+        return max(1.0, float(getattr(settings, 'NOMINATIM_BURST', 1)))
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            with self._bucket_lock:
+                if self._bucket is None:
+                    self._bucket = self._build_bucket()
+        return self._bucket
+
+    def _build_bucket(self):
+        from .redis_connection import shared_redis
+
+        connection = shared_redis()
+        if connection is not None:
+            return _RedisBucket(connection, self.KEY)
+        return _LocalBucket()
+
+    def acquire(self) -> float:
+        try:
+            return self.bucket.acquire(self.rate, self.capacity)
+        except Exception as e:
+            # Redis injoignable : ne pas appeler Nominatim sans contrôle
+            logger.warning(f"NominatimRateLimiter: jeton indisponible ({e})")
+            return 1.0 / self.rate
+
+    def reset(self):
+        self._bucket = None
+
+
+class GeocodeStore:
+    """
+    Table GeocodeEntry devant Nominatim, avec résolution des misses en file d'attente
+    """
+    FOUND = 'found'
+    NOT_FOUND = 'not_found'
+    PENDING = 'pending'
+    FAILED = 'failed'
+
+    CACHE_TIMEOUT = 86400  # cache Django devant la table (24 heures)
+
+    @property
+    def not_found_retry(self) -> timedelta:
+        return timedelta(hours=float(getattr(settings, 'NOMINATIM_NOT_FOUND_RETRY_HOURS', 24 * 7)))
+
+    @property
+    def pending_timeout(self) -> timedelta:
+        # Entrée 'pending' plus ancienne : la tâche est perdue, on replanifie
+        return timedelta(seconds=float(getattr(settings, 'NOMINATIM_PENDING_TIMEOUT_SECONDS', 600)))
+
+    @staticmethod
+    def make_key(kind: str, query: str) -> str:
+        return hashlib.sha256(f"{kind}:{normalize_query(query)}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _cache_key(kind: str, key: str) -> str:
+        return f"geocode:{kind}:{key}"
+
+    def lookup(self, kind: str, query: str, params: Dict) -> GeocodeLookup:
+        """
+        Résultat connu, ou planification de la résolution (sans attente)
+
+        Args:
+            kind: 'quartier', 'address' ou 'reverse'
+            query: Texte de la requête (normalisé pour la clé)
+            params: Paramètres transmis à la tâche de résolution
+
+        Returns:
+            GeocodeLookup(status, result) ; status 'found', 'not_found' ou 'pending'
+        """
+        try:
+            return self._lookup(kind, query, params)
+        except Exception as e:
+            logger.error(f"❌ Stockage de géocodage indisponible ({kind}: {query}): {e}")
+            return GeocodeLookup(self.PENDING, None)
+
+    def _lookup(self, kind: str, query: str, params: Dict) -> GeocodeLookup:
+        from apps.pricing.models import GeocodeEntry
+
+        key = self.make_key(kind, query)
+        cached = cache.get(self._cache_key(kind, key))
+        if cached is not None:
+            return GeocodeLookup(self.FOUND, cached)
+
+        now = timezone.now()
+        entry = GeocodeEntry.objects.filter(kind=kind, key=key).first()
+        if entry is not None:
+            if entry.status == self.FOUND:
+                cache.set(self._cache_key(kind, key), entry.result, self.CACHE_TIMEOUT)
+                return GeocodeLookup(self.FOUND, entry.result)
+            if entry.status in (self.NOT_FOUND, self.FAILED) and entry.retry_after and entry.retry_after > now:
+                # Échec (Nominatim indisponible) : à redemander plus tard, pas introuvable
+                return GeocodeLookup(self.NOT_FOUND if entry.status == self.NOT_FOUND else self.PENDING, None)
+            if entry.status == self.PENDING and entry.updated_at > now - self.pending_timeout:
+                return GeocodeLookup(self.PENDING, None)
+            # Entrée à réessayer : un seul process la reprend (UPDATE conditionnel)
+            claimed = GeocodeEntry.objects.filter(
+                pk=entry.pk, status=entry.status, updated_at=entry.updated_at
+            ).update(status=self.PENDING, attempts=0, params=params, updated_at=now)
+        else:
+            try:
+                with transaction.atomic():
+                    entry = GeocodeEntry.objects.create(
+                        kind=kind, key=key, query=normalize_query(query), params=params
+                    )
+                claimed = True
+            except IntegrityError:
+                # Créée entre-temps par une autre requête, déjà planifiée
+                claimed = False
+
+        if claimed:
+            self._schedule(entry.pk)
+            # Résolue immédiatement si Celery s'exécute en mode eager (dev, tests)
+            entry = GeocodeEntry.objects.filter(pk=entry.pk).first()
+            if entry is not None and entry.status == self.FOUND:
+                return GeocodeLookup(self.FOUND, entry.result)
+            if entry is not None and entry.status == self.NOT_FOUND:
+                return GeocodeLookup(self.NOT_FOUND, None)
+        return GeocodeLookup(self.PENDING, None)
+
+    @staticmethod
+    def _schedule(entry_id):
+        try:
+            from apps.pricing.tasks import resolve_geocode
+            resolve_geocode.delay(entry_id)
+        except Exception as e:
+            # Broker indisponible : l'entrée reste 'pending' et sera replanifiée
+            # par une prochaine demande après NOMINATIM_PENDING_TIMEOUT_SECONDS
+            logger.error(f"❌ Géocodage {entry_id} non planifié: {e}")
+
+    def store(self, entry, status: str, result=None, retry_in: Optional[float] = None):
+        """
+        Enregistre l'issue d'une résolution
+
+        Args:
+            entry: GeocodeEntry résolue
+            status: 'found', 'not_found' ou 'failed'
+            result: Résultat Nominatim (status 'found')
+            retry_in: Délai en secondes avant un nouvel essai ('not_found' / 'failed')
+        """
+        now = timezone.now()
+        entry.status = status
+        entry.result = result
+        if status == self.FOUND:
+            entry.resolved_at = now
+            entry.retry_after = None
+            cache.set(self._cache_key(entry.kind, entry.key), result, self.CACHE_TIMEOUT)
+        else:
+            if retry_in is None:
+                retry = self.not_found_retry if status == self.NOT_FOUND else timedelta(hours=1)
+            else:
+                retry = timedelta(seconds=retry_in)
+            entry.retry_after = now + retry
+        entry.save(update_fields=['status', 'result', 'resolved_at', 'retry_after', 'attempts', 'updated_at'])
+
+
+nominatim_limiter = NominatimRateLimiter()
+geocode_store = GeocodeStore()
@@ -6,17 +6,27 @@ Avec fallback sur formule haversine si l'API est indisponible
 Ce service unifié gère:
 - Calcul de distance entre 2 points GPS
 - Calcul d'itinéraires avec polylines (pour affichage sur carte)
+- Matrices de distances (toutes les paires en un seul appel)
 - Geocoding: convertir adresse -> coordonnées GPS
 """
 import os
+import json
+import hashlib
 import logging
+import time
 from math import radians, cos, sin, asin, sqrt, isfinite
 from typing import Tuple, Optional, Dict, List
+import numpy as np
 import requests
 from django.conf import settings
 from django.core.cache import cache
 import sentry_sdk
 
+from .offline_routing import offline_router
+from .quartier_locator import quartier_locator
+from .route_cache import route_cache
+from .routing_providers import routing_orchestrator
+
 logger = logging.getLogger(__name__)
 
 
@@ -38,6 +48,19 @@ class LocationService:
     OSRM_BASE_URL = 'https://router.project-osrm.org'
     
     ROUTE_CACHE_TIMEOUT = 3600  # 1 heure pour les routes
+    ROUTE_FALLBACK_CACHE_TIMEOUT = 300  # 5 minutes pour les lignes droites de secours
+    
+    # Nombre max de points envoyés aux endpoints /table (OSRM) et /matrix (ORS)
+    # Distance à vol d'oiseau -> distance par route approchée (+20%)
+    ROAD_FACTOR = 1.2
+    
+    MATRIX_MAX_POINTS = int(os.getenv('DISTANCE_MATRIX_MAX_POINTS', '100'))
+    # Au-delà de MATRIX_MAX_POINTS, la matrice est demandée par blocs : nombre max
+    # de requêtes de blocs avant de se rabattre sur haversine
+    MATRIX_MAX_BLOCK_REQUESTS = int(os.getenv('DISTANCE_MATRIX_MAX_BLOCK_REQUESTS', '10'))
+    # Couples laissés sans distance par /matrix (centroïdes loin d'une route) : nombre
+    # max de requêtes /directions (rayon d'accroche 1 km) par lot avant haversine
+    DIRECTIONS_MAX_REQUESTS = int(os.getenv('DISTANCE_DIRECTIONS_MAX_REQUESTS', '10'))
     
     @classmethod
     def haversine_distance(cls, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -80,19 +103,101 @@ class LocationService:
         Args:
             pickup_lat, pickup_lon: Coordonnées du point de départ
             delivery_lat, delivery_lon: Coordonnées de la destination
-            use_api: Si True, utilise OpenRouteService, sinon haversine
+            use_api: Si True, utilise le graphe routier local ou OpenRouteService, sinon haversine
+        
+        Returns:
+            Distance en kilomètres (par route si API, à vol d'oiseau +20% sinon)
+        """
+        pair = ((pickup_lat, pickup_lon), (delivery_lat, delivery_lon))
+        distances, source = cls.get_distances([pair], use_api=use_api)
+        logger.info(f"Distance calculée ({source}): {distances[pair]} km")
+        return distances[pair]
+    
+    @classmethod
+    def get_distances(
+        cls,
+        pairs: List[Tuple[Tuple[float, float], Tuple[float, float]]],
+        use_api: bool = True,
+    ) -> Tuple[Dict, str]:
+        """
+        Distances (km) d'une liste de couples (départ, arrivée)
+        
+        Même ordre de sources pour un couple seul (get_distance) et pour un lot
+        (devis en lot), donc même prix :
+        1. graphe routier local (OFFLINE_ROUTING_GRAPH), couple par couple,
+           jusqu'à OFFLINE_ROUTING_MATRIX_MAX_POINTS couples (une recherche
+           Python par couple) ;
+        2. si clé API : /matrix d'OpenRouteService par lots d'au plus
+           MATRIX_MAX_POINTS points distincts (lots de plus d'un couple), puis
+           /directions avec un rayon d'accroche de 1 km pour le couple seul et
+           les cases non routables de la matrice (/matrix accroche au plus près,
+           les centroïdes de zones sont souvent loin d'une route), au plus
+           DIRECTIONS_MAX_REQUESTS requêtes ;
+        3. haversine x ROAD_FACTOR pour les couples restants.
         
         Returns:
-            Distance en kilomètres (par route si API, à vol d'oiseau sinon)
+            tuple: ({couple: distance_km}, sources séparées par des virgules)
         """
-        # Si pas de clé API ou si use_api=False, utiliser haversine
-        if not cls.ORS_API_KEY or not use_api:
-            logger.info("Utilisation de la formule haversine (distance à vol d'oiseau)")
-            distance = cls.haversine_distance(pickup_lat, pickup_lon, delivery_lat, delivery_lon)
-            # Ajouter 20% pour approximer la distance réelle par route
-            return round(distance * 1.2, 2)
+        pairs = list(dict.fromkeys(pairs))
+        distances = {}
+        sources = set()
         
-        # Utiliser OpenRouteService pour distance réelle par route
+        if use_api:
+            if offline_router.graph is not None and len(pairs) <= getattr(settings, 'OFFLINE_ROUTING_MATRIX_MAX_POINTS', 8):
+                for origin, destination in pairs:
+                    route = cls._get_route_offline(*origin, *destination)
+                    if route:
+                        distances[(origin, destination)] = route['distance_km']
+                        sources.add('offline')
+            
+            remaining = [pair for pair in pairs if pair not in distances]
+            if remaining and cls.ORS_API_KEY:
+                # Couple seul, ou case non routable d'une matrice obtenue
+                unroutable = remaining if len(remaining) == 1 else []
+                if len(remaining) > 1:
+                    for chunk in cls._chunk_pairs(remaining):
+                        points = list(dict.fromkeys(point for pair in chunk for point in pair))
+                        matrix = cls._get_matrix_ors([(float(lat), float(lon)) for lat, lon in points])
+                        if not matrix:
+                            continue
+                        index = {point: i for i, point in enumerate(points)}
+                        for origin, destination in chunk:
+                            distance = matrix['distances_km'][index[origin]][index[destination]]
+                            if distance is not None:
+                                distances[(origin, destination)] = distance
+                                sources.add(matrix['source'])
+                            else:
+                                unroutable.append((origin, destination))
+                
+                for origin, destination in unroutable[:cls.DIRECTIONS_MAX_REQUESTS]:
+                    distance = cls._get_distance_ors(*origin, *destination)
+                    if distance is not None:
+                        distances[(origin, destination)] = distance
+                        sources.add('openrouteservice')
+        
+        remaining = [pair for pair in pairs if pair not in distances]
+        if remaining:
+            haversine = cls.haversine_pairs(
+                [origin for origin, _ in remaining], [destination for _, destination in remaining]
+            )
+            for pair, distance in zip(remaining, haversine.tolist()):
+                # Approximation de la distance par route
+                distances[pair] = round(round(distance, 2) * cls.ROAD_FACTOR, 2)
+            sources.add('haversine')
+        
+        return distances, ','.join(sorted(sources))
+    
+    @classmethod
+    def _get_distance_ors(
+        cls,
+        pickup_lat: float,
+        pickup_lon: float,
+        delivery_lat: float,
+        delivery_lon: float
+    ) -> Optional[float]:
+        """
+        Distance par route (km) via /directions d'OpenRouteService, None si non routable
+        """
         try:
             url = f"{cls.ORS_BASE_URL}/v2/directions/driving-car"
             headers = {
@@ -101,41 +206,329 @@ class LocationService:
             }
             body = {
                 'coordinates': [
-                    [pickup_lon, pickup_lat],    # Point de départ [longitude, latitude]
-                    [delivery_lon, delivery_lat]  # Destination [longitude, latitude]
+                    [float(pickup_lon), float(pickup_lat)],    # Point de départ [longitude, latitude]
+                    [float(delivery_lon), float(delivery_lat)]  # Destination [longitude, latitude]
                 ],
                 'radiuses': [1000, 1000]  # Augmenter le rayon de recherche à 1km
             }
             
             response = requests.post(url, json=body, headers=headers, timeout=5)
+            if response.status_code != 200:
+                # Erreur API (404, 400, etc.) : normal pour des coordonnées loin d'une route
+                return None
             
-            if response.status_code == 200:
-                data = response.json()
-                # Distance en mètres, convertir en km
-                distance_m = data['routes'][0]['summary']['distance']
-                distance_km = round(distance_m / 1000, 2)
-                logger.info(f"Distance calculée via OpenRouteService: {distance_km} km")
-                return distance_km
-            else:
-                # Erreur API (404, 400, etc.) - utiliser haversine en silence
-                # Pas besoin de logger l'erreur car c'est normal (coordonnées pas sur route)
-                distance = cls.haversine_distance(pickup_lat, pickup_lon, delivery_lat, delivery_lon)
-                return round(distance * 1.2, 2)
-                
+            # Distance en mètres, convertir en km
+            return round(response.json()['routes'][0]['summary']['distance'] / 1000, 2)
         except Exception as e:
             logger.error(f"Erreur OpenRouteService: {e}, fallback sur haversine")
-            # Fallback sur haversine en cas d'erreur
-            distance = cls.haversine_distance(pickup_lat, pickup_lon, delivery_lat, delivery_lon)
-            return round(distance * 1.2, 2)
+            return None
+    
+    @classmethod
+    def _chunk_pairs(cls, pairs: List) -> List[List]:
+        """Lots de couples d'au plus MATRIX_MAX_POINTS points distincts"""
+        limit = max(2, cls.MATRIX_MAX_POINTS)
+        chunks, chunk, chunk_points = [], [], set()
+        for pair in pairs:
+            if chunk and len(chunk_points | set(pair)) > limit:
+                chunks.append(chunk)
+                chunk, chunk_points = [], set()
+            chunk.append(pair)
+            chunk_points.update(pair)
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+    
+    @classmethod
+    def haversine_matrix(cls, points: List[Tuple[float, float]]) -> np.ndarray:
+        """
+        Matrice n×n des distances haversine (km) entre tous les points, par broadcasting NumPy
+        
+        Args:
+            points: Liste de (latitude, longitude)
+        
+        Returns:
+            np.ndarray de forme (n, n), NaN pour les points sans coordonnées
+        """
+        coords = np.array(
+            [
+                (np.nan, np.nan) if lat is None or lon is None else (float(lat), float(lon))
+                for lat, lon in points
+            ],
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        lat = np.radians(coords[:, 0])
+        lon = np.radians(coords[:, 1])
+        
+        dlat = lat[:, None] - lat[None, :]
+        dlon = lon[:, None] - lon[None, :]
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlon / 2) ** 2
+        
+        # Rayon de la Terre en km (identique à haversine_distance)
+        return 2 * 6371 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    @classmethod
+    def haversine_pairs(
+        cls,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+    ) -> np.ndarray:
+        """
+        Distances haversine (km) entre origins[i] et destinations[i], vectorisées NumPy
+
+        Contrairement à haversine_matrix, ne calcule que les n couples demandés (pas n×n).
+
+        Returns:
+            np.ndarray de forme (n,)
+        """
+        start = np.radians(np.array(origins, dtype=np.float64).reshape(-1, 2))
+        end = np.radians(np.array(destinations, dtype=np.float64).reshape(-1, 2))
+        dlat = end[:, 0] - start[:, 0]
+        dlon = end[:, 1] - start[:, 1]
+        a = np.sin(dlat / 2) ** 2 + np.cos(start[:, 0]) * np.cos(end[:, 0]) * np.sin(dlon / 2) ** 2
+        return 2 * 6371 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    @classmethod
+    def get_distance_matrix(
+        cls,
+        points: List[Tuple[float, float]],
+        use_api: bool = True,
+        use_cache: bool = True,
+    ) -> Dict:
+        """
+        Calcule les distances entre toutes les paires de points en un seul appel
+        
+        Utilise le graphe routier local s'il est configuré (OFFLINE_ROUTING_GRAPH), puis
+        l'endpoint /table d'OSRM, puis /matrix d'OpenRouteService, avec fallback sur
+        une matrice haversine (vol d'oiseau) calculée localement. Au-delà de
+        MATRIX_MAX_POINTS points, la matrice est demandée par blocs.
+        
+        Args:
+            points: Liste de (latitude, longitude)
+            use_api: Si False, calcule directement la matrice haversine
+            use_cache: Utiliser le cache (défaut: True)
+        
+        Returns:
+            Dict avec:
+            - distances_km: Matrice n×n (liste de listes) des distances en km
+            - durations_min: Matrice n×n des durées en minutes
+            - source: 'offline', 'osrm', 'openrouteservice' ou 'haversine' ; par blocs,
+              les sources des blocs jointes par '+' si elles diffèrent
+            
+            Les points sans coordonnées n'empêchent pas le routage des autres :
+            seules leurs lignes et colonnes restent en haversine (NaN).
+        """
+        points = [
+            (None, None) if lat is None or lon is None else (float(lat), float(lon))
+            for lat, lon in points
+        ]
+        n = len(points)
+        complete = [i for i, (lat, _) in enumerate(points) if lat is not None]
+        
+        if len(complete) < n:
+            result = cls._haversine_matrix_result(points)
+            if use_api and len(complete) >= 2:
+                routed = cls.get_distance_matrix([points[i] for i in complete], use_cache=use_cache)
+                for a, i in enumerate(complete):
+                    for b, j in enumerate(complete):
+                        result['distances_km'][i][j] = routed['distances_km'][a][b]
+                        result['durations_min'][i][j] = routed['durations_min'][a][b]
+                result['source'] = routed['source']
+            return result
+        
+        if n < 2 or not use_api:
+            return cls._haversine_matrix_result(points)
+        if n > cls.MATRIX_MAX_POINTS:
+            return cls._get_matrix_blocks(points, use_cache)
+        
+        # Vérifier le cache (clé = empreinte de l'ensemble ordonné de points)
+        cache_key = None
+        if use_cache:
+            digest = hashlib.sha1(
+                json.dumps([(round(lat, 5), round(lon, 5)) for lat, lon in points]).encode()
+            ).hexdigest()
+            cache_key = f"distance_matrix:{digest}"
+            cached = cache.get(cache_key)
+            if cached:
+                logger.info(f"Matrice de distances trouvée en cache ({n} points)")
+                return cached
+        
+        result = cls._get_matrix_offline(points)
+        if not result:
+            result = cls._get_matrix_osrm(points)
+        if not result:
+            result = cls._get_matrix_ors(points)
+        if not result:
+            logger.warning(f"Matrice de distances: APIs indisponibles, fallback haversine ({n} points)")
+            return cls._haversine_matrix_result(points)
+        
+        # Paires non routables (null) : compléter avec la distance haversine
+        haversine = cls.haversine_matrix(points)
+        for i in range(n):
+            for j in range(n):
+                if result['distances_km'][i][j] is None:
+                    result['distances_km'][i][j] = round(float(haversine[i, j]), 2)
+                if result['durations_min'][i][j] is None:
+                    result['durations_min'][i][j] = round(float(haversine[i, j]) * 3, 1)
+        
+        if cache_key:
+            cache.set(cache_key, result, cls.ROUTE_CACHE_TIMEOUT)
+        
+        return result
+    
+    @classmethod
+    def _get_matrix_blocks(cls, points: List[Tuple[float, float]], use_cache: bool = True) -> Dict:
+        """
+        Matrice de plus de MATRIX_MAX_POINTS points, assemblée par blocs
+        
+        Les points sont découpés en groupes de MATRIX_MAX_POINTS // 2 ; chaque paire
+        de groupes est une requête de MATRIX_MAX_POINTS points au plus, qui donne
+        les blocs croisés et les blocs diagonaux des deux groupes. La source vaut
+        'osrm+haversine' (par exemple) si des blocs n'ont pas pu être routés.
+        """
+        n = len(points)
+        size = max(1, cls.MATRIX_MAX_POINTS // 2)
+        groups = [list(range(start, min(start + size, n))) for start in range(0, n, size)]
+        pairs = [(a, b) for a in range(len(groups)) for b in range(a + 1, len(groups))]
+        if len(pairs) > cls.MATRIX_MAX_BLOCK_REQUESTS:
+            logger.warning(
+                f"Matrice de distances: {n} points ({len(pairs)} blocs), fallback haversine"
+            )
+            return cls._haversine_matrix_result(points)
+        
+        distances = [[None] * n for _ in range(n)]
+        durations = [[None] * n for _ in range(n)]
+        sources = []
+        for a, b in pairs:
+            indices = groups[a] + groups[b]
+            block = cls.get_distance_matrix([points[i] for i in indices], use_cache=use_cache)
+            if block['source'] not in sources:
+                sources.append(block['source'])
+            for row, i in enumerate(indices):
+                for col, j in enumerate(indices):
+                    distances[i][j] = block['distances_km'][row][col]
+                    durations[i][j] = block['durations_min'][row][col]
+        
+        logger.info(f"Matrice de distances par blocs: {n} points, {len(pairs)} requêtes")
+        return {
+            'distances_km': distances,
+            'durations_min': durations,
+            'source': '+'.join(sources),
+        }
+    
+    @classmethod
+    def _haversine_matrix_result(cls, points: List[Tuple[float, float]]) -> Dict:
+        distances = np.round(cls.haversine_matrix(points), 2)
+        return {
+            'distances_km': distances.tolist(),
+            'durations_min': np.round(distances * 3, 1).tolist(),  # Estimation ~20 km/h en ville
+            'source': 'haversine'
+        }
+    
+    @classmethod
+    def _get_matrix_offline(cls, points: List[Tuple[float, float]]) -> Optional[Dict]:
+        """
+        Matrice de distances via le graphe routier local (None si non configuré)
+        
+        Un Dijkstra par point source : au-delà de OFFLINE_ROUTING_MATRIX_MAX_POINTS
+        points, None pour laisser OSRM / ORS répondre plus vite.
+        """
+        graph = offline_router.graph
+        if graph is None or len(points) > getattr(settings, 'OFFLINE_ROUTING_MATRIX_MAX_POINTS', 8):
+            return None
+        try:
+            return graph.matrix(points)
+        except Exception as e:
+            logger.error(f"Erreur routing hors ligne (matrice): {e}")
+            return None
+    
+    @classmethod
+    def _get_matrix_osrm(cls, points: List[Tuple[float, float]]) -> Optional[Dict]:
+        """
+        Matrice de distances via l'endpoint /table d'OSRM (format lon,lat)
+        """
+        try:
+            coordinates = ';'.join(f"{lon},{lat}" for lat, lon in points)
+            url = f"{cls.OSRM_BASE_URL}/table/v1/driving/{coordinates}"
+            response = requests.get(url, params={'annotations': 'distance,duration'}, timeout=10)
+            
+            if response.status_code != 200:
+                logger.error(f"OSRM table erreur HTTP {response.status_code}")
+                return None
+            
+            data = response.json()
+            if data.get('code') != 'Ok' or not data.get('distances'):
+                logger.warning(f"OSRM table response invalide: {data.get('code')}")
+                return None
+            
+            return {
+                'distances_km': [
+                    [round(d / 1000, 2) if d is not None else None for d in row]
+                    for row in data['distances']
+                ],
+                'durations_min': [
+                    [round(d / 60, 1) if d is not None else None for d in row]
+                    for row in data.get('durations') or [[None] * len(points)] * len(points)
+                ],
+                'source': 'osrm'
+            }
+        except Exception as e:
+            logger.error(f"Erreur OSRM table: {e}")
+            return None
+    
+    @classmethod
+    def _get_matrix_ors(cls, points: List[Tuple[float, float]]) -> Optional[Dict]:
+        """
+        Matrice de distances via l'endpoint /matrix d'OpenRouteService (nécessite clé API)
+        """
+        if not cls.ORS_API_KEY:
+            return None
+        
+        try:
+            url = f"{cls.ORS_BASE_URL}/v2/matrix/driving-car"
+            headers = {
+                'Authorization': cls.ORS_API_KEY,
+                'Content-Type': 'application/json'
+            }
+            body = {
+                'locations': [[lon, lat] for lat, lon in points],
+                'metrics': ['distance', 'duration'],
+                'units': 'km'
+            }
+            response = requests.post(url, json=body, headers=headers, timeout=10)
+            
+            if response.status_code != 200:
+                logger.error(f"ORS matrix erreur {response.status_code}: {response.text[:200]}")
+                return None
+            
+            data = response.json()
+            if not data.get('distances'):
+                return None
+            
+            return {
+                'distances_km': [
+                    [round(d, 2) if d is not None else None for d in row]
+                    for row in data['distances']
+                ],
+                'durations_min': [
+                    [round(d / 60, 1) if d is not None else None for d in row]
+                    for row in data.get('durations') or [[None] * len(points)] * len(points)
+                ],
+                'source': 'openrouteservice'
+            }
+        except Exception as e:
+            logger.error(f"Erreur OpenRouteService matrix: {e}")
+            return None
     
     @classmethod
-    def geocode_address(cls, address: str, city: str = "Abidjan") -> Optional[Tuple[float, float]]:
+    def geocode_address(cls, address: str, city: str = "Abidjan", raise_errors: bool = False) -> Optional[Tuple[float, float]]:
         """
         Convertit une adresse en coordonnées GPS
         
         Args:
             address: Adresse à géocoder
             city: Ville (défaut: Abidjan)
+            raise_errors: Si True, les erreurs transitoires (réseau, 429, 5xx) sont levées
+                au lieu de renvoyer None (permet à une tâche Celery de réessayer)
         
         Returns:
             Tuple (latitude, longitude) ou None si échec
@@ -168,8 +561,15 @@ class LocationService:
                     return None
             else:
                 logger.error(f"Geocoding erreur {response.status_code}")
+                if raise_errors and (response.status_code == 429 or response.status_code >= 500):
+                    response.raise_for_status()
                 return None
                 
+        except requests.RequestException as e:
+            logger.error(f"Erreur geocoding: {e}")
+            if raise_errors:
+                raise
+            return None
         except Exception as e:
             logger.error(f"Erreur geocoding: {e}")
             return None
@@ -179,12 +579,19 @@ class LocationService:
         """
         Convertit des coordonnées GPS en adresse
         
+        Quartier le plus proche d'abord (index local des centroïdes, voir
+        quartier_locator), OpenRouteService seulement au-delà du rayon local.
+        
         Args:
             lat, lon: Coordonnées GPS
         
         Returns:
             Adresse formatée ou None si échec
         """
+        local_result = quartier_locator.locate(lat, lon)
+        if local_result:
+            return local_result['address']
+        
         if not cls.ORS_API_KEY:
             logger.warning("Pas de clé OpenRouteService, reverse geocoding impossible")
             return None
@@ -308,7 +715,8 @@ class LocationService:
         """
         Calcule un itinéraire entre 2 points avec polyline pour affichage carte
         
-        Utilise OSRM (gratuit) en priorité, avec fallback sur OpenRouteService
+        Utilise OSRM (gratuit) en priorité, avec fallback sur OpenRouteService :
+        requête hedgée vers ORS si OSRM tarde (voir routing_providers)
         
         Args:
             start_lat, start_lon: Coordonnées du point de départ
@@ -346,14 +754,6 @@ class LocationService:
             # never fail due to logging
             pass
 
-        # Vérifier le cache
-        if use_cache:
-            cache_key = f"route:{start_lat:.5f},{start_lon:.5f}:{end_lat:.5f},{end_lon:.5f}"
-            cached = cache.get(cache_key)
-            if cached:
-                logger.info("Route trouvée en cache")
-                return cached
-
         # Guard: reject clearly invalid coordinates such as exact (0.0, 0.0) or non-finite values.
         def _invalid_point(lat, lon):
             try:
@@ -411,28 +811,35 @@ class LocationService:
             # Valid routes (from OSRM/ORS) will be cached at the end of the function.
 
             return result
+
+        # Vérifier le cache (extrémités alignées sur la grille du cache, voir route_cache)
+        if use_cache:
+            cached = route_cache.get(start_lat, start_lon, end_lat, end_lon)
+            if cached:
+                logger.info("Route trouvée en cache")
+                return cached
+        fetch_started = time.perf_counter()
         
         # Choix du provider : par défaut OSRM d'abord, fallback ORS.
         # Si on souhaite prioriser OpenRouteService (par ex. pas d'OSRM local
         # et vous avez une clé ORS), activez l'env `PREFER_ORS=true`.
         prefer_ors = os.getenv('PREFER_ORS', '').lower() in ('1', 'true', 'yes')
 
-        result = None
-
-        if prefer_ors and cls.ORS_API_KEY:
-            logger.info("PREFERENCE: utilisation d'OpenRouteService en priorité")
-            result = cls._get_route_ors(start_lat, start_lon, end_lat, end_lon, context=context)
-            # Si ORS échoue, tenter OSRM ensuite
-            if not result:
-                logger.info("OpenRouteService a échoué, essai OSRM...")
-                result = cls._get_route_osrm(start_lat, start_lon, end_lat, end_lon, context=context)
-        else:
-            # Essayer OSRM d'abord (gratuit, pas de clé API)
-            result = cls._get_route_osrm(start_lat, start_lon, end_lat, end_lon, context=context)
-            # Fallback sur OpenRouteService si OSRM échoue
-            if not result and cls.ORS_API_KEY:
-                logger.info("OSRM indisponible, essai OpenRouteService...")
-                result = cls._get_route_ors(start_lat, start_lon, end_lat, end_lon, context=context)
+        # Providers par ordre de préférence : l'orchestrateur lance le premier,
+        # hedge vers le suivant s'il tarde et ignore ceux dont le disjoncteur est ouvert
+        candidates = [('osrm', cls._get_route_osrm)]
+        if cls.ORS_API_KEY:
+            candidates.append(('openrouteservice', cls._get_route_ors))
+            if prefer_ors:
+                logger.info("PREFERENCE: utilisation d'OpenRouteService en priorité")
+                candidates.reverse()
+        graph = offline_router.graph
+        if graph is not None and graph.nearest(start_lat, start_lon) and graph.nearest(end_lat, end_lon):
+            # Graphe routier local : aucun appel réseau, les APIs en secours. Un point hors
+            # du réseau n'est pas proposé au graphe (ce n'est pas un échec du provider,
+            # qui ouvrirait son disjoncteur)
+            candidates.insert(0, ('offline', cls._get_route_offline))
+        result = routing_orchestrator.route(candidates, (start_lat, start_lon, end_lat, end_lon), context=context)
         
         # Fallback sur ligne droite si tout échoue
         if not result:
@@ -454,10 +861,41 @@ class LocationService:
         
         # Mettre en cache (ne pas mettre en cache les fallbacks causés par des coordonnées invalides)
         if use_cache and result and result.get('source') != 'fallback_invalid_input':
-            cache.set(cache_key, result, cls.ROUTE_CACHE_TIMEOUT)
+            # Une ligne droite de secours ne doit pas masquer longtemps le retour du provider
+            timeout = (
+                cls.ROUTE_FALLBACK_CACHE_TIMEOUT if result.get('source') == 'fallback_straight_line'
+                else cls.ROUTE_CACHE_TIMEOUT
+            )
+            route_cache.set(
+                start_lat, start_lon, end_lat, end_lon, result, timeout,
+                fetch_seconds=time.perf_counter() - fetch_started
+            )
         
         return result
     
+    @classmethod
+    def _get_route_offline(
+        cls,
+        start_lat: float,
+        start_lon: float,
+        end_lat: float,
+        end_lon: float,
+        context: Optional[Dict] = None,
+    ) -> Optional[Dict]:
+        """
+        Obtenir un itinéraire via le graphe routier local (voir offline_routing)
+        
+        None si aucun graphe n'est configuré ou si un point est loin du réseau
+        """
+        graph = offline_router.graph
+        if graph is None:
+            return None
+        try:
+            return graph.route(start_lat, start_lon, end_lat, end_lon)
+        except Exception as e:
+            logger.error(f"Erreur routing hors ligne: {e}")
+            return None
+    
     @classmethod
     def _get_route_osrm(
         cls,
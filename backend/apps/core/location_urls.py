@@ -13,6 +13,7 @@ from .location_views import (
     search_suggestions,
     validate_quartier_exists,
     get_route,
+    route_cache_stats,
     get_delivery_route,
 )
 
@@ -63,6 +64,10 @@ urlpatterns = [
     # Body: {"origin": {"lat": 5.36, "lng": -4.01}, "destination": {"lat": 5.29, "lng": -3.98}}
     path('route/', get_route, name='get-route'),
     
+    # Métriques du cache des itinéraires (admin)
+    # GET /api/v1/locations/route/stats/
+    path('route/stats/', route_cache_stats, name='route-cache-stats'),
+    
     # Calculer l'itinéraire complet d'une livraison
     # POST /api/v1/locations/delivery-route/
     # Body: {"pickup": {...}, "delivery": {...}, "driver": {...}}
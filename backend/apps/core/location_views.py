@@ -6,10 +6,12 @@ Ces endpoints sont utilisés par les apps Flutter (merchant_app, driver_app)
 pour obtenir les coordonnées GPS des adresses de livraison.
 """
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework import status
 from .nominatim_service import NominatimService
+from .quartier_index import quartier_index
+from .quartier_locator import quartier_locator
 from .quartiers_data import (
     get_all_quartiers,
     get_quartiers_by_commune,
@@ -23,6 +25,18 @@ import sentry_sdk
 logger = logging.getLogger(__name__)
 
 
+def _geocode_pending_response(message='Géocodage en cours, réessayez dans quelques secondes'):
+    """
+    202 pour une adresse inconnue dont la résolution Nominatim est en file d'attente
+    (voir apps/core/geocode_store.py) : le client redemande après Retry-After
+    """
+    return Response(
+        {'success': False, 'pending': True, 'message': message},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Retry-After': '2'}
+    )
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def list_quartiers(request):
@@ -118,7 +132,8 @@ def geocode_quartier(request):
     Géocode un quartier pour obtenir ses coordonnées GPS.
     
     1. Cherche d'abord dans la base locale (instantané)
-    2. Si non trouvé, utilise Nominatim (gratuit)
+    2. Si non trouvé, utilise Nominatim (gratuit) : résultat conservé en base,
+       première demande résolue en arrière-plan (202 + "pending": true)
     
     Body:
     {
@@ -171,7 +186,11 @@ def geocode_quartier(request):
         })
     
     # Étape 2: Utiliser Nominatim si non trouvé localement
-    nominatim_result = NominatimService.geocode_quartier(quartier, commune)
+    lookup = NominatimService.lookup_quartier(quartier, commune)
+    nominatim_result = lookup.result
+    
+    if lookup.status == 'pending':
+        return _geocode_pending_response()
     
     if nominatim_result:
         return Response({
@@ -188,7 +207,7 @@ def geocode_quartier(request):
     return Response({
         'success': False,
         'error': f'Impossible de trouver "{quartier}" à {commune}. Vérifiez l\'orthographe.',
-        'suggestions': search_quartiers(quartier[:3], 5) if len(quartier) >= 3 else []
+        'suggestions': search_quartiers(quartier, 5)
     }, status=status.HTTP_404_NOT_FOUND)
 
 
@@ -224,7 +243,11 @@ def geocode_address_nominatim(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    result = NominatimService.geocode_address(address, city)
+    lookup = NominatimService.lookup_address(address, city)
+    result = lookup.result
+    
+    if lookup.status == 'pending':
+        return _geocode_pending_response()
     
     if result:
         lat, lon = result
@@ -251,6 +274,9 @@ def reverse_geocode_nominatim(request):
     Convertit des coordonnées GPS en adresse.
     Utile pour afficher l'adresse après sélection sur carte.
     
+    1. Quartier le plus proche dans l'index local des centroïdes (instantané)
+    2. Au-delà de REVERSE_GEOCODE_LOCAL_RADIUS_METERS, Nominatim
+    
     Body:
     {
         "latitude": 5.3679,
@@ -262,7 +288,12 @@ def reverse_geocode_nominatim(request):
         "success": true,
         "latitude": 5.3679,
         "longitude": -3.985,
-        "address": "Riviera 2, Cocody, Abidjan, Côte d'Ivoire"
+        "address": "Riviera 2, Cocody, Abidjan, Côte d'Ivoire",
+        "quartier": "Riviera 2",      // réponse locale uniquement
+        "commune": "COCODY",
+        "distance_m": 0.0,            // distance au centroïde
+        "confidence": 1.0,            // 1 sur le centroïde, 0 à la limite du rayon
+        "source": "local"             // ou "nominatim"
     }
     """
     latitude = request.data.get('latitude')
@@ -283,14 +314,24 @@ def reverse_geocode_nominatim(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    address = NominatimService.reverse_geocode(lat, lon)
+    local_result = quartier_locator.locate(lat, lon)
+    
+    if local_result:
+        return Response({'success': True, **local_result})
+    
+    lookup = NominatimService.lookup_reverse(lat, lon)
+    address = lookup.result
+    
+    if lookup.status == 'pending':
+        return _geocode_pending_response()
     
     if address:
         return Response({
             'success': True,
             'latitude': lat,
             'longitude': lon,
-            'address': address
+            'address': address,
+            'source': 'nominatim'
         })
     else:
         return Response({
@@ -327,7 +368,8 @@ def search_suggestions(request):
     """
     GET /api/v1/locations/suggestions/?q=Riviera
     
-    Recherche des suggestions d'adresses avec Nominatim.
+    Recherche des suggestions d'adresses : index local des quartiers, puis
+    Nominatim seulement si aucun quartier ne correspond vraiment.
     Pour l'autocomplete dans les apps Flutter.
     
     Query params:
@@ -357,21 +399,22 @@ def search_suggestions(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # D'abord chercher dans les données locales (plus rapide)
-    local_results = search_quartiers(query, limit)
+    # D'abord chercher dans l'index local (quelques microsecondes)
+    local_matches = quartier_index.search(query, limit)
     
     # Formater comme suggestions
     suggestions = []
-    for q in local_results:
+    for match in local_matches:
+        q = match.entry
         suggestions.append({
-            'display_name': f"{q['nom']}, {q['commune']}, Abidjan",
-            'latitude': q['latitude'],
-            'longitude': q['longitude'],
+            'display_name': f"{q.nom}, {q.commune}, Abidjan",
+            'latitude': q.latitude,
+            'longitude': q.longitude,
             'source': 'local'
         })
     
-    # Si pas assez de résultats locaux, compléter avec Nominatim
-    if len(suggestions) < limit:
+    # Nominatim seulement si l'index local n'a aucune correspondance sûre
+    if not any(match.is_good for match in local_matches):
         nominatim_results = NominatimService.search_suggestions(query, limit - len(suggestions))
         for r in nominatim_results:
             suggestions.append({
@@ -474,10 +517,14 @@ def validate_quartier_exists(request):
     
     if local_result and not local_result.get('has_gps'):
         # Trouvé mais sans GPS → vérifier sur Nominatim
-        nominatim_result = NominatimService.geocode_quartier(
+        lookup = NominatimService.lookup_quartier(
             local_result['nom'], 
             local_result['commune']
         )
+        nominatim_result = lookup.result
+        
+        if lookup.status == 'pending':
+            return _geocode_pending_response()
         
         if nominatim_result:
             return Response({
@@ -497,9 +544,13 @@ def validate_quartier_exists(request):
     
     # ÉTAPE 2: Recherche directe sur Nominatim
     address_to_search = f"{quartier}, {commune}, Abidjan" if commune else f"{quartier}, Abidjan"
-    nominatim_result = NominatimService.geocode_address(address_to_search)
+    lookup = NominatimService.lookup_address(address_to_search)
     
-    if nominatim_result:
+    if lookup.status == 'pending':
+        return _geocode_pending_response()
+    
+    if lookup.result:
+        latitude, longitude = lookup.result
         return Response({
             'success': True,
             'found': True,
@@ -508,9 +559,9 @@ def validate_quartier_exists(request):
             'quartier': {
                 'nom': quartier,
                 'commune': commune.upper() if commune else 'ABIDJAN',
-                'latitude': nominatim_result['latitude'],
-                'longitude': nominatim_result['longitude'],
-                'display_name': nominatim_result.get('display_name', ''),
+                'latitude': latitude,
+                'longitude': longitude,
+                'display_name': address_to_search,
                 'has_gps': True
             }
         })
@@ -616,6 +667,22 @@ def get_route(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def route_cache_stats(request):
+    """
+    GET /api/v1/locations/route/stats/
+    
+    Métriques du cache des itinéraires (admin) : hits local / partagé,
+    misses, taux de hit et latence (p50 / p95), pour ce worker et pour
+    l'ensemble des workers ; état des providers de routing de ce worker
+    (disjoncteurs, taux de succès, latence, requêtes hedgées).
+    """
+    from .route_cache import route_cache
+    from .routing_providers import routing_orchestrator
+    return Response({**route_cache.stats(), 'routing': routing_orchestrator.stats()})
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def get_delivery_route(request):
@@ -7,387 +7,355 @@ Ce service permet de :
 - Faire du reverse geocoding (coordonnées GPS -> adresse)
 - Rechercher des quartiers d'Abidjan avec leurs coordonnées
 
+Les géocodages sont conservés en base (GeocodeEntry, voir
+apps/core/geocode_store.py) : une requête déjà résolue ne repart jamais vers
+Nominatim. Une requête inconnue est résolue en arrière-plan par la tâche
+pricing.resolve_geocode, sous une limite de débit commune à tous les
+process : les requêtes web n'attendent jamais.
+
 Aucune clé API requise !
 """
 import logging
 import requests
 import time
+from math import cos, radians
 from typing import Optional, Tuple, List, Dict
+from django.conf import settings
 from django.core.cache import cache
 
+from .geocode_store import GeocodeLookup, geocode_store, nominatim_limiter
+from .route_cache import METERS_PER_DEGREE, snap_point
+
 logger = logging.getLogger(__name__)
 
 
+class NominatimUnavailable(Exception):
+    """Nominatim injoignable ou surchargé (réseau, 429, 503) : à réessayer plus tard"""
+
+
+class NominatimRateLimited(NominatimUnavailable):
+    """Aucun jeton disponible dans le délai accordé"""
+
+    def __init__(self, wait: float):
+        super().__init__(f"limite de débit Nominatim, prochain jeton dans {wait:.2f}s")
+        self.wait = wait
+
+
 class NominatimService:
     """
     Service de géocodage gratuit utilisant Nominatim (OpenStreetMap)
-    
+
     Avantages:
     - 100% gratuit
     - Pas de limite mensuelle
     - Bonne couverture d'Abidjan
-    
+
     Règles d'utilisation:
-    - Max 1 requête par seconde (géré automatiquement)
+    - Max 1 requête par seconde pour toute l'application (token bucket Redis)
     - User-Agent standard (navigateur)
     """
-    
+
     BASE_URL = 'https://nominatim.openstreetmap.org'
     # User-Agent navigateur standard (évite les blocages 503)
     USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    CACHE_TIMEOUT = 86400  # 24 heures
-    
-    # Dernière requête (pour respecter la limite 1/sec)
-    _last_request_time = 0
-    
+
+    @classmethod
+    def _request(cls, endpoint: str, params: Dict, max_wait: float = 0, timeout: int = 15):
+        """
+        Appel HTTP à Nominatim sous la limite de débit partagée
+
+        Args:
+            endpoint: 'search' ou 'reverse'
+            params: Paramètres de la requête
+            max_wait: Attente maximale d'un jeton en secondes (0 = requête web, jamais d'attente)
+            timeout: Timeout HTTP
+
+        Returns:
+            JSON de la réponse, ou None (réponse HTTP inexploitable)
+
+        Raises:
+            NominatimRateLimited: Pas de jeton dans le délai max_wait
+            NominatimUnavailable: Erreur réseau, 429 ou 503
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = nominatim_limiter.acquire()
+            if not wait:
+                break
+            if time.monotonic() + wait > deadline:
+                raise NominatimRateLimited(wait)
+            time.sleep(wait)
+
+        headers = {
+            'User-Agent': cls.USER_AGENT,
+            'Accept': 'application/json',
+            'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8'
+        }
+        try:
+            response = requests.get(
+                f'{cls.BASE_URL}/{endpoint}',
+                params=params,
+                headers=headers,
+                timeout=timeout
+            )
+        except requests.RequestException as e:
+            raise NominatimUnavailable(f"erreur réseau: {e}")
+
+        if response.status_code in (429, 503):
+            logger.warning(f"⚠️ Nominatim indisponible ({response.status_code})")
+            raise NominatimUnavailable(f"HTTP {response.status_code}")
+        if response.status_code != 200:
+            logger.warning(f"⚠️ Erreur HTTP {response.status_code}")
+            return None
+        return response.json()
+
+    @classmethod
+    def _search_first(cls, queries: List[str], max_wait: float) -> Optional[Dict]:
+        """Premier résultat de la première variante de requête qui en donne un"""
+        for query in queries:
+            data = cls._request('search', {
+                'q': query,
+                'format': 'json',
+                'limit': 1,
+                'countrycodes': 'ci',  # Restreindre à la Côte d'Ivoire
+            }, max_wait=max_wait)
+            if data:
+                return data[0]
+        return None
+
+    @classmethod
+    def resolve(cls, kind: str, params: Dict, max_wait: float = 0):
+        """
+        Interroge Nominatim pour une entrée du stockage (tâche pricing.resolve_geocode)
+
+        Args:
+            kind: 'quartier', 'address' ou 'reverse'
+            params: Paramètres enregistrés par geocode_quartier / geocode_address / reverse_geocode
+            max_wait: Attente maximale d'un jeton par appel HTTP
+
+        Returns:
+            Résultat à stocker (dict, [lat, lon] ou adresse), None si introuvable
+
+        Raises:
+            NominatimUnavailable: La résolution est à réessayer
+        """
+        if kind == 'quartier':
+            quartier, commune, city = params['quartier'], params['commune'], params['city']
+            # Format simplifié pour meilleure compatibilité : essayer plusieurs variantes
+            result = cls._search_first([
+                f"{quartier}, {commune}, {city}",  # Simple
+                f"{quartier} {commune} {city}",    # Sans virgules
+                f"{quartier}, {city}",              # Sans commune
+            ], max_wait)
+            if not result:
+                logger.warning(f"⚠️ Aucun résultat pour: {quartier}, {commune}")
+                return None
+            location_data = {
+                'latitude': float(result['lat']),
+                'longitude': float(result['lon']),
+                'display_name': result.get('display_name', ''),
+                'quartier': quartier,
+                'commune': commune,
+                'city': city,
+                'success': True
+            }
+            logger.info(f"✅ Géocodé: {quartier}, {commune} -> ({location_data['latitude']}, {location_data['longitude']})")
+            return location_data
+
+        if kind == 'address':
+            address, city = params['address'], params['city']
+            result = cls._search_first([
+                f"{address}, {city}",
+                f"{address} {city}",
+            ], max_wait)
+            if not result:
+                logger.warning(f"⚠️ Aucun résultat pour: {address}")
+                return None
+            lat, lon = float(result['lat']), float(result['lon'])
+            logger.info(f"✅ Adresse géocodée: {address} -> ({lat}, {lon})")
+            return [lat, lon]
+
+        if kind == 'reverse':
+            data = cls._request('reverse', {
+                'lat': params['latitude'],
+                'lon': params['longitude'],
+                'format': 'json',
+                'zoom': 18,  # Niveau de détail
+            }, max_wait=max_wait)
+            if not data or 'display_name' not in data:
+                return None
+            logger.info(f"✅ Reverse geocode: ({params['latitude']}, {params['longitude']}) -> {data['display_name']}")
+            return data['display_name']
+
+        raise ValueError(f"Type de géocodage inconnu: {kind}")
+
     @classmethod
-    def _wait_for_rate_limit(cls):
+    def lookup_quartier(cls, quartier: str, commune: str, city: str = "Abidjan") -> GeocodeLookup:
         """
-        Attend le temps nécessaire pour respecter la limite de 1 req/sec
-        Évite de se faire bloquer par Nominatim
+        Géocodage d'un quartier depuis le stockage, planifié s'il est inconnu
+
+        Returns:
+            GeocodeLookup(status, result) ; status 'found', 'not_found' ou 'pending'
         """
-        current_time = time.time()
-        time_since_last = current_time - cls._last_request_time
-        
-        if time_since_last < 1:
-            time.sleep(1 - time_since_last)
-        
-        cls._last_request_time = time.time()
-    
+        return geocode_store.lookup(
+            'quartier',
+            f"{quartier}, {commune}, {city}",
+            {'quartier': quartier, 'commune': commune, 'city': city}
+        )
+
     @classmethod
     def geocode_quartier(
-        cls, 
-        quartier: str, 
-        commune: str, 
+        cls,
+        quartier: str,
+        commune: str,
         city: str = "Abidjan"
     ) -> Optional[Dict]:
         """
         Géocode un quartier pour obtenir ses coordonnées GPS
-        
+
         Args:
             quartier: Nom du quartier (ex: "Riviera 2")
             commune: Nom de la commune (ex: "Cocody")
             city: Ville (défaut: Abidjan)
-        
+
         Returns:
-            Dict avec {latitude, longitude, display_name} ou None si échec
-        
+            Dict avec {latitude, longitude, display_name}, ou None si introuvable
+            ou pas encore résolu (voir lookup_quartier)
+
         Example:
             >>> result = NominatimService.geocode_quartier("Riviera 2", "Cocody")
             >>> print(result)  # {'latitude': 5.365, 'longitude': -4.008, ...}
         """
-        # Clé de cache pour éviter les requêtes répétées
-        cache_key = f"nominatim_geo_{quartier}_{commune}_{city}".lower().replace(' ', '_')
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            logger.info(f"✅ Cache hit pour {quartier}, {commune}")
-            return cached_result
-        
-        try:
-            cls._wait_for_rate_limit()
-            
-            # Construire la requête
-            # Format simplifié pour meilleure compatibilité
-            # Essayer plusieurs variantes
-            queries_to_try = [
-                f"{quartier}, {commune}, {city}",  # Simple
-                f"{quartier} {commune} {city}",    # Sans virgules
-                f"{quartier}, {city}",              # Sans commune
-            ]
-            
-            headers = {
-                'User-Agent': cls.USER_AGENT,
-                'Accept': 'application/json',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8'
-            }
-            
-            result = None
-            
-            # Essayer les différentes variantes
-            for query in queries_to_try:
-                params = {
-                    'q': query,
-                    'format': 'json',
-                    'limit': 1,
-                    'countrycodes': 'ci',  # Restreindre à la Côte d'Ivoire
-                }
-                
-                try:
-                    response = requests.get(
-                        f'{cls.BASE_URL}/search',
-                        params=params,
-                        headers=headers,
-                        timeout=15
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data:
-                            result = data[0]
-                            break
-                    elif response.status_code == 503:
-                        logger.warning(f"⚠️ Nominatim surchargé (503), attente 2 secondes...")
-                        time.sleep(2)
-                        continue
-                    elif response.status_code == 429:
-                        logger.warning(f"⚠️ Trop de requêtes (429), attente 3 secondes...")
-                        time.sleep(3)
-                        continue
-                        
-                except requests.RequestException:
-                    continue
-            
-            # Traiter le résultat si trouvé
-            if result:
-                location_data = {
-                    'latitude': float(result['lat']),
-                    'longitude': float(result['lon']),
-                    'display_name': result.get('display_name', ''),
-                    'quartier': quartier,
-                    'commune': commune,
-                    'city': city,
-                    'success': True
-                }
-                
-                # Mettre en cache
-                cache.set(cache_key, location_data, cls.CACHE_TIMEOUT)
-                
-                logger.info(f"✅ Géocodé: {quartier}, {commune} -> ({location_data['latitude']}, {location_data['longitude']})")
-                return location_data
-            else:
-                logger.warning(f"⚠️ Aucun résultat pour: {quartier}, {commune}")
-                return None
-                
-        except requests.RequestException as e:
-            logger.error(f"❌ Erreur réseau Nominatim: {e}")
-            return None
-        except Exception as e:
-            logger.error(f"❌ Erreur inattendue: {e}")
-            return None
-    
+        return cls.lookup_quartier(quartier, commune, city).result
+
+    @classmethod
+    def lookup_address(cls, address: str, city: str = "Abidjan") -> GeocodeLookup:
+        """
+        Géocodage d'une adresse libre depuis le stockage, planifié s'il est inconnu
+
+        Returns:
+            GeocodeLookup(status, (latitude, longitude) ou None)
+        """
+        lookup = geocode_store.lookup('address', f"{address}, {city}", {'address': address, 'city': city})
+        if lookup.result:
+            return GeocodeLookup(lookup.status, tuple(lookup.result))
+        return lookup
+
     @classmethod
     def geocode_address(
-        cls, 
-        address: str, 
+        cls,
+        address: str,
         city: str = "Abidjan"
     ) -> Optional[Tuple[float, float]]:
         """
         Géocode une adresse libre (alternative à OpenRouteService)
-        
+
         Args:
             address: Adresse complète
             city: Ville (défaut: Abidjan)
-        
+
         Returns:
-            Tuple (latitude, longitude) ou None si échec
+            Tuple (latitude, longitude), ou None si introuvable ou pas encore résolu
         """
-        cache_key = f"nominatim_addr_{address}_{city}".lower().replace(' ', '_')
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return cached_result
-        
-        try:
-            cls._wait_for_rate_limit()
-            
-            # Essayer plusieurs formats
-            queries = [
-                f"{address}, {city}",
-                f"{address} {city}",
-            ]
-            
-            headers = {
-                'User-Agent': cls.USER_AGENT,
-                'Accept': 'application/json',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8'
-            }
-            
-            result = None
-            
-            for query in queries:
-                params = {
-                    'q': query,
-                    'format': 'json',
-                    'limit': 1,
-                    'countrycodes': 'ci',
-                }
-                
-                try:
-                    response = requests.get(
-                        f'{cls.BASE_URL}/search',
-                        params=params,
-                        headers=headers,
-                        timeout=15
-                    )
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data:
-                            result = data[0]
-                            break
-                    elif response.status_code in [503, 429]:
-                        time.sleep(2)
-                        continue
-                        
-                except requests.RequestException:
-                    continue
-            
-            if result:
-                lat = float(result['lat'])
-                lon = float(result['lon'])
-                
-                # Mettre en cache
-                cache.set(cache_key, (lat, lon), cls.CACHE_TIMEOUT)
-                
-                logger.info(f"✅ Adresse géocodée: {address} -> ({lat}, {lon})")
-                return (lat, lon)
-            else:
-                logger.warning(f"⚠️ Aucun résultat pour: {address}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"❌ Erreur geocoding: {e}")
-            return None
-    
+        return cls.lookup_address(address, city).result
+
+    @classmethod
+    def lookup_reverse(cls, latitude: float, longitude: float) -> GeocodeLookup:
+        """
+        Reverse geocoding depuis le stockage, planifié s'il est inconnu
+
+        Les positions sont alignées sur une grille de NOMINATIM_REVERSE_GRID_METERS
+        (30 m) : les fixes GPS d'un même lieu partagent une entrée (et un appel
+        Nominatim, fait au centre de la cellule) au lieu d'en créer une chacun.
+        """
+        grid = float(getattr(settings, 'NOMINATIM_REVERSE_GRID_METERS', 30))
+        row, col = snap_point(float(latitude), float(longitude), grid)
+        step = grid / METERS_PER_DEGREE
+        center_lat = round(row * step, 6)
+        center_lon = round(col * step / max(cos(radians(row * step)), 0.01), 6)
+        # Hémisphères en lettres : normalize_query retire les signes moins
+        query = (
+            f"{abs(center_lat):.6f}{'N' if center_lat >= 0 else 'S'},"
+            f"{abs(center_lon):.6f}{'E' if center_lon >= 0 else 'W'}"
+        )
+        return geocode_store.lookup('reverse', query, {'latitude': center_lat, 'longitude': center_lon})
+
     @classmethod
     def reverse_geocode(
-        cls, 
-        latitude: float, 
+        cls,
+        latitude: float,
         longitude: float
     ) -> Optional[str]:
         """
         Convertit des coordonnées GPS en adresse lisible
-        
+
         Args:
             latitude: Latitude
             longitude: Longitude
-        
+
         Returns:
-            Adresse formatée ou None si échec
+            Adresse formatée, ou None si introuvable ou pas encore résolue
         """
-        cache_key = f"nominatim_rev_{latitude:.6f}_{longitude:.6f}"
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
-            return cached_result
-        
-        try:
-            cls._wait_for_rate_limit()
-            
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'format': 'json',
-                'zoom': 18,  # Niveau de détail
-            }
-            
-            headers = {
-                'User-Agent': cls.USER_AGENT,
-                'Accept': 'application/json',
-                'Accept-Language': 'fr-FR,fr;q=0.9,en;q=0.8'
-            }
-            
-            response = requests.get(
-                f'{cls.BASE_URL}/reverse',
-                params=params,
-                headers=headers,
-                timeout=15
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'display_name' in data:
-                    address = data['display_name']
-                    
-                    # Mettre en cache
-                    cache.set(cache_key, address, cls.CACHE_TIMEOUT)
-                    
-                    logger.info(f"✅ Reverse geocode: ({latitude}, {longitude}) -> {address}")
-                    return address
-                else:
-                    return None
-            elif response.status_code in [503, 429]:
-                logger.warning(f"⚠️ Nominatim temporairement indisponible ({response.status_code})")
-                return None
-            else:
-                logger.warning(f"⚠️ Erreur HTTP {response.status_code}")
-                return None
-                
-        except Exception as e:
-            logger.error(f"❌ Erreur reverse geocoding: {e}")
-            return None
-    
+        return cls.lookup_reverse(latitude, longitude).result
+
     @classmethod
     def search_suggestions(
-        cls, 
-        query: str, 
+        cls,
+        query: str,
         limit: int = 5
     ) -> List[Dict]:
         """
         Recherche des suggestions d'adresses (pour autocomplete)
-        
+
+        Appel direct (saisie en cours, non conservé en base) uniquement si un
+        jeton est disponible tout de suite : sinon aucune suggestion Nominatim.
+
         Args:
             query: Texte de recherche (ex: "Riviera")
             limit: Nombre max de résultats
-        
+
         Returns:
             Liste de suggestions [{display_name, lat, lon}, ...]
         """
         if len(query) < 3:
             return []
-        
+
         cache_key = f"nominatim_search_{query}_{limit}".lower().replace(' ', '_')
         cached_result = cache.get(cache_key)
-        
+
         if cached_result:
             return cached_result
-        
+
         try:
-            cls._wait_for_rate_limit()
-            
             # Ajouter Abidjan pour restreindre la recherche
             full_query = f"{query}, Abidjan, Côte d'Ivoire"
-            
-            params = {
+
+            data = cls._request('search', {
                 'q': full_query,
                 'format': 'json',
                 'limit': limit,
                 'countrycodes': 'ci',
-            }
-            
-            headers = {
-                'User-Agent': cls.USER_AGENT,
-                'Accept': 'application/json'
-            }
-            
-            response = requests.get(
-                f'{cls.BASE_URL}/search',
-                params=params,
-                headers=headers,
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                suggestions = []
-                for item in data:
-                    suggestions.append({
-                        'display_name': item.get('display_name', ''),
-                        'latitude': float(item['lat']),
-                        'longitude': float(item['lon']),
-                        'type': item.get('type', ''),
-                    })
-                
-                # Mettre en cache (5 minutes pour les suggestions)
-                cache.set(cache_key, suggestions, 300)
-                
-                return suggestions
-            else:
+            }, timeout=10)
+            if data is None:
                 return []
-                
+
+            suggestions = []
+            for item in data:
+                suggestions.append({
+                    'display_name': item.get('display_name', ''),
+                    'latitude': float(item['lat']),
+                    'longitude': float(item['lon']),
+                    'type': item.get('type', ''),
+                })
+
+            # Mettre en cache (5 minutes pour les suggestions)
+            cache.set(cache_key, suggestions, 300)
+
+            return suggestions
+
+        except NominatimUnavailable as e:
+            logger.info(f"Suggestions Nominatim ignorées: {e}")
+            return []
         except Exception as e:
             logger.error(f"❌ Erreur recherche: {e}")
             return []
@@ -0,0 +1,719 @@
+"""
+Routing embarqué sur un extrait OpenStreetMap (sans réseau)
+
+Les itinéraires et distances dépendaient uniquement de services externes
+(OSRM de démo, OpenRouteService) : limites de débit et latence réseau sur
+chaque devis. Ce module calcule les mêmes résultats localement :
+
+- Construction (commande `build_routing_graph`, une fois par extrait) :
+  lecture d'un extrait OSM (.osm / .osm.gz / .osm.bz2, ou .osm.pbf si
+  pyosmium est installé), routes carrossables uniquement, sens uniques
+  respectés, nœuds intermédiaires des voies fusionnés dans la géométrie
+  des arcs (le graphe ne garde que les intersections), conservation de la
+  plus grande composante fortement connexe (toute paire de nœuds est
+  joignable), puis précalcul des landmarks. Le tout est enregistré dans un
+  fichier .npz de tableaux NumPy (graphe CSR).
+- Requêtes : A* avec landmarks (ALT) sur les temps de parcours pour un
+  itinéraire, Dijkstra un-vers-plusieurs pour les matrices de distances
+  (un par point : LocationService ne les demande que jusqu'à
+  OFFLINE_ROUTING_MATRIX_MAX_POINTS points, OSRM / ORS au-delà).
+  Les points sont rattachés à l'intersection la plus proche (au plus
+  OFFLINE_ROUTING_MAX_SNAP_METERS, 500 m), l'approche étant comptée à vol
+  d'oiseau.
+
+Les restrictions de tourner ne sont pas prises en compte.
+
+Usage:
+    graph = offline_router.graph  # None si OFFLINE_ROUTING_GRAPH n'est pas configuré
+    graph.route(start_lat, start_lon, end_lat, end_lon)
+    graph.matrix([(lat, lon), ...])
+"""
+import bz2
+import gzip
+import heapq
+import json
+import logging
+import os
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from collections import Counter
+from math import asin, ceil, cos, inf, radians, sin, sqrt
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import polyline
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+GRAPH_FORMAT_VERSION = 1
+
+EARTH_RADIUS_M = 6371000.0
+
+# Vitesses par défaut (km/h) des routes carrossables, par type de voie OSM
+HIGHWAY_SPEEDS_KMH = {
+    'motorway': 80, 'motorway_link': 45,
+    'trunk': 65, 'trunk_link': 40,
+    'primary': 50, 'primary_link': 35,
+    'secondary': 40, 'secondary_link': 30,
+    'tertiary': 35, 'tertiary_link': 25,
+    'unclassified': 25, 'residential': 20,
+    'living_street': 10, 'service': 15, 'road': 20,
+}
+
+# Vitesse de l'approche (point demandé -> intersection la plus proche)
+ACCESS_SPEED_KMH = 15
+
+# Pas de la grille d'index des intersections (degrés, ~550 m)
+SNAP_CELL_DEGREES = 0.005
+
+NO_ACCESS = {'no', 'private'}
+ONEWAY_FORWARD = {'yes', 'true', '1'}
+
+
+def _haversine_m(lat1, lon1, lat2, lon2):
+    """Distance haversine en mètres (scalaires ou tableaux NumPy)"""
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _segment_m(lat1, lon1, lat2, lon2):
+    """Distance haversine en mètres entre deux points (scalaires, sans NumPy)"""
+    lat1, lon1, lat2, lon2 = radians(lat1), radians(lon1), radians(lat2), radians(lon2)
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * asin(sqrt(min(a, 1.0)))
+
+
+def _parse_speed(maxspeed: Optional[str]) -> Optional[float]:
+    """Valeur numérique d'un tag maxspeed ('50', '50 km/h', '30 mph'), sinon None"""
+    if not maxspeed:
+        return None
+    match = re.match(r'\s*(\d+(?:\.\d+)?)\s*(mph)?', maxspeed)
+    if not match:
+        return None
+    speed = float(match.group(1))
+    return speed * 1.609 if match.group(2) else speed
+
+
+def way_profile(tags: Dict[str, str]) -> Optional[Tuple[float, int]]:
+    """
+    (vitesse km/h, sens) d'une voie OSM carrossable, None sinon.
+
+    sens: 0 = double sens, 1 = sens unique dans l'ordre des nœuds, -1 = sens inverse
+    """
+    highway = tags.get('highway')
+    if highway not in HIGHWAY_SPEEDS_KMH:
+        return None
+    if tags.get('access') in NO_ACCESS or tags.get('motor_vehicle') in NO_ACCESS or tags.get('area') == 'yes':
+        return None
+    speed = HIGHWAY_SPEEDS_KMH[highway]
+    maxspeed = _parse_speed(tags.get('maxspeed'))
+    if maxspeed:
+        # La vitesse réelle en ville reste sous la limite affichée
+        speed = min(maxspeed * 0.8, speed * 1.5)
+    oneway = tags.get('oneway', '')
+    if oneway == '-1':
+        return speed, -1
+    if oneway in ONEWAY_FORWARD or tags.get('junction') in ('roundabout', 'circular') or highway == 'motorway':
+        return speed, 1 if oneway != 'no' else 0
+    return speed, 0
+
+
+# ----------------------------------------------------------------------
+# Lecture des extraits OSM
+# ----------------------------------------------------------------------
+
+def _open_osm(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _iter_osm(path, kinds):
+    """Éléments OSM de premier niveau des types `kinds`, libérés au fur et à mesure"""
+    with _open_osm(path) as source:
+        context = ET.iterparse(source, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end' or elem.tag not in ('node', 'way', 'relation'):
+                continue
+            if elem.tag in kinds:
+                yield elem
+            # Éléments déjà lus : ne pas garder l'arbre complet en mémoire
+            root.clear()
+
+
+def _read_osm_xml(path):
+    """
+    Voies carrossables et coordonnées de leurs nœuds d'un fichier OSM XML.
+
+    Deux passes : les voies d'abord (pour ne garder que les nœuds utiles),
+    puis les nœuds.
+    """
+    ways = []
+    needed = set()
+    for elem in _iter_osm(path, ('way',)):
+        refs, tags = array('q'), {}
+        for child in elem:
+            if child.tag == 'nd':
+                refs.append(int(child.get('ref')))
+            elif child.tag == 'tag':
+                tags[child.get('k')] = child.get('v')
+        profile = way_profile(tags)
+        if profile and len(refs) >= 2:
+            ways.append((refs, profile[0], profile[1]))
+            needed.update(refs)
+
+    coords = {}
+    for elem in _iter_osm(path, ('node',)):
+        node_id = int(elem.get('id'))
+        if node_id in needed:
+            coords[node_id] = (float(elem.get('lat')), float(elem.get('lon')))
+    return ways, coords
+
+
+def _read_osm_pbf(path):
+    """Même résultat que _read_osm_xml pour un .osm.pbf (nécessite pyosmium)"""
+    try:
+        import osmium
+    except ImportError:
+        raise ValueError("Lecture des fichiers .pbf : installer pyosmium, ou convertir l'extrait en .osm")
+
+    ways, coords = [], {}
+
+    class Handler(osmium.SimpleHandler):
+        def way(self, way):
+            profile = way_profile({tag.k: tag.v for tag in way.tags})
+            if not profile or len(way.nodes) < 2:
+                return
+            refs = array('q')
+            for node in way.nodes:
+                refs.append(node.ref)
+                if node.location.valid():
+                    coords[node.ref] = (node.location.lat, node.location.lon)
+            ways.append((refs, profile[0], profile[1]))
+
+    Handler().apply_file(path, locations=True)
+    return ways, coords
+
+
+def read_osm(path):
+    """(voies [(refs, vitesse km/h, sens)], {id nœud: (lat, lon)}) d'un extrait OSM"""
+    if path.endswith('.pbf'):
+        return _read_osm_pbf(path)
+    return _read_osm_xml(path)
+
+
+# ----------------------------------------------------------------------
+# Graphe
+# ----------------------------------------------------------------------
+
+def _dijkstra(indptr, targets, weights, source, count):
+    """Temps minimal depuis `source` vers tous les nœuds (listes Python CSR)"""
+    dist = [inf] * count
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    pop, push = heapq.heappop, heapq.heappush
+    while heap:
+        d, u = pop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(indptr[u], indptr[u + 1]):
+            v = targets[e]
+            nd = d + weights[e]
+            if nd < dist[v]:
+                dist[v] = nd
+                push(heap, (nd, v))
+    return dist
+
+
+def _csr(count, sources):
+    """Ordre des arcs par source et pointeurs CSR"""
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=count), out=indptr[1:])
+    return order, indptr
+
+
+def _largest_scc(count, sources, targets):
+    """Masque des nœuds de la plus grande composante fortement connexe (Kosaraju itératif)"""
+    order, indptr = _csr(count, sources)
+    forward = targets[order].tolist()
+    indptr_list = indptr.tolist()
+    rorder, rindptr = _csr(count, targets)
+    backward = sources[rorder].tolist()
+    rindptr_list = rindptr.tolist()
+
+    visited = [False] * count
+    finish = []
+    for root in range(count):
+        if visited[root]:
+            continue
+        visited[root] = True
+        stack = [(root, indptr_list[root])]
+        while stack:
+            u, e = stack[-1]
+            if e < indptr_list[u + 1]:
+                stack[-1] = (u, e + 1)
+                v = forward[e]
+                if not visited[v]:
+                    visited[v] = True
+                    stack.append((v, indptr_list[v]))
+            else:
+                stack.pop()
+                finish.append(u)
+
+    component = [-1] * count
+    sizes = []
+    for root in reversed(finish):
+        if component[root] != -1:
+            continue
+        label = len(sizes)
+        component[root] = label
+        stack, size = [root], 0
+        while stack:
+            u = stack.pop()
+            size += 1
+            for e in range(rindptr_list[u], rindptr_list[u + 1]):
+                v = backward[e]
+                if component[v] == -1:
+                    component[v] = label
+                    stack.append(v)
+        sizes.append(size)
+    largest = int(np.argmax(sizes)) if sizes else 0
+    return np.array(component) == largest
+
+
+class OfflineRoutingGraph:
+    """
+    Graphe routier en tableaux NumPy (CSR) et requêtes ALT / Dijkstra.
+
+    Tableaux:
+        node_lat, node_lon (n)         : intersections
+        indptr (n + 1), target, length_m, time_s, shape (m) : arcs triés par source
+        shape_ptr, shape_lat, shape_lon : points intermédiaires des voies ;
+            shape[e] = k -> points k dans le sens de l'arc, ~k -> en sens inverse
+        landmarks (k), landmark_from (k, n), landmark_to (k, n) : temps depuis / vers chaque landmark
+    """
+
+    ARRAYS = (
+        'node_lat', 'node_lon', 'indptr', 'target', 'length_m', 'time_s', 'shape',
+        'shape_ptr', 'shape_lat', 'shape_lon', 'landmarks', 'landmark_from', 'landmark_to',
+    )
+    ACTIVE_LANDMARKS = 4
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Optional[Dict] = None):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.meta = meta or {}
+        self.node_count = len(self.node_lat)
+        self.max_snap_meters = getattr(settings, 'OFFLINE_ROUTING_MAX_SNAP_METERS', 500)
+        self._prepare()
+
+    def _prepare(self):
+        """Structures de requête dérivées des tableaux (listes Python, index spatial)"""
+        self._indptr = self.indptr.tolist()
+        self._target = self.target.tolist()
+        self._time = self.time_s.astype(np.float64).tolist()
+        self._length = self.length_m.astype(np.float64).tolist()
+        self._source = np.repeat(np.arange(self.node_count), np.diff(self.indptr)).tolist()
+
+        cells = self._cell_keys(self.node_lat, self.node_lon)
+        order = np.argsort(cells, kind='stable')
+        keys, starts = np.unique(cells[order], return_index=True)
+        bounds = np.append(starts, len(order))
+        self._cells = {int(key): order[bounds[i]:bounds[i + 1]] for i, key in enumerate(keys)}
+
+    @staticmethod
+    def _cell(lat, lon):
+        return int(np.floor(lat / SNAP_CELL_DEGREES)), int(np.floor(lon / SNAP_CELL_DEGREES))
+
+    @staticmethod
+    def _cell_keys(lat, lon):
+        rows = np.floor(np.asarray(lat) / SNAP_CELL_DEGREES).astype(np.int64)
+        cols = np.floor(np.asarray(lon) / SNAP_CELL_DEGREES).astype(np.int64)
+        return rows * 1_000_000 + cols
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_osm(cls, path: str, landmark_count: int = 8) -> 'OfflineRoutingGraph':
+        started = time.monotonic()
+        ways, coords = read_osm(path)
+        logger.info(f"Routing hors ligne: {len(ways)} voies, {len(coords)} nœuds lus depuis {path}")
+        graph = cls.from_ways(ways, coords, landmark_count=landmark_count)
+        graph.meta.update({'source': os.path.basename(path), 'build_seconds': round(time.monotonic() - started, 1)})
+        return graph
+
+    @classmethod
+    def from_ways(cls, ways, coords, landmark_count: int = 8) -> 'OfflineRoutingGraph':
+        """Graphe à partir des voies [(refs, vitesse km/h, sens)] et des coordonnées des nœuds"""
+        usage = Counter()
+        for refs, _, _ in ways:
+            usage.update(refs)
+            # Les extrémités de voie sont toujours des intersections
+            usage[refs[0]] += 2
+            usage[refs[-1]] += 2
+
+        vertex_ids: Dict[int, int] = {}
+        vertex_coords: List[Tuple[float, float]] = []
+
+        def vertex(ref):
+            index = vertex_ids.get(ref)
+            if index is None:
+                index = vertex_ids[ref] = len(vertex_coords)
+                vertex_coords.append(coords[ref])
+            return index
+
+        sources, targets, lengths, times, shapes = array('q'), array('q'), array('d'), array('d'), array('q')
+        shape_ptr, shape_lat, shape_lon = array('q', [0]), array('d'), array('d')
+
+        def add_segment(start, end, length, speed, direction, points):
+            if start == end:
+                return
+            shape_id = len(shape_ptr) - 1
+            for lat, lon in points:
+                shape_lat.append(lat)
+                shape_lon.append(lon)
+            shape_ptr.append(len(shape_lat))
+            seconds = length / (speed / 3.6)
+            u, v = vertex(start), vertex(end)
+            arcs = []
+            if direction >= 0:
+                arcs.append((u, v, shape_id))
+            if direction <= 0:
+                arcs.append((v, u, ~shape_id))
+            for arc_source, arc_target, arc_shape in arcs:
+                sources.append(arc_source)
+                targets.append(arc_target)
+                lengths.append(length)
+                times.append(seconds)
+                shapes.append(arc_shape)
+
+        for refs, speed, direction in ways:
+            start = previous_ref = previous = None
+            length, points = 0.0, []
+            for ref in refs:
+                point = coords.get(ref)
+                if point is None:
+                    # Nœud hors de l'extrait : la voie s'arrête au dernier nœud connu
+                    if start is not None and previous_ref != start:
+                        add_segment(start, previous_ref, length, speed, direction, points[:-1])
+                    start = None
+                    continue
+                if start is None:
+                    start, previous_ref, previous = ref, ref, point
+                    length, points = 0.0, []
+                    continue
+                length += _segment_m(previous[0], previous[1], point[0], point[1])
+                previous_ref, previous = ref, point
+                if usage[ref] >= 2:
+                    add_segment(start, ref, length, speed, direction, points)
+                    start, length, points = ref, 0.0, []
+                else:
+                    points.append(point)
+
+        sources = np.frombuffer(sources, dtype=np.int64)
+        targets = np.frombuffer(targets, dtype=np.int64)
+        count = len(vertex_coords)
+        if not count:
+            raise ValueError("Aucune route carrossable dans l'extrait")
+
+        # Plus grande composante fortement connexe : toute paire de nœuds est joignable
+        keep = _largest_scc(count, sources, targets)
+        remap = np.full(count, -1, dtype=np.int64)
+        remap[keep] = np.arange(int(keep.sum()))
+        edge_keep = keep[sources] & keep[targets]
+        sources, targets = remap[sources[edge_keep]], remap[targets[edge_keep]]
+        lengths = np.frombuffer(lengths, dtype=np.float64)[edge_keep]
+        times = np.frombuffer(times, dtype=np.float64)[edge_keep]
+        shapes = np.frombuffer(shapes, dtype=np.int64)[edge_keep]
+        node_coords = np.array(vertex_coords, dtype=np.float64)[keep]
+        count = len(node_coords)
+
+        order, indptr = _csr(count, sources)
+        arrays = {
+            'node_lat': node_coords[:, 0],
+            'node_lon': node_coords[:, 1],
+            'indptr': indptr,
+            'target': targets[order].astype(np.int32),
+            'length_m': lengths[order].astype(np.float32),
+            'time_s': times[order].astype(np.float32),
+            'shape': shapes[order].astype(np.int32),
+            'shape_ptr': np.frombuffer(shape_ptr, dtype=np.int64).copy(),
+            'shape_lat': np.frombuffer(shape_lat, dtype=np.float64).astype(np.float32),
+            'shape_lon': np.frombuffer(shape_lon, dtype=np.float64).astype(np.float32),
+        }
+        arrays.update(cls._select_landmarks(arrays, count, landmark_count))
+        return cls(arrays, meta={'version': GRAPH_FORMAT_VERSION, 'nodes': count, 'edges': len(targets)})
+
+    @staticmethod
+    def _select_landmarks(arrays, count, landmark_count):
+        """Landmarks "les plus éloignés" et temps depuis / vers chacun d'eux"""
+        indptr = arrays['indptr'].tolist()
+        targets = arrays['target'].tolist()
+        weights = arrays['time_s'].astype(np.float64).tolist()
+        sources = np.repeat(np.arange(count), np.diff(arrays['indptr']))
+        rorder, rindptr = _csr(count, arrays['target'].astype(np.int64))
+        rtargets = sources[rorder].tolist()
+        rweights = arrays['time_s'].astype(np.float64)[rorder].tolist()
+        rindptr = rindptr.tolist()
+
+        landmarks, rows_from, rows_to = [], [], []
+        # Premier landmark : le nœud le plus éloigné d'un nœud quelconque
+        closest = np.array(_dijkstra(indptr, targets, weights, 0, count))
+        for _ in range(min(landmark_count, count)):
+            landmark = int(np.argmax(closest))
+            landmarks.append(landmark)
+            row_from = np.array(_dijkstra(indptr, targets, weights, landmark, count))
+            rows_from.append(row_from)
+            rows_to.append(np.array(_dijkstra(rindptr, rtargets, rweights, landmark, count)))
+            closest = row_from if len(landmarks) == 1 else np.minimum(closest, row_from)
+        return {
+            'landmarks': np.array(landmarks, dtype=np.int32),
+            'landmark_from': np.vstack(rows_from),
+            'landmark_to': np.vstack(rows_to),
+        }
+
+    # ------------------------------------------------------------------
+    # Fichier
+    # ------------------------------------------------------------------
+
+    def save(self, path: str):
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        meta = dict(self.meta, version=GRAPH_FORMAT_VERSION)
+        with open(path, 'wb') as output:
+            np.savez(output, meta=np.array(json.dumps(meta)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> 'OfflineRoutingGraph':
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('version') != GRAPH_FORMAT_VERSION:
+                raise ValueError(f"Format de graphe {meta.get('version')} non supporté, reconstruire {path}")
+            arrays = {name: data[name] for name in cls.ARRAYS}
+        return cls(arrays, meta)
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+
+    def nearest(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        """(intersection la plus proche, distance en m), None au-delà de max_snap_meters"""
+        row, col = self._cell(lat, lon)
+        reach = max(1, ceil(self.max_snap_meters / (SNAP_CELL_DEGREES * 111320 * max(cos(radians(lat)), 0.1))))
+        for ring in range(1, reach + 1):
+            candidates = [
+                self._cells[key]
+                for key in (
+                    (row + dr) * 1_000_000 + col + dc
+                    for dr in range(-ring, ring + 1) for dc in range(-ring, ring + 1)
+                )
+                if key in self._cells
+            ]
+            if not candidates:
+                continue
+            nodes = np.concatenate(candidates)
+            distances = _haversine_m(lat, lon, self.node_lat[nodes], self.node_lon[nodes])
+            best = int(np.argmin(distances))
+            if distances[best] > self.max_snap_meters:
+                return None
+            return int(nodes[best]), float(distances[best])
+        return None
+
+    def _heuristic(self, source: int, target: int) -> List[float]:
+        """Minorant ALT du temps restant vers `target`, pour chaque nœud"""
+        to_target_from = self.landmark_from[:, target]
+        from_target_to = self.landmark_to[:, target]
+        at_source = np.maximum(
+            to_target_from - self.landmark_from[:, source],
+            self.landmark_to[:, source] - from_target_to,
+        )
+        active = np.argsort(at_source)[-self.ACTIVE_LANDMARKS:]
+        bounds = np.maximum(
+            to_target_from[active, None] - self.landmark_from[active],
+            self.landmark_to[active] - from_target_to[active, None],
+        )
+        return np.maximum(bounds.max(axis=0), 0.0).tolist()
+
+    def shortest_path(self, source: int, target: int) -> Optional[List[int]]:
+        """Arcs du plus court chemin (en temps) de source à target, A* + landmarks"""
+        if source == target:
+            return []
+        h = self._heuristic(source, target)
+        indptr, targets, weights = self._indptr, self._target, self._time
+        best = {source: 0.0}
+        parent = {source: -1}
+        heap = [(h[source], 0.0, source)]
+        pop, push = heapq.heappop, heapq.heappush
+        while heap:
+            _, d, u = pop(heap)
+            if u == target:
+                break
+            if d > best[u]:
+                continue
+            for e in range(indptr[u], indptr[u + 1]):
+                v = targets[e]
+                nd = d + weights[e]
+                if nd < best.get(v, inf):
+                    best[v] = nd
+                    parent[v] = e
+                    push(heap, (nd + h[v], nd, v))
+        else:
+            return None
+
+        edges = []
+        node = target
+        while node != source:
+            e = parent[node]
+            edges.append(e)
+            node = self._source[e]
+        edges.reverse()
+        return edges
+
+    def _edge_points(self, edge: int) -> List[Tuple[float, float]]:
+        shape = int(self.shape[edge])
+        index = shape if shape >= 0 else ~shape
+        start, end = int(self.shape_ptr[index]), int(self.shape_ptr[index + 1])
+        points = list(zip(self.shape_lat[start:end].tolist(), self.shape_lon[start:end].tolist()))
+        if shape < 0:
+            points.reverse()
+        target = self._target[edge]
+        points.append((float(self.node_lat[target]), float(self.node_lon[target])))
+        return points
+
+    def route(self, start_lat: float, start_lon: float, end_lat: float, end_lon: float) -> Optional[Dict]:
+        """
+        Itinéraire au format de LocationService.get_route (source 'offline'),
+        None si un point est trop loin du réseau
+        """
+        start = self.nearest(start_lat, start_lon)
+        end = self.nearest(end_lat, end_lon)
+        if start is None or end is None:
+            return None
+        edges = self.shortest_path(start[0], end[0])
+        if edges is None:
+            return None
+
+        access_m = start[1] + end[1]
+        length_m = sum(self._length[e] for e in edges) + access_m
+        seconds = sum(self._time[e] for e in edges) + access_m / (ACCESS_SPEED_KMH / 3.6)
+
+        points = [(start_lat, start_lon)]
+        if start[1] > 1:
+            points.append((float(self.node_lat[start[0]]), float(self.node_lon[start[0]])))
+        for e in edges:
+            points.extend(self._edge_points(e))
+        if end[1] > 1:
+            points.append((end_lat, end_lon))
+        points = [(round(lat, 5), round(lon, 5)) for lat, lon in points]
+
+        return {
+            'distance_km': round(length_m / 1000, 2),
+            'duration_min': round(seconds / 60, 1),
+            'polyline_points': points,
+            'geometry': polyline.encode(points, 5),
+            'steps': [],
+            'source': 'offline',
+        }
+
+    def _one_to_many(self, source: int, targets: set) -> Tuple[List[float], List[float]]:
+        """Temps et longueurs depuis `source` jusqu'à avoir atteint tous les `targets`"""
+        indptr, edge_targets, weights, lengths = self._indptr, self._target, self._time, self._length
+        best = [inf] * self.node_count
+        length = [0.0] * self.node_count
+        best[source] = 0.0
+        remaining = set(targets)
+        remaining.discard(source)
+        heap = [(0.0, source)]
+        pop, push = heapq.heappop, heapq.heappush
+        while heap and remaining:
+            d, u = pop(heap)
+            if d > best[u]:
+                continue
+            remaining.discard(u)
+            for e in range(indptr[u], indptr[u + 1]):
+                v = edge_targets[e]
+                nd = d + weights[e]
+                if nd < best[v]:
+                    best[v] = nd
+                    length[v] = length[u] + lengths[e]
+                    push(heap, (nd, v))
+        return best, length
+
+    def matrix(self, points: List[Tuple[float, float]]) -> Optional[Dict]:
+        """
+        Matrice n×n au format de LocationService.get_distance_matrix
+        (source 'offline'), None si un point est trop loin du réseau
+        """
+        snapped = [self.nearest(lat, lon) for lat, lon in points]
+        if any(item is None for item in snapped):
+            return None
+        nodes = [node for node, _ in snapped]
+        access = [meters for _, meters in snapped]
+        targets = set(nodes)
+        n = len(points)
+        distances = [[0.0] * n for _ in range(n)]
+        durations = [[0.0] * n for _ in range(n)]
+        runs = {}
+        for i, node in enumerate(nodes):
+            if node not in runs:
+                runs[node] = self._one_to_many(node, targets)
+            best, length = runs[node]
+            for j, other in enumerate(nodes):
+                if i == j:
+                    continue
+                access_m = access[i] + access[j]
+                distances[i][j] = round((length[other] + access_m) / 1000, 2)
+                durations[i][j] = round((best[other] + access_m / (ACCESS_SPEED_KMH / 3.6)) / 60, 1)
+        return {'distances_km': distances, 'durations_min': durations, 'source': 'offline'}
+
+
+class OfflineRouter:
+    """Chargement paresseux (une fois par process) du graphe OFFLINE_ROUTING_GRAPH"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._graph = None
+        self._loaded_path = None
+
+    @property
+    def path(self) -> str:
+        return getattr(settings, 'OFFLINE_ROUTING_GRAPH', '') or ''
+
+    @property
+    def graph(self) -> Optional[OfflineRoutingGraph]:
+        path = self.path
+        if not path:
+            return None
+        if self._loaded_path != path:
+            with self._lock:
+                if self._loaded_path != path:
+                    self._graph = None
+                    try:
+                        started = time.monotonic()
+                        self._graph = OfflineRoutingGraph.load(path)
+                        logger.info(
+                            f"Routing hors ligne: graphe {path} chargé en {time.monotonic() - started:.2f}s "
+                            f"({self._graph.node_count} nœuds)"
+                        )
+                    except Exception as e:
+                        logger.error(f"Routing hors ligne: impossible de charger {path} ({e})")
+                    self._loaded_path = path
+        return self._graph
+
+    def reset(self):
+        with self._lock:
+            self._graph = None
+            self._loaded_path = None
+
+
+offline_router = OfflineRouter()
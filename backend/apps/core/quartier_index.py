@@ -0,0 +1,208 @@
+"""
+Index de recherche des quartiers d'Abidjan (autocomplete, validation)
+
+Remplace le parcours linéaire de QUARTIERS_ABIDJAN_COMPLET à chaque frappe.
+Construit une seule fois à l'import (quelques millisecondes, ~250 quartiers) :
+- noms normalisés (minuscules, sans accents ni ponctuation, voir
+  geocode_store.normalize_query) : "Angre" trouve "Angré" ;
+- trie des préfixes, à partir du début de chaque mot du nom : "plateaux ext"
+  trouve "2 Plateaux Extension" ;
+- index des trigrammes (mots complétés d'espaces, comme pg_trgm) : sous-chaînes
+  et fautes de frappe ("Rivierra Palmerai"), similarité = trigrammes communs /
+  trigrammes distincts.
+
+Classement : nom identique, début du nom, début d'un mot, sous-chaîne, puis
+approchant ; à rang égal, les plus similaires, puis les quartiers avec GPS
+d'abord, puis les plus courts.
+
+Usage:
+    matches = quartier_index.search('angre 8', limit=5)
+    matches[0].entry.as_dict()  # {'nom': 'Angré 8e Tranche', 'commune': 'COCODY', ...}
+    quartier_index.has_good_match('rue des jardins')  # False -> Nominatim
+"""
+from collections import Counter, defaultdict, namedtuple
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from .geocode_store import normalize_query
+from .quartiers_data import QUARTIERS_ABIDJAN_COMPLET, QUARTIERS_GPS
+
+EXACT, PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(5)
+
+
+class QuartierEntry(namedtuple('QuartierEntry', 'nom commune latitude longitude has_gps normalized commune_key')):
+    __slots__ = ()
+
+    def as_dict(self) -> Dict:
+        return {
+            'nom': self.nom,
+            'commune': self.commune,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'has_gps': self.has_gps,
+        }
+
+
+class QuartierMatch(namedtuple('QuartierMatch', 'entry rank similarity')):
+    __slots__ = ()
+
+    @property
+    def is_good(self) -> bool:
+        """Correspondance assez sûre pour ne pas interroger Nominatim"""
+        return self.rank < FUZZY or self.similarity >= QuartierIndex.GOOD_SIMILARITY
+
+
+def trigrams(text: str) -> set:
+    """Trigrammes d'un texte normalisé, chaque mot complété de deux espaces devant et un derrière"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class QuartierIndex:
+    """
+    Trie des préfixes + index des trigrammes sur les noms de quartiers normalisés
+    """
+    MIN_SIMILARITY = 0.3  # seuil des suggestions approchantes (défaut pg_trgm)
+    GOOD_SIMILARITY = 0.5  # en dessous, la correspondance locale est jugée douteuse
+    # Pour attribuer des coordonnées : "Riviera 5" ne doit pas devenir "Riviera 1" (0.67)
+    STRICT_SIMILARITY = 0.7
+    CACHE_SIZE = 4096  # requêtes récentes (frappes successives de l'autocomplete)
+
+    def __init__(self, entries: List[QuartierEntry]):
+        self.entries = entries
+        self._trie = {}
+        self._trigrams = defaultdict(list)
+        self._trigram_counts = []
+        for entry_id, entry in enumerate(entries):
+            words = entry.normalized.split()
+            start = 0
+            for word in words:
+                start = entry.normalized.index(word, start)
+                self._insert(entry.normalized[start:], entry_id)
+                start += len(word)
+            grams = trigrams(entry.normalized)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigrams[gram].append(entry_id)
+        self._freeze(self._trie)
+        self._search_ids = lru_cache(maxsize=self.CACHE_SIZE)(self._search_ids)
+
+    @classmethod
+    def from_gazetteer(cls, quartiers=None, gps=None) -> 'QuartierIndex':
+        quartiers = QUARTIERS_ABIDJAN_COMPLET if quartiers is None else quartiers
+        gps = QUARTIERS_GPS if gps is None else gps
+        entries = []
+        for commune, noms in quartiers.items():
+            commune_gps = gps.get(commune, {})
+            for nom in noms:
+                coords = commune_gps.get(nom)
+                entries.append(QuartierEntry(
+                    nom=nom,
+                    commune=commune,
+                    latitude=coords[0] if coords else None,
+                    longitude=coords[1] if coords else None,
+                    has_gps=bool(coords),
+                    normalized=normalize_query(nom),
+                    commune_key=normalize_query(commune),
+                ))
+        return cls(entries)
+
+    def _insert(self, suffix: str, entry_id: int):
+        node = self._trie
+        for char in suffix:
+            node = node.setdefault(char, {})
+            node.setdefault('', set()).add(entry_id)
+
+    def _freeze(self, node: Dict):
+        for char, child in node.items():
+            if char == '':
+                continue
+            child[''] = tuple(sorted(child['']))
+            self._freeze(child)
+
+    def _prefix_ids(self, query: str):
+        node = self._trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                return ()
+        return node.get('', ())
+
+    def _search_ids(self, query: str, commune_key: str, min_similarity: float, limit: int):
+        """Identifiants, rangs et similarités triés (mis en cache par requête)"""
+        found = {}
+        for entry_id in self._prefix_ids(query):
+            entry = self.entries[entry_id]
+            if commune_key and entry.commune_key != commune_key:
+                continue
+            rank = EXACT if entry.normalized == query else PREFIX if entry.normalized.startswith(query) else WORD_PREFIX
+            found[entry_id] = (rank, 1.0)
+
+        # Assez de débuts de mots (frappes courtes) : sous-chaînes et approchants seraient classés après
+        query_grams = trigrams(query) if len(found) < limit else ()
+        if query_grams:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._trigrams.get(gram, ()))
+            for entry_id, common in shared.items():
+                if entry_id in found:
+                    continue
+                if query in self.entries[entry_id].normalized:
+                    found[entry_id] = (SUBSTRING, 1.0)
+                    continue
+                similarity = common / (len(query_grams) + self._trigram_counts[entry_id] - common)
+                if similarity >= min_similarity:
+                    found[entry_id] = (FUZZY, similarity)
+
+        results = []
+        for entry_id, (rank, similarity) in found.items():
+            entry = self.entries[entry_id]
+            if commune_key and entry.commune_key != commune_key:
+                continue
+            results.append((rank, -similarity, not entry.has_gps, len(entry.normalized), entry.nom, entry_id))
+        results.sort()
+        return tuple((entry_id, rank, -similarity) for rank, similarity, _, _, _, entry_id in results)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 15,
+        commune: Optional[str] = None,
+        min_similarity: Optional[float] = None
+    ) -> List[QuartierMatch]:
+        """
+        Quartiers correspondant à la requête, les meilleurs d'abord
+
+        Args:
+            query: Texte saisi (casse, accents et ponctuation ignorés)
+            limit: Nombre max de résultats
+            commune: Restreindre à une commune (optionnel)
+            min_similarity: Seuil des correspondances approchantes (défaut MIN_SIMILARITY)
+
+        Returns:
+            Liste de QuartierMatch(entry, rank, similarity)
+        """
+        normalized = normalize_query(query)
+        if not normalized:
+            return []
+        ranked = self._search_ids(
+            normalized,
+            normalize_query(commune) if commune else '',
+            self.MIN_SIMILARITY if min_similarity is None else min_similarity,
+            limit,
+        )
+        return [QuartierMatch(self.entries[entry_id], rank, similarity) for entry_id, rank, similarity in ranked[:limit]]
+
+    def has_good_match(self, query: str, commune: Optional[str] = None) -> bool:
+        matches = self.search(query, limit=1, commune=commune)
+        return bool(matches) and matches[0].is_good
+
+    def in_commune(self, commune: str) -> List[QuartierEntry]:
+        commune_key = normalize_query(commune)
+        return [entry for entry in self.entries if entry.commune_key == commune_key]
+
+
+quartier_index = QuartierIndex.from_gazetteer()
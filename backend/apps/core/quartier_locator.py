@@ -0,0 +1,236 @@
+"""
+Reverse geocoding local : quartier et commune les plus proches d'un point
+
+Les centroïdes déjà connus du projet suffisent à répondre à « dans quel
+quartier / quelle commune est ce point ? » sans appel réseau :
+- QUARTIERS_GPS (centre des quartiers principaux) ;
+- PricingZone.default_latitude / default_longitude (centre de la commune,
+  ou du quartier pour les zones qui en précisent un).
+
+Les points sont projetés en mètres (équirectangulaire autour d'Abidjan) et
+rangés dans un KD-tree. L'index suit le cycle de vie de zone_index : copie
+par process + copie dans le cache Django, reconstruite quand une PricingZone
+change (numéro de version propre, incrémenté par les signaux pricing).
+
+Au-delà de REVERSE_GEOCODE_LOCAL_RADIUS_METERS (1500 m) du centroïde le plus
+proche, `locate` renvoie None et l'appelant interroge Nominatim / ORS.
+
+Usage:
+    place = quartier_locator.locate(5.3679, -3.985)
+    # {'quartier': 'Riviera 2', 'commune': 'COCODY', 'distance_m': 12.4, 'confidence': 0.99, ...}
+    places = quartier_locator.locate_many([(5.36, -3.98), (5.30, -4.01)])  # backfills
+"""
+import heapq
+import logging
+from math import cos, radians
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+from apps.pricing.zone_index import CachedPricingIndex
+
+from .quartiers_data import QUARTIERS_GPS, get_commune_display_name
+from .route_cache import METERS_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_LATITUDE = 5.35  # Abidjan : projection équirectangulaire locale
+
+
+def project(lat: float, lon: float) -> Tuple[float, float]:
+    """(lat, lon) -> (x, y) en mètres"""
+    return (
+        lon * METERS_PER_DEGREE * cos(radians(REFERENCE_LATITUDE)),
+        lat * METERS_PER_DEGREE,
+    )
+
+
+def build_kdtree(points: Sequence[Tuple[float, float]]):
+    """
+    KD-tree 2D équilibré (médiane alternée x / y)
+
+    Nœud = (indice du point, axe, sous-arbre gauche, sous-arbre droit), None
+    pour un sous-arbre vide. Tuples imbriqués : l'arbre se met en cache tel quel.
+    """
+    def build(indexes, depth):
+        if not indexes:
+            return None
+        axis = depth % 2
+        indexes = sorted(indexes, key=lambda i: points[i][axis])
+        middle = len(indexes) // 2
+        return (
+            indexes[middle],
+            axis,
+            build(indexes[:middle], depth + 1),
+            build(indexes[middle + 1:], depth + 1),
+        )
+
+    return build(list(range(len(points))), 0)
+
+
+def kdtree_nearest(tree, points, x: float, y: float, k: int = 1) -> List[Tuple[float, int]]:
+    """Les k points les plus proches de (x, y) : [(distance en mètres, indice)], du plus proche au plus loin"""
+    best = []  # tas max des k meilleurs : (-distance², indice)
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if node is None:
+            continue
+        index, axis, left, right = node
+        px, py = points[index]
+        distance2 = (px - x) ** 2 + (py - y) ** 2
+        if len(best) < k:
+            heapq.heappush(best, (-distance2, index))
+        elif distance2 < -best[0][0]:
+            heapq.heapreplace(best, (-distance2, index))
+
+        delta = (x if axis == 0 else y) - (px if axis == 0 else py)
+        near, far = (left, right) if delta < 0 else (right, left)
+        # Côté lointain seulement si la tranche peut contenir un meilleur point
+        if len(best) < k or delta * delta < -best[0][0]:
+            stack.append(far)
+        stack.append(near)
+    return sorted(((-d2) ** 0.5, index) for d2, index in best)
+
+
+class QuartierLocator(CachedPricingIndex):
+    """
+    KD-tree des centroïdes de quartiers et de communes
+    """
+
+    CACHE_KEY = 'core:quartier_locator'
+    VERSION_KEY = 'core:quartier_locator:version'
+
+    @property
+    def radius_m(self) -> float:
+        return float(getattr(settings, 'REVERSE_GEOCODE_LOCAL_RADIUS_METERS', 1500))
+
+    def _build(self, version):
+        from apps.pricing.models import PricingZone
+
+        places = []
+        seen = set()
+
+        def add(lat, lon, quartier, commune, source):
+            key = (round(lat, 5), round(lon, 5))
+            if key in seen:
+                # Plusieurs zones d'une commune partagent souvent le même centre
+                return
+            seen.add(key)
+            places.append({
+                'quartier': quartier,
+                'commune': commune,
+                'latitude': lat,
+                'longitude': lon,
+                'source': source,
+            })
+
+        for commune, quartiers in QUARTIERS_GPS.items():
+            for nom, (lat, lon) in quartiers.items():
+                add(lat, lon, nom, commune, 'quartier')
+
+        try:
+            zones = PricingZone.objects.filter(
+                is_active=True,
+                default_latitude__isnull=False,
+                default_longitude__isnull=False
+            ).only('commune', 'quartier', 'default_latitude', 'default_longitude')
+            for zone in zones:
+                add(
+                    float(zone.default_latitude),
+                    float(zone.default_longitude),
+                    zone.quartier or None,
+                    (zone.commune or '').strip().upper(),
+                    'zone' if zone.quartier else 'commune'
+                )
+        except Exception as e:
+            logger.warning(f"QuartierLocator: zones tarifaires indisponibles ({e}), quartiers seuls")
+
+        points = [project(place['latitude'], place['longitude']) for place in places]
+        logger.debug(f"QuartierLocator: {len(places)} centroïdes indexés")
+        return {
+            'version': version,
+            'places': places,
+            'points': points,
+            'tree': build_kdtree(points),
+        }
+
+    def nearest(self, latitude: float, longitude: float, k: int = 1) -> List[Dict]:
+        """
+        Les k centroïdes les plus proches, sans limite de distance
+
+        Returns:
+            [{quartier, commune, latitude, longitude, source, distance_m}, ...]
+        """
+        index = self._get_index()
+        if not index['places']:
+            return []
+        x, y = project(float(latitude), float(longitude))
+        return [
+            {**index['places'][i], 'distance_m': round(distance, 1)}
+            for distance, i in kdtree_nearest(index['tree'], index['points'], x, y, k)
+        ]
+
+    def _describe(self, place: Dict, latitude: float, longitude: float, radius: float) -> Optional[Dict]:
+        if place['distance_m'] > radius:
+            return None
+        commune = get_commune_display_name(place['commune'])
+        parts = [place['quartier'], commune] if place['quartier'] else [commune]
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'quartier': place['quartier'],
+            'commune': place['commune'],
+            'address': ', '.join(parts + ['Abidjan', "Côte d'Ivoire"]),
+            'distance_m': place['distance_m'],
+            # 1 sur le centroïde, 0 à la limite du rayon
+            'confidence': round(max(0.0, 1 - place['distance_m'] / radius), 2),
+            'source': 'local',
+        }
+
+    def locate(self, latitude: float, longitude: float, radius_m: Optional[float] = None) -> Optional[Dict]:
+        """
+        Quartier / commune du point, ou None au-delà du rayon (appelant : Nominatim)
+
+        Args:
+            latitude, longitude: Coordonnées GPS
+            radius_m: Rayon max (défaut REVERSE_GEOCODE_LOCAL_RADIUS_METERS)
+
+        Returns:
+            Dict {latitude, longitude, quartier, commune, address, distance_m, confidence, source}
+        """
+        try:
+            nearest = self.nearest(latitude, longitude)
+        except Exception as e:
+            logger.warning(f"QuartierLocator: recherche impossible ({e})")
+            return None
+        if not nearest:
+            return None
+        return self._describe(nearest[0], latitude, longitude, radius_m or self.radius_m)
+
+    def locate_many(
+        self,
+        points: Sequence[Tuple[float, float]],
+        radius_m: Optional[float] = None
+    ) -> List[Optional[Dict]]:
+        """
+        `locate` pour une liste de points (backfills) : un seul accès à l'index
+
+        Returns:
+            Liste alignée sur `points` (None pour les points hors rayon)
+        """
+        index = self._get_index()
+        radius = radius_m or self.radius_m
+        results = []
+        for latitude, longitude in points:
+            if not index['places'] or latitude is None or longitude is None:
+                results.append(None)
+                continue
+            x, y = project(float(latitude), float(longitude))
+            (distance, i), = kdtree_nearest(index['tree'], index['points'], x, y)
+            place = {**index['places'][i], 'distance_m': round(distance, 1)}
+            results.append(self._describe(place, float(latitude), float(longitude), radius))
+        return results
+
+
+quartier_locator = QuartierLocator()
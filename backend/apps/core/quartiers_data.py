@@ -539,6 +539,10 @@ def get_quartier_coordinates(quartier: str, commune: str = None) -> dict:
     """
     Retourne les coordonnées GPS d'un quartier
     
+    Recherche dans l'index (casse et accents ignorés, fautes de frappe
+    légères tolérées) : d'abord dans la commune si elle est fournie, puis
+    dans toutes les communes.
+    
     Args:
         quartier: Nom du quartier
         commune: Commune (optionnel, accélère la recherche)
@@ -546,57 +550,14 @@ def get_quartier_coordinates(quartier: str, commune: str = None) -> dict:
     Returns:
         Dict {nom, commune, latitude, longitude, has_gps} ou None
     """
-    quartier_lower = quartier.lower().strip()
-    
-    # Si commune fournie, chercher uniquement dans cette commune
-    if commune:
-        commune_upper = commune.upper()
-        if commune_upper in QUARTIERS_GPS:
-            for nom, (lat, lon) in QUARTIERS_GPS[commune_upper].items():
-                if nom.lower() == quartier_lower or quartier_lower in nom.lower():
-                    return {
-                        'nom': nom,
-                        'commune': commune_upper,
-                        'latitude': lat,
-                        'longitude': lon,
-                        'has_gps': True,
-                    }
-        
-        # Quartier existe mais pas de GPS
-        if commune_upper in QUARTIERS_ABIDJAN_COMPLET:
-            for nom in QUARTIERS_ABIDJAN_COMPLET[commune_upper]:
-                if nom.lower() == quartier_lower or quartier_lower in nom.lower():
-                    return {
-                        'nom': nom,
-                        'commune': commune_upper,
-                        'latitude': None,
-                        'longitude': None,
-                        'has_gps': False,
-                    }
-    
-    # Sinon, chercher dans toutes les communes (d'abord ceux avec GPS)
-    for comm, quartiers_gps in QUARTIERS_GPS.items():
-        for nom, (lat, lon) in quartiers_gps.items():
-            if nom.lower() == quartier_lower or quartier_lower in nom.lower():
-                return {
-                    'nom': nom,
-                    'commune': comm,
-                    'latitude': lat,
-                    'longitude': lon,
-                    'has_gps': True,
-                }
+    from .quartier_index import quartier_index
     
-    # Ensuite chercher dans la liste complète
-    for comm, quartiers in QUARTIERS_ABIDJAN_COMPLET.items():
-        for nom in quartiers:
-            if nom.lower() == quartier_lower or quartier_lower in nom.lower():
-                return {
-                    'nom': nom,
-                    'commune': comm,
-                    'latitude': None,
-                    'longitude': None,
-                    'has_gps': False,
-                }
+    for scope in ([commune, None] if commune else [None]):
+        matches = quartier_index.search(
+            quartier, limit=1, commune=scope, min_similarity=quartier_index.STRICT_SIMILARITY
+        )
+        if matches:
+            return matches[0].entry.as_dict()
     
     return None
 
@@ -606,46 +567,19 @@ def search_quartiers(query: str, limit: int = 15) -> list:
     Recherche des quartiers par nom (pour autocomplete)
     
     Args:
-        query: Texte de recherche
+        query: Texte de recherche (casse, accents et fautes de frappe légères ignorés)
         limit: Nombre max de résultats
     
     Returns:
-        Liste de quartiers correspondants (triés: avec GPS d'abord)
+        Liste de quartiers correspondants (les plus pertinents d'abord, avec GPS
+        d'abord à pertinence égale)
     """
-    if len(query) < 2:
-        return []
+    from .quartier_index import quartier_index
     
-    query_lower = query.lower().strip()
-    results_with_gps = []
-    results_without_gps = []
+    if len(query.strip()) < 2:
+        return []
     
-    for commune, quartiers in QUARTIERS_ABIDJAN_COMPLET.items():
-        commune_gps = QUARTIERS_GPS.get(commune, {})
-        
-        for nom in quartiers:
-            if query_lower in nom.lower():
-                coords = commune_gps.get(nom)
-                
-                if coords:
-                    results_with_gps.append({
-                        'nom': nom,
-                        'commune': commune,
-                        'latitude': coords[0],
-                        'longitude': coords[1],
-                        'has_gps': True,
-                    })
-                else:
-                    results_without_gps.append({
-                        'nom': nom,
-                        'commune': commune,
-                        'latitude': None,
-                        'longitude': None,
-                        'has_gps': False,
-                    })
-    
-    # Priorité aux résultats avec GPS
-    results = results_with_gps + results_without_gps
-    return results[:limit]
+    return [match.entry.as_dict() for match in quartier_index.search(query, limit)]
 
 
 def validate_quartier(quartier: str, commune: str) -> bool:
@@ -659,14 +593,17 @@ def validate_quartier(quartier: str, commune: str) -> bool:
     Returns:
         True si le quartier existe, False sinon
     """
-    commune_upper = commune.upper()
+    from .geocode_store import normalize_query
+    from .quartier_index import quartier_index
     
-    if commune_upper not in QUARTIERS_ABIDJAN_COMPLET:
+    if commune.upper() not in QUARTIERS_ABIDJAN_COMPLET:
         return False
     
-    quartier_lower = quartier.lower().strip()
-    for nom in QUARTIERS_ABIDJAN_COMPLET[commune_upper]:
-        if quartier_lower in nom.lower() or nom.lower() in quartier_lower:
+    quartier_normalized = normalize_query(quartier)
+    if not quartier_normalized:
+        return False
+    for entry in quartier_index.in_commune(commune):
+        if quartier_normalized in entry.normalized or entry.normalized in quartier_normalized:
             return True
     
     return False
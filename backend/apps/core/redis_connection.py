@@ -0,0 +1,78 @@
+"""
+Connexion Redis partagée entre process (gunicorn, Celery, flux SSE).
+
+Utilisée par les structures qui doivent être communes à tous les process :
+index géographique des livreurs, tampon des positions GPS, diffusion du suivi
+en temps réel, limiteur de débit Nominatim.
+
+Le cache par défaut est réutilisé s'il est django-redis ; sinon la connexion
+est ouverte depuis settings.REDIS_URL. Sans Redis configuré, shared_redis()
+retourne None et les appelants gardent leur implémentation propre au process
+(développement, tests).
+
+Usage:
+    connection = shared_redis()
+    if connection is not None:
+        connection.publish(channel, message)
+"""
+import logging
+import threading
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def redis_url():
+    """URL Redis du projet ('' si non configurée)"""
+    return (getattr(settings, 'REDIS_URL', '') or '').strip()
+
+
+def shared_redis():
+    """Client Redis commun à tous les process, ou None si Redis n'est pas configuré"""
+    if 'django_redis' in settings.CACHES.get('default', {}).get('BACKEND', ''):
+        try:
+            from django_redis import get_redis_connection
+            return get_redis_connection('default')
+        except Exception as e:
+            logger.warning(f"Cache django-redis inutilisable ({e}), connexion depuis REDIS_URL")
+
+    url = redis_url()
+    if not url:
+        return None
+    with _clients_lock:
+        client = _clients.get(url)
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                logger.warning("Paquet redis absent : structures partagées propres au process")
+                return None
+            client = _clients[url] = redis.Redis.from_url(url, **_url_options(url))
+    return client
+
+
+def shared_redis_location():
+    """
+    (url, options) du Redis de shared_redis(), pour les clients qui ouvrent leur
+    propre connexion (ex: redis.asyncio pour la diffusion SSE), ou None
+    """
+    cache_config = settings.CACHES.get('default', {})
+    if 'django_redis' in cache_config.get('BACKEND', ''):
+        return cache_config['LOCATION'], dict(cache_config.get('OPTIONS', {}).get('CONNECTION_POOL_KWARGS', {}))
+    url = redis_url()
+    if not url:
+        return None
+    return url, _url_options(url)
+
+
+def _url_options(url):
+    options = {'socket_connect_timeout': 5, 'socket_timeout': 5}
+    if urlparse(url).scheme == 'rediss':
+        # Mêmes options que le cache de production (Redis Cloud, certificat non vérifié)
+        options.update(ssl_cert_reqs=None, ssl_check_hostname=False)
+    return options
@@ -0,0 +1,286 @@
+"""
+Cache des itinéraires de LocationService.get_route
+
+Les livreurs et les clients demandent sans cesse les mêmes trajets à
+quelques mètres près : une clé sur les coordonnées exactes (5 décimales,
+~1 m) ne se réutilise presque jamais. Ce cache :
+- aligne départ et arrivée sur une grille de ROUTE_CACHE_GRID_METERS (50 m
+  par défaut) : deux demandes dont les extrémités tombent dans les mêmes
+  cellules partagent l'itinéraire (0 = coordonnées exactes, ancien comportement) ;
+- garde un LRU en mémoire du process (ROUTE_CACHE_LOCAL_SIZE entrées,
+  ROUTE_CACHE_LOCAL_SECONDS) devant le cache Django partagé (Redis en prod) ;
+- stocke dans le cache partagé une version compressée : polyline encodée
+  au lieu de la liste de points, JSON compressé zlib ;
+- compte les hits (local / partagé), les misses et la latence des appels
+  (histogramme par paliers, agrégeable entre workers).
+
+Usage:
+    cached = route_cache.get(start_lat, start_lon, end_lat, end_lon)
+    route_cache.set(start_lat, start_lon, end_lat, end_lon, result, timeout, fetch_seconds)
+    route_cache.stats()
+"""
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from math import cos, radians
+from typing import Dict, Optional, Tuple
+
+import polyline
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Longueur d'un degré de latitude (partagée par les grilles et projections de apps.core)
+METERS_PER_DEGREE = 111320.0
+
+# Bornes hautes (ms) de l'histogramme de latence
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+COUNTERS = ('hits_local', 'hits_shared', 'misses', 'stores')
+
+
+def snap_point(lat: float, lon: float, grid_meters: float) -> Tuple[int, int]:
+    """
+    Cellule de la grille contenant le point : indices (ligne, colonne).
+
+    Le pas en longitude est élargi selon la latitude de la ligne pour que
+    les cellules mesurent ~grid_meters de côté.
+    """
+    step = grid_meters / METERS_PER_DEGREE
+    row = int(round(lat / step))
+    lon_step = step / max(cos(radians(row * step)), 0.01)
+    return row, int(round(lon / lon_step))
+
+
+class RouteCache:
+    """
+    Cache à deux niveaux (LRU local + cache Django) des itinéraires,
+    indexé par cellules de grille.
+    """
+
+    GRID_METERS = getattr(settings, 'ROUTE_CACHE_GRID_METERS', 50)
+    LOCAL_SIZE = getattr(settings, 'ROUTE_CACHE_LOCAL_SIZE', 2048)
+    LOCAL_TIMEOUT = getattr(settings, 'ROUTE_CACHE_LOCAL_SECONDS', 300)
+    STATS_FLUSH_SECONDS = 30
+    STATS_KEY_PREFIX = 'route-cache:stats:'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local: 'OrderedDict[str, Tuple[float, Dict]]' = OrderedDict()
+        self._reset_counters()
+        self._stats_flushed_at = time.monotonic()
+
+    def _reset_counters(self):
+        self._counters = {name: 0 for name in COUNTERS}
+        self._latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self._pending_counters = dict(self._counters)
+        self._pending_latency = list(self._latency)
+
+    # ------------------------------------------------------------------
+    # Clés et sérialisation
+    # ------------------------------------------------------------------
+
+    def key(self, start_lat, start_lon, end_lat, end_lon) -> str:
+        grid = self.GRID_METERS
+        if not grid or grid <= 0:
+            return f"route:{start_lat:.5f},{start_lon:.5f}:{end_lat:.5f},{end_lon:.5f}"
+        start_row, start_col = snap_point(start_lat, start_lon, grid)
+        end_row, end_col = snap_point(end_lat, end_lon, grid)
+        return f"route:g{grid}:{start_row},{start_col}:{end_row},{end_col}"
+
+    @staticmethod
+    def _pack(result: Dict) -> bytes:
+        """Résultat -> JSON compressé, la polyline remplaçant la liste de points"""
+        payload = dict(result)
+        points = payload.pop('polyline_points', None) or []
+        geometry = payload.get('geometry')
+        payload['polyline'] = geometry if isinstance(geometry, str) and geometry else (polyline.encode(points, 5) if points else '')
+        return zlib.compress(json.dumps(payload, separators=(',', ':')).encode(), 6)
+
+    @staticmethod
+    def _unpack(blob: bytes) -> Dict:
+        from .location_service import LocationService
+
+        payload = json.loads(zlib.decompress(blob))
+        encoded = payload.pop('polyline', '')
+        payload['polyline_points'] = LocationService._decode_polyline(encoded, precision=5) if encoded else []
+        return payload
+
+    # ------------------------------------------------------------------
+    # Lecture / écriture
+    # ------------------------------------------------------------------
+
+    def get(self, start_lat, start_lon, end_lat, end_lon) -> Optional[Dict]:
+        """Itinéraire en cache pour ces cellules, ou None (compté comme miss)"""
+        started = time.perf_counter()
+        key = self.key(start_lat, start_lon, end_lat, end_lon)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry and entry[0] > now:
+                self._local.move_to_end(key)
+                self._count('hits_local', time.perf_counter() - started)
+                return dict(entry[1])
+            if entry:
+                del self._local[key]
+
+        result = None
+        try:
+            blob = cache.get(key)
+            if blob is not None:
+                result = self._unpack(blob)
+        except Exception as e:
+            logger.warning(f"RouteCache: lecture impossible pour {key} ({e})")
+
+        if result is None:
+            with self._lock:
+                self._count('misses')
+            return None
+
+        self._remember(key, result)
+        with self._lock:
+            self._count('hits_shared', time.perf_counter() - started)
+        self._maybe_flush_stats()
+        return dict(result)
+
+    def set(self, start_lat, start_lon, end_lat, end_lon, result: Dict, timeout: int,
+            fetch_seconds: Optional[float] = None):
+        """
+        Met l'itinéraire en cache (local + partagé).
+
+        fetch_seconds: durée du calcul par le provider, comptée dans
+        l'histogramme de latence des misses
+        """
+        key = self.key(start_lat, start_lon, end_lat, end_lon)
+        try:
+            cache.set(key, self._pack(result), timeout)
+        except Exception as e:
+            logger.warning(f"RouteCache: écriture impossible pour {key} ({e})")
+        self._remember(key, result, timeout)
+        with self._lock:
+            self._count('stores', fetch_seconds)
+        self._maybe_flush_stats()
+
+    def _remember(self, key, result, timeout=None):
+        ttl = min(self.LOCAL_TIMEOUT, timeout) if timeout else self.LOCAL_TIMEOUT
+        with self._lock:
+            self._local[key] = (time.monotonic() + ttl, result)
+            self._local.move_to_end(key)
+            while len(self._local) > self.LOCAL_SIZE:
+                self._local.popitem(last=False)
+
+    def clear(self):
+        """Vide le niveau local et remet les compteurs à zéro (le cache partagé n'est pas touché)"""
+        with self._lock:
+            self._local.clear()
+            self._reset_counters()
+
+    # ------------------------------------------------------------------
+    # Métriques
+    # ------------------------------------------------------------------
+
+    def _count(self, name, seconds=None):
+        """Incrémente un compteur (appelé sous self._lock)"""
+        self._counters[name] += 1
+        self._pending_counters[name] += 1
+        if seconds is not None:
+            bucket = self._bucket(seconds * 1000)
+            self._latency[bucket] += 1
+            self._pending_latency[bucket] += 1
+
+    @staticmethod
+    def _bucket(elapsed_ms):
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                return i
+        return len(LATENCY_BUCKETS_MS)
+
+    def _maybe_flush_stats(self, force=False):
+        """Reporte les compteurs du process dans le cache partagé (toutes les 30 s)"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._stats_flushed_at < self.STATS_FLUSH_SECONDS:
+                return
+            self._stats_flushed_at = now
+            deltas = {name: value for name, value in self._pending_counters.items() if value}
+            deltas.update({
+                f'latency:{i}': value for i, value in enumerate(self._pending_latency) if value
+            })
+            self._pending_counters = {name: 0 for name in COUNTERS}
+            self._pending_latency = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+        for name, value in deltas.items():
+            key = self.STATS_KEY_PREFIX + name
+            try:
+                cache.add(key, 0, None)
+                cache.incr(key, value)
+            except Exception as e:
+                logger.debug(f"RouteCache: compteur {name} non reporté ({e})")
+
+    @classmethod
+    def _summary(cls, counters, latency):
+        hits = counters['hits_local'] + counters['hits_shared']
+        lookups = hits + counters['misses']
+        summary = dict(counters)
+        summary['lookups'] = lookups
+        summary['hit_rate'] = round(hits / lookups, 4) if lookups else None
+        summary['latency_ms'] = {
+            'buckets': {
+                (f'le_{bound}' if i < len(LATENCY_BUCKETS_MS) else 'inf'): latency[i]
+                for i, bound in enumerate(LATENCY_BUCKETS_MS + (None,))
+            },
+            'p50': cls._percentile(latency, 0.50),
+            'p95': cls._percentile(latency, 0.95),
+        }
+        return summary
+
+    @staticmethod
+    def _percentile(latency, quantile):
+        """Borne haute du palier contenant le quantile (None si aucune mesure)"""
+        total = sum(latency)
+        if not total:
+            return None
+        threshold = quantile * total
+        seen = 0
+        for i, count in enumerate(latency):
+            seen += count
+            if seen >= threshold:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def stats(self) -> Dict:
+        """
+        Compteurs du process et de l'ensemble des workers.
+
+        Latence : hits = temps de lecture du cache, misses = temps de calcul
+        par le provider (stores).
+        """
+        self._maybe_flush_stats(force=True)
+        with self._lock:
+            process = self._summary(dict(self._counters), list(self._latency))
+            local_entries = len(self._local)
+
+        names = list(COUNTERS) + [f'latency:{i}' for i in range(len(LATENCY_BUCKETS_MS) + 1)]
+        try:
+            shared = cache.get_many([self.STATS_KEY_PREFIX + name for name in names])
+        except Exception:
+            shared = {}
+        values = {name: int(shared.get(self.STATS_KEY_PREFIX + name) or 0) for name in names}
+        cluster = self._summary(
+            {name: values[name] for name in COUNTERS},
+            [values[f'latency:{i}'] for i in range(len(LATENCY_BUCKETS_MS) + 1)],
+        )
+        return {
+            'grid_meters': self.GRID_METERS,
+            'local_entries': local_entries,
+            'process': process,
+            'cluster': cluster,
+        }
+
+
+route_cache = RouteCache()
@@ -0,0 +1,262 @@
+"""
+Orchestration des providers de routing (OSRM, OpenRouteService)
+
+LocationService.get_route interrogeait les providers l'un après l'autre :
+quand le serveur de démo OSRM rame, chaque requête payait son timeout
+complet avant le fallback. L'orchestrateur :
+- lance le provider préféré, puis une requête "hedgée" vers le suivant si
+  aucune réponse n'est arrivée après ROUTING_HEDGE_AFTER_MS (800 ms), ou
+  tout de suite si le premier échoue ; la première réponse valide gagne
+  (les requêtes perdantes se terminent en arrière-plan) ;
+- avec un seul provider disponible, pas de requête hedgée (un doublon ne
+  ferait que doubler la charge d'un serveur déjà lent), sauf pour les
+  providers listés dans ROUTING_SELF_HEDGE_PROVIDERS ;
+- tient un disjoncteur par provider : après ROUTING_BREAKER_FAILURES (5)
+  échecs consécutifs le provider est ignoré pendant
+  ROUTING_BREAKER_RESET_SECONDS (30 s), puis une seule requête d'essai
+  décide de sa réouverture ;
+- suit un score de santé (taux de succès et latence en moyenne mobile) :
+  un provider sous ROUTING_DEMOTE_BELOW (0.5) de succès passe après les autres.
+Au-delà de ROUTING_DEADLINE_SECONDS sans réponse valide, route() renvoie
+None (get_route se rabat sur la ligne droite).
+
+État par process (les workers apprennent chacun l'état des providers).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Disjoncteur fermé / ouvert / semi-ouvert d'un provider"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True si une requête peut partir (en semi-ouvert : une seule requête d'essai)"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Routing: disjoncteur de {self.name} ouvert après {self.failures} échec(s)")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class ProviderState:
+    """Disjoncteur et score de santé d'un provider"""
+
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_seconds)
+        self.success_rate = 1.0
+        self.latency_seconds = None
+        self.calls = 0
+        self.failures = 0
+        self.wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, success: bool, elapsed: float):
+        with self._lock:
+            self.calls += 1
+            self.success_rate += self.EWMA_ALPHA * ((1.0 if success else 0.0) - self.success_rate)
+            if success:
+                if self.latency_seconds is None:
+                    self.latency_seconds = elapsed
+                else:
+                    self.latency_seconds += self.EWMA_ALPHA * (elapsed - self.latency_seconds)
+            else:
+                self.failures += 1
+        if success:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    def stats(self) -> Dict:
+        return {
+            'state': self.breaker.state,
+            'success_rate': round(self.success_rate, 3),
+            'latency_ms': round(self.latency_seconds * 1000, 1) if self.latency_seconds is not None else None,
+            'calls': self.calls,
+            'failures': self.failures,
+            'wins': self.wins,
+        }
+
+
+class RoutingOrchestrator:
+    """
+    Requêtes hedgées vers les providers de routing, avec disjoncteurs.
+
+    Usage:
+        result = routing_orchestrator.route(
+            [('osrm', fetch_osrm), ('openrouteservice', fetch_ors)],
+            (start_lat, start_lon, end_lat, end_lon),
+            context=context,
+        )
+    """
+
+    HEDGE_AFTER_SECONDS = getattr(settings, 'ROUTING_HEDGE_AFTER_MS', 800) / 1000
+    DEADLINE_SECONDS = getattr(settings, 'ROUTING_DEADLINE_SECONDS', 15)
+    FAILURE_THRESHOLD = getattr(settings, 'ROUTING_BREAKER_FAILURES', 5)
+    RESET_SECONDS = getattr(settings, 'ROUTING_BREAKER_RESET_SECONDS', 30)
+    DEMOTE_BELOW = getattr(settings, 'ROUTING_DEMOTE_BELOW', 0.5)
+    MAX_WORKERS = getattr(settings, 'ROUTING_MAX_WORKERS', 16)
+    SELF_HEDGE_PROVIDERS = frozenset(getattr(settings, 'ROUTING_SELF_HEDGE_PROVIDERS', ()))
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[str, ProviderState] = {}
+        self._executor = None
+        self.hedges = 0
+
+    def provider(self, name: str) -> ProviderState:
+        with self._lock:
+            state = self._providers.get(name)
+            if state is None:
+                state = self._providers[name] = ProviderState(name, self.FAILURE_THRESHOLD, self.RESET_SECONDS)
+            return state
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix='routing')
+            return self._executor
+
+    def _plan(self, candidates: Sequence[Tuple[str, Callable]]) -> List[Tuple[ProviderState, Callable]]:
+        """Providers dans l'ordre de préférence, les providers en mauvaise santé en dernier"""
+        plan = [(self.provider(name), fetch) for name, fetch in candidates]
+        # Tri stable : l'ordre de préférence est conservé à santé égale
+        plan.sort(key=lambda item: item[0].success_rate < self.DEMOTE_BELOW)
+        return plan
+
+    def _call(self, state: ProviderState, fetch: Callable, args, context):
+        started = time.monotonic()
+        try:
+            result = fetch(*args, context=context)
+        except Exception as e:
+            logger.error(f"Routing: erreur inattendue du provider {state.name}: {e}")
+            result = None
+        state.record(bool(result), time.monotonic() - started)
+        return result
+
+    def route(self, candidates: Sequence[Tuple[str, Callable]], args: tuple, context: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Première réponse valide parmi les providers candidats.
+
+        Args:
+            candidates: (nom, fonction) par ordre de préférence ; la fonction
+                reçoit `*args, context=context` et renvoie un dict ou None
+            args: (start_lat, start_lon, end_lat, end_lon)
+
+        Returns:
+            Dict de l'itinéraire, ou None si aucun provider n'a répondu à temps
+        """
+        queue = self._plan(candidates)
+        if len(queue) == 1 and queue[0][0].name in self.SELF_HEDGE_PROVIDERS:
+            # Un seul provider, doublon autorisé explicitement pour celui-ci
+            queue.append(queue[0])
+        executor = self._get_executor()
+        deadline = time.monotonic() + self.DEADLINE_SECONDS
+        pending = {}
+        launched = set()
+
+        def launch_next(hedge=False):
+            while queue:
+                state, fetch = queue.pop(0)
+                if state.name in launched:
+                    # Doublon : seulement en hedge (pas de nouvel essai après un
+                    # échec) et si le provider est pleinement disponible
+                    if not hedge or state.breaker.state != CircuitBreaker.CLOSED:
+                        continue
+                elif not state.breaker.allow():
+                    logger.info(f"Routing: provider {state.name} ignoré (disjoncteur {state.breaker.state})")
+                    continue
+                launched.add(state.name)
+                if hedge:
+                    with self._lock:
+                        self.hedges += 1
+                    logger.info(f"Routing: pas de réponse après {self.HEDGE_AFTER_SECONDS:.1f}s, requête hedgée vers {state.name}")
+                pending[executor.submit(self._call, state, fetch, args, context)] = state
+                return True
+            return False
+
+        if not launch_next():
+            logger.warning("Routing: aucun provider disponible (disjoncteurs ouverts)")
+            return None
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Routing: aucune réponse après {self.DEADLINE_SECONDS}s")
+                return None
+            timeout = min(self.HEDGE_AFTER_SECONDS, remaining) if queue else remaining
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                launch_next(hedge=True)
+                continue
+            for future in done:
+                state = pending.pop(future)
+                result = future.result()
+                if result:
+                    with state._lock:
+                        state.wins += 1
+                    return result
+            # Échec(s) : passer au provider suivant sans attendre le délai de hedge
+            launch_next()
+        return None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            providers = dict(self._providers)
+            hedges = self.hedges
+        return {
+            'hedge_after_ms': round(self.HEDGE_AFTER_SECONDS * 1000),
+            'hedges': hedges,
+            'providers': {name: state.stats() for name, state in providers.items()},
+        }
+
+    def reset(self):
+        """Oublie l'état des providers et attend les requêtes en vol (tests)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._providers.clear()
+            self.hedges = 0
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+routing_orchestrator = RoutingOrchestrator()
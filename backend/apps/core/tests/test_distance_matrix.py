@@ -0,0 +1,156 @@
+"""
+Tests de LocationService.get_distance_matrix (matrice haversine NumPy et endpoints /table, /matrix).
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.core.location_service import LocationService
+
+
+POINTS = [
+    (5.3600, -4.0083),  # Plateau
+    (5.3484, -3.9869),  # Cocody
+    (5.2850, -3.9875),  # Port-Bouët
+    (5.4167, -4.0167),  # Abobo
+]
+
+
+def _osrm_response(n):
+    response = mock.Mock(status_code=200)
+    response.json.return_value = {
+        'code': 'Ok',
+        'distances': [[0 if i == j else 1000 * (i + j) for j in range(n)] for i in range(n)],
+        'durations': [[0 if i == j else 60 * (i + j) for j in range(n)] for i in range(n)],
+    }
+    return response
+
+
+class HaversineMatrixTests(SimpleTestCase):
+    def test_matches_pairwise_haversine(self):
+        matrix = LocationService.haversine_matrix(POINTS)
+        self.assertEqual(matrix.shape, (4, 4))
+        for i, (lat1, lon1) in enumerate(POINTS):
+            for j, (lat2, lon2) in enumerate(POINTS):
+                self.assertAlmostEqual(
+                    round(float(matrix[i, j]), 2),
+                    LocationService.haversine_distance(lat1, lon1, lat2, lon2),
+                    places=2,
+                )
+
+    def test_symmetric_with_zero_diagonal(self):
+        matrix = LocationService.haversine_matrix(POINTS)
+        self.assertTrue((matrix == matrix.T).all())
+        self.assertTrue((matrix.diagonal() == 0).all())
+
+    def test_without_api(self):
+        result = LocationService.get_distance_matrix(POINTS, use_api=False)
+        self.assertEqual(result['source'], 'haversine')
+        self.assertEqual(len(result['distances_km']), 4)
+
+
+class DistanceMatrixApiTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('apps.core.location_service.requests.get')
+    def test_single_osrm_table_call_then_cached(self, mock_get):
+        mock_get.return_value = _osrm_response(len(POINTS))
+
+        result = LocationService.get_distance_matrix(POINTS)
+        again = LocationService.get_distance_matrix(POINTS)
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('/table/v1/driving/', mock_get.call_args[0][0])
+        self.assertEqual(result['source'], 'osrm')
+        self.assertEqual(result['distances_km'][1][2], 3.0)
+        self.assertEqual(result['durations_min'][1][2], 3.0)
+        self.assertEqual(again, result)
+
+    @mock.patch('apps.core.location_service.requests.get')
+    def test_unroutable_pairs_filled_with_haversine(self, mock_get):
+        response = _osrm_response(2)
+        response.json.return_value['distances'][0][1] = None
+        mock_get.return_value = response
+
+        result = LocationService.get_distance_matrix(POINTS[:2])
+        self.assertEqual(
+            result['distances_km'][0][1],
+            LocationService.haversine_distance(*POINTS[0], *POINTS[1]),
+        )
+
+    @mock.patch('apps.core.location_service.requests.get')
+    def test_point_without_coordinates_keeps_the_others_routed(self, mock_get):
+        mock_get.return_value = _osrm_response(3)
+
+        result = LocationService.get_distance_matrix(POINTS[:2] + [(None, None)] + POINTS[2:3])
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(mock_get.call_args[0][0].count(';'), 2)
+        self.assertEqual(result['source'], 'osrm')
+        self.assertEqual(result['distances_km'][0][1], 1.0)
+        self.assertEqual(result['distances_km'][1][3], 3.0)
+        self.assertNotEqual(result['distances_km'][2][0], result['distances_km'][2][0])  # NaN
+
+    @mock.patch.object(LocationService, 'MATRIX_MAX_POINTS', 4)
+    @mock.patch('apps.core.location_service.requests.get')
+    def test_large_matrix_requested_by_blocks(self, mock_get):
+        mock_get.return_value = _osrm_response(4)
+        points = POINTS + [(5.30, -4.02), (5.33, -3.95)]
+
+        result = LocationService.get_distance_matrix(points)
+
+        # 3 groupes de 2 points : une requête de 4 points par paire de groupes
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertTrue(all(call[0][0].count(';') == 3 for call in mock_get.call_args_list))
+        self.assertEqual(result['source'], 'osrm')
+        self.assertTrue(all(d is not None for row in result['distances_km'] for d in row))
+        # Groupes 0 et 2 : points 0 et 4 aux positions 0 et 2 du bloc
+        self.assertEqual(result['distances_km'][0][4], 2.0)
+
+    @mock.patch.object(LocationService, 'MATRIX_MAX_POINTS', 2)
+    @mock.patch.object(LocationService, 'MATRIX_MAX_BLOCK_REQUESTS', 2)
+    @mock.patch('apps.core.location_service.requests.get')
+    def test_too_many_blocks_fall_back_to_haversine(self, mock_get):
+        result = LocationService.get_distance_matrix(POINTS)
+        mock_get.assert_not_called()
+        self.assertEqual(result['source'], 'haversine')
+
+    @mock.patch.object(LocationService, 'ORS_API_KEY', '')
+    @mock.patch('apps.core.location_service.requests.get', side_effect=Exception('network down'))
+    def test_fallback_to_haversine(self, _mock_get):
+        result = LocationService.get_distance_matrix(POINTS)
+        self.assertEqual(result['source'], 'haversine')
+
+
+@mock.patch.object(LocationService, 'ORS_API_KEY', 'test-key')
+class PairDistancesApiTests(SimpleTestCase):
+    @mock.patch('apps.core.location_service.requests.post')
+    def test_single_pair_uses_directions_with_wide_snapping(self, mock_post):
+        mock_post.return_value = mock.Mock(status_code=200)
+        mock_post.return_value.json.return_value = {'routes': [{'summary': {'distance': 4321}}]}
+
+        distance = LocationService.get_distance(*POINTS[0], *POINTS[1])
+
+        self.assertEqual(distance, 4.32)
+        url = mock_post.call_args.args[0]
+        self.assertTrue(url.endswith('/v2/directions/driving-car'))
+        self.assertEqual(mock_post.call_args.kwargs['json']['radiuses'], [1000, 1000])
+
+    @mock.patch.object(LocationService, 'DIRECTIONS_MAX_REQUESTS', 1)
+    @mock.patch.object(LocationService, '_get_distance_ors', return_value=9.0)
+    def test_unroutable_matrix_cells_retry_directions_within_the_limit(self, directions):
+        pairs = [(POINTS[0], POINTS[1]), (POINTS[2], POINTS[3]), (POINTS[0], POINTS[2])]
+        matrix = {
+            'distances_km': [[0.0, None, 1.0, 1.0], [1.0, 0.0, 1.0, 1.0], [1.0, 1.0, 0.0, None], [1.0] * 4],
+            'source': 'openrouteservice',
+        }
+        with mock.patch.object(LocationService, '_get_matrix_ors', return_value=matrix):
+            distances, source = LocationService.get_distances(pairs)
+
+        directions.assert_called_once_with(*POINTS[0], *POINTS[1])
+        self.assertEqual(distances[pairs[0]], 9.0)
+        self.assertEqual(distances[pairs[1]], round(LocationService.haversine_distance(*POINTS[2], *POINTS[3]) * 1.2, 2))
+        self.assertEqual(distances[pairs[2]], 1.0)
+        self.assertEqual(source, 'haversine,openrouteservice')
@@ -0,0 +1,185 @@
+"""
+Tests du stockage des géocodages et du limiteur de débit Nominatim (apps/core/geocode_store.py).
+"""
+import time
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from apps.core import location_views
+from apps.core.geocode_store import NominatimRateLimiter, geocode_store, nominatim_limiter, normalize_query
+from apps.core.nominatim_service import NominatimService
+from apps.core.tests.utils import REDIS_URL, redis_available
+from apps.pricing.models import GeocodeEntry
+from apps.pricing.tasks import resolve_geocode
+
+RIVIERA = {'lat': '5.3679', 'lon': '-3.9850', 'display_name': 'Riviera 2, Cocody, Abidjan'}
+
+
+def nominatim_response(payload, status_code=200):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = payload
+    return response
+
+
+class NormalizeQueryTests(SimpleTestCase):
+    def test_case_accents_and_punctuation_are_ignored(self):
+        self.assertEqual(normalize_query("  Rivièra-2,  COCODY "), 'riviera 2 cocody')
+        self.assertEqual(
+            geocode_store.make_key('address', 'Rue des Jardins, Cocody'),
+            geocode_store.make_key('address', 'rue des  jardins cocody'),
+        )
+        self.assertNotEqual(
+            geocode_store.make_key('address', 'Cocody'),
+            geocode_store.make_key('quartier', 'Cocody'),
+        )
+
+
+class RateLimiterTests(SimpleTestCase):
+    def test_local_bucket_refills_at_the_configured_rate(self):
+        limiter = NominatimRateLimiter()
+
+        self.assertEqual(limiter.acquire(), 0)
+        wait = limiter.acquire()
+        self.assertGreater(wait, 0.9)
+        self.assertLessEqual(wait, 1.0)
+
+    @skipUnless(redis_available(), 'Redis requis pour le limiteur partagé')
+    @override_settings(CACHES={'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': REDIS_URL}})
+    def test_redis_bucket_is_shared_between_processes(self):
+        from django_redis import get_redis_connection
+
+        get_redis_connection('default').delete(NominatimRateLimiter.KEY)
+        self.addCleanup(get_redis_connection('default').delete, NominatimRateLimiter.KEY)
+        worker_a, worker_b = NominatimRateLimiter(), NominatimRateLimiter()
+
+        self.assertEqual(worker_a.acquire(), 0)
+        self.assertGreater(worker_b.acquire(), 0.9)
+        time.sleep(0.01)
+        with override_settings(NOMINATIM_RATE_PER_SECOND=1000):
+            self.assertEqual(worker_b.acquire(), 0)
+
+
+@override_settings(NOMINATIM_RATE_PER_SECOND=1000, NOMINATIM_BURST=10)
+class GeocodeStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        nominatim_limiter.reset()
+        self.addCleanup(nominatim_limiter.reset)
+        patcher = mock.patch('apps.core.nominatim_service.requests.get')
+        self.http = patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('apps.pricing.tasks.resolve_geocode.delay')
+        self.delay = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _resolve_scheduled(self):
+        """Exécute les résolutions planifiées, comme le ferait un worker Celery"""
+        calls, self.delay.call_args_list = self.delay.call_args_list, []
+        for call in calls:
+            resolve_geocode.apply(args=call.args)
+
+    def test_miss_is_resolved_once_and_persisted(self):
+        self.http.return_value = nominatim_response([RIVIERA])
+
+        self.assertEqual(NominatimService.lookup_quartier('Riviera 2', 'Cocody').status, 'pending')
+        self._resolve_scheduled()
+        first = NominatimService.lookup_quartier('Riviera 2', 'Cocody')
+        self.assertEqual(first.status, 'found')
+        self.assertEqual(first.result['latitude'], 5.3679)
+
+        # Autre graphie, cache Django vidé : servi par la base sans appel HTTP
+        cache.clear()
+        self.assertEqual(NominatimService.geocode_quartier('RIVIÉRA 2', 'cocody')['longitude'], -3.985)
+        self.assertEqual(self.http.call_count, 1)
+        self.delay.assert_not_called()
+        entry = GeocodeEntry.objects.get()
+        self.assertEqual((entry.status, entry.query, entry.retry_after), ('found', 'riviera 2 cocody abidjan', None))
+
+    def test_concurrent_misses_schedule_a_single_resolution(self):
+        lookups = [NominatimService.lookup_address('Rue des Jardins') for _ in range(3)]
+
+        self.assertEqual({lookup.status for lookup in lookups}, {'pending'})
+        self.delay.assert_called_once_with(GeocodeEntry.objects.get().pk)
+        self.http.assert_not_called()
+
+    def test_not_found_is_remembered(self):
+        self.http.return_value = nominatim_response([])
+
+        NominatimService.lookup_address('Nulle part')
+        self._resolve_scheduled()
+        self.assertEqual(NominatimService.lookup_address('Nulle part').status, 'not_found')
+        calls = self.http.call_count
+        self.assertEqual(NominatimService.lookup_address('nulle  part').status, 'not_found')
+        self.assertEqual(self.http.call_count, calls)
+        self.delay.assert_not_called()
+
+    def test_unavailable_nominatim_is_retried_later(self):
+        self.http.return_value = nominatim_response({}, status_code=503)
+
+        self.assertEqual(NominatimService.lookup_reverse(5.3679, -3.985).status, 'pending')
+        self._resolve_scheduled()
+        self.assertEqual(GeocodeEntry.objects.get().status, 'failed')
+        self.assertEqual(NominatimService.lookup_reverse(5.3679, -3.985).status, 'pending')
+        self.delay.assert_not_called()
+
+        # Le délai écoulé, la demande suivante relance la résolution
+        GeocodeEntry.objects.update(retry_after=None)
+        self.http.return_value = nominatim_response({'display_name': 'Riviera 2, Cocody'})
+        self.assertIsNone(NominatimService.reverse_geocode(5.367901, -3.985001))
+        self._resolve_scheduled()
+        self.assertEqual(NominatimService.reverse_geocode(5.367901, -3.985001), 'Riviera 2, Cocody')
+
+    def test_nearby_gps_fixes_share_one_reverse_entry(self):
+        self.http.return_value = nominatim_response({'display_name': 'Riviera 2, Cocody'})
+
+        # Fixes à quelques mètres l'un de l'autre, dans la même cellule de 30 m
+        for offset in (0, 0.00003, -0.00004):
+            NominatimService.reverse_geocode(5.36776 + offset, -3.98522 - offset)
+        NominatimService.reverse_geocode(5.3700, -3.9851)
+        self._resolve_scheduled()
+
+        self.assertEqual(GeocodeEntry.objects.filter(kind='reverse').count(), 2)
+        self.assertEqual(self.http.call_count, 2)
+
+    @override_settings(NOMINATIM_RATE_PER_SECOND=1, NOMINATIM_BURST=1)
+    def test_web_requests_never_wait_for_a_token(self):
+        self.http.return_value = nominatim_response([RIVIERA])
+        nominatim_limiter.acquire()
+
+        with mock.patch('apps.core.nominatim_service.time.sleep') as sleep:
+            lookup = NominatimService.lookup_address('Boulevard Latrille')
+            suggestions = NominatimService.search_suggestions('Riviera')
+            self._resolve_scheduled()
+
+        self.assertEqual((lookup.status, suggestions), ('pending', []))
+        sleep.assert_not_called()
+        self.http.assert_not_called()
+
+
+@override_settings(NOMINATIM_RATE_PER_SECOND=1000, NOMINATIM_BURST=10)
+class GeocodeViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        nominatim_limiter.reset()
+        self.addCleanup(nominatim_limiter.reset)
+
+    def _geocode(self, address):
+        request = APIRequestFactory().post('/api/v1/locations/geocode-address/', {'address': address}, format='json')
+        return location_views.geocode_address_nominatim(request)
+
+    def test_pending_then_resolved(self):
+        with mock.patch('apps.pricing.tasks.resolve_geocode.delay'):
+            response = self._geocode('Rue des Jardins, Cocody')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(response.data['pending'])
+        self.assertEqual(response['Retry-After'], '2')
+
+        with mock.patch('apps.core.nominatim_service.requests.get', return_value=nominatim_response([RIVIERA])):
+            resolve_geocode.apply(args=(GeocodeEntry.objects.get().pk,))
+
+        response = self._geocode('Rue des Jardins, Cocody')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['latitude'], response.data['longitude']), (5.3679, -3.985))
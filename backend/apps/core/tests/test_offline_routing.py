@@ -0,0 +1,242 @@
+"""
+Tests du routing hors ligne (apps/core/offline_routing.py) sur un petit extrait OSM synthétique.
+"""
+import gzip
+import heapq
+import os
+import random
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from apps.core.location_service import LocationService
+from apps.core.offline_routing import OfflineRoutingGraph, offline_router, way_profile
+from apps.core.route_cache import route_cache
+from apps.core.routing_providers import routing_orchestrator
+
+ROWS = COLS = 6
+ORIGIN = (5.3000, -4.0200)
+STEP = 0.002  # ~220 m entre intersections
+
+
+def node_id(row, col):
+    return 1 + row * 100 + col
+
+
+def build_extract(path):
+    """
+    Quadrillage de rues : une voie par ligne et par colonne, un nœud de
+    géométrie au milieu de chaque tronçon horizontal. La ligne 2 est une
+    secondaire à sens unique (ouest -> est), la ligne 0 une primaire. S'y
+    ajoutent un chemin piéton (ignoré) et une rue isolée (hors de la
+    composante principale).
+    """
+    nodes, ways = [], []
+    for row in range(ROWS):
+        for col in range(COLS):
+            nodes.append((node_id(row, col), ORIGIN[0] + row * STEP, ORIGIN[1] + col * STEP))
+            if col < COLS - 1:
+                nodes.append((node_id(row, col) + 50, ORIGIN[0] + row * STEP + 0.0003, ORIGIN[1] + (col + 0.5) * STEP))
+    for row in range(ROWS):
+        refs = []
+        for col in range(COLS):
+            refs.append(node_id(row, col))
+            if col < COLS - 1:
+                refs.append(node_id(row, col) + 50)
+        tags = {'highway': 'primary', 'maxspeed': '50'} if row == 0 else {'highway': 'residential'}
+        if row == 2:
+            tags = {'highway': 'secondary', 'oneway': 'yes'}
+        ways.append((1000 + row, refs, tags))
+    for col in range(COLS):
+        ways.append((2000 + col, [node_id(row, col) for row in range(ROWS)], {'highway': 'tertiary'}))
+    ways.append((3000, [node_id(0, 0), node_id(5, 5)], {'highway': 'footway'}))
+    nodes += [(9001, 5.40, -3.90), (9002, 5.401, -3.90)]
+    ways.append((3001, [9001, 9002], {'highway': 'residential'}))
+
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<osm version="0.6">']
+    lines += [f'  <node id="{i}" lat="{lat:.7f}" lon="{lon:.7f}"/>' for i, lat, lon in nodes]
+    for way_id, refs, tags in ways:
+        lines.append(f'  <way id="{way_id}">')
+        lines += [f'    <nd ref="{ref}"/>' for ref in refs]
+        lines += [f'    <tag k="{k}" v="{v}"/>' for k, v in tags.items()]
+        lines.append('  </way>')
+    lines.append('</osm>')
+    with gzip.open(path, 'wt', encoding='utf-8') as output:
+        output.write('\n'.join(lines))
+
+
+def point(row, col):
+    return ORIGIN[0] + row * STEP, ORIGIN[1] + col * STEP
+
+
+def reference_times(graph, source):
+    """Dijkstra de référence sur les tableaux du graphe"""
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for e in range(graph.indptr[u], graph.indptr[u + 1]):
+            v, nd = int(graph.target[e]), d + float(graph.time_s[e])
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+class OfflineRoutingTestCase(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.extract = os.path.join(cls.tmpdir.name, 'grid.osm.gz')
+        build_extract(cls.extract)
+        cls.graph = OfflineRoutingGraph.from_osm(cls.extract, landmark_count=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+        super().tearDownClass()
+
+
+class OfflineRoutingGraphTests(OfflineRoutingTestCase):
+    def test_keeps_intersections_of_the_connected_network(self):
+        # 36 intersections ; la rue isolée et le chemin piéton sont écartés
+        self.assertEqual(self.graph.node_count, ROWS * COLS)
+        self.assertIsNone(self.graph.nearest(5.40, -3.90))
+
+    def test_way_profile(self):
+        self.assertIsNone(way_profile({'highway': 'footway'}))
+        self.assertIsNone(way_profile({'highway': 'residential', 'access': 'private'}))
+        self.assertEqual(way_profile({'highway': 'residential', 'oneway': '-1'})[1], -1)
+        self.assertEqual(way_profile({'highway': 'primary', 'junction': 'roundabout'})[1], 1)
+        self.assertEqual(way_profile({'highway': 'primary', 'maxspeed': '30'})[0], 24)
+
+    def test_alt_matches_dijkstra(self):
+        rng = random.Random(0)
+        for _ in range(40):
+            source, target = rng.randrange(self.graph.node_count), rng.randrange(self.graph.node_count)
+            edges = self.graph.shortest_path(source, target)
+            self.assertAlmostEqual(
+                sum(float(self.graph.time_s[e]) for e in edges),
+                reference_times(self.graph, source)[target],
+                places=3,
+            )
+
+    def test_one_way_street_is_respected(self):
+        west_to_east = self.graph.route(*point(2, 0), *point(2, 5))
+        east_to_west = self.graph.route(*point(2, 5), *point(2, 0))
+
+        # Dans le sens autorisé : tout droit, avec les nœuds de géométrie de la voie
+        self.assertAlmostEqual(west_to_east['distance_km'], 1.12, delta=0.05)
+        self.assertIn((round(point(2, 0)[0] + 0.0003, 5), round(ORIGIN[1] + 0.5 * STEP, 5)), west_to_east['polyline_points'])
+        # En sens inverse : détour par une rue parallèle
+        self.assertGreater(east_to_west['distance_km'], west_to_east['distance_km'] + 0.3)
+
+    def test_route_format_and_snapping(self):
+        start_lat, start_lon = point(1, 1)
+        route = self.graph.route(start_lat + 0.0002, start_lon, *point(4, 4))
+
+        self.assertEqual(route['source'], 'offline')
+        self.assertEqual(route['polyline_points'][0], (round(start_lat + 0.0002, 5), round(start_lon, 5)))
+        self.assertEqual(LocationService._decode_polyline(route['geometry']), route['polyline_points'])
+        self.assertGreater(route['duration_min'], 0)
+        self.assertIsNone(self.graph.route(5.0, -4.5, *point(4, 4)))
+
+    def test_matrix_matches_routes(self):
+        points = [point(0, 0), point(2, 5), point(5, 2)]
+        matrix = self.graph.matrix(points)
+
+        self.assertEqual(matrix['source'], 'offline')
+        for i, a in enumerate(points):
+            for j, b in enumerate(points):
+                expected = 0 if i == j else self.graph.route(*a, *b)['distance_km']
+                self.assertAlmostEqual(matrix['distances_km'][i][j], expected, places=2)
+
+    def test_save_and_load(self):
+        path = os.path.join(self.tmpdir.name, 'saved.npz')
+        self.graph.save(path)
+        loaded = OfflineRoutingGraph.load(path)
+
+        self.assertEqual(loaded.route(*point(0, 0), *point(5, 5)), self.graph.route(*point(0, 0), *point(5, 5)))
+
+
+class LocationServiceOfflineTests(OfflineRoutingTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.graph_path = os.path.join(cls.tmpdir.name, 'abidjan.npz')
+        call_command('build_routing_graph', cls.extract, output=cls.graph_path, landmarks=4, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+        route_cache.clear()
+        routing_orchestrator.reset()
+        offline_router.reset()
+        self.addCleanup(offline_router.reset)
+        settings_patch = override_settings(OFFLINE_ROUTING_GRAPH=self.graph_path)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+        # Aucun appel réseau ne doit partir
+        for target in ('requests.get', 'requests.post'):
+            patcher = mock.patch(f'apps.core.location_service.{target}', side_effect=AssertionError('appel réseau'))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_get_route_uses_local_graph(self):
+        route = LocationService.get_route(*point(0, 0), *point(5, 5))
+
+        self.assertEqual(route['source'], 'offline')
+        self.assertEqual(routing_orchestrator.stats()['providers']['offline']['wins'], 1)
+
+    def test_get_distance_and_matrix_use_local_graph(self):
+        distance = LocationService.get_distance(*point(0, 0), *point(5, 5))
+        matrix = LocationService.get_distance_matrix([point(0, 0), point(5, 5), point(3, 1)])
+
+        self.assertEqual(matrix['source'], 'offline')
+        self.assertEqual(matrix['distances_km'][0][1], distance)
+
+    @override_settings(OFFLINE_ROUTING_MATRIX_MAX_POINTS=1)
+    def test_large_pair_batch_is_left_to_the_apis(self):
+        pairs = [(point(0, 0), point(5, 5)), (point(3, 1), point(2, 5))]
+        with mock.patch.object(LocationService, 'ORS_API_KEY', ''), \
+                mock.patch.object(LocationService, '_get_route_offline', side_effect=AssertionError('recherche hors ligne')):
+            distances, source = LocationService.get_distances(pairs)
+
+        self.assertEqual(source, 'haversine')
+        self.assertEqual(len(distances), 2)
+
+    def test_point_off_network_falls_back(self):
+        with mock.patch.object(LocationService, '_get_route_osrm', return_value=None):
+            route = LocationService.get_route(5.0, -4.5, *point(5, 5))
+
+        self.assertEqual(route['source'], 'fallback_straight_line')
+
+    def test_point_off_network_does_not_trip_the_offline_breaker(self):
+        with mock.patch.object(LocationService, '_get_route_osrm', return_value=None):
+            for i in range(routing_orchestrator.FAILURE_THRESHOLD + 1):
+                LocationService.get_route(5.0, -4.5 + i / 1000, *point(5, 5), use_cache=False)
+
+        route = LocationService.get_route(*point(0, 0), *point(5, 5))
+
+        self.assertEqual(route['source'], 'offline')
+        self.assertEqual(routing_orchestrator.stats()['providers']['offline']['failures'], 0)
+
+    @override_settings(OFFLINE_ROUTING_MATRIX_MAX_POINTS=2)
+    def test_larger_matrix_is_left_to_the_apis(self):
+        points = [point(0, 0), point(5, 5), point(3, 1)]
+        table = {
+            'distances_km': [[0.0, 1.0, 2.0], [1.0, 0.0, 3.0], [2.0, 3.0, 0.0]],
+            'durations_min': [[0.0, 1.0, 2.0], [1.0, 0.0, 3.0], [2.0, 3.0, 0.0]],
+            'source': 'osrm',
+        }
+        with mock.patch.object(LocationService, '_get_matrix_osrm', return_value=table), \
+                mock.patch.object(OfflineRoutingGraph, 'matrix', side_effect=AssertionError('matrice hors ligne')):
+            matrix = LocationService.get_distance_matrix(points)
+
+        self.assertEqual(matrix['source'], 'osrm')
@@ -0,0 +1,91 @@
+"""
+Tests de l'index de recherche des quartiers (apps/core/quartier_index.py).
+"""
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from rest_framework.test import APIRequestFactory
+
+from apps.core import location_views
+from apps.core.quartier_index import EXACT, FUZZY, QuartierIndex, quartier_index
+from apps.core.quartiers_data import get_quartier_coordinates, search_quartiers, validate_quartier
+
+GAZETTEER = {
+    'COCODY': ['Angré', 'Angré 8e Tranche', '2 Plateaux', '2 Plateaux Extension', 'Riviera 1', 'Riviera Palmeraie'],
+    'PLATEAU': ['Le Plateau'],
+    'MARCORY': ['Zone 4', 'Biétry'],
+    'PORT-BOUET': ['Zone 4'],
+}
+GPS = {
+    'COCODY': {'Angré': (5.365, -3.995), 'Riviera 1': (5.3651, -3.9917)},
+    'PORT-BOUET': {'Zone 4': (5.2600, -3.9400)},
+}
+
+
+class QuartierIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = QuartierIndex.from_gazetteer(GAZETTEER, GPS)
+
+    def names(self, query, **kwargs):
+        return [match.entry.nom for match in self.index.search(query, **kwargs)]
+
+    def test_accents_and_case_are_ignored(self):
+        matches = self.index.search('ANGRE')
+        self.assertEqual((matches[0].entry.nom, matches[0].rank), ('Angré', EXACT))
+        self.assertEqual(self.names('bietry'), ['Biétry'])
+
+    def test_word_prefixes_and_substrings(self):
+        self.assertEqual(self.names('plateaux ext')[0], '2 Plateaux Extension')
+        self.assertEqual(set(self.names('lateau', min_similarity=1)), {'2 Plateaux', '2 Plateaux Extension', 'Le Plateau'})
+
+    def test_typos_are_ranked_by_similarity(self):
+        matches = self.index.search('Rivierra Palmerai')
+        self.assertEqual(matches[0].entry.nom, 'Riviera Palmeraie')
+        self.assertEqual(matches[0].rank, FUZZY)
+        self.assertTrue(matches[0].is_good)
+        self.assertFalse(self.index.has_good_match('rue des jardins'))
+
+    def test_gps_first_then_commune_filter(self):
+        self.assertEqual([m.entry.commune for m in self.index.search('zone 4')], ['PORT-BOUET', 'MARCORY'])
+        self.assertEqual([m.entry.commune for m in self.index.search('zone 4', commune='Marcory')], ['MARCORY'])
+        self.assertEqual([m.entry.commune for m in self.index.search('zone 4', commune='Port-Bouët')], ['PORT-BOUET'])
+
+
+class GazetteerFunctionsTests(SimpleTestCase):
+    def test_search_quartiers_keeps_its_format(self):
+        result = search_quartiers('angre', 3)[0]
+        self.assertEqual(set(result), {'nom', 'commune', 'latitude', 'longitude', 'has_gps'})
+        self.assertEqual(result['nom'], 'Angré')
+        self.assertEqual(search_quartiers('a'), [])
+
+    def test_coordinates_tolerate_accents_but_not_other_sectors(self):
+        self.assertEqual(get_quartier_coordinates('riviera palmerai', 'cocody')['nom'], 'Riviera Palmeraie')
+        self.assertEqual(get_quartier_coordinates('Bietry')['commune'], 'MARCORY')
+        self.assertIsNone(get_quartier_coordinates('Riviera 5', 'COCODY'))
+        self.assertIsNone(get_quartier_coordinates(''))
+
+    def test_validate_quartier(self):
+        self.assertTrue(validate_quartier('angre', 'COCODY'))
+        self.assertFalse(validate_quartier('angre', 'YOPOUGON'))
+
+
+class SuggestionsViewTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def _suggestions(self, query):
+        request = APIRequestFactory().get('/api/v1/locations/suggestions/', {'q': query, 'limit': 5})
+        return location_views.search_suggestions(request)
+
+    def test_nominatim_only_without_good_local_match(self):
+        with mock.patch.object(location_views.NominatimService, 'search_suggestions', return_value=[]) as nominatim:
+            response = self._suggestions('Angre')
+            nominatim.assert_not_called()
+            self.assertEqual(response.data['suggestions'][0]['display_name'], 'Angré, COCODY, Abidjan')
+
+            self._suggestions('Rue des Jardins')
+            nominatim.assert_called_once_with('Rue des Jardins', 5)
+
+    def test_shared_index_covers_the_gazetteer(self):
+        self.assertGreater(len(quartier_index.entries), 200)
@@ -0,0 +1,159 @@
+"""
+Tests du reverse geocoding local (apps/core/quartier_locator.py).
+"""
+import random
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIRequestFactory
+
+from apps.core import location_views
+from apps.core.nominatim_service import NominatimService
+from apps.core.quartier_locator import build_kdtree, kdtree_nearest, quartier_locator
+from apps.deliveries.models import Delivery
+from apps.pricing.models import PricingZone
+from apps.pricing.zone_index import zone_index
+
+
+class KDTreeTests(SimpleTestCase):
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        points = [(rng.uniform(0, 30000), rng.uniform(0, 30000)) for _ in range(300)]
+        tree = build_kdtree(points)
+
+        for _ in range(200):
+            x, y = rng.uniform(-2000, 32000), rng.uniform(-2000, 32000)
+            expected = sorted(((px - x) ** 2 + (py - y) ** 2) ** 0.5 for px, py in points)[:3]
+            found = [distance for distance, _ in kdtree_nearest(tree, points, x, y, k=3)]
+            self.assertEqual([round(d, 6) for d in found], [round(d, 6) for d in expected])
+
+    def test_empty_tree(self):
+        self.assertEqual(kdtree_nearest(build_kdtree([]), [], 0, 0), [])
+
+
+class QuartierLocatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quartier_locator.invalidate()
+        self.addCleanup(quartier_locator.invalidate)
+
+    def test_point_near_a_centroid(self):
+        place = quartier_locator.locate(5.3681, -3.9852)
+
+        self.assertEqual((place['quartier'], place['commune'], place['source']), ('Riviera 2', 'COCODY', 'local'))
+        self.assertLess(place['distance_m'], 50)
+        self.assertGreater(place['confidence'], 0.95)
+        self.assertEqual(place['address'], "Riviera 2, Cocody, Abidjan, Côte d'Ivoire")
+
+    def test_far_point_is_left_to_nominatim(self):
+        # Golfe de Guinée, à plusieurs kilomètres de tout centroïde
+        self.assertIsNone(quartier_locator.locate(5.10, -3.90))
+        self.assertIsNotNone(quartier_locator.locate(5.10, -3.90, radius_m=100000))
+
+    def test_pricing_zones_are_indexed_and_follow_zone_changes(self):
+        self.assertIsNone(quartier_locator.locate(5.60, -4.20))
+
+        PricingZone.objects.create(zone_name='Zone Anyama Nord', commune='Anyama', quartier='Anyama Nord',
+                                   is_active=True, default_latitude=Decimal('5.6000'),
+                                   default_longitude=Decimal('-4.2000'))
+
+        place = quartier_locator.locate(5.6001, -4.2001)
+        self.assertEqual((place['quartier'], place['commune']), ('Anyama Nord', 'ANYAMA'))
+
+    def test_zone_change_bumps_its_own_version_once(self):
+        quartier_locator.locate(5.3679, -3.985)
+        zone_index.get_by_commune('Cocody')
+        locator_version = cache.get(quartier_locator.VERSION_KEY)
+        zone_version = cache.get(zone_index.VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch.object(quartier_locator, 'invalidate', wraps=quartier_locator.invalidate) as invalidate:
+            PricingZone.objects.create(zone_name='Zone Anyama Nord', commune='Anyama', is_active=True)
+
+        invalidate.assert_called_once_with()
+        self.assertNotEqual(cache.get(quartier_locator.VERSION_KEY), locator_version)
+        self.assertNotEqual(cache.get(zone_index.VERSION_KEY), zone_version)
+        self.assertNotEqual(quartier_locator.VERSION_KEY, zone_index.VERSION_KEY)
+
+    def test_locate_many_is_aligned_with_input(self):
+        places = quartier_locator.locate_many([(5.3679, -3.985), (5.10, -3.90), (None, None)])
+
+        self.assertEqual(places[0]['quartier'], 'Riviera 2')
+        self.assertEqual(places[1:], [None, None])
+
+
+class ReverseGeocodeViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quartier_locator.invalidate()
+
+    def _reverse(self, latitude, longitude):
+        request = APIRequestFactory().post(
+            '/api/v1/locations/reverse-geocode/', {'latitude': latitude, 'longitude': longitude}, format='json'
+        )
+        return location_views.reverse_geocode_nominatim(request)
+
+    @mock.patch.object(NominatimService, 'lookup_reverse')
+    def test_local_answer_skips_nominatim(self, lookup):
+        response = self._reverse(5.3679, -3.985)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['quartier'], response.data['source']), ('Riviera 2', 'local'))
+        lookup.assert_not_called()
+
+    @mock.patch.object(NominatimService, 'lookup_reverse')
+    def test_outside_the_radius_falls_back_to_nominatim(self, lookup):
+        lookup.return_value = mock.Mock(status='found', result='Grand-Bassam, Côte d\'Ivoire')
+
+        response = self._reverse(5.10, -3.90)
+
+        lookup.assert_called_once()
+        self.assertEqual(response.data['source'], 'nominatim')
+
+
+@mock.patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+class BackfillDeliveryQuartiersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        quartier_locator.invalidate()
+
+    def _create(self, **extra):
+        data = dict(
+            pickup_commune='Cocody',
+            delivery_commune='Plateau',
+            delivery_address='Rue du Commerce',
+            recipient_name='Client',
+            recipient_phone='+2250100000000',
+            package_weight_kg=Decimal('2.0'),
+            payment_method='prepaid',
+            calculated_price=Decimal('1500'),
+        )
+        data.update(extra)
+        return Delivery.objects.create(**data)
+
+    def test_fills_missing_quartiers_from_coordinates(self, delay):
+        delivery = self._create()
+        far = self._create(pickup_quartier='Angré')
+        Delivery.objects.filter(pk=delivery.pk).update(
+            pickup_quartier='', pickup_latitude=Decimal('5.3679'), pickup_longitude=Decimal('-3.985'),
+            delivery_quartier='', delivery_latitude=Decimal('5.10'), delivery_longitude=Decimal('-3.90'),
+        )
+        Delivery.objects.filter(pk=far.pk).update(
+            delivery_quartier='', delivery_latitude=None, delivery_longitude=None,
+        )
+
+        out = StringIO()
+        call_command('backfill_delivery_quartiers', '--dry-run', stdout=out)
+        self.assertEqual(Delivery.objects.get(pk=delivery.pk).pickup_quartier, '')
+
+        call_command('backfill_delivery_quartiers', '--batch-size', '1', stdout=out)
+        delivery.refresh_from_db()
+        far.refresh_from_db()
+        self.assertEqual((delivery.pickup_quartier, delivery.delivery_quartier), ('Riviera 2', ''))
+        self.assertEqual(delivery.pickup_commune_key, 'cocody')
+        self.assertEqual(far.pickup_quartier, 'Angré')
+        self.assertIn('1/1 livraisons mises à jour, 1 positions hors rayon', out.getvalue())
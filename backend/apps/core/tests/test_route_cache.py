@@ -0,0 +1,130 @@
+"""
+Tests du cache des itinéraires (apps/core/route_cache.py) et de son usage par LocationService.get_route.
+"""
+from unittest import mock
+
+import polyline
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.core.location_service import LocationService
+from apps.core.route_cache import RouteCache, route_cache
+
+PLATEAU = (5.32000, -4.02000)
+COCODY = (5.36000, -3.98000)
+# ~10 m de chaque point, dans la même cellule de 50 m
+NEAR_PLATEAU = (5.31991, -4.02009)
+NEAR_COCODY = (5.36009, -3.97991)
+
+
+def _route(points=None):
+    points = points or [PLATEAU, (5.34012, -4.00051), COCODY]
+    return {
+        'distance_km': 7.4,
+        'duration_min': 18.0,
+        'polyline_points': points,
+        'geometry': polyline.encode(points),
+        'steps': [{'instruction': 'Boulevard Latrille', 'distance_m': 900, 'duration_s': 120,
+                   'maneuver': 'turn', 'modifier': 'left'}],
+        'source': 'osrm',
+    }
+
+
+class RouteCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = RouteCache()
+
+    def test_nearby_endpoints_share_a_key(self):
+        key = self.cache.key(*PLATEAU, *COCODY)
+        self.assertEqual(self.cache.key(*NEAR_PLATEAU, *NEAR_COCODY), key)
+        # ~300 m : autre cellule
+        self.assertNotEqual(self.cache.key(5.32270, -4.02000, *COCODY), key)
+        # Le sens compte
+        self.assertNotEqual(self.cache.key(*COCODY, *PLATEAU), key)
+
+    def test_grid_zero_keeps_exact_keys(self):
+        self.cache.GRID_METERS = 0
+        self.assertEqual(self.cache.key(*PLATEAU, *COCODY), 'route:5.32000,-4.02000:5.36000,-3.98000')
+
+    def test_shared_copy_is_compressed_and_restored(self):
+        route = _route()
+        self.cache.set(*PLATEAU, *COCODY, route, 60)
+
+        blob = cache.get(self.cache.key(*PLATEAU, *COCODY))
+        self.assertIsInstance(blob, bytes)
+
+        # Un autre worker (LRU vide) relit la copie partagée
+        other = RouteCache()
+        restored = other.get(*PLATEAU, *COCODY)
+        self.assertEqual(restored['polyline_points'], route['polyline_points'])
+        self.assertEqual(restored['steps'], route['steps'])
+        self.assertEqual(restored['distance_km'], 7.4)
+        self.assertEqual(other.stats()['process']['hits_shared'], 1)
+
+    def test_straight_line_without_geometry_is_encoded(self):
+        route = dict(_route([PLATEAU, COCODY]), geometry=None, source='fallback_straight_line')
+        self.cache.set(*PLATEAU, *COCODY, route, 60)
+
+        restored = RouteCache().get(*PLATEAU, *COCODY)
+        self.assertEqual(restored['polyline_points'], [PLATEAU, COCODY])
+        self.assertIsNone(restored['geometry'])
+
+    def test_local_lru_evicts_least_recently_used(self):
+        self.cache.LOCAL_SIZE = 2
+        ends = [(5.30, -4.0), (5.31, -4.0), (5.33, -4.0)]
+        for end in ends[:2]:
+            self.cache.set(*PLATEAU, *end, _route(), 60)
+        self.cache.get(*PLATEAU, *ends[0])
+        self.cache.set(*PLATEAU, *ends[2], _route(), 60)
+
+        cache.clear()
+        self.assertIsNotNone(self.cache.get(*PLATEAU, *ends[0]))
+        self.assertIsNone(self.cache.get(*PLATEAU, *ends[1]))
+        self.assertIsNotNone(self.cache.get(*PLATEAU, *ends[2]))
+
+    def test_stats_count_hits_misses_and_latency(self):
+        self.assertIsNone(self.cache.get(*PLATEAU, *COCODY))
+        self.cache.set(*PLATEAU, *COCODY, _route(), 60, fetch_seconds=0.2)
+        self.cache.get(*PLATEAU, *COCODY)
+        self.cache.get(*PLATEAU, *COCODY)
+
+        stats = self.cache.stats()
+        process = stats['process']
+        self.assertEqual((process['hits_local'], process['misses'], process['stores']), (2, 1, 1))
+        self.assertAlmostEqual(process['hit_rate'], 2 / 3, places=3)
+        self.assertEqual(process['latency_ms']['buckets']['le_250'], 1)
+        self.assertEqual(process['latency_ms']['p95'], 250)
+        self.assertEqual(stats['cluster']['misses'], 1)
+
+
+class GetRouteCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        route_cache.clear()
+
+    @mock.patch.object(LocationService, '_get_route_osrm')
+    def test_nearby_requests_reuse_one_provider_call(self, mock_osrm):
+        mock_osrm.return_value = _route()
+
+        first = LocationService.get_route(*PLATEAU, *COCODY)
+        second = LocationService.get_route(*NEAR_PLATEAU, *NEAR_COCODY)
+
+        self.assertEqual(mock_osrm.call_count, 1)
+        self.assertEqual(second['polyline_points'], first['polyline_points'])
+        self.assertEqual(route_cache.stats()['process']['hits_local'], 1)
+
+    @mock.patch.object(LocationService, '_get_route_osrm', return_value=None)
+    def test_straight_line_fallback_is_cached_briefly(self, _mock_osrm):
+        with mock.patch.object(LocationService, 'ORS_API_KEY', ''), \
+                mock.patch.object(route_cache, 'set', wraps=route_cache.set) as mock_set:
+            result = LocationService.get_route(*PLATEAU, *COCODY)
+
+        self.assertEqual(result['source'], 'fallback_straight_line')
+        self.assertEqual(mock_set.call_args.args[5], LocationService.ROUTE_FALLBACK_CACHE_TIMEOUT)
+
+    def test_invalid_coordinates_skip_the_cache(self):
+        result = LocationService.get_route(0.0, 0.0, *COCODY)
+
+        self.assertEqual(result['source'], 'fallback_invalid_input')
+        self.assertEqual(route_cache.stats()['process']['lookups'], 0)
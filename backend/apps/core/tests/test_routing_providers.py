@@ -0,0 +1,169 @@
+"""
+Tests de l'orchestration des providers de routing (apps/core/routing_providers.py),
+contre des serveurs OSRM / OpenRouteService locaux.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import polyline
+from django.test import SimpleTestCase
+
+from apps.core.location_service import LocationService
+from apps.core.routing_providers import CircuitBreaker, routing_orchestrator
+
+PLATEAU = (5.32, -4.02)
+COCODY = (5.36, -3.98)
+GEOMETRY = polyline.encode([PLATEAU, (5.34, -4.0), COCODY])
+
+
+class StubRoutingServer:
+    """Serveur HTTP local imitant OSRM (GET /route/v1/...) ou ORS (POST /v2/directions/...)"""
+
+    def __init__(self, provider):
+        self.provider = provider
+        self.status = 200
+        self.delays = []  # délais des prochaines requêtes, puis 0
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.respond(self)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                stub.respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, handler):
+        self.hits += 1
+        delay = self.delays.pop(0) if self.delays else 0
+        time.sleep(delay)
+        if self.status != 200:
+            body = {'error': 'unavailable'}
+        elif self.provider == 'osrm':
+            body = {'code': 'Ok', 'routes': [{'geometry': GEOMETRY, 'distance': 7400, 'duration': 1080, 'legs': []}]}
+        else:
+            body = {'routes': [{'geometry': GEOMETRY, 'summary': {'distance': 7600, 'duration': 1200}, 'segments': []}]}
+        payload = json.dumps(body).encode()
+        try:
+            handler.send_response(self.status)
+            handler.send_header('Content-Type', 'application/json')
+            handler.send_header('Content-Length', str(len(payload)))
+            handler.end_headers()
+            handler.wfile.write(payload)
+        except OSError:
+            pass
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class RoutingOrchestratorTests(SimpleTestCase):
+    def setUp(self):
+        self.osrm = StubRoutingServer('osrm')
+        self.ors = StubRoutingServer('ors')
+        self.addCleanup(self.osrm.close)
+        self.addCleanup(self.ors.close)
+        for patcher in (
+            mock.patch.object(LocationService, 'OSRM_BASE_URL', self.osrm.url),
+            mock.patch.object(LocationService, 'ORS_BASE_URL', self.ors.url),
+            mock.patch.object(LocationService, 'ORS_API_KEY', 'test-key'),
+            mock.patch.dict(os.environ, {'OSRM_RETRY_ATTEMPTS': '1', 'ORS_RETRY_ATTEMPTS': '1', 'PREFER_ORS': ''}),
+            mock.patch.object(routing_orchestrator, 'HEDGE_AFTER_SECONDS', 0.2),
+            mock.patch.object(routing_orchestrator, 'FAILURE_THRESHOLD', 2),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        routing_orchestrator.reset()
+        self.addCleanup(routing_orchestrator.reset)
+
+    def _route(self):
+        started = time.monotonic()
+        result = LocationService.get_route(*PLATEAU, *COCODY, use_cache=False)
+        return result, time.monotonic() - started
+
+    def test_fast_primary_is_not_hedged(self):
+        result, _ = self._route()
+
+        self.assertEqual(result['source'], 'osrm')
+        self.assertEqual(self.ors.hits, 0)
+        self.assertEqual(routing_orchestrator.stats()['hedges'], 0)
+
+    def test_slow_primary_is_hedged_to_next_provider(self):
+        self.osrm.delays = [2.0]
+
+        result, elapsed = self._route()
+
+        self.assertEqual(result['source'], 'openrouteservice')
+        self.assertLess(elapsed, 1.0)
+        stats = routing_orchestrator.stats()
+        self.assertEqual(stats['hedges'], 1)
+        self.assertEqual(stats['providers']['openrouteservice']['wins'], 1)
+
+    def test_failing_primary_falls_back_without_waiting(self):
+        self.osrm.status = 500
+        routing_orchestrator.HEDGE_AFTER_SECONDS = 5
+
+        result, elapsed = self._route()
+
+        self.assertEqual(result['source'], 'openrouteservice')
+        self.assertLess(elapsed, 1.0)
+
+    def test_breaker_skips_dead_provider_then_probes_it(self):
+        self.osrm.status = 500
+        for _ in range(2):
+            self._route()
+        osrm = routing_orchestrator.provider('osrm')
+        self.assertEqual(osrm.breaker.state, CircuitBreaker.OPEN)
+
+        result, _ = self._route()
+        self.assertEqual(result['source'], 'openrouteservice')
+        self.assertEqual(self.osrm.hits, 2)
+
+        # Après le délai de réouverture, une requête d'essai referme le disjoncteur
+        self.osrm.status = 200
+        osrm.breaker.reset_seconds = 0
+        result, _ = self._route()
+        self.assertEqual(result['source'], 'osrm')
+        self.assertEqual(osrm.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_all_providers_down_uses_straight_line(self):
+        self.osrm.status = self.ors.status = 503
+
+        result, _ = self._route()
+
+        self.assertEqual(result['source'], 'fallback_straight_line')
+
+    def test_single_provider_is_not_hedged_to_itself(self):
+        self.osrm.delays = [0.5]
+
+        with mock.patch.object(LocationService, 'ORS_API_KEY', ''):
+            result, _ = self._route()
+
+        self.assertEqual(result['source'], 'osrm')
+        self.assertEqual(self.osrm.hits, 1)
+        self.assertEqual(routing_orchestrator.stats()['hedges'], 0)
+
+    def test_single_provider_hedges_a_duplicate_request_when_opted_in(self):
+        self.osrm.delays = [2.0]
+
+        with mock.patch.object(LocationService, 'ORS_API_KEY', ''), \
+                mock.patch.object(routing_orchestrator, 'SELF_HEDGE_PROVIDERS', frozenset({'osrm'})):
+            result, elapsed = self._route()
+
+        self.assertEqual(result['source'], 'osrm')
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(self.osrm.hits, 2)
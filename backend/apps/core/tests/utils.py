@@ -0,0 +1,13 @@
+"""
+Utilitaires partagés par les tests qui ont besoin d'un vrai Redis.
+"""
+
+REDIS_URL = 'redis://localhost:6379/15'
+
+
+def redis_available():
+    try:
+        import redis
+        return redis.Redis.from_url(REDIS_URL, socket_connect_timeout=0.2).ping()
+    except Exception:
+        return False
@@ -0,0 +1,393 @@
+# deliveries/bulk_import.py
+"""
+Import en masse de livraisons depuis un manifeste marchand (CSV ou JSON).
+
+Le manifeste est lu en flux et traité par lots de `batch_size` lignes :
+1. validation de chaque ligne avec `DeliveryCreateSerializer` (mêmes règles que
+   la création unitaire) ;
+2. tarification du lot en un appel (`PricingCalculator.calculate_prices` :
+   index des zones, table tarifaire compilée, une matrice de distances) ;
+3. coordonnées GPS : celles du client, sinon le centroïde de zone utilisé pour
+   le prix, sinon les coordonnées par défaut de la commune (pas de géocodage
+   réseau ligne par ligne) ;
+4. insertion avec `bulk_create` (les signaux pre_save / post_save ne sont pas
+   déclenchés : coordonnées, code PIN et agrégats journaliers sont donc
+   renseignés ici) ;
+5. envoi des codes PIN par email via Celery, après commit du lot.
+
+Une ligne invalide n'interrompt pas l'import : elle est reportée avec son numéro.
+Seul le lot courant est gardé en mémoire, le rapport est borné à
+`MAX_REPORTED_ROWS` erreurs et livraisons.
+
+Formats acceptés :
+- CSV avec en-tête (séparateur ',' ou ';'), noms de colonnes = champs de création ;
+- JSON : tableau d'objets ou un objet par ligne (JSON Lines).
+Une colonne / clé optionnelle `reference` (numéro de commande du marchand) est
+renvoyée telle quelle dans le rapport.
+"""
+
+import codecs
+import csv
+import json
+import logging
+import random
+import string
+from datetime import datetime
+from decimal import Decimal
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from apps.pricing.calculator import PricingCalculator
+
+from .models import Delivery
+from .rollups import record_created
+from .serializers import DeliveryCreateSerializer
+from .signals import local_coordinates
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BATCH_SIZE = 500
+
+# Nombre maximum d'erreurs / de livraisons détaillées dans le rapport
+MAX_REPORTED_ROWS = 1000
+
+# Taille des blocs lus dans un manifeste JSON
+JSON_READ_CHUNK = 64 * 1024
+
+# Tentatives d'insertion d'un lot en cas de collision de numéro de suivi
+INSERT_ATTEMPTS = 3
+
+COORD_QUANTUM = Decimal('0.00000001')
+
+MODEL_FIELDS = {field.name for field in Delivery._meta.concrete_fields}
+
+
+def _as_text(stream):
+    """Décode un flux binaire en UTF-8 (BOM Excel toléré) ; un flux texte est renvoyé tel quel"""
+    sample = stream.read(0)
+    if isinstance(sample, bytes):
+        return codecs.getreader('utf-8-sig')(stream)
+    return stream
+
+
+def iter_csv_rows(stream):
+    """
+    Itère sur les lignes d'un manifeste CSV (dicts), sans charger le fichier.
+    Les cellules vides sont ignorées pour laisser s'appliquer les valeurs par défaut.
+    """
+    text = _as_text(stream)
+    header = text.readline()
+    if not header:
+        return
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(chain([header], text), delimiter=delimiter)
+    try:
+        for row in reader:
+            yield {
+                key.strip(): value.strip()
+                for key, value in row.items()
+                if key and isinstance(value, str) and value.strip()
+            }
+    except csv.Error as e:
+        raise ValueError(f"CSV invalide (ligne {reader.line_num}): {e}")
+
+
+def iter_json_rows(stream, chunk_size=JSON_READ_CHUNK):
+    """
+    Itère sur les objets d'un manifeste JSON (tableau ou JSON Lines) en lisant
+    le flux par blocs : seul l'objet en cours de décodage est gardé en mémoire.
+    """
+    text = _as_text(stream)
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+
+    while True:
+        buffer = buffer.lstrip()
+        if buffer:
+            if not started:
+                started = True
+                if buffer[0] == '[':
+                    buffer = buffer[1:]
+                    continue
+            # Séparateurs du tableau
+            if buffer[0] in ',]':
+                buffer = buffer[1:]
+                continue
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                buffer = buffer[end:]
+                yield obj
+                continue
+        elif eof:
+            return
+
+        chunk = text.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def iter_manifest_rows(stream, file_format):
+    """Sélectionne le lecteur selon le format ('csv' ou 'json')"""
+    if file_format == 'csv':
+        return iter_csv_rows(stream)
+    if file_format in ('json', 'jsonl', 'ndjson'):
+        return iter_json_rows(stream)
+    raise ValueError(f"Format de manifeste non supporté: {file_format}")
+
+
+def guess_manifest_format(filename, default='csv'):
+    """Format d'après l'extension du fichier"""
+    extension = (filename or '').rsplit('.', 1)[-1].lower() if '.' in (filename or '') else ''
+    if extension in ('csv', 'txt'):
+        return 'csv'
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'json'
+    return default
+
+
+class BulkDeliveryImporter:
+    """
+    Usage:
+        importer = BulkDeliveryImporter(user)
+        report = importer.run(iter_manifest_rows(fichier, 'csv'))
+    """
+
+    def __init__(self, user, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, send_pin_emails=True):
+        from apps.merchants.models import Merchant
+
+        self.user = user
+        self.batch_size = max(1, int(batch_size))
+        self.dry_run = dry_run
+        self.send_pin_emails = send_pin_emails
+        self.calculator = PricingCalculator()
+
+        # Mêmes règles que DeliveryViewSet.perform_create
+        self.merchant = Merchant.objects.filter(user=user).first()
+        self.default_pickup_commune = None
+        if self.merchant:
+            primary_address = self.merchant.addresses.filter(is_primary=True).first()
+            if primary_address:
+                self.default_pickup_commune = primary_address.commune
+        else:
+            from apps.individuals.models import Individual
+            if not Individual.objects.filter(user=user).exists():
+                raise ValidationError("Vous n'avez pas de profil")
+
+        self.report = {
+            'total_rows': 0,
+            'created': 0,
+            'failed': 0,
+            'dry_run': dry_run,
+            'errors': [],
+            'deliveries': [],
+            'truncated': False,
+        }
+
+    def run(self, rows):
+        """Importe toutes les lignes (itérable de dicts) et renvoie le rapport"""
+        batch = []
+        for row_number, row in enumerate(rows, start=1):
+            batch.append((row_number, row))
+            if len(batch) >= self.batch_size:
+                self._process_batch(batch)
+                batch = []
+        if batch:
+            self._process_batch(batch)
+
+        logger.info(
+            f"Import livraisons ({self.user}): {self.report['created']} créées, "
+            f"{self.report['failed']} en erreur sur {self.report['total_rows']} lignes"
+        )
+        return self.report
+
+    # ------------------------------------------------------------------
+    # Traitement d'un lot
+    # ------------------------------------------------------------------
+
+    def _process_batch(self, batch):
+        self.report['total_rows'] += len(batch)
+
+        # 1. Validation ligne par ligne
+        valid = []
+        for row_number, row in batch:
+            if not isinstance(row, dict):
+                self._add_error(row_number, None, {'non_field_errors': ['La ligne doit être un objet']})
+                continue
+            row = dict(row)
+            reference = row.pop('reference', None)
+            if not row.get('pickup_commune') and self.default_pickup_commune:
+                row['pickup_commune'] = self.default_pickup_commune
+
+            serializer = DeliveryCreateSerializer(data=row)
+            if not serializer.is_valid():
+                self._add_error(row_number, reference, serializer.errors)
+                continue
+
+            data = serializer.validated_data
+            if not data.get('pickup_commune'):
+                message = ("Vous devez avoir une adresse principale ou fournir 'pickup_commune'"
+                           if self.merchant else "pickup_commune est requis pour les particuliers")
+                self._add_error(row_number, reference, {'pickup_commune': [message]})
+                continue
+            valid.append((row_number, reference, data))
+
+        if not valid:
+            return
+
+        # 2. Tarification du lot
+        quotes = self.calculator.calculate_prices([self._pricing_data(data) for _, _, data in valid])
+        distance_source = quotes['distance_source']
+
+        # 3. Construction des livraisons
+        pending = []
+        for (row_number, reference, data), quote in zip(valid, quotes['quotes']):
+            if 'error' in quote:
+                self._add_error(row_number, reference, {'pricing': [quote['error']]})
+                continue
+            if quote['total_price'] <= 0:
+                self._add_error(row_number, reference, {'pricing': ["Le prix calculé est invalide"]})
+                continue
+            pending.append((row_number, reference, self._build_delivery(data, quote, distance_source)))
+
+        if not pending:
+            return
+
+        # 4. Insertion
+        if not self.dry_run:
+            try:
+                self._insert([delivery for _, _, delivery in pending])
+            except Exception as e:
+                logger.error(f"Import livraisons: échec d'insertion du lot ({e})", exc_info=True)
+                for row_number, reference, _ in pending:
+                    self._add_error(row_number, reference, {'non_field_errors': ["Erreur lors de l'enregistrement"]})
+                return
+
+        for row_number, reference, delivery in pending:
+            self.report['created'] += 1
+            self._add_result(self.report['deliveries'], {
+                'row': row_number,
+                'reference': reference,
+                'id': None if self.dry_run else str(delivery.id),
+                'tracking_number': None if self.dry_run else delivery.tracking_number,
+                'calculated_price': float(delivery.calculated_price),
+            })
+
+    def _pricing_data(self, data):
+        """Même construction que DeliveryViewSet.perform_create"""
+        pricing_data = {
+            'pickup_commune': data.get('pickup_commune'),
+            'delivery_commune': data.get('delivery_commune'),
+            'package_weight_kg': float(data.get('package_weight_kg', 0) or 0),
+            'is_fragile': data.get('is_fragile', False),
+            'scheduling_type': data.get('scheduling_type', 'immediate'),
+        }
+        for field in ('pickup_quartier', 'delivery_quartier'):
+            value = data.get(field)
+            if isinstance(value, str):
+                value = value.strip()
+            if value:
+                pricing_data[field] = value
+        for side in ('pickup', 'delivery'):
+            lat, lon = data.get(f'{side}_latitude'), data.get(f'{side}_longitude')
+            if lat is not None and lon is not None:
+                pricing_data[f'{side}_coords'] = (float(lat), float(lon))
+        return pricing_data
+
+    def _build_delivery(self, data, quote, distance_source):
+        details = quote.get('details', {})
+        delivery = Delivery(
+            **{field: value for field, value in data.items() if field in MODEL_FIELDS},
+            merchant=self.merchant,
+            created_by=self.user,
+            calculated_price=Decimal(str(quote['total_price'])),
+            driver_amount=Decimal(str(quote['driver_amount'])),
+            platform_fee=Decimal(str(quote['platform_fee'])),
+            platform_fee_percentage=Decimal(str(quote.get('platform_fee_percentage', 25.0))),
+            distance_source=distance_source,
+        )
+        delivery.delivery_confirmation_code = delivery.generate_confirmation_code()
+        delivery.update_commune_keys()
+
+        if details.get('distance_km') is not None:
+            delivery.distance_km = Decimal(str(details['distance_km']))
+
+        # Coordonnées : client, sinon centroïde de zone utilisé pour le prix,
+        # sinon coordonnées locales de la commune (cf. signals.local_coordinates)
+        used_coords = details.get('used_coords') or {}
+        for side in ('pickup', 'delivery'):
+            if delivery.get_coords(side):
+                continue
+            coords = used_coords.get(side)
+            if not coords:
+                coords = local_coordinates(getattr(delivery, f'{side}_commune'), getattr(delivery, f'{side}_quartier'))
+            if coords:
+                setattr(delivery, f'{side}_latitude', Decimal(str(coords[0])).quantize(COORD_QUANTUM))
+                setattr(delivery, f'{side}_longitude', Decimal(str(coords[1])).quantize(COORD_QUANTUM))
+        return delivery
+
+    def _insert(self, deliveries):
+        for attempt in range(INSERT_ATTEMPTS):
+            self._assign_tracking_numbers(deliveries)
+            try:
+                with transaction.atomic():
+                    Delivery.objects.bulk_create(deliveries, batch_size=self.batch_size)
+                    record_created(deliveries)
+                    if self.send_pin_emails and getattr(self.user, 'email', None):
+                        delivery_ids = [str(d.id) for d in deliveries]
+                        transaction.on_commit(lambda: self._queue_pin_emails(delivery_ids))
+                return
+            except IntegrityError:
+                # Numéro de suivi pris entre-temps par une autre création
+                if attempt == INSERT_ATTEMPTS - 1:
+                    raise
+                logger.warning("Import livraisons: collision de numéro de suivi, nouvel essai")
+
+    def _assign_tracking_numbers(self, deliveries):
+        """
+        Numéros de suivi uniques pour tout le lot : `generate_tracking_number`
+        n'a que 4 chiffres aléatoires par seconde, insuffisant pour des centaines de lignes.
+        """
+        numbers = set()
+        while len(numbers) < len(deliveries):
+            prefix = 'LB' + str(int(datetime.now().timestamp()))[-8:]
+            missing = len(deliveries) - len(numbers)
+            candidates = {
+                prefix + ''.join(random.choices(string.digits, k=4 if len(deliveries) < 1000 else 6))
+                for _ in range(missing)
+            } - numbers
+            taken = set(Delivery.objects.filter(tracking_number__in=candidates).values_list('tracking_number', flat=True))
+            numbers |= candidates - taken
+        for delivery, number in zip(deliveries, numbers):
+            delivery.tracking_number = number
+
+    def _queue_pin_emails(self, delivery_ids):
+        from .tasks import send_delivery_pin_emails
+
+        try:
+            send_delivery_pin_emails.delay(delivery_ids, self.user.email)
+        except Exception as e:
+            logger.error(f"Import livraisons: envoi des codes PIN non planifié ({e})")
+
+    # ------------------------------------------------------------------
+    # Rapport
+    # ------------------------------------------------------------------
+
+    def _add_error(self, row_number, reference, errors):
+        self.report['failed'] += 1
+        self._add_result(self.report['errors'], {'row': row_number, 'reference': reference, 'errors': errors})
+
+    def _add_result(self, bucket, item):
+        if len(bucket) < MAX_REPORTED_ROWS:
+            bucket.append(item)
+        else:
+            self.report['truncated'] = True
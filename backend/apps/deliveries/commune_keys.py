@@ -0,0 +1,69 @@
+# deliveries/commune_keys.py
+"""
+Recalcul des clés de commune normalisées (`normalize_commune_name`) :
+`Delivery.pickup_commune_key` / `delivery_commune_key` et `DriverZone.commune_key`.
+
+Les clés sont maintenues par les méthodes save() des modèles. Ces fonctions
+servent au remplissage initial (migrations) et à la réparation après des
+écritures qui contournent save() (`QuerySet.update`, SQL brut) : commande
+`backfill_commune_keys`.
+
+Les modèles sont passés en paramètre pour fonctionner aussi avec les modèles
+historiques des migrations (sans méthodes personnalisées).
+"""
+
+from apps.pricing.calculator import normalize_commune_name
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+def _backfill(model, pairs, batch_size):
+    """
+    Parcourt la table par pages de clé primaire et met à jour (bulk_update)
+    les lignes dont une clé diffère de la normalisation de sa colonne source.
+
+    Args:
+        pairs: [(champ_source, champ_clé), ...]
+    """
+    fields = ['pk'] + [field for pair in pairs for field in pair]
+    queryset = model.objects.order_by('pk').only(*fields[1:])
+    updated = 0
+    last_pk = None
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(page[:batch_size])
+        if not rows:
+            return updated
+
+        changed = []
+        for row in rows:
+            dirty = False
+            for source, key in pairs:
+                value = normalize_commune_name(getattr(row, source))
+                if getattr(row, key) != value:
+                    setattr(row, key, value)
+                    dirty = True
+            if dirty:
+                changed.append(row)
+        if changed:
+            model.objects.bulk_update(changed, [key for _, key in pairs], batch_size=batch_size)
+            updated += len(changed)
+        last_pk = rows[-1].pk
+
+
+def backfill_delivery_commune_keys(delivery_model=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Renvoie le nombre de livraisons mises à jour"""
+    if delivery_model is None:
+        from .models import Delivery as delivery_model
+    return _backfill(
+        delivery_model,
+        [('pickup_commune', 'pickup_commune_key'), ('delivery_commune', 'delivery_commune_key')],
+        batch_size,
+    )
+
+
+def backfill_driver_zone_commune_keys(driver_zone_model=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Renvoie le nombre de zones livreur mises à jour"""
+    if driver_zone_model is None:
+        from apps.drivers.models import DriverZone as driver_zone_model
+    return _backfill(driver_zone_model, [('commune', 'commune_key')], batch_size)
@@ -0,0 +1,25 @@
+# backend/apps/deliveries/management/commands/backfill_commune_keys.py
+from django.core.management.base import BaseCommand
+
+from apps.deliveries.commune_keys import (
+    DEFAULT_BATCH_SIZE, backfill_delivery_commune_keys, backfill_driver_zone_commune_keys
+)
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les communes normalisées (pickup/delivery_commune_key, DriverZone.commune_key)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Lignes par lot')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        self.stdout.write('📍 Livraisons...')
+        deliveries = backfill_delivery_commune_keys(batch_size=batch_size)
+        self.stdout.write('📍 Zones livreurs...')
+        zones = backfill_driver_zone_commune_keys(batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'\n🎉 {deliveries} livraisons et {zones} zones livreurs mises à jour'
+        ))
@@ -0,0 +1,86 @@
+# backend/apps/deliveries/management/commands/backfill_delivery_quartiers.py
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.core.quartier_locator import quartier_locator
+from apps.deliveries.models import Delivery
+
+SIDES = {
+    'pickup': ('pickup_latitude', 'pickup_longitude', 'pickup_quartier', 'pickup_commune'),
+    'delivery': ('delivery_latitude', 'delivery_longitude', 'delivery_quartier', 'delivery_commune'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Complète les quartiers (et communes) manquants des livraisons à partir de leurs '
+        'coordonnées GPS, par reverse geocoding local (aucun appel réseau)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Lignes par lot')
+        parser.add_argument(
+            '--radius', type=float, default=None,
+            help='Distance max au centroïde en mètres (défaut: REVERSE_GEOCODE_LOCAL_RADIUS_METERS)'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Compter sans écrire')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        missing = Q()
+        for lat_field, lon_field, quartier_field, _ in SIDES.values():
+            missing |= Q(**{quartier_field: '', f'{lat_field}__isnull': False, f'{lon_field}__isnull': False})
+
+        fields = [field for side in SIDES.values() for field in side]
+        queryset = Delivery.objects.filter(missing).order_by('pk').only(
+            *fields, 'pickup_commune_key', 'delivery_commune_key'
+        )
+
+        scanned = updated = unresolved = 0
+        last_pk = None
+        while True:
+            page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(page[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1].pk
+            scanned += len(rows)
+
+            # Un seul passage dans l'index pour tout le lot
+            todo = [
+                (row, side)
+                for row in rows
+                for side, (lat_field, lon_field, quartier_field, _) in SIDES.items()
+                if not getattr(row, quartier_field) and getattr(row, lat_field) is not None
+                and getattr(row, lon_field) is not None
+            ]
+            places = quartier_locator.locate_many(
+                [(getattr(row, SIDES[side][0]), getattr(row, SIDES[side][1])) for row, side in todo],
+                radius_m=options['radius']
+            )
+
+            changed = {}
+            for (row, side), place in zip(todo, places):
+                if not place or not place['quartier']:
+                    unresolved += 1
+                    continue
+                _, _, quartier_field, commune_field = SIDES[side]
+                setattr(row, quartier_field, place['quartier'])
+                if not getattr(row, commune_field):
+                    setattr(row, commune_field, place['commune'])
+                changed[row.pk] = row
+
+            if changed and not options['dry_run']:
+                # bulk_update ne passe pas par save() : clés de commune recalculées à la main,
+                # et pas de nouveau géocodage déclenché par les signaux
+                for row in changed.values():
+                    row.update_commune_keys()
+                Delivery.objects.bulk_update(list(changed.values()), fields[2:4] + fields[6:8] + [
+                    'pickup_commune_key', 'delivery_commune_key'
+                ])
+            updated += len(changed)
+
+        verb = 'à mettre à jour' if options['dry_run'] else 'mises à jour'
+        self.stdout.write(self.style.SUCCESS(
+            f'🎉 {updated}/{scanned} livraisons {verb}, {unresolved} positions hors rayon ou sans quartier'
+        ))
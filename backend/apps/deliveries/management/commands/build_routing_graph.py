@@ -0,0 +1,48 @@
+# backend/apps/deliveries/management/commands/build_routing_graph.py
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.offline_routing import OfflineRoutingGraph
+
+
+class Command(BaseCommand):
+    help = (
+        'Construit le graphe routier hors ligne (fichier .npz) à partir d\'un extrait '
+        'OpenStreetMap (.osm, .osm.gz, .osm.bz2 ou .osm.pbf avec pyosmium)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('extract', help='Extrait OSM (ex: abidjan.osm.bz2)')
+        parser.add_argument(
+            '--output',
+            help='Fichier .npz à écrire (défaut: OFFLINE_ROUTING_GRAPH)'
+        )
+        parser.add_argument('--landmarks', type=int, default=8, help='Nombre de landmarks ALT (défaut: 8)')
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'OFFLINE_ROUTING_GRAPH', '')
+        if not output:
+            raise CommandError('Indiquer --output ou configurer OFFLINE_ROUTING_GRAPH')
+        if not os.path.exists(options['extract']):
+            raise CommandError(f"Extrait introuvable: {options['extract']}")
+
+        started = time.monotonic()
+        try:
+            graph = OfflineRoutingGraph.from_osm(options['extract'], landmark_count=options['landmarks'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Écriture atomique : les workers qui chargent le graphe ne lisent jamais un fichier partiel
+        temporary = f'{output}.tmp'
+        graph.save(temporary)
+        os.replace(temporary, output)
+
+        size_mb = os.path.getsize(output) / (1024 * 1024)
+        self.stdout.write(self.style.SUCCESS(
+            f'🎉 Graphe écrit dans {output}: {graph.meta["nodes"]} intersections, '
+            f'{graph.meta["edges"]} arcs, {len(graph.landmarks)} landmarks, '
+            f'{size_mb:.1f} Mo en {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,58 @@
+# backend/apps/deliveries/management/commands/import_deliveries.py
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.authentication.models import User
+from apps.deliveries.bulk_import import (
+    BulkDeliveryImporter, DEFAULT_BATCH_SIZE, guess_manifest_format, iter_manifest_rows
+)
+
+
+class Command(BaseCommand):
+    help = 'Importe en masse les livraisons d\'un manifeste CSV / JSON pour un marchand ou un particulier'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Chemin du manifeste (.csv, .json, .jsonl)')
+        parser.add_argument('--user', required=True, help='Email du créateur des livraisons')
+        parser.add_argument('--format', choices=['csv', 'json'], help='Format du manifeste (défaut: extension)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Lignes par lot')
+        parser.add_argument('--dry-run', action='store_true', help='Valide et calcule les prix sans rien créer')
+        parser.add_argument('--no-email', action='store_true', help="N'envoie pas les codes PIN par email")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(email=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur introuvable: {options['user']}")
+
+        file_format = options['format'] or guess_manifest_format(options['path'])
+        try:
+            importer = BulkDeliveryImporter(
+                user,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                send_pin_emails=not options['no_email'],
+            )
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+
+        self.stdout.write(f"📦 Import de {options['path']} ({file_format}) pour {user.email}...")
+        try:
+            with open(options['path'], 'rb') as manifest:
+                report = importer.run(iter_manifest_rows(manifest, file_format))
+        except OSError as e:
+            raise CommandError(f"Lecture impossible: {e}")
+        except ValueError as e:
+            report = importer.report
+            self.stdout.write(self.style.ERROR(f"❌ Manifeste invalide: {e}"))
+
+        for error in report['errors']:
+            reference = f" ({error['reference']})" if error.get('reference') else ''
+            self.stdout.write(self.style.ERROR(f"❌ Ligne {error['row']}{reference}: {error['errors']}"))
+        if report['truncated']:
+            self.stdout.write(self.style.WARNING('⚠️ Rapport tronqué'))
+
+        verb = 'validées' if report['dry_run'] else 'créées'
+        self.stdout.write(self.style.SUCCESS(
+            f"\n🎉 {report['created']}/{report['total_rows']} livraisons {verb}, {report['failed']} en erreur"
+        ))
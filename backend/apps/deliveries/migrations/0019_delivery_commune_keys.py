@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+def backfill_keys(apps, schema_editor):
+    from apps.deliveries.commune_keys import backfill_delivery_commune_keys
+
+    updated = backfill_delivery_commune_keys(apps.get_model('deliveries', 'Delivery'))
+    print(f'Delivery commune keys filled: {updated}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('deliveries', '0018_add_platform_fee_driver_amount_optional_weight'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='delivery',
+            name='delivery_commune_key',
+            field=models.CharField(blank=True, editable=False, help_text='Commune de livraison normalisée (normalize_commune_name), maintenue au save()', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='delivery',
+            name='pickup_commune_key',
+            field=models.CharField(blank=True, editable=False, help_text='Commune de départ normalisée (normalize_commune_name), maintenue au save()', max_length=100),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['status', 'pickup_commune_key'], name='delivery_status_pickup_key_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['status', 'delivery_commune_key'], name='delivery_status_dlv_key_idx'),
+        ),
+    ]
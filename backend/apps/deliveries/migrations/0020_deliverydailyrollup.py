@@ -0,0 +1,47 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    from apps.deliveries.rollups import reconcile_delivery_rollups
+
+    result = reconcile_delivery_rollups(
+        delivery_model=apps.get_model('deliveries', 'Delivery'),
+        rollup_model=apps.get_model('deliveries', 'DeliveryDailyRollup'),
+    )
+    print(f"Delivery daily rollups built: {result['rows']}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merchants', '0003_allow_null_merchant_in_rating'),
+        ('drivers', '0014_archivedtrack'),
+        ('deliveries', '0019_delivery_commune_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Jour de création des livraisons')),
+                ('completed_day', models.DateField(blank=True, help_text="Jour de livraison ou d'annulation", null=True)),
+                ('delivery_commune', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(max_length=50)),
+                ('deliveries', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('driver', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='drivers.driver')),
+                ('merchant', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='merchants.merchant')),
+            ],
+            options={
+                'verbose_name': 'Agrégat journalier de livraisons',
+                'verbose_name_plural': 'Agrégats journaliers de livraisons',
+                'db_table': 'delivery_daily_rollups',
+                'indexes': [models.Index(fields=['day', 'status'], name='rollup_day_status_idx'), models.Index(fields=['merchant', 'day'], name='rollup_merchant_day_idx'), models.Index(fields=['driver', 'day'], name='rollup_driver_day_idx')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
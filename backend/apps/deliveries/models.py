@@ -45,6 +45,7 @@ class Delivery(models.Model):
     pickup_address = models.ForeignKey(MerchantAddress, on_delete=models.SET_NULL, null=True, blank=True)
     pickup_address_details = models.CharField(max_length=255, blank=True, help_text="Adresse complète si différente des adresses sauvegardées")
     pickup_commune = models.CharField(max_length=100, blank=True, help_text="Commune de départ (ex: Cocody)")
+    pickup_commune_key = models.CharField(max_length=100, blank=True, editable=False, help_text="Commune de départ normalisée (normalize_commune_name), maintenue au save()")
     pickup_quartier = models.CharField(max_length=100, blank=True, help_text="Quartier de départ pour plus de précision")
     pickup_latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
     pickup_longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
@@ -52,6 +53,7 @@ class Delivery(models.Model):
     # Adresse de livraison
     delivery_address = models.CharField(max_length=255, blank=True, help_text="Adresse complète (optionnel - la commune et quartier suffisent)")
     delivery_commune = models.CharField(max_length=100)
+    delivery_commune_key = models.CharField(max_length=100, blank=True, editable=False, help_text="Commune de livraison normalisée (normalize_commune_name), maintenue au save()")
     delivery_quartier = models.CharField(max_length=100, blank=True)
     delivery_latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
     delivery_longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
@@ -210,6 +212,8 @@ class Delivery(models.Model):
             models.Index(fields=['delivery_commune'], name='delivery_delivery_commune_idx'),
             models.Index(fields=['created_by', 'status'], name='delivery_createdby_status_idx'),
             models.Index(fields=['tracking_number'], name='delivery_tracking_idx'),
+            models.Index(fields=['status', 'pickup_commune_key'], name='delivery_status_pickup_key_idx'),
+            models.Index(fields=['status', 'delivery_commune_key'], name='delivery_status_dlv_key_idx'),
         ]
     
     def __str__(self):
@@ -252,8 +256,26 @@ class Delivery(models.Model):
             # Défensive : en cas d'erreur, continuer la sauvegarde normale
             pass
 
+        self.update_commune_keys()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # Garder les clés normalisées cohérentes avec les sauvegardes partielles
+            extra = {f'{field}_key' for field in ('pickup_commune', 'delivery_commune') if field in update_fields}
+            if extra:
+                kwargs['update_fields'] = set(update_fields) | extra
+
         super().save(*args, **kwargs)
 
+    def update_commune_keys(self):
+        """
+        Recalcule `pickup_commune_key` / `delivery_commune_key` (normalize_commune_name).
+        À appeler explicitement avant un bulk_create / bulk_update, qui ne passent pas par save().
+        """
+        from apps.pricing.calculator import normalize_commune_name
+
+        self.pickup_commune_key = normalize_commune_name(self.pickup_commune)
+        self.delivery_commune_key = normalize_commune_name(self.delivery_commune)
+
     def get_coords(self, which='pickup'):
         """
         Retourne un tuple (latitude, longitude) en float pour 'pickup' ou 'delivery'.
@@ -279,3 +301,42 @@ class Delivery(models.Model):
             return (float(lat), float(lon))
         except (TypeError, ValueError, Exception):
             return None
+
+
+class DeliveryDailyRollup(models.Model):
+    """
+    Compteurs journaliers pré-agrégés des livraisons (dashboard admin, statistiques).
+
+    Une ligne = nombre de livraisons et chiffre d'affaires (`calculated_price`) par
+    jour de création × jour de fin (livraison ou annulation, vide sinon) × commune
+    de livraison × merchant × livreur × statut courant.
+    Maintenue à chaque sauvegarde d'une livraison (deliveries/rollups.py) et
+    réconciliée chaque nuit avec la table `deliveries`.
+    """
+    day = models.DateField(help_text="Jour de création des livraisons")
+    completed_day = models.DateField(null=True, blank=True, help_text="Jour de livraison ou d'annulation")
+    delivery_commune = models.CharField(max_length=100, blank=True)
+    # Pas de contrainte ni de cascade : supprimer un merchant ou un livreur ne touche
+    # pas aux compteurs, corrigés par les signaux des livraisons et la réconciliation
+    merchant = models.ForeignKey(
+        Merchant, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    driver = models.ForeignKey(
+        Driver, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    status = models.CharField(max_length=50)
+    deliveries = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'delivery_daily_rollups'
+        verbose_name = 'Agrégat journalier de livraisons'
+        verbose_name_plural = 'Agrégats journaliers de livraisons'
+        indexes = [
+            models.Index(fields=['day', 'status'], name='rollup_day_status_idx'),
+            models.Index(fields=['merchant', 'day'], name='rollup_merchant_day_idx'),
+            models.Index(fields=['driver', 'day'], name='rollup_driver_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.delivery_commune} {self.status}: {self.deliveries}"
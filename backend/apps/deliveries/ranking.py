@@ -0,0 +1,128 @@
+# deliveries/ranking.py
+"""
+Classement vectorisé des livreurs candidats pour l'auto-assignation.
+
+Les coordonnées, la charge active, le rating et l'expérience de tous les
+candidats sont chargés dans des tableaux NumPy : les distances haversine sont
+calculées en une seule passe et le top-k est extrait avec `argpartition`,
+puis trié selon l'ordre historique de `_find_best_driver` :
+
+    distance (inconnue = +inf) → charge active → rating décroissant → expérience décroissante
+"""
+
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0  # même rayon que LocationService.haversine_distance
+
+
+def haversine_km(lats, lons, origin_lat: float, origin_lon: float) -> np.ndarray:
+    """
+    Distances haversine (km) entre un point d'origine et un tableau de points.
+
+    Les valeurs NaN (coordonnées manquantes) produisent une distance NaN.
+    """
+    lat1 = np.radians(np.asarray(lats, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lons, dtype=np.float64))
+    lat0 = np.radians(origin_lat)
+    lon0 = np.radians(origin_lon)
+
+    a = (
+        np.sin((lat1 - lat0) / 2.0) ** 2
+        + np.cos(lat0) * np.cos(lat1) * np.sin((lon1 - lon0) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class DriverRankingEngine:
+    """
+    Moteur de classement batch des livreurs.
+
+    Usage:
+        engine = DriverRankingEngine.from_rows(rows)
+        ranked = engine.top_k(pickup_coords, k=1)   # -> [(driver_id, distance_km), ...]
+
+    `rows` est un itérable de tuples
+    (driver_id, latitude, longitude, active_deliveries_count, rating, successful_deliveries),
+    typiquement issu d'un `values_list()` sur le queryset de candidats.
+    """
+
+    def __init__(self, ids: Sequence, lats, lons, loads, ratings, experience):
+        self.ids = list(ids)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.loads = np.asarray(loads, dtype=np.int64)
+        self.ratings = np.asarray(ratings, dtype=np.float64)
+        self.experience = np.asarray(experience, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Tuple]) -> 'DriverRankingEngine':
+        """Construit le moteur depuis des lignes `values_list()`."""
+        rows = list(rows)
+        n = len(rows)
+        ids = [None] * n
+        lats = np.full(n, np.nan)
+        lons = np.full(n, np.nan)
+        loads = np.zeros(n, dtype=np.int64)
+        ratings = np.zeros(n)
+        experience = np.zeros(n, dtype=np.int64)
+
+        for i, (driver_id, lat, lon, load, rating, successful) in enumerate(rows):
+            ids[i] = driver_id
+            if lat is not None and lon is not None:
+                lats[i] = float(lat)
+                lons[i] = float(lon)
+            loads[i] = load or 0
+            ratings[i] = float(rating or 0)
+            experience[i] = int(successful or 0)
+
+        return cls(ids, lats, lons, loads, ratings, experience)
+
+    def distances(self, origin: Optional[Tuple[float, float]]) -> np.ndarray:
+        """Distances au point d'origine, +inf quand la position est inconnue."""
+        if not origin or len(self) == 0:
+            return np.full(len(self), np.inf)
+        dist = haversine_km(self.lats, self.lons, origin[0], origin[1])
+        dist[np.isnan(dist)] = np.inf
+        return dist
+
+    def top_k(self, origin: Optional[Tuple[float, float]], k: int = 1) -> List[Tuple[object, Optional[float]]]:
+        """
+        Retourne les k meilleurs candidats triés, sous forme de (driver_id, distance_km).
+
+        `argpartition` isole les k plus petites distances en O(n) ; tous les
+        candidats à égalité avec la k-ième distance sont conservés avant le tri
+        lexicographique, afin que les critères secondaires départagent
+        exactement comme l'ancien tri Python.
+        """
+        n = len(self)
+        if n == 0 or k <= 0:
+            return []
+        k = min(k, n)
+
+        dist = self.distances(origin)
+
+        if k < n:
+            part = np.argpartition(dist, k - 1)
+            kth = dist[part[k - 1]]
+            candidates = np.flatnonzero(dist <= kth)
+        else:
+            candidates = np.arange(n)
+
+        # np.lexsort trie par la DERNIÈRE clé en premier
+        order = np.lexsort((
+            -self.experience[candidates],
+            -self.ratings[candidates],
+            self.loads[candidates],
+            dist[candidates],
+        ))
+        best = candidates[order[:k]]
+
+        return [
+            (self.ids[i], float(dist[i]) if np.isfinite(dist[i]) else None)
+            for i in best
+        ]
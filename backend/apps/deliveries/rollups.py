@@ -0,0 +1,306 @@
+# deliveries/rollups.py
+"""
+Agrégats journaliers des livraisons (`DeliveryDailyRollup`).
+
+Le dashboard admin et `compute_delivery_stats` lisent ces compteurs au lieu
+d'agréger la table `deliveries` : le coût d'une lecture dépend du nombre de
+combinaisons jour × commune × merchant × livreur × statut, pas du nombre de
+livraisons, et un dashboard sur 365 jours coûte à peu près autant que sur 7.
+
+Maintenance :
+- incrémentale : chaque sauvegarde d'une livraison déplace une unité (et son
+  prix) de l'ancienne clé vers la nouvelle (`record_transition`, appelée par
+  les signaux post_save / post_delete), dans la transaction de la sauvegarde ;
+- imports en masse (`bulk_create`, sans signaux) : `record_created` ;
+- réconciliation nocturne (tâche `deliveries.reconcile_delivery_rollups`) :
+  recalcul depuis `deliveries` et correction des écarts laissés par les
+  écritures qui contournent save() (`QuerySet.update`, SQL brut, SET_NULL à la
+  suppression d'un livreur...).
+
+Les périodes sont comptées en jours entiers (fuseau TIME_ZONE) :
+`period_start_day(30)` = il y a 30 jours, dès minuit.
+
+Les modèles sont passés en paramètre de `reconcile_delivery_rollups` pour
+fonctionner aussi avec les modèles historiques des migrations.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, Q, Subquery, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+KEY_FIELDS = ('day', 'completed_day', 'delivery_commune', 'merchant_id', 'driver_id', 'status')
+# Champs de Delivery dont dépendent la clé et le chiffre d'affaires
+SOURCE_FIELDS = (
+    'created_at', 'delivered_at', 'cancelled_at', 'delivery_commune',
+    'merchant_id', 'driver_id', 'status', 'calculated_price',
+)
+# Date de fin d'une livraison terminée, selon son statut
+COMPLETION_FIELDS = {'delivered': 'delivered_at', 'cancelled': 'cancelled_at'}
+
+_NOT_LOADED = object()
+
+
+def local_day(value):
+    """Date locale (TIME_ZONE) d'un datetime, None si absent"""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.date()
+
+
+def period_start_day(period_days):
+    """Premier jour compté dans une période de `period_days` jours"""
+    return local_day(timezone.now()) - timedelta(days=period_days)
+
+
+def day_start(day):
+    """Minuit (heure locale) du jour donné"""
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if timezone.is_aware(timezone.now()) else start
+
+
+def rollup_state(delivery):
+    """
+    (clé, prix) d'une livraison, ou None si elle n'est pas encore enregistrée
+    (pas de `created_at`) ou si un champ est différé (`only()` / `defer()`)
+    """
+    values = {field: delivery.__dict__.get(field, _NOT_LOADED) for field in SOURCE_FIELDS}
+    if _NOT_LOADED in values.values() or values['created_at'] is None:
+        return None
+    completion_field = COMPLETION_FIELDS.get(values['status'])
+    key = (
+        local_day(values['created_at']),
+        local_day(values[completion_field]) if completion_field else None,
+        values['delivery_commune'] or '',
+        values['merchant_id'],
+        values['driver_id'],
+        values['status'],
+    )
+    return key, Decimal(values['calculated_price'] or 0)
+
+
+def _apply(deltas, rollup_model=None):
+    """Ajoute les deltas {clé: [livraisons, chiffre d'affaires]} aux compteurs"""
+    if rollup_model is None:
+        from .models import DeliveryDailyRollup as rollup_model
+
+    for key, (count, revenue) in deltas.items():
+        if not count and not revenue:
+            continue
+        filters = dict(zip(KEY_FIELDS, key))
+        # Une seule ligne modifiée même si une création concurrente a dupliqué la clé
+        updated = rollup_model.objects.filter(
+            pk__in=Subquery(rollup_model.objects.filter(**filters).order_by('pk').values('pk')[:1])
+        ).update(deliveries=F('deliveries') + count, revenue=F('revenue') + revenue)
+        if not updated:
+            rollup_model.objects.create(deliveries=count, revenue=revenue, **filters)
+
+
+def _safe_apply(deltas):
+    """Les agrégats ne doivent jamais faire échouer la sauvegarde d'une livraison"""
+    try:
+        with transaction.atomic():
+            _apply(deltas)
+    except Exception as e:
+        logger.warning(f"Agrégats de livraisons non mis à jour ({e}), corrigés à la prochaine réconciliation")
+
+
+def record_transition(previous, current):
+    """
+    Déplace une livraison de l'état `previous` vers `current` (valeurs de
+    `rollup_state`, None = non comptée / inconnue)
+    """
+    if previous == current:
+        return
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    if previous is not None:
+        key, price = previous
+        deltas[key][0] -= 1
+        deltas[key][1] -= price
+    if current is not None:
+        key, price = current
+        deltas[key][0] += 1
+        deltas[key][1] += price
+    _safe_apply(deltas)
+
+
+def record_created(deliveries):
+    """Compte des livraisons insérées avec `bulk_create` (aucun signal déclenché)"""
+    deltas = defaultdict(lambda: [0, Decimal('0')])
+    for delivery in deliveries:
+        state = rollup_state(delivery)
+        if state is None:
+            continue
+        key, price = state
+        deltas[key][0] += 1
+        deltas[key][1] += price
+    _safe_apply(deltas)
+
+
+def reconcile_delivery_rollups(since=None, delivery_model=None, rollup_model=None):
+    """
+    Recalcule les agrégats depuis la table `deliveries` et corrige les écarts
+
+    Args:
+        since: Premier jour de création recalculé (date), tout l'historique par défaut
+
+    Returns:
+        dict: {'rows', 'created', 'updated', 'deleted'} (lignes d'agrégats corrigées)
+        et 'pruned' (lignes à zéro laissées par les transitions, supprimées)
+    """
+    if delivery_model is None:
+        from .models import Delivery as delivery_model
+    if rollup_model is None:
+        from .models import DeliveryDailyRollup as rollup_model
+
+    deliveries = delivery_model.objects.order_by()
+    rollups = rollup_model.objects.order_by('pk')
+    if since is not None:
+        deliveries = deliveries.filter(created_at__gte=day_start(since))
+        rollups = rollups.filter(day__gte=since)
+
+    expected = {}
+    grouped = deliveries.annotate(
+        day=TruncDate('created_at'),
+        completed_day=Case(
+            *(When(status=status, then=TruncDate(field)) for status, field in COMPLETION_FIELDS.items()),
+            default=None,
+            output_field=DateField(),
+        ),
+    ).values(*KEY_FIELDS).annotate(count=Count('pk'), total=Sum('calculated_price'))
+    for row in grouped:
+        key = tuple(row[field] if field != 'delivery_commune' else row[field] or '' for field in KEY_FIELDS)
+        count, total = expected.get(key, (0, Decimal('0')))
+        expected[key] = (count + row['count'], total + (row['total'] or 0))
+
+    created = updated = pruned = 0
+    with transaction.atomic():
+        stale = []
+        changed = []
+        seen = set()
+        for rollup in rollups.only(*KEY_FIELDS, 'deliveries', 'revenue'):
+            key = tuple(getattr(rollup, field) for field in KEY_FIELDS)
+            if key in seen or key not in expected:
+                # Doublon d'une clé déjà vue, ou plus aucune livraison pour cette clé
+                stale.append(rollup.pk)
+                if not rollup.deliveries and not rollup.revenue:
+                    # Ligne vidée par les transitions : pas un écart
+                    pruned += 1
+                continue
+            seen.add(key)
+            count, total = expected[key]
+            if rollup.deliveries != count or rollup.revenue != total:
+                rollup.deliveries, rollup.revenue = count, total
+                changed.append(rollup)
+
+        deleted = 0
+        for start in range(0, len(stale), 1000):
+            deleted += rollup_model.objects.filter(pk__in=stale[start:start + 1000]).delete()[0]
+        if changed:
+            rollup_model.objects.bulk_update(changed, ['deliveries', 'revenue'], batch_size=1000)
+            updated = len(changed)
+        missing = [
+            rollup_model(deliveries=count, revenue=total, **dict(zip(KEY_FIELDS, key)))
+            for key, (count, total) in expected.items() if key not in seen
+        ]
+        if missing:
+            rollup_model.objects.bulk_create(missing, batch_size=1000)
+            created = len(missing)
+
+    return {'rows': len(expected), 'created': created, 'updated': updated, 'deleted': deleted - pruned, 'pruned': pruned}
+
+
+def delivery_totals(scope, period_days):
+    """
+    Compteurs de `compute_delivery_stats` lus dans les agrégats, en une requête
+
+    Args:
+        scope: Filtres de DeliveryDailyRollup (ex: {'merchant_id': ...}, {} = toutes les livraisons)
+    """
+    from .models import DeliveryDailyRollup
+
+    start = period_start_day(period_days)
+    delivered = Q(status='delivered')
+    totals = DeliveryDailyRollup.objects.filter(**scope).aggregate(
+        total_all_time=Sum('deliveries'),
+        period_total=Sum('deliveries', filter=Q(day__gte=start)),
+        delivered=Sum('deliveries', filter=delivered & Q(completed_day__gte=start)),
+        in_progress=Sum('deliveries', filter=Q(status='in_progress')),
+        pending=Sum('deliveries', filter=Q(status='pending')),
+        cancelled=Sum('deliveries', filter=Q(status='cancelled', completed_day__gte=start)),
+        period_revenue=Sum('revenue', filter=delivered & Q(completed_day__gte=start)),
+        total_revenue=Sum('revenue', filter=delivered),
+    )
+    return {name: value or 0 for name, value in totals.items()}
+
+
+def dashboard_totals(period_days, top=5):
+    """
+    Agrégats du dashboard admin sur la période et la période précédente, en une requête
+
+    Returns:
+        dict: start (datetime), by_status, total, previous_total, revenue,
+        delivered, top_communes, active_merchants, top_merchants, active_drivers, top_drivers
+    """
+    from .models import DeliveryDailyRollup
+
+    start = period_start_day(period_days)
+    current = Q(day__gte=start)
+    rows = DeliveryDailyRollup.objects.filter(
+        day__gte=start - timedelta(days=period_days)
+    ).values(
+        'delivery_commune', 'merchant_id', 'merchant__business_name',
+        'driver_id', 'driver__user__first_name', 'driver__user__last_name', 'status',
+    ).annotate(
+        current=Sum('deliveries', filter=current),
+        previous=Sum('deliveries', filter=~current),
+        revenue=Sum('revenue', filter=current),
+    ).order_by()
+
+    by_status = defaultdict(int)
+    communes = defaultdict(int)
+    merchants = defaultdict(int)
+    drivers = defaultdict(int)
+    merchant_names = {}
+    driver_names = {}
+    previous_total = 0
+    revenue = Decimal('0')
+    for row in rows:
+        previous_total += row['previous'] or 0
+        count = row['current'] or 0
+        if not count:
+            continue
+        by_status[row['status']] += count
+        communes[row['delivery_commune']] += count
+        merchants[row['merchant_id']] += count
+        merchant_names[row['merchant_id']] = row['merchant__business_name']
+        if row['driver_id'] is not None:
+            drivers[row['driver_id']] += count
+            driver_names[row['driver_id']] = f"{row['driver__user__first_name']} {row['driver__user__last_name']}"
+        if row['status'] == 'delivered':
+            revenue += row['revenue'] or 0
+
+    def ranked(counts):
+        return sorted(counts.items(), key=lambda item: -item[1])[:top]
+
+    return {
+        'start': day_start(start),
+        'by_status': by_status,
+        'total': sum(by_status.values()),
+        'previous_total': previous_total,
+        'revenue': revenue,
+        'delivered': by_status['delivered'],
+        'top_communes': ranked(communes),
+        'active_merchants': len(merchants),
+        'top_merchants': [(merchant_names[merchant_id], count) for merchant_id, count in ranked(merchants)],
+        'active_drivers': len(drivers),
+        'top_drivers': [(driver_names[driver_id], count) for driver_id, count in ranked(drivers)],
+    }
@@ -7,10 +7,12 @@ from datetime import timedelta
 from django.db import transaction
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from geopy.distance import geodesic
-from django.db.models import Count, Q
+from django.db.models import Count, OuterRef, Q, Subquery
 from .models import Delivery
+from .ranking import DriverRankingEngine
 from apps.drivers.models import Driver, DriverZone
+from apps.drivers.geo_index import driver_geo_index
+from apps.core.location_service import LocationService
 from apps.notifications.models import Notification
 from apps.notifications.services import (
     notify_new_delivery_assignment,
@@ -21,7 +23,6 @@ from apps.notifications.services import (
 from apps.pricing.calculator import normalize_commune_name  # Pour normaliser les noms de communes
 
 from django.db.models import Sum
-from apps.payments.models import Invoice
 
 # Import pour la création automatique de ChatRoom
 try:
@@ -32,27 +33,45 @@ except ImportError:
     CHAT_AVAILABLE = False
 
 
-def compute_delivery_stats(qs, period_days=30, merchant=None):
+def stats_period_start(period_days, from_rollups=False):
+    """Start of the stats period: `period_days` ago, or from midnight when counted in whole days (daily rollups)"""
+    from .rollups import day_start, period_start_day
+
+    if from_rollups:
+        return day_start(period_start_day(period_days))
+    return timezone.now() - timedelta(days=period_days)
+
+
+def compute_delivery_stats(qs, period_days=30, merchant=None, rollup_scope=None):
     """Compute aggregated delivery stats for a queryset of Delivery objects.
 
-    If `merchant` is provided, invoice-related aggregates will be computed for that merchant.
+    If `merchant` is provided, invoice-related aggregates will be computed for that merchant,
+    unless it was loaded with them (deliveries/stats.py merchant_stats_profile).
+    If `rollup_scope` is provided (DeliveryDailyRollup filters selecting the same deliveries
+    as `qs`, e.g. {'merchant_id': ...}, {} for all deliveries), delivery counts and revenue
+    are read from the daily rollups in one query, with the period counted in whole days.
+    Otherwise one conditional aggregate runs over `qs` (deliveries/stats.py), plus one over
+    the merchant's invoices.
     Returns a dict with keys: deliveries, revenue, invoices
     """
-    from django.utils import timezone
-    from datetime import timedelta
+    from .rollups import delivery_totals
+    from .stats import delivery_counts, invoice_totals
 
-    period_start = timezone.now() - timedelta(days=period_days)
-
-    total_all_time = qs.count()
-    # Number of deliveries created in the period
-    period_created_qs = qs.filter(created_at__gte=period_start)
-    period_total = period_created_qs.count()
+    period_start = stats_period_start(period_days, from_rollups=rollup_scope is not None)
+    if rollup_scope is not None:
+        totals = delivery_totals(rollup_scope, period_days)
+    else:
+        totals = delivery_counts(qs, period_start)
 
+    total_all_time = totals['total_all_time']
+    period_total = totals['period_total']
     # Use event timestamps for delivered/cancelled counts to reflect actual completions
-    delivered = qs.filter(status='delivered', delivered_at__gte=period_start).count()
-    in_progress = qs.filter(status='in_progress').count()
-    pending = qs.filter(status='pending').count()
-    cancelled = qs.filter(status='cancelled', cancelled_at__gte=period_start).count()
+    delivered = totals['delivered']
+    in_progress = totals['in_progress']
+    pending = totals['pending']
+    cancelled = totals['cancelled']
+    period_revenue = totals['period_revenue']
+    total_revenue = totals['total_revenue']
 
     try:
         denom = delivered + cancelled
@@ -60,35 +79,15 @@ def compute_delivery_stats(qs, period_days=30, merchant=None):
     except Exception:
         success_rate = 0
 
-    # revenue: sum of calculated_price for deliveries delivered during the period
-    try:
-        period_revenue = qs.filter(status='delivered', delivered_at__gte=period_start).aggregate(total=Sum('calculated_price'))['total'] or 0
-    except Exception:
-        period_revenue = 0
-    
-    # total_revenue: sum of all delivered deliveries (all time)
-    try:
-        total_revenue = qs.filter(status='delivered').aggregate(total=Sum('calculated_price'))['total'] or 0
-    except Exception:
-        total_revenue = 0
-    
-    total_billed = 0
-    paid_amount = 0
-    pending_amount = 0
-    invoices_count = 0
-    invoices_paid_count = 0
-    invoices_pending_count = 0
-
-    if merchant is not None:
+    invoices = {
+        'total_billed': 0, 'paid': 0, 'pending_payment': 0,
+        'total': 0, 'paid_count': 0, 'pending_count': 0,
+    }
+    if getattr(merchant, 'stats_invoices', None) is not None:
+        invoices = merchant.stats_invoices
+    elif merchant is not None:
         try:
-            inv_qs = Invoice.objects.filter(merchant=merchant)
-            period_invoices = inv_qs.filter(created_at__gte=period_start)
-            total_billed = period_invoices.aggregate(total=Sum('total_amount'))['total'] or 0
-            paid_amount = period_invoices.filter(status='paid').aggregate(total=Sum('total_amount'))['total'] or 0
-            pending_amount = period_invoices.filter(status='sent').aggregate(total=Sum('total_amount'))['total'] or 0
-            invoices_count = period_invoices.count()
-            invoices_paid_count = period_invoices.filter(status='paid').count()
-            invoices_pending_count = period_invoices.filter(status='sent').count()
+            invoices = invoice_totals(merchant, period_start)
         except Exception:
             # if Invoice model or queries fail, keep invoice-related zeros
             pass
@@ -107,14 +106,14 @@ def compute_delivery_stats(qs, period_days=30, merchant=None):
         'revenue': {
             'period_revenue': period_revenue,
             'total_revenue': total_revenue,
-            'total_billed': total_billed,
-            'paid': paid_amount,
-            'pending_payment': pending_amount,
+            'total_billed': invoices['total_billed'],
+            'paid': invoices['paid'],
+            'pending_payment': invoices['pending_payment'],
         },
         'invoices': {
-            'total': invoices_count,
-            'paid': invoices_paid_count,
-            'pending': invoices_pending_count,
+            'total': invoices['total'],
+            'paid': invoices['paid_count'],
+            'pending': invoices['pending_count'],
         }
     }
 
@@ -127,6 +126,9 @@ class DeliveryAssignmentService:
     Fournit des méthodes pour l'assignation manuelle et automatique.
     """
     
+    # Rayon de recherche dans l'index géospatial des livreurs en ligne
+    AUTO_ASSIGN_SEARCH_RADIUS_KM = 10
+    
     def __init__(self):
         self.logger = logger
     
@@ -405,47 +407,62 @@ class DeliveryAssignmentService:
             )
         )
 
-        # 4. Calculer la distance réelle pour chaque driver (si GPS dispo)
-        # Utiliser la méthode utilitaire Delivery.get_coords pour normaliser l'accès
+        # 4. Restreindre aux livreurs proches via l'index géospatial partagé (Redis).
+        # Le classement est d'abord par distance : tout candidat dans le rayon
+        # passe devant les candidats plus lointains ou sans GPS, le résultat est
+        # donc identique à un scan complet tant que l'intersection n'est pas vide.
+        # L'index en mémoire d'un process ne voit pas les positions reçues par les
+        # autres : scan complet de la base dans ce cas.
         pickup_coords = delivery.get_coords('pickup')
+        live_positions = {}
+        if pickup_coords and driver_geo_index.is_shared:
+            nearby = driver_geo_index.nearby(
+                pickup_coords[0],
+                pickup_coords[1],
+                radius_km=self.AUTO_ASSIGN_SEARCH_RADIUS_KM,
+                min_capacity_kg=delivery.package_weight_kg or 0,
+                vehicle_type=getattr(delivery, 'required_vehicle_type', None) or None,
+            )
+            if nearby:
+                live_positions = {n['driver_id']: (n['latitude'], n['longitude']) for n in nearby}
+                nearby_with_stats = drivers_with_stats.filter(id__in=list(live_positions))
+                if nearby_with_stats.exists():
+                    drivers_with_stats = nearby_with_stats
+                else:
+                    live_positions = {}
 
-        driver_distance_list = []
-        for driver in drivers_with_stats:
-            distance_km = None
-            if pickup_coords and driver.current_latitude is not None and driver.current_longitude is not None:
-                try:
-                    driver_coords = (float(driver.current_latitude), float(driver.current_longitude))
-                    distance_km = geodesic(driver_coords, pickup_coords).km
-                except Exception as e:
-                    self.logger.warning(f"Erreur calcul distance GPS pour {driver.user.full_name}: {e}")
-            driver_distance_list.append({
-                'driver': driver,
-                'distance_km': distance_km,
-                'active_deliveries_count': driver.active_deliveries_count,
-                'rating': driver.rating or 0,
-                'successful_deliveries': getattr(driver, 'successful_deliveries', 0)
-            })
+        # 5. Charger les candidats dans des tableaux NumPy et classer en une passe
+        # (distance haversine vectorisée + argpartition, voir apps/deliveries/ranking.py)
+        rows = []
+        for row in drivers_with_stats.values_list(
+            'id',
+            'current_latitude',
+            'current_longitude',
+            'active_deliveries_count',
+            'rating',
+            'successful_deliveries',
+        ):
+            live = live_positions.get(str(row[0]))
+            if live:
+                # Position de l'index = dernier ping reçu, plus fraîche que la base
+                row = (row[0], live[0], live[1]) + row[3:]
+            rows.append(row)
 
-        # 5. Trier par distance (si dispo), puis par critères classiques
-        def sort_key(item):
-            # Priorité: distance (si connue), puis charge, rating, expérience
-            return (
-                item['distance_km'] if item['distance_km'] is not None else float('inf'),
-                item['active_deliveries_count'],
-                -float(item['rating']),
-                -int(item['successful_deliveries'])
-            )
+        engine = DriverRankingEngine.from_rows(rows)
 
-        driver_distance_list.sort(key=sort_key)
+        # 6. Top-1 selon l'ordre : distance (si connue), charge, rating, expérience
+        ranked = engine.top_k(pickup_coords, k=1)
+        if not ranked:
+            return None
 
-        best = driver_distance_list[0]['driver'] if driver_distance_list else None
-        if best:
-            self.logger.debug(
-                f"🎯 Meilleur driver trouvé: {best.user.full_name} | "
-                f"Distance: {driver_distance_list[0]['distance_km']} km | "
-                f"Rating: {best.rating} | "
-                f"Livraisons actives: {driver_distance_list[0]['active_deliveries_count']}"
-            )
+        best_id, best_distance = ranked[0]
+        best = Driver.objects.select_related('user').get(id=best_id)
+        self.logger.debug(
+            f"🎯 Meilleur driver trouvé: {best.user.full_name} | "
+            f"Distance: {best_distance} km | "
+            f"Rating: {best.rating} | "
+            f"Candidats classés: {len(engine)}"
+        )
         return best
     # =========================================================================
     
@@ -480,16 +497,15 @@ class DeliveryAssignmentService:
             if delivery.status in ['pending_assignment', 'pending']:
                 # Vérifier que la livraison est dans les zones du driver (si zones définies)
                 try:
-                    driver_zones = DriverZone.objects.filter(driver=driver).values_list('commune', flat=True)
+                    driver_zone_keys = set(DriverZone.objects.filter(driver=driver).values_list('commune_key', flat=True))
                 except Exception:
-                    driver_zones = []
+                    driver_zone_keys = set()
 
-                if driver_zones:
-                    # compare avec normalisation (gère accents, préfixes Le/La/L'/Les)
+                if driver_zone_keys:
+                    # compare les communes normalisées (gère accents, préfixes Le/La/L'/Les)
                     # Use pickup_commune here to match the logic used in drivers.available_deliveries
-                    normalized_pickup = normalize_commune_name(delivery.pickup_commune or '')
-                    normalized_driver_zones = [normalize_commune_name(z) for z in driver_zones]
-                    if normalized_pickup not in normalized_driver_zones:
+                    normalized_pickup = delivery.pickup_commune_key or normalize_commune_name(delivery.pickup_commune or '')
+                    if normalized_pickup not in driver_zone_keys:
                         raise ValidationError("Cette livraison n'est pas dans votre zone de travail")
 
                 # Vérifier la capacité du véhicule
@@ -800,22 +816,16 @@ class RouteOptimizationService:
         from ortools.constraint_solver import routing_enums_pb2
         from ortools.constraint_solver import pywrapcp
         import numpy as np
-        # Points: start + pickups
+        # Points: start + pickups, puis destinations (pour les distances pickup → livraison)
         points = [(start_point['latitude'], start_point['longitude'])]
         for d in deliveries:
             points.append((d['pickup_latitude'], d['pickup_longitude']))
-        # Distance matrix
-        def compute_euclidean_distance_matrix(locations):
-            n = len(locations)
-            matrix = np.zeros((n, n))
-            for i in range(n):
-                for j in range(n):
-                    if i == j:
-                        matrix[i][j] = 0
-                    else:
-                        matrix[i][j] = geodesic(locations[i], locations[j]).km
-            return matrix
-        distance_matrix = compute_euclidean_distance_matrix(points)
+        for d in deliveries:
+            points.append((d['delivery_latitude'], d['delivery_longitude']))
+        # Distance matrix : toutes les paires en un seul appel (mis en cache)
+        full_matrix = np.array(LocationService.get_distance_matrix(points)['distances_km'], dtype=float)
+        routing_size = len(deliveries) + 1
+        distance_matrix = full_matrix[:routing_size, :routing_size]
         manager = pywrapcp.RoutingIndexManager(len(distance_matrix), 1, 0)
         routing = pywrapcp.RoutingModel(manager)
         def distance_callback(from_index, to_index):
@@ -837,10 +847,7 @@ class RouteOptimizationService:
                 if node != 0:
                     d = deliveries[node-1]
                     pickup_distance = distance_matrix[0][node]
-                    delivery_distance = geodesic(
-                        (d['pickup_latitude'], d['pickup_longitude']),
-                        (d['delivery_latitude'], d['delivery_longitude'])
-                    ).km
+                    delivery_distance = full_matrix[node][node + len(deliveries)]
                     total_distance = pickup_distance + delivery_distance
                     route.append({
                         'delivery_id': str(d['id']),
@@ -855,6 +862,157 @@ class RouteOptimizationService:
                 index = solution.Value(routing.NextVar(index))
         return route
     
+    # Fenêtre de ramassage accordée autour de `scheduled_pickup_time` (minutes)
+    FLEET_PICKUP_WINDOW_MIN = 30
+    
+    def optimize_fleet(self, delivery_ids=None, driver_ids=None, time_limit_seconds=None, apply=False):
+        """
+        Assigne et ordonne les livraisons en attente entre tous les livreurs disponibles
+        (ramassage avant livraison, capacité véhicule, fenêtres horaires de ramassage).
+        
+        Args:
+            delivery_ids: Livraisons à planifier (défaut: toutes les livraisons 'pending' sans livreur)
+            driver_ids: Livreurs à utiliser (défaut: tous les livreurs vérifiés et disponibles)
+            time_limit_seconds: Budget de résolution (défaut: settings.FLEET_VRP_TIME_LIMIT_SECONDS)
+            apply: Si True, enregistre les assignations et notifie les livreurs
+            
+        Returns:
+            dict: Tournées par livreur, livraisons non assignées et livraisons ignorées
+        """
+        from .vrp import solve_pickup_delivery
+        
+        try:
+            deliveries_qs = Delivery.objects.filter(status='pending', driver__isnull=True)
+            if delivery_ids:
+                deliveries_qs = deliveries_qs.filter(id__in=delivery_ids)
+            
+            orders = []
+            skipped = []
+            now = timezone.now()
+            for d in deliveries_qs.values(
+                'id', 'pickup_latitude', 'pickup_longitude', 'delivery_latitude',
+                'delivery_longitude', 'package_weight_kg', 'scheduled_pickup_time',
+                'required_vehicle_type'
+            ):
+                if None in (d['pickup_latitude'], d['pickup_longitude'],
+                            d['delivery_latitude'], d['delivery_longitude']):
+                    skipped.append(str(d['id']))
+                    continue
+                
+                ready_min, due_min = 0, None
+                if d['scheduled_pickup_time']:
+                    ready_min = max(0, int((d['scheduled_pickup_time'] - now).total_seconds() // 60))
+                    due_min = ready_min + self.FLEET_PICKUP_WINDOW_MIN
+                
+                orders.append({
+                    'id': str(d['id']),
+                    'pickup': (float(d['pickup_latitude']), float(d['pickup_longitude'])),
+                    'dropoff': (float(d['delivery_latitude']), float(d['delivery_longitude'])),
+                    'weight_kg': float(d['package_weight_kg'] or 0),
+                    'ready_min': ready_min,
+                    'due_min': due_min,
+                    'required_vehicle_type': d['required_vehicle_type'],
+                })
+            
+            # Poids déjà à bord (colis récupérés) : réduit la capacité disponible
+            load_on_board = Delivery.objects.filter(
+                driver=OuterRef('pk'),
+                status='picked_up'
+            ).values('driver').annotate(total=Sum('package_weight_kg')).values('total')
+            
+            drivers_qs = Driver.objects.filter(verification_status='verified', is_available=True)
+            if driver_ids:
+                drivers_qs = drivers_qs.filter(id__in=driver_ids)
+            drivers = list(self._annotate_for_scoring(drivers_qs).annotate(
+                load_on_board_kg=Subquery(load_on_board[:1])
+            ))
+            
+            vehicles = []
+            for driver in drivers:
+                live = driver_geo_index.get_position(driver.id)
+                if live:
+                    position = {'latitude': live['lat'], 'longitude': live['lon']}
+                elif driver.current_latitude is not None and driver.current_longitude is not None:
+                    position = {
+                        'latitude': float(driver.current_latitude),
+                        'longitude': float(driver.current_longitude)
+                    }
+                else:
+                    position = self._get_driver_current_location(driver)
+                if position['latitude'] is None or position['longitude'] is None:
+                    continue
+                
+                vehicles.append({
+                    'id': str(driver.id),
+                    'latitude': float(position['latitude']),
+                    'longitude': float(position['longitude']),
+                    'capacity_kg': max(0.0, float(driver.vehicle_capacity_kg or 0) - float(driver.load_on_board_kg or 0)),
+                    'vehicle_type': driver.vehicle_type,
+                })
+            
+            if not orders or not vehicles:
+                return {
+                    'success': False,
+                    'message': 'Aucune livraison à planifier' if not orders else 'Aucun livreur disponible',
+                    'routes': [],
+                    'unassigned': [o['id'] for o in orders],
+                    'skipped': skipped
+                }
+            
+            solution = solve_pickup_delivery(vehicles, orders, time_limit_seconds=time_limit_seconds)
+            
+            if apply and solution['routes']:
+                self._apply_fleet_solution(solution)
+            
+            self.logger.info(
+                f"🚚 Optimisation flotte | {len(orders)} livraisons, {len(vehicles)} livreurs | "
+                f"{len(solution['routes'])} tournées, {len(solution['unassigned'])} non assignées"
+            )
+            
+            return {
+                'success': solution['status'] == 'solved',
+                'applied': bool(apply),
+                'total_deliveries': len(orders),
+                'total_drivers': len(vehicles),
+                'total_distance_km': round(sum(r['distance_km'] for r in solution['routes']), 2),
+                'distance_source': solution['distance_source'],
+                'routes': solution['routes'],
+                'unassigned': solution['unassigned'],
+                'skipped': skipped
+            }
+        except Exception as e:
+            self.logger.error(f"Erreur optimisation flotte: {str(e)}", exc_info=True)
+            return {
+                'success': False,
+                'message': f'Erreur: {str(e)}'
+            }
+    
+    @transaction.atomic
+    def _apply_fleet_solution(self, solution):
+        """Enregistre les assignations calculées par `optimize_fleet`."""
+        assignment_service = DeliveryAssignmentService()
+        drivers = {
+            str(driver.id): driver
+            for driver in Driver.objects.select_related('user').filter(
+                id__in=[route['vehicle_id'] for route in solution['routes']]
+            )
+        }
+        
+        for route in solution['routes']:
+            driver = drivers[route['vehicle_id']]
+            order_ids = [stop['order_id'] for stop in route['stops'] if stop['type'] == 'pickup']
+            
+            # Ne pas écraser une livraison assignée entre-temps
+            deliveries = Delivery.objects.select_for_update().filter(
+                id__in=order_ids, status='pending', driver__isnull=True
+            )
+            for delivery in deliveries:
+                delivery.driver = driver
+                delivery.status = 'assigned'
+                delivery.assigned_at = timezone.now()
+                delivery.save()
+                assignment_service._create_assignment_notification(delivery, driver)
+    
     def suggest_delivery_assignment(self, delivery_id):
         """
         Suggère les meilleurs livreurs pour une livraison donnée.
@@ -868,13 +1026,16 @@ class RouteOptimizationService:
         try:
             delivery = Delivery.objects.get(id=delivery_id)
             
-            # Trouver les livreurs disponibles dans la zone
-            available_drivers = Driver.objects.filter(
-                is_available=True,
-                zones__commune=delivery.pickup_commune
-            ).distinct()
+            # Trouver les livreurs disponibles dans la zone, avec toutes les
+            # données de scoring agrégées en une seule requête (pas de N+1)
+            available_drivers = list(self._annotate_for_scoring(
+                Driver.objects.filter(
+                    is_available=True,
+                    zones__commune=delivery.pickup_commune
+                ).distinct().select_related('user')
+            ))
             
-            if not available_drivers.exists():
+            if not available_drivers:
                 return {
                     'success': False,
                     'message': 'Aucun livreur disponible dans cette zone',
@@ -917,10 +1078,57 @@ class RouteOptimizationService:
                 'message': 'Livraison introuvable'
             }
     
+    def _annotate_for_scoring(self, drivers_qs):
+        """
+        Annote un queryset de livreurs avec tout ce dont `_calculate_driver_score`
+        a besoin : compteurs de livraisons (Count conditionnels) et position de la
+        dernière livraison récupérée / zone principale (sous-requêtes corrélées).
+        """
+        last_picked_up = Delivery.objects.filter(
+            driver=OuterRef('pk'),
+            status='picked_up'
+        ).order_by('-picked_up_at')
+        # `.first()` sur un queryset non ordonné trie par clé primaire
+        main_zone = DriverZone.objects.filter(driver=OuterRef('pk')).order_by('pk')
+        
+        return drivers_qs.annotate(
+            score_current_deliveries=Count(
+                'deliveries',
+                filter=Q(deliveries__status__in=['assigned', 'picked_up']),
+                distinct=True
+            ),
+            score_total_deliveries=Count('deliveries', distinct=True),
+            score_successful_deliveries=Count(
+                'deliveries',
+                filter=Q(deliveries__status='delivered'),
+                distinct=True
+            ),
+            last_picked_up_id=Subquery(last_picked_up.values('id')[:1]),
+            last_picked_up_latitude=Subquery(last_picked_up.values('pickup_latitude')[:1]),
+            last_picked_up_longitude=Subquery(last_picked_up.values('pickup_longitude')[:1]),
+            main_zone_commune=Subquery(main_zone.values('commune')[:1]),
+        )
+    
     def _get_driver_current_location(self, driver):
         """Récupère la position actuelle du driver"""
         # TODO: Intégrer avec système GPS en temps réel
         # Pour l'instant, utilise la dernière livraison en cours
+        if hasattr(driver, 'last_picked_up_id'):
+            # Valeurs pré-calculées par `_annotate_for_scoring`
+            if driver.last_picked_up_id is not None:
+                lat = driver.last_picked_up_latitude
+                lon = driver.last_picked_up_longitude
+                try:
+                    return {
+                        'latitude': float(lat) if lat is not None else None,
+                        'longitude': float(lon) if lon is not None else None,
+                    }
+                except Exception:
+                    return {'latitude': None, 'longitude': None}
+            if driver.main_zone_commune:
+                return self._get_commune_center(driver.main_zone_commune)
+            return {'latitude': 5.3600, 'longitude': -4.0083}
+        
         last_delivery = Delivery.objects.filter(
             driver=driver,
             status='picked_up'
@@ -1065,10 +1273,13 @@ class RouteOptimizationService:
         score += distance_score
         
         # 2. Charge actuelle (30 points max)
-        current_deliveries = Delivery.objects.filter(
-            driver=driver,
-            status__in=['assigned', 'picked_up']
-        ).count()
+        if hasattr(driver, 'score_current_deliveries'):
+            current_deliveries = driver.score_current_deliveries
+        else:
+            current_deliveries = Delivery.objects.filter(
+                driver=driver,
+                status__in=['assigned', 'picked_up']
+            ).count()
         
         if current_deliveries == 0:
             workload_score = 30
@@ -1082,8 +1293,12 @@ class RouteOptimizationService:
         score += workload_score
         
         # 3. Taux de succès (20 points max)
-        total_deliveries = Delivery.objects.filter(driver=driver).count()
-        successful = Delivery.objects.filter(driver=driver, status='delivered').count()
+        if hasattr(driver, 'score_total_deliveries'):
+            total_deliveries = driver.score_total_deliveries
+            successful = driver.score_successful_deliveries
+        else:
+            total_deliveries = Delivery.objects.filter(driver=driver).count()
+            successful = Delivery.objects.filter(driver=driver, status='delivered').count()
         
         success_rate = (successful / total_deliveries * 100) if total_deliveries > 0 else 0
         success_score = int(success_rate * 0.2)  # 0-20 points
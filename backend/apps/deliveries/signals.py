@@ -1,9 +1,10 @@
-from django.db.models.signals import post_save, pre_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 from .models import Delivery
 from .email_service import send_delivery_pin_email
-from apps.core.location_service import LocationService
-from apps.pricing.models import PricingZone
+from .rollups import record_transition, rollup_state
+from .stats import invalidate_stats
 import logging
 import unicodedata
 
@@ -40,78 +41,200 @@ ABIDJAN_COMMUNES_COORDS = {
 }
 
 
-@receiver(pre_save, sender=Delivery)
-def auto_geocode_and_calculate_distance(sender, instance, **kwargs):
+# Champs d'adresse par côté : l'enrichissement n'est déclenché que s'ils changent
+ADDRESS_FIELDS = {
+    'pickup': ('pickup_address_id', 'pickup_address_details', 'pickup_commune', 'pickup_quartier'),
+    'delivery': ('delivery_address', 'delivery_commune', 'delivery_quartier'),
+}
+
+COORD_FIELDS = {
+    'pickup': ('pickup_latitude', 'pickup_longitude'),
+    'delivery': ('delivery_latitude', 'delivery_longitude'),
+}
+
+_NOT_LOADED = object()
+
+
+def address_state(instance, side):
+    """Valeurs des champs d'adresse et de coordonnées d'un côté (champs différés ignorés)"""
+    fields = ADDRESS_FIELDS[side] + COORD_FIELDS[side]
+    return tuple(instance.__dict__.get(field, _NOT_LOADED) for field in fields)
+
+
+def local_coordinates(commune, quartier=None):
     """
-    Signal pré-sauvegarde pour :
-    1. Géocoder automatiquement les adresses si les coordonnées GPS sont manquantes
-    2. Calculer automatiquement la distance entre pickup et delivery
+    Coordonnées approximatives sans appel réseau : centroïde de la zone tarifaire
+    (quartier puis commune, via l'index en mémoire), sinon coordonnées par défaut
+    de la commune. Renvoie (Decimal, Decimal) ou None.
     """
     from decimal import Decimal
-    location_service = LocationService()
-    
-    # 1. Géocodage de l'adresse de récupération (pickup)
-    if not instance.get_coords('pickup') and instance.pickup_commune:
-        commune_norm = normalize_commune(instance.pickup_commune)
-        coords_found = False
-        
-        # Essayer d'abord avec l'adresse complète si disponible
-        if instance.pickup_address:
-            pickup_full_address = f"{instance.pickup_address}, {instance.pickup_commune}"
-            coords = location_service.geocode_address(pickup_full_address)
+    from apps.pricing.zone_index import zone_index
+
+    if not commune:
+        return None
+    try:
+        zone = zone_index.get_by_quartier(quartier, commune) or zone_index.get_by_commune(commune)
+    except Exception as e:
+        logger.warning(f"Index des zones indisponible pour {commune}: {e}")
+        zone = None
+    if zone is not None and zone.default_latitude is not None and zone.default_longitude is not None:
+        return (zone.default_latitude, zone.default_longitude)
+
+    coords = ABIDJAN_COMMUNES_COORDS.get(normalize_commune(commune))
+    if coords:
+        return (Decimal(str(coords[0])), Decimal(str(coords[1])))
+    return None
+
+
+@receiver(post_init, sender=Delivery)
+def remember_address_state(sender, instance, **kwargs):
+    """Mémorise l'adresse chargée pour détecter ses changements au save()"""
+    instance._address_state = {side: address_state(instance, side) for side in ADDRESS_FIELDS}
+
+
+@receiver(pre_save, sender=Delivery)
+def prepare_location_enrichment(sender, instance, update_fields=None, **kwargs):
+    """
+    Signal pré-sauvegarde, sans appel réseau :
+    1. Ne fait rien si aucune adresse n'a changé (transitions de statut avec update_fields)
+    2. Renseigne des coordonnées approximatives locales si elles manquent
+    3. Marque les côtés à géocoder précisément par la tâche `deliveries.enrich_delivery_location`
+    """
+    if update_fields is not None and not any(
+        field in update_fields or field.removesuffix('_id') in update_fields
+        for side in ADDRESS_FIELDS for field in ADDRESS_FIELDS[side] + COORD_FIELDS[side]
+    ):
+        return
+
+    instance._enrich_sides = []
+    previous = getattr(instance, '_address_state', {})
+    for side in ADDRESS_FIELDS:
+        if not instance._state.adding and previous.get(side) == address_state(instance, side):
+            continue
+        if instance.get_coords(side):
+            continue
+        commune = getattr(instance, f'{side}_commune')
+        if not commune:
+            continue
+
+        # Les coordonnées locales ne sont écrites que si elles font partie de la sauvegarde
+        lat_field, lon_field = COORD_FIELDS[side]
+        if update_fields is None or (lat_field in update_fields and lon_field in update_fields):
+            coords = local_coordinates(commune, getattr(instance, f'{side}_quartier'))
             if coords:
-                instance.pickup_latitude, instance.pickup_longitude = coords
-                coords_found = True
-                logger.info(f"✅ Adresse pickup géocodée: {pickup_full_address}")
-        
-        # Si pas de résultat, chercher dans les zones avec normalisation
-        if not coords_found:
-            for zone in PricingZone.objects.filter(default_latitude__isnull=False):
-                if normalize_commune(zone.commune) == commune_norm:
-                    instance.pickup_latitude = zone.default_latitude
-                    instance.pickup_longitude = zone.default_longitude
-                    coords_found = True
-                    logger.info(f"✅ Coordonnées zone utilisées pour pickup: {instance.pickup_commune}")
-                    break
-        
-        # Fallback: coordonnées hardcodées d'Abidjan
-        if not coords_found and commune_norm in ABIDJAN_COMMUNES_COORDS:
-            lat, lng = ABIDJAN_COMMUNES_COORDS[commune_norm]
-            instance.pickup_latitude = Decimal(str(lat))
-            instance.pickup_longitude = Decimal(str(lng))
-            logger.info(f"✅ Coordonnées fallback utilisées pour pickup: {instance.pickup_commune}")
-    
-    # 2. Géocodage de l'adresse de livraison (delivery)
-    if not instance.get_coords('delivery') and instance.delivery_commune:
-        commune_norm = normalize_commune(instance.delivery_commune)
-        coords_found = False
-        
-        # Essayer avec l'adresse complète
-        delivery_full_address = f"{instance.delivery_address}, {instance.delivery_commune}"
-        coords = location_service.geocode_address(delivery_full_address)
-        if coords:
-            instance.delivery_latitude, instance.delivery_longitude = coords
-            coords_found = True
-            logger.info(f"✅ Adresse delivery géocodée: {delivery_full_address}")
-        
-        # Si pas de résultat, chercher dans les zones avec normalisation
-        if not coords_found:
-            for zone in PricingZone.objects.filter(default_latitude__isnull=False):
-                if normalize_commune(zone.commune) == commune_norm:
-                    instance.delivery_latitude = zone.default_latitude
-                    instance.delivery_longitude = zone.default_longitude
-                    coords_found = True
-                    logger.info(f"✅ Coordonnées zone utilisées pour delivery: {instance.delivery_commune}")
-                    break
-        
-        # Fallback: coordonnées hardcodées d'Abidjan
-        if not coords_found and commune_norm in ABIDJAN_COMMUNES_COORDS:
-            lat, lng = ABIDJAN_COMMUNES_COORDS[commune_norm]
-            instance.delivery_latitude = Decimal(str(lat))
-            instance.delivery_longitude = Decimal(str(lng))
-            logger.info(f"✅ Coordonnées fallback utilisées pour delivery: {instance.delivery_commune}")
+                setattr(instance, lat_field, coords[0])
+                setattr(instance, lon_field, coords[1])
+        instance._enrich_sides.append(side)
+
+
+@receiver(post_save, sender=Delivery)
+def schedule_location_enrichment(sender, instance, **kwargs):
+    """Planifie le géocodage précis après le commit (jamais dans la requête)"""
+    sides = getattr(instance, '_enrich_sides', None)
+    instance._enrich_sides = []
+    instance._address_state = {side: address_state(instance, side) for side in ADDRESS_FIELDS}
+    if not sides:
+        return
+
+    delivery_id = str(instance.pk)
+
+    def enqueue():
+        from .tasks import enrich_delivery_location
+        try:
+            enrich_delivery_location.delay(delivery_id, sides)
+        except Exception as e:
+            logger.warning(f"Enrichissement de la livraison {delivery_id} non planifié: {e}")
+
+    transaction.on_commit(enqueue)
+
+
+def tracking_state(instance):
+    """Statut et livreur chargés (suivi temps réel), _NOT_LOADED si différés"""
+    return (instance.__dict__.get('status', _NOT_LOADED), instance.__dict__.get('driver_id', _NOT_LOADED))
+
+
+@receiver(post_init, sender=Delivery)
+def remember_tracking_state(sender, instance, **kwargs):
+    instance._tracking_state = tracking_state(instance)
+
+
+@receiver(post_save, sender=Delivery)
+def publish_tracking_status(sender, instance, created, **kwargs):
+    """Pousse les transitions de statut et changements de livreur aux abonnés du suivi, après le commit"""
+    previous = getattr(instance, '_tracking_state', None)
+    state = tracking_state(instance)
+    instance._tracking_state = state
+    if created or state == previous or _NOT_LOADED in state:
+        return
+
+    from .tracking_stream import delivery_channel, publish, status_payload
+
+    channel, payload = delivery_channel(instance.pk), status_payload(instance)
+    transaction.on_commit(lambda: publish(channel, 'status', payload))
+
+
+@receiver(post_init, sender=Delivery)
+def remember_rollup_state(sender, instance, **kwargs):
+    instance._rollup_state = rollup_state(instance)
+
+
+@receiver(post_save, sender=Delivery)
+def update_delivery_rollups(sender, instance, created, **kwargs):
+    """Reporte la création ou la transition dans les agrégats journaliers (dashboard)"""
+    previous = getattr(instance, '_rollup_state', None)
+    state = rollup_state(instance)
+    instance._rollup_state = state
+    if created:
+        record_transition(None, state)
+    elif previous is not None and state is not None:
+        # État inconnu (champs différés) : laissé à la réconciliation nocturne
+        record_transition(previous, state)
+
+
+@receiver(post_delete, sender=Delivery)
+def remove_from_delivery_rollups(sender, instance, **kwargs):
+    record_transition(getattr(instance, '_rollup_state', None), None)
+
+
+def stats_scopes(instance):
+    """Périmètres des statistiques en cache (deliveries/stats.py) dont relève la livraison"""
+    return (
+        ('merchant', instance.__dict__.get('merchant_id')),
+        ('driver', instance.__dict__.get('driver_id')),
+        ('user', instance.__dict__.get('created_by_id')),
+    )
+
+
+@receiver(post_init, sender=Delivery)
+def remember_stats_scopes(sender, instance, **kwargs):
+    instance._stats_scopes = stats_scopes(instance)
+
+
+@receiver(post_save, sender=Delivery)
+@receiver(post_delete, sender=Delivery)
+def invalidate_delivery_stats(sender, instance, **kwargs):
+    """
+    Périme les statistiques des anciens et nouveaux merchant / livreur / créateur,
+    une fois la transaction validée : un recalcul entre-temps (lecture de l'état
+    d'avant le commit) n'est pas conservé sous la nouvelle version
+    """
+    scopes = set(getattr(instance, '_stats_scopes', ())) | set(stats_scopes(instance))
+    instance._stats_scopes = stats_scopes(instance)
+    transaction.on_commit(lambda: invalidate_stats(*scopes))
+
+
+@receiver(post_save, sender='payments.DriverEarning')
+@receiver(post_delete, sender='payments.DriverEarning')
+def invalidate_earning_stats(sender, instance, **kwargs):
+    scope = ('driver', instance.driver_id)
+    transaction.on_commit(lambda: invalidate_stats(scope))
 
 
+@receiver(post_save, sender='payments.Invoice')
+@receiver(post_delete, sender='payments.Invoice')
+def invalidate_invoice_stats(sender, instance, **kwargs):
+    scope = ('merchant', instance.merchant_id)
+    transaction.on_commit(lambda: invalidate_stats(scope))
 
 
 @receiver(post_save, sender=Delivery)
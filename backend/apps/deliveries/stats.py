@@ -0,0 +1,279 @@
+# deliveries/stats.py
+"""
+Statistiques des écrans « mes statistiques » (merchant, particulier, livreur).
+
+Chaque fonction fait une seule requête par modèle : un aggregate() avec des
+Count / Sum filtrés (FILTER / CASE WHEN) au lieu d'un count() ou aggregate()
+par compteur. Les résultats sont mis en cache quelques secondes
+(USER_STATS_CACHE_SECONDS, 60 par défaut) par périmètre :
+('merchant', id), ('driver', id) ou ('user', id) pour un particulier.
+
+Invalidation : toute sauvegarde ou suppression d'une livraison, d'un gain
+livreur ou d'une facture incrémente, une fois la transaction validée, la version
+des périmètres concernés (signaux de deliveries/signals.py) ; les entrées d'une ancienne version sont
+ignorées.
+
+Les profils merchant / livreur sont lus avec leurs totaux de factures / gains
+(merchant_stats_profile, driver_stats_profile) : avec les compteurs de
+livraisons, deux requêtes par écran.
+
+Usage:
+    driver = driver_stats_profile(request.user, period_start)
+    counts = cached_stats(('driver', driver.pk), 'my_stats', (30,), lambda: driver_stats(driver, period_start))
+"""
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EARNING_STATUSES = ('pending', 'approved', 'paid')
+PAYMENT_METHODS = ('orange_money', 'mtn_money', 'moov_money', 'wave', 'cash')
+
+
+def _timeout():
+    return int(getattr(settings, 'USER_STATS_CACHE_SECONDS', 60))
+
+
+def _version_key(scope):
+    return f"stats:{scope[0]}:{scope[1]}:version"
+
+
+def cached_stats(scope, name, params, compute):
+    """
+    Résultat de `compute()` en cache pour le périmètre, une lecture de cache (get_many)
+
+    Args:
+        scope: ('merchant' | 'driver' | 'user', id), ou None pour ne pas mettre en cache
+        name: Nom de la statistique (endpoint)
+        params: Paramètres de la requête (tuple : période, filtres...)
+    """
+    if scope is None:
+        return compute()
+    version_key = _version_key(scope)
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()
+    data_key = f"stats:{scope[0]}:{scope[1]}:{name}:{digest}"
+    try:
+        found = cache.get_many([version_key, data_key])
+    except Exception as e:
+        logger.warning(f"Cache des statistiques indisponible ({e})")
+        return compute()
+
+    version = found.get(version_key, 0)
+    entry = found.get(data_key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    data = compute()
+    try:
+        cache.set(data_key, (version, data), _timeout())
+    except Exception as e:
+        logger.warning(f"Cache des statistiques indisponible ({e})")
+    return data
+
+
+def invalidate_stats(*scopes):
+    """Périme les statistiques en cache des périmètres donnés (ids None ignorés)"""
+    version = time.time_ns()
+    keys = {_version_key(scope): version for scope in scopes if scope[1] is not None}
+    if not keys:
+        return
+    try:
+        # Même durée que les entrées : une version expirée ne peut plus valider d'entrée ancienne
+        cache.set_many(keys, _timeout())
+    except Exception as e:
+        logger.warning(f"Invalidation des statistiques impossible ({e})")
+
+
+def delivery_counts(qs, period_start):
+    """
+    Compteurs et chiffre d'affaires des livraisons de `qs`, en une requête
+
+    Livrées / annulées comptées sur la date de l'événement (delivered_at /
+    cancelled_at), en cours / en attente quelle que soit la période.
+    """
+    delivered = Q(status='delivered')
+    delivered_in_period = delivered & Q(delivered_at__gte=period_start)
+    totals = qs.order_by().aggregate(
+        total_all_time=Count('pk'),
+        period_total=Count('pk', filter=Q(created_at__gte=period_start)),
+        delivered=Count('pk', filter=delivered_in_period),
+        in_progress=Count('pk', filter=Q(status='in_progress')),
+        pending=Count('pk', filter=Q(status='pending')),
+        cancelled=Count('pk', filter=Q(status='cancelled', cancelled_at__gte=period_start)),
+        period_revenue=Sum('calculated_price', filter=delivered_in_period),
+        total_revenue=Sum('calculated_price', filter=delivered),
+    )
+    totals['period_revenue'] = totals['period_revenue'] or 0
+    totals['total_revenue'] = totals['total_revenue'] or 0
+    return totals
+
+
+def _invoice_aggregates(period_start, prefix=''):
+    """Sommes et nombres de factures de la période, relatifs à Invoice (`prefix` = chemin depuis un autre modèle)"""
+    in_period = Q(**{f'{prefix}created_at__gte': period_start})
+    paid = in_period & Q(**{f'{prefix}status': 'paid'})
+    sent = in_period & Q(**{f'{prefix}status': 'sent'})
+    amount, pk = f'{prefix}total_amount', f'{prefix}pk'
+    return {
+        'total_billed': Sum(amount, filter=in_period),
+        'paid': Sum(amount, filter=paid),
+        'pending_payment': Sum(amount, filter=sent),
+        'total': Count(pk, filter=in_period),
+        'paid_count': Count(pk, filter=paid),
+        'pending_count': Count(pk, filter=sent),
+    }
+
+
+def _clean_invoices(totals):
+    for name in ('total_billed', 'paid', 'pending_payment'):
+        totals[name] = totals[name] or 0
+    return totals
+
+
+def invoice_totals(merchant, period_start):
+    """Montants et nombres de factures du merchant sur la période, en une requête"""
+    from apps.payments.models import Invoice
+
+    return _clean_invoices(
+        Invoice.objects.filter(merchant=merchant, created_at__gte=period_start).order_by().aggregate(
+            **_invoice_aggregates(period_start)
+        )
+    )
+
+
+def merchant_stats_profile(user, period_start):
+    """
+    Profil merchant de `user` et ses totaux de factures sur la période
+    (attribut `stats_invoices`, lu par compute_delivery_stats), en une requête.
+    None si l'utilisateur n'a pas de profil merchant.
+    """
+    from apps.merchants.models import Merchant
+
+    aggregates = _invoice_aggregates(period_start, prefix='invoices__')
+    merchant = Merchant.objects.filter(user=user).annotate(
+        **{f'stats_invoices_{name}': aggregate for name, aggregate in aggregates.items()}
+    ).first()
+    if merchant is not None:
+        merchant.stats_invoices = _clean_invoices(
+            {name: getattr(merchant, f'stats_invoices_{name}') for name in aggregates}
+        )
+    return merchant
+
+
+def _earning_aggregates(period_start, prefix=''):
+    """Gains de la période, au total et par statut, relatifs à DriverEarning"""
+    in_period = Q(**{f'{prefix}created_at__gte': period_start})
+    amount = f'{prefix}total_earning'
+    return {
+        'total_earned': Sum(amount, filter=in_period),
+        **{status: Sum(amount, filter=in_period & Q(**{f'{prefix}status': status})) for status in EARNING_STATUSES}
+    }
+
+
+def earning_totals(driver, period_start):
+    """Gains du livreur sur la période, au total et par statut, en une requête"""
+    from apps.payments.models import DriverEarning
+
+    totals = DriverEarning.objects.filter(driver=driver, created_at__gte=period_start).order_by().aggregate(
+        **_earning_aggregates(period_start)
+    )
+    return {name: value or Decimal('0') for name, value in totals.items()}
+
+
+def driver_stats_profile(user, period_start):
+    """
+    Profil livreur de `user` (avec son utilisateur) et ses gains sur la période
+    (attribut `stats_earnings`, lu par driver_stats), en une requête.
+    None si l'utilisateur n'a pas de profil livreur.
+    """
+    from apps.drivers.models import Driver
+
+    aggregates = _earning_aggregates(period_start, prefix='earnings__')
+    driver = Driver.objects.select_related('user').filter(user=user).annotate(
+        **{f'stats_earnings_{name}': aggregate for name, aggregate in aggregates.items()}
+    ).first()
+    if driver is not None:
+        driver.stats_earnings = {
+            name: getattr(driver, f'stats_earnings_{name}') or Decimal('0') for name in aggregates
+        }
+    return driver
+
+
+def driver_stats(driver, period_start):
+    """
+    Compteurs de DriverViewSet.my_stats : livraisons en une requête, gains lus
+    sur le profil (driver_stats_profile) ou en une seconde requête
+    """
+    from .models import Delivery
+
+    earnings = getattr(driver, 'stats_earnings', None)
+    return {
+        'deliveries': delivery_counts(Delivery.objects.filter(driver=driver), period_start),
+        'earnings': earnings if earnings is not None else earning_totals(driver, period_start),
+    }
+
+
+def driver_earnings(driver, period_days, daily_days=7):
+    """
+    Gains de DriverViewSet.my_earnings en une requête : totaux par jour et par
+    statut sur la période, résumés ici par statut et par jour (derniers `daily_days` jours)
+    """
+    from apps.payments.models import DriverEarning
+
+    now = timezone.now()
+    period_start = now - timedelta(days=period_days)
+    daily_start = now - timedelta(days=daily_days)
+    rows = DriverEarning.objects.filter(driver=driver, created_at__gte=period_start).annotate(
+        day=TruncDate('created_at')
+    ).values('day', 'status').annotate(
+        total=Sum('total_earning'),
+        # Le détail journalier ne couvre que les gains créés depuis `daily_start`
+        recent=Sum('total_earning', filter=Q(created_at__gte=daily_start)),
+    ).order_by('day')
+
+    summary = {'total_earned': Decimal('0'), **{status: Decimal('0') for status in EARNING_STATUSES}}
+    daily = {}
+    for row in rows:
+        summary['total_earned'] += row['total'] or 0
+        if row['status'] in EARNING_STATUSES:
+            summary[row['status']] += row['total'] or 0
+        if row['recent'] is not None:
+            daily[row['day']] = daily.get(row['day'], Decimal('0')) + row['recent']
+    return {'summary': summary, 'daily': sorted(daily.items())}
+
+
+def payment_stats(driver, now=None):
+    """
+    Compteurs de PaymentViewSet.stats en une requête : gains à vie, du mois,
+    du mois précédent et nombre de gains par moyen de paiement de la livraison
+    """
+    from apps.payments.models import DriverEarning
+
+    now = now or timezone.now()
+    month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    this_month = Q(created_at__gte=month_start)
+    last_month = Q(created_at__gte=last_month_start, created_at__lt=month_start)
+
+    totals = DriverEarning.objects.filter(driver=driver).order_by().aggregate(
+        lifetime_earnings=Sum('total_earning'),
+        lifetime_count=Count('pk'),
+        month_earnings=Sum('total_earning', filter=this_month),
+        month_count=Count('pk', filter=this_month),
+        last_month_earnings=Sum('total_earning', filter=last_month),
+        last_month_count=Count('pk', filter=last_month),
+        **{method: Count('pk', filter=Q(delivery__payment_method=method)) for method in PAYMENT_METHODS}
+    )
+    for name in ('lifetime_earnings', 'month_earnings', 'last_month_earnings'):
+        totals[name] = totals[name] or Decimal('0')
+    totals['payment_methods'] = {method: totals.pop(method) for method in PAYMENT_METHODS}
+    return totals
@@ -0,0 +1,176 @@
+"""
+Celery Tasks for Deliveries App
+"""
+from celery import shared_task
+
+
+@shared_task(name='deliveries.dispatch_pending_deliveries')
+def dispatch_pending_deliveries(delivery_ids=None, driver_ids=None, time_limit_seconds=None, apply=True):
+    """
+    Optimise l'assignation des livraisons en attente sur toute la flotte
+
+    Args:
+        delivery_ids: Livraisons à planifier (défaut: toutes les livraisons en attente)
+        driver_ids: Livreurs à utiliser (défaut: tous les livreurs disponibles)
+        time_limit_seconds: Budget de résolution du solveur
+        apply: Enregistrer les assignations (défaut: True)
+
+    Returns:
+        dict: Résultat de RouteOptimizationService.optimize_fleet
+    """
+    from .services import RouteOptimizationService
+
+    return RouteOptimizationService().optimize_fleet(
+        delivery_ids=delivery_ids,
+        driver_ids=driver_ids,
+        time_limit_seconds=time_limit_seconds,
+        apply=apply
+    )
+
+
+@shared_task(name='deliveries.send_delivery_pin_emails')
+def send_delivery_pin_emails(delivery_ids, to_email):
+    """
+    Envoie les codes PIN des livraisons importées en masse
+
+    Args:
+        delivery_ids: Identifiants des livraisons (str)
+        to_email: Email du créateur (merchant ou particulier)
+
+    Returns:
+        dict: {'sent': int, 'total': int}
+    """
+    from .models import Delivery
+    from .email_service import send_delivery_pin_email
+
+    sent = 0
+    deliveries = Delivery.objects.filter(id__in=delivery_ids).only(
+        'id', 'tracking_number', 'delivery_confirmation_code'
+    )
+    for delivery in deliveries.iterator():
+        if send_delivery_pin_email(delivery.delivery_confirmation_code, to_email, delivery):
+            sent += 1
+
+    return {'sent': sent, 'total': len(delivery_ids)}
+
+
+@shared_task(bind=True, name='deliveries.enrich_delivery_location', max_retries=3, default_retry_delay=60)
+def enrich_delivery_location(self, delivery_id, sides=('pickup', 'delivery')):
+    """
+    Géocode précisément les adresses d'une livraison et complète sa distance
+
+    Planifiée par le signal pre_save uniquement quand une adresse change.
+    Idempotente : les coordonnées ne sont écrites (UPDATE conditionnel) que si
+    l'adresse n'a pas changé entre-temps et que les coordonnées en base sont
+    encore absentes ou égales à l'approximation locale (centroïde de zone) ;
+    des coordonnées fournies par le client ou le livreur ne sont jamais écrasées.
+    Les erreurs réseau du géocodeur déclenchent un nouvel essai.
+
+    Args:
+        delivery_id: Identifiant de la livraison
+        sides: Côtés à enrichir ('pickup', 'delivery')
+
+    Returns:
+        dict: {'delivery_id', 'geocoded': [côtés mis à jour], 'distance_km'}
+    """
+    import logging
+    from decimal import Decimal
+
+    import requests
+
+    from apps.core.location_service import LocationService
+    from .models import Delivery
+    from .signals import ADDRESS_FIELDS, COORD_FIELDS, local_coordinates
+
+    logger = logging.getLogger(__name__)
+    quantum = Decimal('0.00000001')
+
+    delivery = Delivery.objects.select_related('pickup_address').filter(pk=delivery_id).first()
+    if delivery is None:
+        return {'delivery_id': delivery_id, 'geocoded': [], 'distance_km': None}
+
+    geocoded = []
+    for side in sides:
+        if side not in ADDRESS_FIELDS:
+            continue
+        lat_field, lon_field = COORD_FIELDS[side]
+        commune = getattr(delivery, f'{side}_commune')
+        current = (getattr(delivery, lat_field), getattr(delivery, lon_field))
+
+        if current[0] is not None and current[1] is not None:
+            if current != local_coordinates(commune, getattr(delivery, f'{side}_quartier')):
+                continue
+
+        if side == 'pickup':
+            address = delivery.pickup_address_details or (
+                delivery.pickup_address.street_address if delivery.pickup_address else ''
+            )
+        else:
+            address = delivery.delivery_address
+        if not address or not address.strip() or not commune:
+            # Sans adresse détaillée, le centroïde local vaut le géocodage de la commune
+            continue
+
+        try:
+            coords = LocationService.geocode_address(f"{address}, {commune}", raise_errors=True)
+        except requests.RequestException as exc:
+            raise self.retry(exc=exc, countdown=60 * (2 ** self.request.retries))
+        if not coords:
+            continue
+
+        lat = Decimal(str(coords[0])).quantize(quantum)
+        lon = Decimal(str(coords[1])).quantize(quantum)
+        unchanged = {field: getattr(delivery, field) for field in ADDRESS_FIELDS[side]}
+        if Delivery.objects.filter(
+            pk=delivery.pk, **{lat_field: current[0], lon_field: current[1]}, **unchanged
+        ).update(**{lat_field: lat, lon_field: lon}):
+            setattr(delivery, lat_field, lat)
+            setattr(delivery, lon_field, lon)
+            geocoded.append(side)
+            logger.info(f"✅ Adresse {side} géocodée pour {delivery.tracking_number}: ({lat}, {lon})")
+
+    distance_km = delivery.distance_km
+    pickup, dropoff = delivery.get_coords('pickup'), delivery.get_coords('delivery')
+    if distance_km is None and pickup and dropoff:
+        distance_km = Decimal(str(LocationService.get_distance(*pickup, *dropoff)))
+        Delivery.objects.filter(pk=delivery.pk, distance_km__isnull=True).update(
+            distance_km=distance_km,
+            distance_source='openrouteservice' if LocationService.ORS_API_KEY else 'fallback_straight_line',
+        )
+
+    return {
+        'delivery_id': delivery_id,
+        'geocoded': geocoded,
+        'distance_km': float(distance_km) if distance_km is not None else None,
+    }
+
+
+@shared_task(name='deliveries.reconcile_delivery_rollups')
+def reconcile_delivery_rollups(days=None):
+    """
+    Réconciliation nocturne des agrégats journaliers avec la table `deliveries`
+
+    Corrige les écarts laissés par les écritures qui contournent save()
+    (QuerySet.update, SQL brut, SET_NULL à la suppression d'un livreur).
+
+    Args:
+        days: Ne recalculer que les livraisons créées ces `days` derniers jours
+            (défaut: tout l'historique)
+
+    Returns:
+        dict: {'rows', 'created', 'updated', 'deleted', 'pruned'}
+    """
+    import logging
+
+    from . import rollups
+
+    logger = logging.getLogger(__name__)
+
+    since = rollups.period_start_day(days) if days is not None else None
+    result = rollups.reconcile_delivery_rollups(since=since)
+    if result['created'] or result['updated'] or result['deleted']:
+        # Écart entre maintenance incrémentale et table source
+        logger.warning(f"Agrégats de livraisons corrigés: {result}")
+    else:
+        logger.info(f"Agrégats de livraisons à jour: {result['rows']} lignes")
+    return result
@@ -0,0 +1,186 @@
+"""
+Tests de l'import en masse de livraisons (apps/deliveries/bulk_import.py).
+"""
+import io
+import json
+import math
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.location_service import LocationService
+from apps.deliveries.bulk_import import MODEL_FIELDS, BulkDeliveryImporter, iter_csv_rows, iter_json_rows
+from apps.deliveries.models import Delivery
+from apps.deliveries.tasks import send_delivery_pin_emails
+from apps.merchants.models import Merchant, MerchantAddress
+from apps.pricing.models import PricingZone, ZonePricingMatrix
+from apps.pricing.tariff_table import tariff_table
+from apps.pricing.zone_index import zone_index
+
+User = get_user_model()
+
+
+class ManifestReaderTests(SimpleTestCase):
+    def test_json_array_read_in_small_chunks(self):
+        rows = [{'delivery_commune': 'Cocody', 'recipient_name': f'Client {i}'} for i in range(50)]
+        stream = io.BytesIO(json.dumps(rows, indent=2).encode())
+        self.assertEqual(list(iter_json_rows(stream, chunk_size=7)), rows)
+
+    def test_json_lines(self):
+        stream = io.BytesIO(b'{"a": 1}\n{"a": "x\\n"}\n\n{"a": [1, 2]}\n')
+        self.assertEqual(list(iter_json_rows(stream, chunk_size=3)), [{'a': 1}, {'a': 'x\n'}, {'a': [1, 2]}])
+
+    def test_truncated_json_raises(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_rows(io.BytesIO(b'[{"a": 1}, {"a": '), chunk_size=4))
+
+    def test_csv_semicolon_with_bom_and_blank_cells(self):
+        content = '﻿delivery_commune;recipient_name;delivery_quartier\nCocody;Awa;\nPlateau;"Koffi; fils";Centre\n'
+        rows = list(iter_csv_rows(io.BytesIO(content.encode('utf-8'))))
+        self.assertEqual(rows, [
+            {'delivery_commune': 'Cocody', 'recipient_name': 'Awa'},
+            {'delivery_commune': 'Plateau', 'recipient_name': 'Koffi; fils', 'delivery_quartier': 'Centre'},
+        ])
+
+
+@patch.object(LocationService, 'ORS_API_KEY', '')
+class BulkDeliveryImportTests(TestCase):
+    def setUp(self):
+        zone_index.invalidate()
+        tariff_table.invalidate()
+        zones = [
+            PricingZone.objects.create(zone_name='Zone Cocody', commune='Cocody', is_active=True,
+                                       default_latitude=Decimal('5.3599517'), default_longitude=Decimal('-3.9615917')),
+            PricingZone.objects.create(zone_name='Zone Plateau', commune='Plateau', is_active=True,
+                                       default_latitude=Decimal('5.3238'), default_longitude=Decimal('-4.0213')),
+        ]
+        for origin in zones:
+            for destination in zones:
+                ZonePricingMatrix.objects.create(
+                    origin_zone=origin, destination_zone=destination, base_rate=Decimal('1200'),
+                    per_kg_rate=Decimal('150'), per_km_rate=Decimal('80'),
+                    effective_from=date.today() - timedelta(days=1),
+                )
+
+        self.user = User.objects.create_user(
+            email='bulk@test.com', phone='+2250700300000', password='test123',
+            user_type='merchant', first_name='Bulk', last_name='Merchant'
+        )
+        self.merchant = Merchant.objects.get(user=self.user)
+        MerchantAddress.objects.create(merchant=self.merchant, street_address='Rue 12', commune='Cocody', is_primary=True)
+
+    def _row(self, i, **extra):
+        row = {
+            'reference': f'CMD-{i}',
+            'delivery_commune': 'Plateau' if i % 2 else 'Cocody',
+            'recipient_name': f'Client {i}',
+            'recipient_phone': '+2250102030405',
+            'package_weight_kg': '3',
+            'payment_method': 'prepaid',
+        }
+        row.update(extra)
+        return row
+
+    def test_import_creates_priced_deliveries(self):
+        rows = [self._row(i) for i in range(120)]
+        with self.captureOnCommitCallbacks(execute=True), \
+                patch('apps.deliveries.tasks.send_delivery_pin_emails.delay') as delay:
+            report = BulkDeliveryImporter(self.user, batch_size=50).run(iter(rows))
+
+        self.assertEqual(report['created'], 120)
+        self.assertEqual(report['failed'], 0)
+        deliveries = Delivery.objects.filter(merchant=self.merchant)
+        self.assertEqual(deliveries.count(), 120)
+        self.assertEqual(len(set(deliveries.values_list('tracking_number', flat=True))), 120)
+        for delivery in deliveries:
+            self.assertEqual(delivery.pickup_commune, 'Cocody')
+            self.assertEqual(delivery.created_by, self.user)
+            self.assertTrue(delivery.calculated_price > 0)
+            self.assertEqual(delivery.calculated_price, delivery.platform_fee + delivery.driver_amount)
+            self.assertEqual(len(delivery.delivery_confirmation_code), 4)
+            self.assertIsNotNone(delivery.get_coords('pickup'))
+            self.assertIsNotNone(delivery.get_coords('delivery'))
+
+        # Une tâche Celery par lot, puis un email de code PIN par livraison
+        self.assertEqual(delay.call_count, 3)
+        for call in delay.call_args_list:
+            send_delivery_pin_emails(*call.args)
+        self.assertEqual(len(mail.outbox), 120)
+
+    def test_same_price_as_single_pricing(self):
+        from apps.pricing.calculator import PricingCalculator
+
+        report = BulkDeliveryImporter(self.user, send_pin_emails=False).run([self._row(1)])
+        delivery = Delivery.objects.get(id=report['deliveries'][0]['id'])
+        expected = PricingCalculator().calculate_price({
+            'pickup_commune': 'Cocody', 'delivery_commune': 'Plateau',
+            'package_weight_kg': 3.0, 'is_fragile': False, 'scheduling_type': 'immediate',
+        })
+        self.assertEqual(float(delivery.calculated_price), expected['total_price'])
+
+    def test_invalid_rows_are_reported(self):
+        rows = [
+            self._row(0),
+            self._row(1, recipient_name=''),
+            self._row(2, delivery_commune='Atlantis'),
+            'not an object',
+            self._row(4),
+        ]
+        report = BulkDeliveryImporter(self.user, send_pin_emails=False).run(rows)
+
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['failed'], 3)
+        errors = {e['row']: e for e in report['errors']}
+        self.assertEqual(sorted(errors), [2, 3, 4])
+        self.assertIn('recipient_name', errors[2]['errors'])
+        self.assertEqual(errors[3]['reference'], 'CMD-2')
+        self.assertIn('pricing', errors[3]['errors'])
+
+    def test_dry_run_creates_nothing(self):
+        report = BulkDeliveryImporter(self.user, dry_run=True).run([self._row(i) for i in range(5)])
+        self.assertEqual(report['created'], 5)
+        self.assertFalse(Delivery.objects.exists())
+        self.assertTrue(all(d['calculated_price'] > 0 for d in report['deliveries']))
+
+    def test_query_count_does_not_grow_per_row(self):
+        importer = BulkDeliveryImporter(self.user, batch_size=500, send_pin_emails=False)
+        importer.run([self._row(0)])
+        rows = [self._row(i) for i in range(1, 201)]
+        with CaptureQueriesContext(connection) as ctx:
+            importer.run(rows)
+
+        # Vérification des numéros de suivi (un nouveau tirage en cas de doublon),
+        # savepoint et INSERT groupés : aucune requête de validation ou de tarification par ligne
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "deliveries"')]
+        self.assertEqual(len(inserts), math.ceil(len(rows) / connection.ops.bulk_batch_size(list(MODEL_FIELDS), rows)))
+        # Agrégats journaliers : une écriture par commune du lot (+ savepoint), pas par ligne
+        rollup_writes = [q for q in ctx.captured_queries if 'delivery_daily_rollups' in q['sql']]
+        self.assertLessEqual(len(rollup_writes), 2 * 2)
+        self.assertLessEqual(len(ctx.captured_queries) - len(inserts) - len(rollup_writes), 5 + 2)
+        self.assertFalse([q for q in ctx.captured_queries if 'pricing' in q['sql']])
+
+    def test_endpoint_accepts_csv_upload(self):
+        from apps.deliveries.views import DeliveryViewSet
+
+        header = 'reference,delivery_commune,recipient_name,recipient_phone,package_weight_kg,payment_method\n'
+        lines = ''.join(f'CMD-{i},Plateau,Client {i},+2250102030405,2,prepaid\n' for i in range(30))
+        upload = io.BytesIO((header + lines + 'CMD-X,Plateau,,+2250102030405,2,prepaid\n').encode())
+        upload.name = 'manifeste.csv'
+
+        request = APIRequestFactory().post('/api/v1/deliveries/bulk-import/', {'file': upload}, format='multipart')
+        force_authenticate(request, user=self.user)
+        with patch('apps.deliveries.bulk_import.BulkDeliveryImporter._queue_pin_emails'):
+            response = DeliveryViewSet.as_view({'post': 'bulk_import'})(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 30)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(response.data['errors'][0]['reference'], 'CMD-X')
+        self.assertEqual(Delivery.objects.count(), 30)
@@ -0,0 +1,150 @@
+"""
+Tests des agrégats journaliers des livraisons (deliveries/rollups.py) :
+maintenance par les signaux, réconciliation nocturne et lectures du dashboard.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.deliveries import rollups
+from apps.deliveries.models import Delivery, DeliveryDailyRollup
+from apps.deliveries.services import compute_delivery_stats
+from apps.deliveries.tasks import reconcile_delivery_rollups
+
+NO_DRIFT = {'created': 0, 'updated': 0, 'deleted': 0}
+
+
+@patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+class DeliveryRollupTests(TestCase):
+    def setUp(self):
+        merchant_user = User.objects.create_user(
+            email='shop@example.com', phone='0100000000', password='testpass', user_type='merchant'
+        )
+        self.merchant = merchant_user.merchant_profile
+        self.merchant.business_name = 'Boutique Test'
+        self.merchant.save()
+        driver_user = User.objects.create_user(
+            email='driver@example.com', phone='0200000000', password='testpass', user_type='driver',
+            first_name='Awa', last_name='Koné'
+        )
+        self.driver = driver_user.driver_profile
+
+    def _create(self, **extra):
+        data = dict(
+            merchant=self.merchant,
+            pickup_commune='Cocody',
+            delivery_commune='Plateau',
+            delivery_address='Rue du Commerce',
+            recipient_name='Client',
+            recipient_phone='+2250100000000',
+            package_weight_kg=Decimal('2.0'),
+            payment_method='prepaid',
+            calculated_price=Decimal('1500'),
+        )
+        data.update(extra)
+        return Delivery.objects.create(**data)
+
+    def _drift(self):
+        result = rollups.reconcile_delivery_rollups()
+        return {name: result[name] for name in NO_DRIFT}
+
+    def test_status_transitions_keep_rollups_exact(self, delay):
+        first = self._create()
+        second = self._create(delivery_commune='Yopougon', calculated_price=Decimal('2500'))
+
+        first.driver = self.driver
+        first.status = 'assigned'
+        first.save()
+        delivery = Delivery.objects.get(pk=first.pk)
+        delivery.status = 'delivered'
+        delivery.delivered_at = timezone.now()
+        delivery.save(update_fields=['status', 'delivered_at'])
+        second.status = 'cancelled'
+        second.cancelled_at = timezone.now()
+        second.save()
+
+        self.assertEqual(self._drift(), NO_DRIFT)
+        today = rollups.local_day(timezone.now())
+        row = DeliveryDailyRollup.objects.get(status='delivered')
+        self.assertEqual(
+            (row.day, row.completed_day, row.delivery_commune, row.driver_id, row.deliveries, row.revenue),
+            (today, today, 'Plateau', self.driver.pk, 1, Decimal('1500'))
+        )
+
+        second.delete()
+        self.assertEqual(self._drift(), NO_DRIFT)
+        self.assertFalse(DeliveryDailyRollup.objects.filter(status='cancelled').exists())
+
+    def test_nightly_reconcile_fixes_writes_that_bypass_save(self, delay):
+        delivery = self._create()
+        Delivery.objects.filter(pk=delivery.pk).update(status='failed', calculated_price=Decimal('900'))
+
+        result = reconcile_delivery_rollups.apply().get()
+
+        self.assertEqual((result['created'], result['deleted']), (1, 1))
+        row = DeliveryDailyRollup.objects.get(deliveries__gt=0)
+        self.assertEqual((row.status, row.revenue), ('failed', Decimal('900')))
+        self.assertEqual(self._drift(), NO_DRIFT)
+
+    def test_bulk_created_deliveries_are_counted(self, delay):
+        deliveries = [
+            Delivery(
+                merchant=self.merchant, pickup_commune='Cocody', delivery_commune='Plateau',
+                recipient_name='Client', recipient_phone='+2250100000000', package_weight_kg=Decimal('1'),
+                payment_method='prepaid', calculated_price=Decimal('1000'), tracking_number=f'LBTEST{i}'
+            )
+            for i in range(3)
+        ]
+        Delivery.objects.bulk_create(deliveries)
+        rollups.record_created(deliveries)
+
+        self.assertEqual(rollups.delivery_totals({}, 30)['total_all_time'], 3)
+        self.assertEqual(self._drift(), NO_DRIFT)
+
+    def test_stats_from_rollups_match_the_deliveries_table(self, delay):
+        delivered = self._create(driver=self.driver)
+        delivered.status = 'delivered'
+        delivered.delivered_at = timezone.now()
+        delivered.save()
+        self._create(status='in_progress', driver=self.driver)
+        cancelled = self._create(calculated_price=Decimal('700'))
+        cancelled.status = 'cancelled'
+        cancelled.cancelled_at = timezone.now()
+        cancelled.save()
+        self._create()
+        old = self._create(status='delivered', delivered_at=timezone.now() - timedelta(days=40))
+        Delivery.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=45))
+        rollups.reconcile_delivery_rollups()
+
+        qs = Delivery.objects.filter(merchant=self.merchant)
+        from_table = compute_delivery_stats(qs, period_days=30, merchant=self.merchant)
+        from_rollups = compute_delivery_stats(
+            qs, period_days=30, merchant=self.merchant, rollup_scope={'merchant_id': self.merchant.pk}
+        )
+
+        self.assertEqual(from_rollups, from_table)
+        self.assertEqual(from_rollups['deliveries']['total_all_time'], 5)
+        self.assertEqual(from_rollups['revenue']['total_revenue'], Decimal('3000'))
+
+    def test_dashboard_totals(self, delay):
+        for commune in ('Plateau', 'Plateau', 'Yopougon'):
+            self._create(delivery_commune=commune, driver=self.driver, status='delivered',
+                         delivered_at=timezone.now())
+        self._create(merchant=None, status='failed')
+        previous = self._create()
+        Delivery.objects.filter(pk=previous.pk).update(created_at=timezone.now() - timedelta(days=10))
+        rollups.reconcile_delivery_rollups()
+
+        with self.assertNumQueries(1):
+            totals = rollups.dashboard_totals(7)
+
+        self.assertEqual((totals['total'], totals['previous_total'], totals['delivered']), (4, 1, 3))
+        self.assertEqual(totals['revenue'], Decimal('4500'))
+        self.assertEqual(totals['top_communes'], [('Plateau', 3), ('Yopougon', 1)])
+        self.assertEqual(totals['top_merchants'][0], ('Boutique Test', 3))
+        self.assertEqual(totals['active_drivers'], 1)
+        self.assertEqual(totals['top_drivers'], [('Awa Koné', 3)])
@@ -0,0 +1,127 @@
+"""
+Tests du moteur de classement vectorisé des livreurs (apps/deliveries/ranking.py).
+"""
+import random
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, TestCase
+from geopy.distance import geodesic
+
+from apps.authentication.models import User
+from apps.deliveries.ranking import DriverRankingEngine, haversine_km
+from apps.deliveries.services import DeliveryAssignmentService
+from apps.drivers.geo_index import DriverGeoIndex, _GridBackend
+from apps.drivers.models import Driver
+
+
+PICKUP = (5.3600, -4.0083)
+
+
+def _legacy_order(rows, pickup):
+    """Réplique de l'ancien tri Python de `_find_best_driver`."""
+    items = []
+    for driver_id, lat, lon, load, rating, successful in rows:
+        distance = None
+        if pickup and lat is not None and lon is not None:
+            distance = geodesic((float(lat), float(lon)), pickup).km
+        items.append((
+            distance if distance is not None else float('inf'),
+            load,
+            -float(rating),
+            -int(successful),
+            driver_id,
+        ))
+    items.sort(key=lambda t: t[:4])
+    return [t[4] for t in items]
+
+
+class HaversineTests(SimpleTestCase):
+    def test_matches_geodesic_within_one_percent(self):
+        target = (5.2850, -3.9875)
+        dist = haversine_km([target[0]], [target[1]], *PICKUP)[0]
+        self.assertAlmostEqual(dist, geodesic(PICKUP, target).km, delta=geodesic(PICKUP, target).km * 0.01)
+
+
+class DriverRankingEngineTests(SimpleTestCase):
+    def test_empty(self):
+        engine = DriverRankingEngine.from_rows([])
+        self.assertEqual(engine.top_k(PICKUP, k=3), [])
+
+    def test_unknown_position_ranked_last(self):
+        rows = [
+            ('no-gps', None, None, 0, 5.0, 100),
+            ('far', 5.40, -4.05, 0, 4.0, 0),
+        ]
+        ranked = DriverRankingEngine.from_rows(rows).top_k(PICKUP, k=2)
+        self.assertEqual([r[0] for r in ranked], ['far', 'no-gps'])
+        self.assertIsNone(ranked[1][1])
+
+    def test_tie_break_load_rating_experience(self):
+        rows = [
+            ('busy', 5.36, -4.00, 2, 5.0, 50),
+            ('low-rating', 5.36, -4.00, 0, 3.5, 50),
+            ('junior', 5.36, -4.00, 0, 4.5, 1),
+            ('best', 5.36, -4.00, 0, 4.5, 30),
+        ]
+        ranked = DriverRankingEngine.from_rows(rows).top_k(PICKUP, k=4)
+        self.assertEqual([r[0] for r in ranked], ['best', 'junior', 'low-rating', 'busy'])
+
+    def test_ties_at_partition_boundary_keep_secondary_order(self):
+        rows = [('d%d' % i, 5.36, -4.00, 0, 4.0, i) for i in range(10)]
+        ranked = DriverRankingEngine.from_rows(rows).top_k(PICKUP, k=1)
+        self.assertEqual(ranked[0][0], 'd9')
+
+    def test_no_pickup_coords_falls_back_to_secondary_criteria(self):
+        rows = [
+            ('a', 5.30, -4.00, 1, 5.0, 10),
+            ('b', 5.40, -4.00, 0, 4.0, 10),
+        ]
+        ranked = DriverRankingEngine.from_rows(rows).top_k(None, k=1)
+        self.assertEqual(ranked[0], ('b', None))
+
+    def test_same_order_as_legacy_loop(self):
+        rng = random.Random(42)
+        rows = []
+        for i in range(300):
+            has_gps = rng.random() > 0.1
+            rows.append((
+                i,
+                rng.uniform(5.15, 5.45) if has_gps else None,
+                rng.uniform(-4.10, -3.70) if has_gps else None,
+                rng.randint(0, 3),
+                round(rng.uniform(3.0, 5.0), 1),
+                rng.randint(0, 200),
+            ))
+        legacy = _legacy_order(rows, PICKUP)
+        ranked = DriverRankingEngine.from_rows(rows).top_k(PICKUP, k=20)
+        self.assertEqual([r[0] for r in ranked], legacy[:20])
+
+
+class FindBestDriverGeoIndexTests(TestCase):
+    def _driver(self, number, lat):
+        user = User.objects.create_user(
+            email=f'driver{number}@example.com', phone=f'020000000{number}', password='testpass', user_type='driver'
+        )
+        Driver.objects.filter(pk=user.driver_profile.pk).update(
+            verification_status='verified', is_available=True, vehicle_capacity_kg=Decimal('30'),
+            current_latitude=Decimal(str(lat)), current_longitude=Decimal('-4.0083'),
+        )
+        return Driver.objects.get(pk=user.driver_profile.pk)
+
+    def test_process_local_index_does_not_restrict_candidates(self):
+        nearest, other = self._driver(1, 5.3600), self._driver(2, 5.3900)
+        delivery = SimpleNamespace(
+            package_weight_kg=Decimal('2'), required_vehicle_type=None, delivery_commune='Plateau',
+            get_coords=lambda which: PICKUP,
+        )
+        # Index en mémoire de ce process : seul `other` y figure (position reçue ici, à tort au point d'enlèvement)
+        local_index = DriverGeoIndex()
+        local_index._backend = _GridBackend()
+        local_index.update_driver(other, latitude=PICKUP[0], longitude=PICKUP[1])
+
+        with patch('apps.deliveries.services.driver_geo_index', local_index):
+            best = DeliveryAssignmentService()._find_best_driver(delivery)
+
+        self.assertEqual(best, nearest)
@@ -0,0 +1,161 @@
+"""
+Tests de l'optimiseur de flotte (apps/deliveries/vrp.py et RouteOptimizationService.optimize_fleet).
+"""
+import importlib.util
+import unittest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from apps.deliveries.models import Delivery
+from apps.deliveries.services import RouteOptimizationService
+from apps.drivers.models import Driver
+
+User = get_user_model()
+
+HAS_ORTOOLS = importlib.util.find_spec('ortools') is not None
+
+
+def _vehicle(vehicle_id, lat, lon, capacity=30, vehicle_type='moto'):
+    return {'id': vehicle_id, 'latitude': lat, 'longitude': lon,
+            'capacity_kg': capacity, 'vehicle_type': vehicle_type}
+
+
+def _order(order_id, pickup, dropoff, weight=2, **extra):
+    return {'id': order_id, 'pickup': pickup, 'dropoff': dropoff, 'weight_kg': weight, **extra}
+
+
+def _solve(vehicles, orders, **kwargs):
+    from apps.deliveries.vrp import solve_pickup_delivery
+    return solve_pickup_delivery(vehicles, orders, time_limit_seconds=1, use_api=False, **kwargs)
+
+
+@unittest.skipUnless(HAS_ORTOOLS, 'ortools non installé')
+class PickupDeliverySolverTests(SimpleTestCase):
+    def test_pickup_before_delivery_on_same_vehicle(self):
+        vehicles = [_vehicle('v1', 5.36, -4.01), _vehicle('v2', 5.30, -3.98)]
+        orders = [
+            _order(f'o{i}', (5.30 + i * 0.01, -4.00), (5.35, -3.97 - i * 0.01))
+            for i in range(6)
+        ]
+        result = _solve(vehicles, orders)
+
+        self.assertEqual(result['status'], 'solved')
+        self.assertEqual(result['unassigned'], [])
+        for route in result['routes']:
+            picked = set()
+            for stop in route['stops']:
+                if stop['type'] == 'pickup':
+                    picked.add(stop['order_id'])
+                else:
+                    self.assertIn(stop['order_id'], picked)
+            delivered = {s['order_id'] for s in route['stops'] if s['type'] == 'delivery'}
+            self.assertEqual(picked, delivered)
+
+    def test_capacity_respected(self):
+        vehicles = [_vehicle('small', 5.36, -4.01, capacity=10), _vehicle('van', 5.36, -4.01, capacity=150)]
+        orders = [_order('heavy', (5.35, -4.00), (5.33, -3.99), weight=40),
+                  _order('light', (5.35, -4.00), (5.33, -3.99), weight=3)]
+        result = _solve(vehicles, orders)
+
+        owner = {s['order_id']: r['vehicle_id'] for r in result['routes'] for s in r['stops']}
+        self.assertEqual(owner['heavy'], 'van')
+        for route in result['routes']:
+            capacity = next(v['capacity_kg'] for v in vehicles if v['id'] == route['vehicle_id'])
+            self.assertTrue(all(s['load_kg'] <= capacity for s in route['stops']))
+
+    def test_oversized_order_left_unassigned(self):
+        vehicles = [_vehicle('v1', 5.36, -4.01, capacity=30)]
+        orders = [_order('too-heavy', (5.35, -4.00), (5.33, -3.99), weight=80),
+                  _order('ok', (5.35, -4.00), (5.33, -3.99), weight=5)]
+        result = _solve(vehicles, orders)
+        self.assertEqual(result['unassigned'], ['too-heavy'])
+
+    def test_pickup_time_window(self):
+        vehicles = [_vehicle('v1', 5.36, -4.01)]
+        orders = [_order('later', (5.36, -4.00), (5.35, -3.99), ready_min=60, due_min=90),
+                  _order('now', (5.36, -4.00), (5.35, -3.99))]
+        result = _solve(vehicles, orders)
+
+        pickup_eta = {s['order_id']: s['eta_min'] for r in result['routes']
+                      for s in r['stops'] if s['type'] == 'pickup'}
+        self.assertGreaterEqual(pickup_eta['later'], 60)
+        self.assertLessEqual(pickup_eta['later'], 90)
+
+    def test_required_vehicle_type(self):
+        vehicles = [_vehicle('moto', 5.36, -4.01), _vehicle('car', 5.20, -3.90, vehicle_type='voiture')]
+        orders = [_order('needs-car', (5.36, -4.00), (5.35, -3.99), required_vehicle_type='voiture'),
+                  _order('needs-truck', (5.36, -4.00), (5.35, -3.99), required_vehicle_type='camionnette')]
+        result = _solve(vehicles, orders)
+
+        owner = {s['order_id']: r['vehicle_id'] for r in result['routes'] for s in r['stops']}
+        self.assertEqual(owner['needs-car'], 'car')
+        self.assertEqual(result['unassigned'], ['needs-truck'])
+
+    def test_empty_fleet(self):
+        result = _solve([], [_order('o1', (5.36, -4.00), (5.35, -3.99))])
+        self.assertEqual(result['status'], 'empty')
+        self.assertEqual(result['unassigned'], ['o1'])
+
+
+@unittest.skipUnless(HAS_ORTOOLS, 'ortools non installé')
+class OptimizeFleetTestCase(TestCase):
+    def setUp(self):
+        self.drivers = []
+        for index, (lat, lon) in enumerate([(Decimal('5.36'), Decimal('-4.01')), (Decimal('5.30'), Decimal('-3.98'))]):
+            user = User.objects.create_user(
+                email=f'fleet{index}@test.com',
+                phone=f'+2250700100{index:03d}',
+                password='test123',
+                user_type='driver',
+                first_name='Fleet',
+                last_name=str(index)
+            )
+            driver = Driver.objects.get(user=user)
+            driver.verification_status = 'verified'
+            driver.is_available = True
+            driver.current_latitude = lat
+            driver.current_longitude = lon
+            driver.save()
+            self.drivers.append(driver)
+
+        self.deliveries = [
+            Delivery.objects.create(
+                pickup_commune='COCODY',
+                delivery_commune='PLATEAU',
+                pickup_latitude=Decimal('5.35') - Decimal(i) / 100,
+                pickup_longitude=Decimal('-4.00'),
+                delivery_latitude=Decimal('5.32'),
+                delivery_longitude=Decimal('-4.02') + Decimal(i) / 100,
+                recipient_name='Client',
+                recipient_phone='+2250100000000',
+                package_weight_kg=Decimal('2.0'),
+                payment_method='prepaid',
+                calculated_price=Decimal('1500'),
+            )
+            for i in range(3)
+        ]
+
+    def test_plan_without_apply(self):
+        result = RouteOptimizationService().optimize_fleet(time_limit_seconds=1)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['total_deliveries'], 3)
+        self.assertEqual(result['unassigned'], [])
+        self.assertFalse(Delivery.objects.filter(driver__isnull=False).exists())
+
+    def test_apply_assigns_deliveries(self):
+        result = RouteOptimizationService().optimize_fleet(time_limit_seconds=1, apply=True)
+
+        self.assertTrue(result['applied'])
+        for delivery in self.deliveries:
+            delivery.refresh_from_db()
+            self.assertEqual(delivery.status, 'assigned')
+            self.assertIn(delivery.driver_id, [d.id for d in self.drivers])
+
+    def test_missing_coordinates_are_skipped(self):
+        Delivery.objects.filter(pk=self.deliveries[0].pk).update(delivery_latitude=None)
+        result = RouteOptimizationService().optimize_fleet(time_limit_seconds=1)
+        self.assertEqual(result['skipped'], [str(self.deliveries[0].pk)])
+        self.assertEqual(result['total_deliveries'], 2)
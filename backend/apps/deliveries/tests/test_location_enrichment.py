@@ -0,0 +1,121 @@
+"""
+Tests de l'enrichissement asynchrone des adresses de livraison
+(signaux pre_save / post_save et tâche `deliveries.enrich_delivery_location`).
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+import requests
+from django.test import TestCase
+
+from apps.core.location_service import LocationService
+from apps.deliveries.models import Delivery
+from apps.deliveries.tasks import enrich_delivery_location
+from apps.pricing.models import PricingZone
+from apps.pricing.zone_index import zone_index
+
+
+@patch.object(LocationService, 'ORS_API_KEY', '')
+class LocationEnrichmentTestCase(TestCase):
+    def setUp(self):
+        zone_index.invalidate()
+        PricingZone.objects.create(zone_name='Zone Cocody', commune='Cocody', is_active=True,
+                                   default_latitude=Decimal('5.3599517'), default_longitude=Decimal('-3.9615917'))
+        PricingZone.objects.create(zone_name='Zone Plateau', commune='Plateau', is_active=True,
+                                   default_latitude=Decimal('5.3238'), default_longitude=Decimal('-4.0213'))
+
+    def _create(self, **extra):
+        data = dict(
+            pickup_commune='Cocody',
+            delivery_commune='Plateau',
+            delivery_address='Rue du Commerce',
+            recipient_name='Client',
+            recipient_phone='+2250100000000',
+            package_weight_kg=Decimal('2.0'),
+            payment_method='prepaid',
+            calculated_price=Decimal('1500'),
+        )
+        data.update(extra)
+        return Delivery.objects.create(**data)
+
+    @patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+    @patch.object(LocationService, 'geocode_address')
+    def test_create_uses_local_coordinates_and_defers_geocoding(self, geocode, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery = self._create()
+
+        geocode.assert_not_called()
+        self.assertEqual(delivery.get_coords('pickup'), (5.3599517, -3.9615917))
+        self.assertEqual(delivery.get_coords('delivery'), (5.3238, -4.0213))
+        delay.assert_called_once_with(str(delivery.pk), ['pickup', 'delivery'])
+
+    @patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+    @patch.object(LocationService, 'geocode_address')
+    def test_status_transitions_do_not_enrich(self, geocode, delay):
+        delivery = self._create()
+        delay.reset_mock()
+
+        delivery = Delivery.objects.get(pk=delivery.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.status = 'in_progress'
+            delivery.save(update_fields=['status'])
+            delivery.delivery_notes = 'Sonner deux fois'
+            delivery.save()
+
+        geocode.assert_not_called()
+        delay.assert_not_called()
+
+    @patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+    def test_address_change_schedules_enrichment(self, delay):
+        delivery = self._create(delivery_latitude=Decimal('5.30'), delivery_longitude=Decimal('-4.00'))
+        delay.reset_mock()
+
+        delivery.delivery_commune = 'Cocody'
+        delivery.delivery_latitude = None
+        delivery.delivery_longitude = None
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.save()
+
+        self.assertEqual(delivery.get_coords('delivery'), (5.3599517, -3.9615917))
+        delay.assert_called_once_with(str(delivery.pk), ['delivery'])
+
+    def test_task_writes_geocoded_coordinates_and_distance(self):
+        with patch('apps.deliveries.tasks.enrich_delivery_location.delay'):
+            delivery = self._create()
+
+        with patch.object(LocationService, 'geocode_address', return_value=(5.3301, -4.0198)) as geocode:
+            result = enrich_delivery_location(str(delivery.pk), ['pickup', 'delivery'])
+            # Deuxième exécution : coordonnées déjà précises, aucun appel
+            enrich_delivery_location(str(delivery.pk), ['pickup', 'delivery'])
+
+        # Le ramassage n'a pas d'adresse détaillée : centroïde conservé
+        geocode.assert_called_once_with('Rue du Commerce, Plateau', raise_errors=True)
+        self.assertEqual(result['geocoded'], ['delivery'])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.get_coords('delivery'), (5.3301, -4.0198))
+        self.assertIsNotNone(delivery.distance_km)
+        self.assertEqual(delivery.distance_source, 'fallback_straight_line')
+
+    def test_task_never_overwrites_precise_coordinates(self):
+        with patch('apps.deliveries.tasks.enrich_delivery_location.delay'):
+            delivery = self._create(delivery_latitude=Decimal('5.31'), delivery_longitude=Decimal('-4.01'))
+
+        with patch.object(LocationService, 'geocode_address', return_value=(5.3301, -4.0198)) as geocode:
+            result = enrich_delivery_location(str(delivery.pk), ['delivery'])
+
+        geocode.assert_not_called()
+        self.assertEqual(result['geocoded'], [])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.get_coords('delivery'), (5.31, -4.01))
+
+    def test_task_retries_on_geocoder_errors(self):
+        with patch('apps.deliveries.tasks.enrich_delivery_location.delay'):
+            delivery = self._create()
+
+        with patch.object(LocationService, 'geocode_address', side_effect=requests.ConnectionError('down')) as geocode:
+            result = enrich_delivery_location.apply(args=(str(delivery.pk), ['delivery']))
+
+        self.assertTrue(result.failed())
+        self.assertEqual(geocode.call_count, enrich_delivery_location.max_retries + 1)
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.get_coords('delivery'), (5.3238, -4.0213))
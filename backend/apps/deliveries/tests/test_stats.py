@@ -0,0 +1,236 @@
+"""
+Tests des statistiques « mes statistiques » (deliveries/stats.py) :
+une requête d'agrégats par modèle, cache par périmètre et invalidation.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import User
+from apps.deliveries import stats
+from apps.deliveries.models import Delivery
+from apps.deliveries.services import compute_delivery_stats
+from apps.payments.models import DriverEarning, Invoice
+
+
+@patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+class UserStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        merchant_user = User.objects.create_user(
+            email='shop@example.com', phone='0100000000', password='testpass', user_type='merchant'
+        )
+        self.merchant = merchant_user.merchant_profile
+        driver_user = User.objects.create_user(
+            email='driver@example.com', phone='0200000000', password='testpass', user_type='driver'
+        )
+        self.driver = driver_user.driver_profile
+
+    def _create(self, **extra):
+        data = dict(
+            merchant=self.merchant,
+            driver=self.driver,
+            pickup_commune='Cocody',
+            delivery_commune='Plateau',
+            delivery_address='Rue du Commerce',
+            recipient_name='Client',
+            recipient_phone='+2250100000000',
+            package_weight_kg=Decimal('2.0'),
+            payment_method='cash',
+            calculated_price=Decimal('1500'),
+        )
+        data.update(extra)
+        return Delivery.objects.create(**data)
+
+    def _earning(self, delivery, amount, status='pending'):
+        return DriverEarning.objects.create(
+            driver=self.driver, delivery=delivery, total_earning=Decimal(amount), status=status
+        )
+
+    def test_delivery_stats_in_one_query_per_model(self, delay):
+        self._create(status='delivered', delivered_at=timezone.now())
+        self._create(status='in_progress')
+        self._create(status='pending')
+        old = self._create(status='delivered', delivered_at=timezone.now() - timedelta(days=40))
+        Delivery.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=45))
+        today = timezone.now().date()
+        for number, (status, amount) in enumerate([('paid', '5000'), ('sent', '2000'), ('draft', '100')]):
+            Invoice.objects.create(
+                invoice_number=f'INV-{number}', merchant=self.merchant, period_start=today,
+                period_end=today, due_date=today, status=status, total_amount=Decimal(amount)
+            )
+
+        with self.assertNumQueries(2):
+            result = compute_delivery_stats(
+                Delivery.objects.filter(merchant=self.merchant), period_days=30, merchant=self.merchant
+            )
+
+        self.assertEqual(result['deliveries'], {
+            'total_all_time': 4, 'period_total': 3, 'delivered': 1,
+            'in_progress': 1, 'pending': 1, 'cancelled': 0, 'success_rate': 100.0,
+        })
+        self.assertEqual(result['revenue']['total_revenue'], Decimal('3000'))
+        self.assertEqual(result['revenue']['period_revenue'], Decimal('1500'))
+        self.assertEqual(result['invoices'], {'total': 3, 'paid': 1, 'pending': 1})
+        self.assertEqual(result['revenue']['pending_payment'], Decimal('2000'))
+
+    def test_driver_endpoints_query_counts(self, delay):
+        first = self._create(status='delivered', delivered_at=timezone.now())
+        second = self._create(status='delivered', delivered_at=timezone.now(), payment_method='wave')
+        third = self._create(status='delivered', delivered_at=timezone.now())
+        self._earning(first, '1000', 'paid')
+        self._earning(second, '700')
+        old = self._earning(third, '300', 'approved')
+        DriverEarning.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=10))
+
+        with self.assertNumQueries(2):
+            counts = stats.driver_stats(self.driver, timezone.now() - timedelta(days=30))
+        self.assertEqual(counts['deliveries']['delivered'], 3)
+        self.assertEqual(counts['earnings']['total_earned'], Decimal('2000'))
+
+        with self.assertNumQueries(1):
+            earnings = stats.driver_earnings(self.driver, 30)
+        self.assertEqual(earnings['summary'], {
+            'total_earned': Decimal('2000'), 'pending': Decimal('700'),
+            'approved': Decimal('300'), 'paid': Decimal('1000'),
+        })
+        # Le gain d'il y a 10 jours est hors du détail journalier (7 jours)
+        self.assertEqual(sum(total for _, total in earnings['daily']), Decimal('1700'))
+
+        with self.assertNumQueries(1):
+            totals = stats.payment_stats(self.driver)
+        self.assertEqual((totals['lifetime_earnings'], totals['lifetime_count']), (Decimal('2000'), 3))
+        self.assertEqual(totals['payment_methods']['cash'], 2)
+        self.assertEqual(totals['payment_methods']['wave'], 1)
+
+    def test_payment_stats_month_boundaries(self, delay):
+        earning = self._earning(self._create(), '500')
+        now = timezone.make_aware(datetime(2026, 1, 15, 12))
+        DriverEarning.objects.filter(pk=earning.pk).update(created_at=timezone.make_aware(datetime(2025, 12, 31, 23)))
+
+        totals = stats.payment_stats(self.driver, now=now)
+
+        self.assertEqual((totals['month_count'], totals['last_month_count']), (0, 1))
+        self.assertEqual(totals['last_month_earnings'], Decimal('500'))
+
+    def test_cache_hit_and_invalidation(self, delay):
+        scope = ('driver', self.driver.pk)
+
+        def compute():
+            return stats.driver_stats(self.driver, timezone.now() - timedelta(days=30))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery = self._create()
+        self.assertEqual(stats.cached_stats(scope, 'my_stats', (30,), compute)['deliveries']['pending'], 1)
+        with self.assertNumQueries(0):
+            stats.cached_stats(scope, 'my_stats', (30,), compute)
+
+        # Modification d'une livraison du livreur : périmée au commit seulement
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.status = 'in_progress'
+            delivery.save()
+            with self.assertNumQueries(0):
+                stats.cached_stats(scope, 'my_stats', (30,), compute)
+        counts = stats.cached_stats(scope, 'my_stats', (30,), compute)
+        self.assertEqual((counts['deliveries']['pending'], counts['deliveries']['in_progress']), (0, 1))
+
+        # Nouveau gain
+        with self.captureOnCommitCallbacks(execute=True):
+            self._earning(delivery, '800')
+        counts = stats.cached_stats(scope, 'my_stats', (30,), compute)
+        self.assertEqual(counts['earnings']['pending'], Decimal('800'))
+
+    def test_reassignment_invalidates_the_previous_driver(self, delay):
+        other_user = User.objects.create_user(
+            email='other@example.com', phone='0300000000', password='testpass', user_type='driver'
+        )
+        other = other_user.driver_profile
+        delivery = self._create()
+        scope = ('driver', self.driver.pk)
+
+        def compute():
+            return stats.delivery_counts(Delivery.objects.filter(driver=self.driver), timezone.now())
+
+        self.assertEqual(stats.cached_stats(scope, 'counts', (), compute)['total_all_time'], 1)
+        delivery = Delivery.objects.get(pk=delivery.pk)
+        delivery.driver = other
+        with self.captureOnCommitCallbacks(execute=True):
+            delivery.save()
+
+        self.assertEqual(stats.cached_stats(scope, 'counts', (), compute)['total_all_time'], 0)
+
+
+@patch('apps.deliveries.tasks.enrich_delivery_location.delay')
+class StatsEndpointQueryTests(TestCase):
+    """Cache vide : profil (avec factures / gains) + compteurs, deux requêtes par écran"""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.merchant_user = User.objects.create_user(
+            email='shop@example.com', phone='0100000000', password='testpass', user_type='merchant'
+        )
+        self.driver_user = User.objects.create_user(
+            email='driver@example.com', phone='0200000000', password='testpass', user_type='driver'
+        )
+        merchant, driver = self.merchant_user.merchant_profile, self.driver_user.driver_profile
+        today = timezone.now().date()
+        Invoice.objects.create(
+            invoice_number='INV-1', merchant=merchant, period_start=today, period_end=today,
+            due_date=today, status='sent', total_amount=Decimal('2000')
+        )
+        delivery = Delivery.objects.create(
+            merchant=merchant, driver=driver, status='delivered', delivered_at=timezone.now(),
+            pickup_commune='Cocody', delivery_commune='Plateau', delivery_address='Rue du Commerce',
+            recipient_name='Client', recipient_phone='+2250100000000', package_weight_kg=Decimal('2.0'),
+            payment_method='cash', calculated_price=Decimal('1500'),
+        )
+        DriverEarning.objects.create(driver=driver, delivery=delivery, total_earning=Decimal('900'), status='approved')
+
+    def _get(self, viewset, action, user, path):
+        request = self.factory.get(path, {'period': 30})
+        force_authenticate(request, user=user)
+        with self.assertNumQueries(2):
+            response = viewset.as_view({'get': action})(request)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_delivery_my_stats_for_a_merchant(self, delay):
+        from apps.deliveries.views import DeliveryViewSet
+
+        data = self._get(DeliveryViewSet, 'my_stats', self.merchant_user, '/api/v1/deliveries/my-stats/')
+        self.assertEqual(data['merchant']['id'], str(self.merchant_user.merchant_profile.pk))
+        self.assertEqual(data['revenue']['pending_payment'], Decimal('2000'))
+        self.assertEqual(data['invoices'], {'total': 1, 'paid': 0, 'pending': 1})
+
+    def test_merchant_my_stats(self, delay):
+        from apps.merchants.views import MerchantViewSet
+
+        data = self._get(MerchantViewSet, 'my_stats', self.merchant_user, '/api/v1/merchants/my-stats/')
+        self.assertEqual(Decimal(data['revenue']['total_billed']), Decimal('2000'))
+        self.assertEqual(data['invoices']['pending'], 1)
+
+    def test_driver_my_stats(self, delay):
+        from apps.drivers.views import DriverViewSet
+
+        data = self._get(DriverViewSet, 'my_stats', self.driver_user, '/api/v1/drivers/my-stats/')
+        self.assertEqual(data['deliveries']['delivered'], 1)
+        self.assertEqual(Decimal(data['earnings']['total_earned']), Decimal('900'))
+        self.assertEqual(Decimal(data['earnings']['approved']), Decimal('900'))
+
+    def test_driver_my_earnings(self, delay):
+        from apps.drivers.views import DriverViewSet
+
+        data = self._get(DriverViewSet, 'my_earnings', self.driver_user, '/api/v1/drivers/me/earnings/')
+        self.assertEqual(Decimal(data['summary']['approved']), Decimal('900'))
+
+    def test_payment_stats(self, delay):
+        from apps.payments.views import PaymentViewSet
+
+        data = self._get(PaymentViewSet, 'stats', self.driver_user, '/api/v1/payments/stats/')
+        self.assertEqual(data['lifetime']['total_payments'], 1)
@@ -0,0 +1,107 @@
+"""
+Tests de `RouteOptimizationService.suggest_delivery_assignment` :
+nombre de requêtes constant et scores identiques au calcul livreur par livreur.
+"""
+
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.deliveries.models import Delivery
+from apps.deliveries.services import RouteOptimizationService
+from apps.drivers.models import Driver, DriverZone
+
+User = get_user_model()
+
+
+class SuggestDeliveryAssignmentTestCase(TestCase):
+    """Suggestions de livreurs sans requêtes N+1"""
+
+    def _make_driver(self, index, with_history=True):
+        user = User.objects.create_user(
+            email=f'suggest{index}@test.com',
+            phone=f'+2250700000{index:03d}',
+            password='test123',
+            user_type='driver',
+            first_name='Driver',
+            last_name=str(index)
+        )
+        driver = Driver.objects.get(user=user)
+        driver.is_available = True
+        driver.verification_status = 'verified'
+        driver.rating = Decimal('4.50') if index % 2 else Decimal('3.80')
+        driver.save()
+        DriverZone.objects.create(driver=driver, commune='Cocody')
+
+        if with_history:
+            statuses = ['delivered', 'delivered', 'cancelled', 'assigned']
+            if index % 2:
+                statuses.append('picked_up')
+            for status in statuses:
+                self._make_delivery(
+                    driver=driver,
+                    status=status,
+                    pickup_latitude=Decimal('5.3500') + Decimal(index) / 100,
+                    pickup_longitude=Decimal('-4.0000'),
+                )
+        return driver
+
+    def _make_delivery(self, **kwargs):
+        fields = {
+            'pickup_commune': 'COCODY',
+            'delivery_commune': 'PLATEAU',
+            'recipient_name': 'Client',
+            'recipient_phone': '+2250100000000',
+            'package_weight_kg': Decimal('2.0'),
+            'payment_method': 'prepaid',
+            'calculated_price': Decimal('1500'),
+        }
+        fields.update(kwargs)
+        return Delivery.objects.create(**fields)
+
+    def _target_delivery(self):
+        return self._make_delivery(
+            pickup_latitude=Decimal('5.3600'),
+            pickup_longitude=Decimal('-4.0083'),
+        )
+
+    def test_query_count_does_not_grow_with_drivers(self):
+        """Le nombre de requêtes ne dépend pas du nombre de livreurs candidats"""
+        self._make_driver(0)
+        delivery = self._target_delivery()
+        service = RouteOptimizationService()
+
+        with self.assertNumQueries(2):
+            result = service.suggest_delivery_assignment(delivery.id)
+        self.assertEqual(len(result['suggestions']), 1)
+
+        for index in range(1, 6):
+            self._make_driver(index, with_history=index != 3)
+
+        with self.assertNumQueries(2):
+            result = service.suggest_delivery_assignment(delivery.id)
+        self.assertEqual(len(result['suggestions']), 6)
+
+    def test_scores_match_per_driver_computation(self):
+        """Les valeurs annotées donnent exactement les mêmes scores qu'avant"""
+        for index in range(4):
+            self._make_driver(index, with_history=index != 2)
+        delivery = self._target_delivery()
+        service = RouteOptimizationService()
+
+        annotated = service._annotate_for_scoring(
+            Driver.objects.filter(zones__commune='COCODY').distinct()
+        )
+        for driver in annotated:
+            plain = Driver.objects.get(pk=driver.pk)
+            self.assertEqual(
+                service._calculate_driver_score(driver, delivery),
+                service._calculate_driver_score(plain, delivery),
+            )
+
+    def test_no_driver_in_zone(self):
+        delivery = self._target_delivery()
+        result = RouteOptimizationService().suggest_delivery_assignment(delivery.id)
+        self.assertFalse(result['success'])
+        self.assertEqual(result['suggestions'], [])
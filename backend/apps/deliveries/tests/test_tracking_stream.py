@@ -0,0 +1,181 @@
+"""
+Tests du suivi temps réel des livraisons (apps/deliveries/tracking_stream.py)
+"""
+import asyncio
+import json
+from decimal import Decimal
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.test import TransactionTestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.authentication.models import User
+from apps.core.tests.utils import REDIS_URL, redis_available
+from apps.deliveries.models import Delivery
+from apps.deliveries.tracking_stream import (
+    TrackingStreamApp, delivery_channel, driver_channel, load_snapshot, publish_driver_position, tracking_hub,
+)
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.merchants.models import Merchant
+
+
+async def unused_app(scope, receive, send):
+    raise AssertionError('La requête aurait dû être servie par le flux de suivi')
+
+
+class StreamClient:
+    """Client ASGI minimal : lit les événements SSE d'un flux"""
+
+    def __init__(self, path, token=None):
+        headers = [(b'authorization', f'Bearer {token}'.encode())] if token else []
+        self.scope = {'type': 'http', 'method': 'GET', 'path': path, 'headers': headers}
+        self.incoming = asyncio.Queue()
+        self.outgoing = asyncio.Queue()
+        self.buffer = ''
+        self.status = None
+        self.closed = False
+
+    async def open(self):
+        self.task = asyncio.ensure_future(
+            TrackingStreamApp(unused_app)(self.scope, self.incoming.get, self.outgoing.put)
+        )
+        start = await asyncio.wait_for(self.outgoing.get(), 2)
+        self.status = start['status']
+        return self
+
+    async def next_event(self, timeout=2):
+        while '\n\n' not in self.buffer:
+            message = await asyncio.wait_for(self.outgoing.get(), timeout)
+            self.buffer += message['body'].decode()
+            self.closed = not message.get('more_body', False)
+        block, self.buffer = self.buffer.split('\n\n', 1)
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if ': ' in line)
+        if 'event' not in fields:
+            return await self.next_event(timeout)
+        return fields['event'], json.loads(fields['data'])
+
+    async def disconnect(self):
+        await self.incoming.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 2)
+
+
+class TrackingStreamTestCase(TransactionTestCase):
+    # Le flux ferme les connexions périmées comme une requête : pas de
+    # transaction de test englobante possible
+    def setUp(self):
+        self.merchant_user = User.objects.create_user(
+            email='stream-merchant@test.com', phone='+2250700500001', password='pw',
+            user_type='merchant', first_name='Stream', last_name='Merchant'
+        )
+        merchant, _ = Merchant.objects.get_or_create(user=self.merchant_user, defaults={'business_name': 'Stream Shop'})
+        self.driver_user = User.objects.create_user(
+            email='stream-driver@test.com', phone='+2250700500002', password='pw',
+            user_type='driver', first_name='Stream', last_name='Driver'
+        )
+        self.driver = self.driver_user.driver_profile
+        self.delivery = Delivery.objects.create(
+            merchant=merchant,
+            driver=self.driver,
+            pickup_commune='Cocody',
+            pickup_latitude=Decimal('5.36000000'),
+            pickup_longitude=Decimal('-3.98000000'),
+            delivery_address='Rue 12',
+            delivery_commune='Plateau',
+            delivery_latitude=Decimal('5.32000000'),
+            delivery_longitude=Decimal('-4.02000000'),
+            package_weight_kg=1.0,
+            calculated_price=1000,
+            payment_method='prepaid',
+            recipient_name='Client',
+            recipient_phone='0780000000',
+            status='assigned',
+        )
+        self.path = f'/api/v1/deliveries/{self.delivery.id}/stream/'
+        self.token = str(AccessToken.for_user(self.merchant_user))
+
+    def _ping(self, latitude, longitude):
+        GPSTrackingService.update_driver_location(
+            self.driver, Decimal(latitude), Decimal(longitude), speed=6.0
+        )
+
+    def _set_status(self, status):
+        self.delivery.status = status
+        self.delivery.save(update_fields=['status'])
+
+    async def test_requires_access_to_the_delivery(self):
+        self.assertEqual((await StreamClient(self.path).open()).status, 401)
+
+        stranger = await sync_to_async(User.objects.create_user)(
+            email='stranger@test.com', phone='+2250700500003', password='pw',
+            user_type='merchant', first_name='Other', last_name='Merchant'
+        )
+        client = await StreamClient(self.path, str(AccessToken.for_user(stranger))).open()
+        self.assertEqual(client.status, 404)
+
+    async def test_pushes_positions_and_status_until_delivered(self):
+        client = await StreamClient(self.path, self.token).open()
+        self.assertEqual(client.status, 200)
+
+        event, snapshot = await client.next_event()
+        self.assertEqual((event, snapshot['status']), ('snapshot', 'assigned'))
+
+        await sync_to_async(self._ping)('5.35000000', '-3.99000000')
+        event, position = await client.next_event()
+        self.assertEqual((event, position['target']), ('position', 'pickup'))
+        self.assertEqual(position['latitude'], 5.35)
+        self.assertGreater(position['eta_min'], 0)
+
+        await sync_to_async(self._set_status)('in_progress')
+        event, status = await client.next_event()
+        self.assertEqual((event, status['status']), ('status', 'in_progress'))
+
+        await sync_to_async(self._ping)('5.33000000', '-4.01000000')
+        event, position = await client.next_event()
+        self.assertEqual(position['target'], 'delivery')
+
+        await sync_to_async(self._set_status)('delivered')
+        event, status = await client.next_event()
+        self.assertEqual(status['status'], 'delivered')
+        await asyncio.wait_for(client.task, 2)
+        self.assertTrue(client.closed)
+        self.assertEqual(tracking_hub.connections, 0)
+
+    async def test_transition_during_snapshot_load_is_not_lost(self):
+        def load_then_transition(user, delivery_id):
+            loaded = load_snapshot(user, delivery_id)
+            self._set_status('in_progress')
+            return loaded
+
+        with mock.patch('apps.deliveries.tracking_stream.load_snapshot', load_then_transition):
+            client = await StreamClient(self.path, self.token).open()
+
+        event, snapshot = await client.next_event()
+        self.assertEqual((event, snapshot['status']), ('snapshot', 'assigned'))
+        event, status = await client.next_event()
+        self.assertEqual((event, status['status']), ('status', 'in_progress'))
+        await client.disconnect()
+
+    async def test_subscribers_share_one_channel_subscription(self):
+        clients = [await StreamClient(self.path, self.token).open() for _ in range(3)]
+        for client in clients:
+            await client.next_event()
+
+        channel = driver_channel(self.driver.id)
+        self.assertEqual(len(tracking_hub._channels[channel]), 3)
+
+        await sync_to_async(publish_driver_position)(self.driver, 5.34, -4.0)
+        for client in clients:
+            event, position = await client.next_event()
+            self.assertEqual((event, position['longitude']), ('position', -4.0))
+
+        for client in clients:
+            await client.disconnect()
+        self.assertNotIn(channel, tracking_hub._channels)
+        self.assertNotIn(delivery_channel(self.delivery.id), tracking_hub._channels)
+
+
+@skipUnless(redis_available(), 'Redis requis pour la diffusion entre nœuds')
+@override_settings(CACHES={'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': REDIS_URL}})
+class RedisTrackingStreamTestCase(TrackingStreamTestCase):
+    """Mêmes scénarios, les publications passant par Redis pub/sub"""
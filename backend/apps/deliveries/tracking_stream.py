@@ -0,0 +1,536 @@
+"""
+Suivi temps réel des livraisons (Server-Sent Events sur ASGI)
+
+Remplace le polling des apps marchand / particulier sur le détail de la
+livraison et l'itinéraire : un abonnement par livraison reçoit en push
+- `snapshot` : état initial (statut, livreur, dernière position, ETA) ;
+- `position` : chaque ping GPS du livreur assigné, avec distance et ETA
+  jusqu'à la cible courante (collecte, puis destination après l'enlèvement) ;
+- `status` : chaque transition de statut ou changement de livreur.
+Le flux se termine après un statut final (livrée / annulée).
+
+    GET /api/v1/deliveries/<id>/stream/
+    Authorization: Bearer <access token>
+
+Diffusion :
+- les publications (pings, transitions) passent par Redis pub/sub quand le
+  projet a un Redis (apps/core/redis_connection.py), donc n'importe quel nœud
+  (gunicorn, uvicorn, worker Celery) peut publier et tous les nœuds servent
+  leurs abonnés ;
+- chaque nœud n'ouvre qu'UNE connexion Redis d'abonnement (TrackingHub) et
+  la répartit entre ses abonnés locaux : un canal Redis par livraison ou
+  livreur suivi, quel que soit le nombre d'abonnés ;
+- sans Redis (développement, tests), diffusion en mémoire dans le process.
+
+Le flux est servi par TrackingStreamApp, monté devant Django dans
+config/asgi.py (détection de la déconnexion du client, pas de thread par
+connexion).
+"""
+import asyncio
+import json
+import logging
+import re
+import uuid
+from typing import Dict, Set
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.core.location_service import LocationService
+from apps.core.redis_connection import shared_redis, shared_redis_location
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = getattr(settings, 'TRACKING_STREAM_HEARTBEAT_SECONDS', 15)
+MAX_CONNECTIONS = getattr(settings, 'TRACKING_STREAM_MAX_CONNECTIONS', 5000)
+# Messages en attente par abonné : au-delà, les plus anciens sont abandonnés
+# (un client lent ne retient que les positions les plus récentes)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+# ETA : distance à vol d'oiseau x facteur de détour / vitesse moyenne urbaine
+ETA_SPEED_KMH = getattr(settings, 'TRACKING_ETA_SPEED_KMH', 20)
+ETA_ROAD_FACTOR = 1.3
+
+TERMINAL_STATUSES = {'delivered', 'cancelled'}
+# Avant l'enlèvement la cible est le point de collecte, ensuite la destination
+PICKUP_STATUSES = {'pending', 'assigned'}
+
+
+def delivery_channel(delivery_id):
+    return f'tracking:delivery:{delivery_id}'
+
+
+def driver_channel(driver_id):
+    return f'tracking:driver:{driver_id}'
+
+
+def _uses_redis():
+    return shared_redis_location() is not None
+
+
+# =============================================================================
+# PUBLICATION (code synchrone : vues, services, tâches Celery)
+# =============================================================================
+
+def publish(channel, event, data):
+    """Publie un événement sur un canal de suivi. Ne lève jamais d'exception."""
+    message = json.dumps({'event': event, 'data': data}, cls=DjangoJSONEncoder)
+    try:
+        connection = shared_redis()
+        if connection is not None:
+            connection.publish(channel, message)
+        else:
+            tracking_hub.dispatch_threadsafe(channel, message)
+    except Exception as e:
+        logger.warning(f"Suivi temps réel: publication impossible sur {channel}: {e}")
+
+
+def publish_driver_position(driver, latitude, longitude, speed=None, timestamp=None):
+    """Diffuse un ping GPS aux abonnés des livraisons du livreur"""
+    publish(driver_channel(driver.id), 'position', {
+        'driver_id': str(driver.id),
+        'latitude': float(latitude),
+        'longitude': float(longitude),
+        'speed': speed,
+        'timestamp': timestamp or timezone.now(),
+    })
+
+
+def status_payload(delivery):
+    return {
+        'delivery_id': str(delivery.pk),
+        'status': delivery.status,
+        'driver_id': str(delivery.driver_id) if delivery.driver_id else None,
+        'assigned_at': delivery.assigned_at,
+        'picked_up_at': delivery.picked_up_at,
+        'delivered_at': delivery.delivered_at,
+        'cancelled_at': delivery.cancelled_at,
+    }
+
+
+# =============================================================================
+# DIFFUSION LOCALE (un hub par process, boucle asyncio du serveur ASGI)
+# =============================================================================
+
+class _Subscription:
+    """File de messages d'un abonné, alimentée par le hub"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.channels: Set[str] = set()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, channel, message, shared):
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait((channel, message, shared))
+
+    async def get(self):
+        return await self.queue.get()
+
+    async def set_channels(self, channels):
+        await self.hub.update(self, set(channels))
+
+    async def close(self):
+        await self.hub.update(self, set())
+        self.hub.subscriptions.discard(self)
+
+
+class TrackingHub:
+    """
+    Répartit les messages de suivi entre les abonnés du process.
+
+    Une seule connexion Redis pub/sub par process : un canal n'est souscrit
+    qu'une fois, au premier abonné local, et désouscrit au départ du dernier.
+    """
+
+    def __init__(self):
+        self.subscriptions: Set[_Subscription] = set()
+        self._channels: Dict[str, Set[_Subscription]] = {}
+        self._loop = None
+        self._lock = None
+        self._pubsub = None
+        self._reader = None
+
+    @property
+    def connections(self):
+        return len(self.subscriptions)
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Nouvelle boucle (redémarrage, tests) : les objets de l'ancienne sont inutilisables
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._pubsub = None
+            self._reader = None
+            self._channels.clear()
+            self.subscriptions.clear()
+
+    async def subscribe(self, channels):
+        self._bind_loop()
+        subscription = _Subscription(self)
+        self.subscriptions.add(subscription)
+        await self.update(subscription, set(channels))
+        return subscription
+
+    async def update(self, subscription, channels):
+        """Aligne les canaux d'un abonné sur `channels`"""
+        async with self._lock:
+            for channel in subscription.channels - channels:
+                subscribers = self._channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._channels[channel]
+                    if self._pubsub is not None:
+                        await self._pubsub.unsubscribe(channel)
+            for channel in channels - subscription.channels:
+                if channel not in self._channels:
+                    self._channels[channel] = set()
+                    if _uses_redis():
+                        await self._redis_subscribe(channel)
+                self._channels[channel].add(subscription)
+            subscription.channels = set(channels)
+
+    async def _redis_subscribe(self, channel):
+        if self._pubsub is None:
+            import redis.asyncio as aioredis
+
+            url, options = shared_redis_location()
+            client = aioredis.from_url(url, **options)
+            self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.ensure_future(self._read_redis())
+
+    async def _read_redis(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Suivi temps réel: lecture Redis impossible ({e}), nouvel essai")
+                await asyncio.sleep(1)
+                continue
+            if message and message.get('type') == 'message':
+                channel = message['channel']
+                data = message['data']
+                self.dispatch(
+                    channel.decode() if isinstance(channel, bytes) else channel,
+                    data.decode() if isinstance(data, bytes) else data,
+                )
+
+    def dispatch(self, channel, message):
+        """Remet un message aux abonnés locaux du canal (boucle du hub)"""
+        subscribers = self._channels.get(channel)
+        if not subscribers:
+            return
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return
+        # Cache commun aux abonnés du message : les abonnés d'une même livraison
+        # reçoivent le même événement, encodé une seule fois
+        shared = {}
+        for subscription in list(subscribers):
+            subscription.deliver(channel, payload, shared)
+
+    def dispatch_threadsafe(self, channel, message):
+        """dispatch() depuis un autre thread (diffusion en mémoire, sans Redis)"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.dispatch, channel, message)
+
+
+tracking_hub = TrackingHub()
+
+
+# =============================================================================
+# ABONNÉ : ÉTAT DE SUIVI D'UNE LIVRAISON
+# =============================================================================
+
+class DeliveryTracker:
+    """Statut, livreur et cible courante d'une livraison suivie (calcul de l'ETA)"""
+
+    def __init__(self, delivery_id, status, driver_id, pickup, destination):
+        self.delivery_id = str(delivery_id)
+        self.status = status
+        self.driver_id = driver_id
+        self.pickup = pickup
+        self.destination = destination
+
+    @classmethod
+    def from_delivery(cls, delivery):
+        return cls(
+            delivery.pk,
+            delivery.status,
+            str(delivery.driver_id) if delivery.driver_id else None,
+            delivery.get_coords('pickup'),
+            delivery.get_coords('delivery'),
+        )
+
+    @property
+    def finished(self):
+        return self.status in TERMINAL_STATUSES
+
+    @property
+    def channels(self):
+        channels = {delivery_channel(self.delivery_id)}
+        if self.driver_id and not self.finished:
+            channels.add(driver_channel(self.driver_id))
+        return channels
+
+    def target(self):
+        if self.status in PICKUP_STATUSES:
+            return 'pickup', self.pickup
+        return 'delivery', self.destination
+
+    def position_payload(self, position):
+        """Position du livreur enrichie de la distance et de l'ETA vers la cible"""
+        name, coords = self.target()
+        payload = dict(position)
+        payload.update({'target': name, 'distance_km': None, 'eta_min': None})
+        if coords and position.get('latitude') is not None and position.get('longitude') is not None:
+            distance_km = LocationService.haversine_distance(
+                position['latitude'], position['longitude'], coords[0], coords[1]
+            ) * ETA_ROAD_FACTOR
+            payload['distance_km'] = round(distance_km, 2)
+            payload['eta_min'] = round(distance_km / ETA_SPEED_KMH * 60, 1)
+        return payload
+
+    def apply_status(self, data):
+        self.status = data.get('status', self.status)
+        self.driver_id = data.get('driver_id')
+
+
+# =============================================================================
+# ACCÈS (synchrone, via sync_to_async)
+# =============================================================================
+
+def _database_call(func, *args):
+    """
+    Exécute `func` comme une requête Django : connexions périmées fermées avant
+    et après (ces appels ne passent pas par le cycle request_started/finished)
+    """
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def visible_deliveries(user):
+    """Livraisons qu'un utilisateur peut suivre (mêmes règles que DeliveryViewSet)"""
+    from .models import Delivery
+
+    if user.user_type == 'merchant':
+        return Delivery.objects.filter(merchant__user=user)
+    if user.user_type == 'driver':
+        return Delivery.objects.filter(driver__user=user)
+    if user.user_type == 'individual':
+        return Delivery.objects.filter(created_by=user)
+    if user.user_type == 'admin' or getattr(user, 'is_staff', False):
+        return Delivery.objects.all()
+    return Delivery.objects.none()
+
+
+def authenticate_token(raw_token):
+    """Utilisateur d'un access token JWT, ou None"""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    authentication = JWTAuthentication()
+    try:
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    except Exception:
+        return None
+    return user if user.is_active else None
+
+
+def load_snapshot(user, delivery_id):
+    """
+    État initial d'une livraison visible par `user`
+
+    Returns:
+        tuple: (DeliveryTracker, payload de l'événement snapshot) ou None
+    """
+    from apps.drivers.geo_index import driver_geo_index
+    from apps.drivers.position_buffer import driver_position_buffer
+
+    delivery = visible_deliveries(user).select_related('driver').filter(pk=delivery_id).first()
+    if delivery is None:
+        return None
+
+    tracker = DeliveryTracker.from_delivery(delivery)
+    position = None
+    driver = delivery.driver
+    if driver is not None:
+        # Dernier ping reçu (tampon, index en ligne), sinon position en base
+        live = driver_position_buffer.get_position(driver.id) or driver_geo_index.get_position(driver.id)
+        if live:
+            position = {'latitude': live['lat'], 'longitude': live['lon']}
+        elif driver.current_latitude is not None and driver.current_longitude is not None:
+            position = {
+                'latitude': float(driver.current_latitude),
+                'longitude': float(driver.current_longitude),
+            }
+
+    snapshot = status_payload(delivery)
+    snapshot['position'] = tracker.position_payload(position) if position else None
+    return tracker, snapshot
+
+
+# =============================================================================
+# APPLICATION ASGI
+# =============================================================================
+
+def format_event(event, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder)
+    return f'event: {event}\ndata: {payload}\n\n'.encode()
+
+
+class TrackingStreamApp:
+    """
+    Sert GET /api/v1/deliveries/<id>/stream/ et transmet le reste à Django.
+
+    Usage (config/asgi.py):
+        application = TrackingStreamApp(get_asgi_application())
+    """
+
+    PATH_RE = re.compile(r'^/api/v1/deliveries/(?P<delivery_id>[0-9a-fA-F-]{32,36})/stream/?$')
+
+    def __init__(self, django_application):
+        self.django_application = django_application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http':
+            match = self.PATH_RE.match(scope['path'])
+            if match:
+                return await self.stream(scope, receive, send, match.group('delivery_id'))
+        return await self.django_application(scope, receive, send)
+
+    @staticmethod
+    async def _respond(send, status, message, headers=()):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'application/json'), *headers],
+        })
+        await send({'type': 'http.response.body', 'body': json.dumps({'error': message}).encode()})
+
+    @staticmethod
+    def _bearer_token(scope):
+        for name, value in scope.get('headers', []):
+            if name == b'authorization':
+                parts = value.decode('latin-1').split()
+                if len(parts) == 2 and parts[0].lower() == 'bearer':
+                    return parts[1]
+        return None
+
+    async def stream(self, scope, receive, send, delivery_id):
+        if scope['method'] != 'GET':
+            return await self._respond(send, 405, 'Méthode non autorisée', [(b'allow', b'GET')])
+
+        token = self._bearer_token(scope)
+        user = await sync_to_async(_database_call)(authenticate_token, token) if token else None
+        if user is None:
+            return await self._respond(send, 401, 'Authentification requise')
+
+        if tracking_hub.connections >= MAX_CONNECTIONS:
+            return await self._respond(send, 503, 'Trop de connexions de suivi', [(b'retry-after', b'5')])
+
+        try:
+            delivery_id = str(uuid.UUID(delivery_id))
+        except ValueError:
+            return await self._respond(send, 404, 'Livraison introuvable')
+
+        # Abonné à la livraison avant de lire le snapshot : une transition publiée
+        # pendant la lecture est rejouée ensuite (dans l'ordre, l'état final est le bon)
+        subscription = await tracking_hub.subscribe({delivery_channel(delivery_id)})
+        disconnected = next_message = None
+        try:
+            loaded = await sync_to_async(_database_call)(load_snapshot, user, delivery_id)
+            if loaded is None:
+                return await self._respond(send, 404, 'Livraison introuvable')
+            tracker, snapshot = loaded
+
+            await send({
+                'type': 'http.response.start',
+                'status': 200,
+                'headers': [
+                    (b'content-type', b'text/event-stream'),
+                    (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'),
+                ],
+            })
+            body = b'retry: 3000\n\n' + format_event('snapshot', snapshot)
+            if tracker.finished:
+                await send({'type': 'http.response.body', 'body': body})
+                return
+
+            # Livreur connu avec le snapshot : ses pings à partir de maintenant
+            await subscription.set_channels(tracker.channels)
+            disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+            while True:
+                if next_message is None:
+                    next_message = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {next_message, disconnected},
+                    timeout=HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if disconnected in done:
+                    return
+                if not done:
+                    await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+                    continue
+
+                channel, message, shared = next_message.result()
+                next_message = None
+                chunk = await self._handle(tracker, subscription, message, shared)
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': not tracker.finished})
+                if tracker.finished:
+                    return
+        finally:
+            for task in (next_message, disconnected):
+                if task is not None:
+                    task.cancel()
+            await subscription.close()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+
+    @staticmethod
+    async def _handle(tracker, subscription, message, shared):
+        event, data = message.get('event'), message.get('data') or {}
+        if event == 'position':
+            # Ping d'un ancien livreur encore en vol après une réassignation
+            if data.get('driver_id') != tracker.driver_id:
+                return None
+            key = ('position', tracker.target())
+            if key not in shared:
+                shared[key] = format_event('position', tracker.position_payload(data))
+            return shared[key]
+        if event == 'status':
+            previous_channels = tracker.channels
+            tracker.apply_status(data)
+            if tracker.channels != previous_channels:
+                await subscription.set_channels(tracker.channels)
+            if 'status' not in shared:
+                shared['status'] = format_event('status', data)
+            return shared['status']
+        return None
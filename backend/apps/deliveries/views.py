@@ -2,9 +2,7 @@
 
 import logging
 from django.db import transaction
-from django.db.models import Count, Sum, Avg, Q
 from django.utils import timezone
-from datetime import timedelta
 from rest_framework import viewsets, filters, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
@@ -23,9 +21,11 @@ from .models_rating import DeliveryRating
 from .serializers import DeliverySerializer, DeliveryCreateSerializer
 from .serializers_rating import DeliveryRatingSerializer
 from .services import DeliveryAssignmentService, RouteOptimizationService
+from .vrp import DEFAULT_TIME_LIMIT_SECONDS
 from .email_service import send_delivery_pin_email
 from apps.merchants.models import Merchant
 from apps.drivers.models import Driver
+from apps.drivers.position_buffer import driver_position_buffer
 from core.permissions import IsMerchant, IsDriver, IsAdmin, IsMerchantOrIndividual
 from apps.notifications.services import notify_delivery_status_change
 from core.cloudinary_service import CloudinaryService
@@ -47,6 +47,9 @@ class DeliveryViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'delivered_at']
     parser_classes = [MultiPartParser, FormParser, JSONParser]
     
+    # dispatch-batch synchrone : budget de résolution max (secondes) dans la requête
+    DISPATCH_SYNC_MAX_SECONDS = 5
+    
     def get_serializer_class(self):
         """Utilise DeliveryCreateSerializer pour la création, DeliverySerializer pour le reste"""
         if self.action == 'create':
@@ -56,12 +59,12 @@ class DeliveryViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         """
         Permissions adaptées par action :
-        - create: Merchants et Particuliers
+        - create/bulk_import: Merchants et Particuliers
         - assign/reassign: Admins uniquement
         - accept/reject: Drivers uniquement
         - list/retrieve: Tous authentifiés
         """
-        if self.action == 'create':
+        if self.action in ['create', 'bulk_import']:
             permission_classes = [IsMerchantOrIndividual]
         elif self.action in ['assign', 'auto_assign', 'reassign']:
             permission_classes = [IsAdmin]
@@ -252,7 +255,73 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         
         headers = self.get_success_headers(output_serializer.data)
         return Response(output_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
-    
+
+    @action(detail=False, methods=['POST'], url_path='bulk-import')
+    def bulk_import(self, request):
+        """
+        POST /api/v1/deliveries/bulk-import/
+
+        Crée en masse les livraisons d'un manifeste marchand.
+
+        Multipart : champ `file` (CSV ou JSON / JSON Lines), `format` optionnel ('csv' | 'json')
+        JSON : {"deliveries": [{...}, ...]}
+        Options : `dry_run` (valide et calcule les prix sans rien créer), `batch_size`
+
+        Chaque ligne accepte les champs de la création unitaire, plus `reference`
+        (numéro de commande renvoyé dans le rapport). Les lignes invalides sont
+        reportées sans bloquer les autres.
+        """
+        from .bulk_import import (
+            BulkDeliveryImporter, DEFAULT_BATCH_SIZE, guess_manifest_format, iter_manifest_rows
+        )
+
+        def flag(name):
+            value = request.query_params.get(name, request.data.get(name, False))
+            return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+        try:
+            batch_size = int(request.query_params.get('batch_size', request.data.get('batch_size', DEFAULT_BATCH_SIZE)))
+            if not 1 <= batch_size <= 5000:
+                raise ValueError
+        except (TypeError, ValueError):
+            return Response({'error': 'batch_size doit être un entier entre 1 et 5000'}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = request.FILES.get('file')
+        if upload is not None:
+            file_format = request.data.get('format') or guess_manifest_format(upload.name)
+            try:
+                rows = iter_manifest_rows(upload, file_format)
+            except ValueError as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            rows = request.data.get('deliveries')
+            if not isinstance(rows, list):
+                return Response(
+                    {'error': "Fournir un fichier 'file' (CSV / JSON) ou une liste 'deliveries'"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+        try:
+            importer = BulkDeliveryImporter(request.user, batch_size=batch_size, dry_run=flag('dry_run'))
+        except DjangoValidationError as e:
+            return Response({'error': ' '.join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            report = importer.run(rows)
+        except ValueError as e:
+            # Manifeste illisible : les lots précédents restent importés
+            logger.warning(f"Import livraisons: manifeste invalide ({e})")
+            report = dict(importer.report, error=f"Manifeste invalide: {e}")
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+
+        if report['dry_run']:
+            response_status = status.HTTP_200_OK
+        elif report['created']:
+            response_status = status.HTTP_201_CREATED
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(report, status=response_status)
+
     def get_queryset(self):
         """
         Filtre les livraisons selon le type d'utilisateur :
@@ -306,6 +375,33 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def _stats_scopes(self, request, merchant=None):
+        """
+        (périmètre du cache par utilisateur, filtres des agrégats journaliers) équivalents
+        à get_queryset(). Filtres None (particuliers, recherche) : statistiques calculées
+        sur la table. Périmètre None (admins) : pas de cache.
+        """
+        user = request.user
+        cache_scope, rollup_scope = None, None
+        if user.user_type == 'merchant':
+            if merchant:
+                cache_scope, rollup_scope = ('merchant', merchant.pk), {'merchant_id': merchant.pk}
+        elif user.user_type == 'driver':
+            driver = Driver.objects.filter(user=user).only('pk').first()
+            if driver:
+                cache_scope, rollup_scope = ('driver', driver.pk), {'driver_id': driver.pk}
+        elif user.user_type == 'individual':
+            cache_scope = ('user', user.pk)
+        elif user.user_type == 'admin' or getattr(user, 'is_staff', False):
+            rollup_scope = {}
+
+        status = request.query_params.get('status')
+        if request.query_params.get(filters.SearchFilter.search_param):
+            rollup_scope = None
+        elif rollup_scope is not None and status:
+            rollup_scope['status'] = status
+        return cache_scope, rollup_scope
+
     @action(detail=False, methods=['GET'], url_path='my-stats', permission_classes=[IsAuthenticated])
     def my_stats(self, request):
         """Return aggregated delivery stats for the current user (merchant or individual).
@@ -318,18 +414,34 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         except (TypeError, ValueError):
             period = 30
 
-        qs = self.filter_queryset(self.get_queryset())
-
         # Use shared helper to compute stats
-        from apps.deliveries.services import compute_delivery_stats
+        from apps.deliveries.services import compute_delivery_stats, stats_period_start
+        from apps.deliveries.stats import cached_stats, merchant_stats_profile
         merchant = None
         try:
             if getattr(request.user, 'user_type', None) == 'merchant':
-                merchant = Merchant.objects.filter(user=request.user).first()
+                # Profil et totaux de factures en une requête, sur la période des compteurs
+                # (jours entiers, sauf recherche : comptés sur la table, cf. _stats_scopes)
+                searching = bool(request.query_params.get(filters.SearchFilter.search_param))
+                merchant = merchant_stats_profile(
+                    request.user, stats_period_start(period, from_rollups=not searching)
+                )
         except Exception:
             merchant = None
 
-        stats = compute_delivery_stats(qs, period_days=period, merchant=merchant)
+        cache_scope, rollup_scope = self._stats_scopes(request, merchant)
+        params = (
+            period,
+            request.query_params.get('status'),
+            request.query_params.get(filters.SearchFilter.search_param),
+        )
+
+        def compute():
+            # Lus dans les agrégats journaliers, les compteurs n'ont pas besoin du queryset
+            qs = self.filter_queryset(self.get_queryset()) if rollup_scope is None else None
+            return compute_delivery_stats(qs, period_days=period, merchant=merchant, rollup_scope=rollup_scope)
+
+        stats = cached_stats(cache_scope, 'deliveries_my_stats', params, compute)
 
         # If the caller is a merchant, include merchant metadata for parity with merchants.my-stats
         response = stats
@@ -578,8 +690,8 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         if not already_picked:
             # Vérifier la proximité GPS entre le driver et le point d'enlèvement
             pickup_coords = delivery.get_coords('pickup')
-            driver_lat = getattr(driver, 'current_latitude', None)
-            driver_lon = getattr(driver, 'current_longitude', None)
+            # Dernier ping reçu (tampon d'écriture différée), sinon position en base
+            driver_lat, driver_lon = driver_position_buffer.current_position(driver)
 
             # Lire la configuration pour exiger la position GPS
             try:
@@ -1171,6 +1283,71 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         else:
             return Response(result, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=False, methods=['POST'], permission_classes=[IsAdmin], url_path='dispatch-batch')
+    def dispatch_batch(self, request):
+        """
+        POST /api/v1/deliveries/dispatch-batch/
+        
+        Optimise en une fois l'assignation et l'ordre des livraisons en attente
+        pour toute la flotte disponible.
+        
+        Body:
+        {
+            "delivery_ids": ["uuid1", "uuid2"],  // optionnel (défaut: toutes les livraisons en attente)
+            "driver_ids": ["uuid1"],             // optionnel (défaut: tous les livreurs disponibles)
+            "time_limit_seconds": 10,            // optionnel
+            "apply": false,                      // true = enregistrer les assignations
+            "async": true                        // false = résoudre dans la requête
+        }
+        
+        Par défaut la résolution passe par Celery (202 + task_id). En synchrone,
+        time_limit_seconds est limité à DISPATCH_SYNC_MAX_SECONDS pour ne pas
+        bloquer un worker web.
+        """
+        delivery_ids = request.data.get('delivery_ids')
+        driver_ids = request.data.get('driver_ids')
+        # Form / multipart : "false" ou "0" ne doivent pas enregistrer d'assignations
+        apply = str(request.data.get('apply', False)).lower() in ('1', 'true', 'yes', 'on')
+        run_async = request.data.get('async', True) not in (False, 'false', '0', 0)
+        max_seconds = 120 if run_async else self.DISPATCH_SYNC_MAX_SECONDS
+        
+        time_limit_seconds = request.data.get('time_limit_seconds')
+        if time_limit_seconds is not None:
+            try:
+                time_limit_seconds = float(time_limit_seconds)
+                if not 0 < time_limit_seconds <= max_seconds:
+                    raise ValueError
+            except (TypeError, ValueError):
+                return Response(
+                    {'error': f'time_limit_seconds doit être un nombre entre 0 et {max_seconds}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        elif not run_async:
+            time_limit_seconds = min(DEFAULT_TIME_LIMIT_SECONDS, max_seconds)
+        
+        if run_async:
+            from .tasks import dispatch_pending_deliveries
+            task = dispatch_pending_deliveries.delay(
+                delivery_ids=delivery_ids,
+                driver_ids=driver_ids,
+                time_limit_seconds=time_limit_seconds,
+                apply=apply
+            )
+            return Response({'success': True, 'task_id': task.id}, status=status.HTTP_202_ACCEPTED)
+        
+        optimizer = RouteOptimizationService()
+        result = optimizer.optimize_fleet(
+            delivery_ids=delivery_ids,
+            driver_ids=driver_ids,
+            time_limit_seconds=time_limit_seconds,
+            apply=apply
+        )
+        
+        if result['success']:
+            return Response(result, status=status.HTTP_200_OK)
+        else:
+            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=True, methods=['GET'], permission_classes=[IsAdmin])
     def suggest_drivers(self, request, pk=None):
         """
@@ -1198,73 +1375,51 @@ class DeliveryViewSet(viewsets.ModelViewSet):
         GET /api/v1/deliveries/dashboard/?period=30
         
         Statistiques globales pour le dashboard admin.
+        Lues dans les agrégats journaliers (deliveries/rollups.py) : le coût ne dépend
+        pas de la longueur de la période. Période comptée en jours entiers.
         """
+        from .rollups import dashboard_totals
+
         period_days = int(request.query_params.get('period', 30))
-        period_start = timezone.now() - timedelta(days=period_days)
-        
-        # Toutes les livraisons
-        all_deliveries = Delivery.objects.all()
-        period_deliveries = all_deliveries.filter(created_at__gte=period_start)
-        
+        totals = dashboard_totals(period_days)
+        period_start = totals['start']
+        by_status = totals['by_status']
+
         # Stats par statut
         # Some deployments still have legacy status values. Count both
         # legacy and current statuses so the dashboard remains accurate.
-        stats_by_status = period_deliveries.aggregate(
-            total=Count('id'),
-            pending=Count('id', filter=Q(status__in=['pending', 'pending_assignment'])),
-            assigned=Count('id', filter=Q(status__in=['assigned'])),
-            picked_up=Count('id', filter=Q(status__in=['picked_up'])),
-            in_transit=Count('id', filter=Q(status__in=['in_transit'])),
+        stats_by_status = {
+            'total': totals['total'],
+            'pending': by_status['pending'] + by_status['pending_assignment'],
+            'assigned': by_status['assigned'],
+            'picked_up': by_status['picked_up'],
+            'in_transit': by_status['in_transit'],
             # Aggregate any status that represents an in-progress delivery
-            in_progress=Count('id', filter=Q(status__in=[
+            'in_progress': sum(by_status[name] for name in (
                 'in_progress', 'pickup_in_progress', 'assigned', 'picked_up', 'in_transit'
-            ])),
-            delivered=Count('id', filter=Q(status='delivered')),
-            cancelled=Count('id', filter=Q(status='cancelled')),
-            failed=Count('id', filter=Q(status='failed'))
-        )
-        
+            )),
+            'delivered': by_status['delivered'],
+            'cancelled': by_status['cancelled'],
+            'failed': by_status['failed'],
+        }
+
         # Revenus
-        revenue_data = period_deliveries.filter(status='delivered').aggregate(
-            total_revenue=Sum('calculated_price'),
-            avg_delivery_price=Avg('calculated_price')
-        )
-        
-        # Stats par commune (top 5)
-        top_communes = period_deliveries.values('delivery_commune').annotate(
-            count=Count('id')
-        ).order_by('-count')[:5]
-        
-        # Merchants actifs
-        active_merchants = period_deliveries.values('merchant').distinct().count()
-        top_merchants = period_deliveries.values(
-            'merchant__business_name'
-        ).annotate(
-            deliveries_count=Count('id')
-        ).order_by('-deliveries_count')[:5]
-        
-        # Drivers actifs
-        active_drivers = period_deliveries.filter(driver__isnull=False).values('driver').distinct().count()
-        top_drivers = period_deliveries.filter(driver__isnull=False).values(
-            'driver__user__first_name', 'driver__user__last_name'
-        ).annotate(
-            deliveries_count=Count('id')
-        ).order_by('-deliveries_count')[:5]
-        
+        revenue_data = {
+            'total_revenue': totals['revenue'],
+            'avg_delivery_price': (
+                (totals['revenue'] / totals['delivered']).quantize(Decimal('0.01')) if totals['delivered'] else None
+            ),
+        }
+
         # Taux de succès
         total_completed = stats_by_status['delivered'] + stats_by_status['cancelled']
         success_rate = (stats_by_status['delivered'] / total_completed * 100) if total_completed > 0 else 0
-        
+
         # Tendances (comparaison avec période précédente)
-        previous_period_start = period_start - timedelta(days=period_days)
-        previous_deliveries = all_deliveries.filter(
-            created_at__gte=previous_period_start,
-            created_at__lt=period_start
-        )
-        previous_count = previous_deliveries.count()
-        current_count = period_deliveries.count()
+        previous_count = totals['previous_total']
+        current_count = totals['total']
         growth_rate = ((current_count - previous_count) / previous_count * 100) if previous_count > 0 else 0
-        
+
         return Response({
             'period': {
                 'days': period_days,
@@ -1289,24 +1444,21 @@ class DeliveryViewSet(viewsets.ModelViewSet):
                 'failed': stats_by_status['failed']
             },
             'top_communes': [
-                {'commune': item['delivery_commune'], 'count': item['count']}
-                for item in top_communes
+                {'commune': commune, 'count': count}
+                for commune, count in totals['top_communes']
             ],
             'merchants': {
-                'active_count': active_merchants,
+                'active_count': totals['active_merchants'],
                 'top_5': [
-                    {'business_name': item['merchant__business_name'], 'deliveries': item['deliveries_count']}
-                    for item in top_merchants
+                    {'business_name': business_name, 'deliveries': count}
+                    for business_name, count in totals['top_merchants']
                 ]
             },
             'drivers': {
-                'active_count': active_drivers,
+                'active_count': totals['active_drivers'],
                 'top_5': [
-                    {
-                        'name': f"{item['driver__user__first_name']} {item['driver__user__last_name']}",
-                        'deliveries': item['deliveries_count']
-                    }
-                    for item in top_drivers
+                    {'name': name, 'deliveries': count}
+                    for name, count in totals['top_drivers']
                 ]
             }
         })
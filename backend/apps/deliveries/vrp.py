@@ -0,0 +1,229 @@
+# deliveries/vrp.py
+"""
+Optimisation de flotte : problème de tournées avec ramassage et livraison (PDPTW).
+
+Assigne et ordonne en une seule résolution OR-Tools les livraisons en attente
+entre tous les livreurs disponibles, avec :
+- précédence ramassage → livraison, sur le même véhicule ;
+- capacité du véhicule (`vehicle_capacity_kg`) ;
+- fenêtres horaires de ramassage (`scheduled_pickup_time`) ;
+- budget de temps de résolution configurable (recherche locale guidée).
+
+Le module ne touche pas à la base : il reçoit des dicts et renvoie des dicts,
+ce qui le rend utilisable depuis `RouteOptimizationService`, la tâche Celery
+et le benchmark.
+
+Véhicules : {'id', 'latitude', 'longitude', 'capacity_kg', 'vehicle_type' (optionnel)}
+Commandes : {'id', 'pickup': (lat, lon), 'dropoff': (lat, lon), 'weight_kg',
+             'ready_min' (optionnel), 'due_min' (optionnel),
+             'required_vehicle_type' (optionnel)}
+"""
+
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from apps.core.location_service import LocationService
+
+
+# Budget de résolution par défaut (secondes)
+DEFAULT_TIME_LIMIT_SECONDS = getattr(settings, 'FLEET_VRP_TIME_LIMIT_SECONDS', 10)
+
+# Temps passé sur place à chaque arrêt (ramassage ou remise du colis)
+SERVICE_TIME_MIN = 5
+
+# Horizon de planification : au-delà, une commande n'est pas planifiée
+HORIZON_MIN = 8 * 60
+
+# Pénalité (en mètres équivalents) pour une commande laissée non assignée
+UNASSIGNED_PENALTY = 1_000_000
+
+
+def solve_pickup_delivery(
+    vehicles: List[Dict],
+    orders: List[Dict],
+    time_limit_seconds: Optional[float] = None,
+    use_api: bool = True,
+    service_time_min: int = SERVICE_TIME_MIN,
+    horizon_min: int = HORIZON_MIN,
+) -> Dict:
+    """
+    Résout le PDPTW pour la flotte.
+
+    Returns:
+        dict: {
+            'routes': [{'vehicle_id', 'stops': [{'type', 'order_id', 'eta_min', 'load_kg'}],
+                        'distance_km', 'duration_min'}],
+            'unassigned': [order_id, ...],
+            'distance_source': source de LocationService.get_distance_matrix
+                               ('haversine' = durées estimées à distance x 3),
+            'status': 'solved' | 'no_solution' | 'empty'
+        }
+    """
+    from ortools.constraint_solver import routing_enums_pb2
+    from ortools.constraint_solver import pywrapcp
+
+    if not vehicles or not orders:
+        return {
+            'routes': [],
+            'unassigned': [o['id'] for o in orders],
+            'distance_source': None,
+            'status': 'empty'
+        }
+
+    n_vehicles = len(vehicles)
+    n_orders = len(orders)
+
+    # Nœuds : départs des véhicules, ramassages, livraisons, puis un puits commun
+    # (distance nulle) pour des tournées ouvertes : le livreur finit là où il livre.
+    points = [(v['latitude'], v['longitude']) for v in vehicles]
+    points += [tuple(o['pickup']) for o in orders]
+    points += [tuple(o['dropoff']) for o in orders]
+    sink = len(points)
+
+    matrix = LocationService.get_distance_matrix(points, use_api=use_api)
+    distances_m = [[int(round(d * 1000)) for d in row] + [0] for row in matrix['distances_km']]
+    durations_min = [[int(round(d)) for d in row] + [0] for row in matrix['durations_min']]
+    distances_m.append([0] * (sink + 1))
+    durations_min.append([0] * (sink + 1))
+
+    def pickup_node(i):
+        return n_vehicles + i
+
+    def dropoff_node(i):
+        return n_vehicles + n_orders + i
+
+    demands = [0] * (sink + 1)
+    for i, order in enumerate(orders):
+        weight = int(round(float(order.get('weight_kg') or 0) * 100))  # en centièmes de kg
+        demands[pickup_node(i)] = weight
+        demands[dropoff_node(i)] = -weight
+
+    manager = pywrapcp.RoutingIndexManager(
+        sink + 1,
+        n_vehicles,
+        list(range(n_vehicles)),
+        [sink] * n_vehicles,
+    )
+    routing = pywrapcp.RoutingModel(manager)
+
+    # Coût = distance
+    def distance_callback(from_index, to_index):
+        return distances_m[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+
+    distance_cb = routing.RegisterTransitCallback(distance_callback)
+    routing.SetArcCostEvaluatorOfAllVehicles(distance_cb)
+    routing.AddDimension(distance_cb, 0, 10_000_000, True, 'Distance')
+
+    # Temps = trajet + temps de service au nœud de départ
+    def time_callback(from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        to_node = manager.IndexToNode(to_index)
+        service = service_time_min if n_vehicles <= from_node < sink else 0
+        return durations_min[from_node][to_node] + service
+
+    time_cb = routing.RegisterTransitCallback(time_callback)
+    routing.AddDimension(time_cb, horizon_min, horizon_min, False, 'Time')
+    time_dimension = routing.GetDimensionOrDie('Time')
+
+    # Capacité
+    def demand_callback(from_index):
+        return demands[manager.IndexToNode(from_index)]
+
+    demand_cb = routing.RegisterUnaryTransitCallback(demand_callback)
+    routing.AddDimensionWithVehicleCapacity(
+        demand_cb,
+        0,
+        [int(round(float(v.get('capacity_kg') or 0) * 100)) for v in vehicles],
+        True,
+        'Capacity',
+    )
+
+    # Départ immédiat des véhicules
+    for v in range(n_vehicles):
+        time_dimension.CumulVar(routing.Start(v)).SetRange(0, 0)
+
+    distance_dimension = routing.GetDimensionOrDie('Distance')
+    for i, order in enumerate(orders):
+        pickup_index = manager.NodeToIndex(pickup_node(i))
+        dropoff_index = manager.NodeToIndex(dropoff_node(i))
+
+        # Précédence ramassage → livraison sur le même véhicule
+        routing.AddPickupAndDelivery(pickup_index, dropoff_index)
+        routing.solver().Add(routing.VehicleVar(pickup_index) == routing.VehicleVar(dropoff_index))
+        routing.solver().Add(
+            distance_dimension.CumulVar(pickup_index) <= distance_dimension.CumulVar(dropoff_index)
+        )
+
+        # Fenêtre horaire de ramassage
+        ready = max(0, min(int(order.get('ready_min') or 0), horizon_min))
+        due = order.get('due_min')
+        due = horizon_min if due is None else max(ready, min(int(due), horizon_min))
+        time_dimension.CumulVar(pickup_index).SetRange(ready, due)
+
+        # Type de véhicule imposé
+        required_type = order.get('required_vehicle_type')
+        if required_type:
+            # -1 = nœud non desservi (la commande peut rester non assignée)
+            allowed = [-1] + [v for v, vehicle in enumerate(vehicles) if vehicle.get('vehicle_type') == required_type]
+            routing.VehicleVar(pickup_index).SetValues(allowed)
+            routing.VehicleVar(dropoff_index).SetValues(allowed)
+
+        # Une commande peut rester non assignée (capacité, fenêtre), avec pénalité
+        routing.AddDisjunction([pickup_index], UNASSIGNED_PENALTY)
+        routing.AddDisjunction([dropoff_index], UNASSIGNED_PENALTY)
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = (
+        routing_enums_pb2.FirstSolutionStrategy.PARALLEL_CHEAPEST_INSERTION
+    )
+    search_parameters.local_search_metaheuristic = (
+        routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    )
+    limit = DEFAULT_TIME_LIMIT_SECONDS if time_limit_seconds is None else time_limit_seconds
+    search_parameters.time_limit.FromMilliseconds(max(1, int(float(limit) * 1000)))
+
+    solution = routing.SolveWithParameters(search_parameters)
+    if not solution:
+        return {
+            'routes': [],
+            'unassigned': [o['id'] for o in orders],
+            'distance_source': matrix['source'],
+            'status': 'no_solution'
+        }
+
+    routes = []
+    assigned = set()
+    for v in range(n_vehicles):
+        index = routing.Start(v)
+        stops = []
+        load = 0
+        while not routing.IsEnd(index):
+            node = manager.IndexToNode(index)
+            if node >= n_vehicles:
+                is_pickup = node < n_vehicles + n_orders
+                order = orders[node - n_vehicles] if is_pickup else orders[node - n_vehicles - n_orders]
+                load += demands[node]
+                stops.append({
+                    'type': 'pickup' if is_pickup else 'delivery',
+                    'order_id': order['id'],
+                    'eta_min': solution.Min(time_dimension.CumulVar(index)),
+                    'load_kg': round(load / 100, 2),
+                })
+                assigned.add(order['id'])
+            index = solution.Value(routing.NextVar(index))
+
+        if stops:
+            routes.append({
+                'vehicle_id': vehicles[v]['id'],
+                'stops': stops,
+                'distance_km': round(solution.Value(distance_dimension.CumulVar(index)) / 1000, 2),
+                'duration_min': solution.Min(time_dimension.CumulVar(index)),
+            })
+
+    return {
+        'routes': routes,
+        'unassigned': [o['id'] for o in orders if o['id'] not in assigned],
+        'distance_source': matrix['source'],
+        'status': 'solved'
+    }
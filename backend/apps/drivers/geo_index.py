@@ -0,0 +1,330 @@
+"""
+Live Driver Geospatial Index
+Keeps the latest position of online drivers in a spatial index so dispatch
+queries ("drivers within R km of this pickup, with capacity >= W") no longer
+scan the drivers table.
+
+Two backends:
+- Redis GEO (GEOADD / GEOSEARCH) on the project's Redis (apps/core/redis_connection.py),
+  so every gunicorn worker and Celery process shares the same index.
+- In-process grid (cells of ~1 km) otherwise (development, tests). It is seeded
+  once from the database and only sees this process's updates: callers must not
+  treat it as complete (see `is_shared`).
+"""
+import json
+import logging
+import threading
+import time
+from math import asin, cos, floor, radians, sin, sqrt
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(sqrt(min(1.0, a)))
+
+
+class _GridBackend:
+    """In-process grid index: cell -> set of driver ids"""
+
+    CELL_DEG = 0.01  # ~1.1 km at Abidjan's latitude
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cells: Dict[tuple, set] = {}
+        self._entries: Dict[str, dict] = {}
+
+    def _cell(self, lat, lon):
+        return (floor(lat / self.CELL_DEG), floor(lon / self.CELL_DEG))
+
+    def upsert(self, driver_id, lat, lon, meta):
+        cell = self._cell(lat, lon)
+        with self._lock:
+            previous = self._entries.get(driver_id)
+            if previous and previous['cell'] != cell:
+                self._cells.get(previous['cell'], set()).discard(driver_id)
+            self._cells.setdefault(cell, set()).add(driver_id)
+            self._entries[driver_id] = {'lat': lat, 'lon': lon, 'cell': cell, **meta}
+
+    def remove(self, driver_id):
+        with self._lock:
+            previous = self._entries.pop(driver_id, None)
+            if previous:
+                self._cells.get(previous['cell'], set()).discard(driver_id)
+
+    def get(self, driver_id):
+        entry = self._entries.get(driver_id)
+        return dict(entry) if entry else None
+
+    def search(self, lat, lon, radius_km):
+        # Convertir le rayon en nombre de cellules à parcourir
+        lat_span = radius_km / 111.32
+        lon_span = radius_km / (111.32 * max(cos(radians(lat)), 0.01))
+        min_cell = self._cell(lat - lat_span, lon - lon_span)
+        max_cell = self._cell(lat + lat_span, lon + lon_span)
+
+        results = []
+        with self._lock:
+            for ci in range(min_cell[0], max_cell[0] + 1):
+                for cj in range(min_cell[1], max_cell[1] + 1):
+                    for driver_id in self._cells.get((ci, cj), ()):
+                        entry = self._entries[driver_id]
+                        distance = _haversine_km(lat, lon, entry['lat'], entry['lon'])
+                        if distance <= radius_km:
+                            results.append((driver_id, distance, dict(entry)))
+        results.sort(key=lambda r: r[1])
+        return results
+
+    def clear(self):
+        with self._lock:
+            self._cells.clear()
+            self._entries.clear()
+
+
+class _RedisBackend:
+    """Redis GEO index shared by all processes"""
+
+    GEO_KEY = 'drivers:geo'
+    META_KEY = 'drivers:geo:meta'
+
+    def __init__(self, connection):
+        self.redis = connection
+
+    def upsert(self, driver_id, lat, lon, meta):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.geoadd(self.GEO_KEY, (lon, lat, driver_id))
+        pipe.hset(self.META_KEY, driver_id, json.dumps({'lat': lat, 'lon': lon, **meta}))
+        pipe.execute()
+
+    def remove(self, driver_id):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zrem(self.GEO_KEY, driver_id)
+        pipe.hdel(self.META_KEY, driver_id)
+        pipe.execute()
+
+    def get(self, driver_id):
+        raw = self.redis.hget(self.META_KEY, driver_id)
+        return json.loads(raw) if raw else None
+
+    def search(self, lat, lon, radius_km):
+        hits = self.redis.geosearch(
+            self.GEO_KEY,
+            longitude=lon,
+            latitude=lat,
+            radius=radius_km,
+            unit='km',
+            sort='ASC',
+            withdist=True,
+        )
+        if not hits:
+            return []
+        ids = [h[0].decode() if isinstance(h[0], bytes) else h[0] for h in hits]
+        metas = self.redis.hmget(self.META_KEY, ids)
+        results = []
+        for driver_id, (_, distance), raw in zip(ids, hits, metas):
+            if raw:
+                results.append((driver_id, float(distance), json.loads(raw)))
+        return results
+
+    def clear(self):
+        self.redis.delete(self.GEO_KEY, self.META_KEY)
+
+
+class DriverGeoIndex:
+    """
+    Spatial index of online drivers (verified + available) keyed by position.
+
+    Usage:
+        driver_geo_index.update_driver(driver, lat, lon)
+        driver_geo_index.nearby(5.36, -4.00, radius_km=5, min_capacity_kg=20)
+    """
+
+    # Positions plus anciennes que ce délai sont ignorées (driver probablement déconnecté)
+    MAX_POSITION_AGE_SECONDS = getattr(settings, 'DRIVER_GEO_INDEX_MAX_AGE', 15 * 60)
+
+    def __init__(self):
+        self._backend = None
+        self._backend_lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    backend = self._build_backend()
+                    if isinstance(backend, _GridBackend):
+                        # L'index en mémoire est propre au process : l'amorcer depuis la base
+                        self._load_from_db(backend)
+                    self._backend = backend
+        return self._backend
+
+    def _build_backend(self):
+        from apps.core.redis_connection import shared_redis
+
+        connection = shared_redis()
+        if connection is not None:
+            return _RedisBackend(connection)
+        return _GridBackend()
+
+    @property
+    def is_shared(self):
+        """True when every process updates this index (Redis), i.e. it holds all online drivers"""
+        return isinstance(self.backend, _RedisBackend)
+
+    @staticmethod
+    def is_online(driver):
+        return driver.verification_status == 'verified' and bool(driver.is_available)
+
+    def update_driver(self, driver, latitude=None, longitude=None):
+        """
+        Upsert the driver's live position (or remove it when the driver is offline).
+        Never raises: the index is an accelerator, Postgres stays the source of truth.
+        """
+        try:
+            lat = latitude if latitude is not None else driver.current_latitude
+            lon = longitude if longitude is not None else driver.current_longitude
+            driver_id = str(driver.id)
+
+            if not self.is_online(driver) or lat is None or lon is None:
+                self.backend.remove(driver_id)
+                return
+
+            self.backend.upsert(driver_id, float(lat), float(lon), {
+                'capacity_kg': float(driver.vehicle_capacity_kg or 0),
+                'vehicle_type': driver.vehicle_type,
+                'updated_at': time.time(),
+            })
+        except Exception as e:
+            logger.warning(f"DriverGeoIndex: mise à jour impossible pour {getattr(driver, 'id', None)}: {e}")
+
+    def remove_driver(self, driver_id):
+        try:
+            self.backend.remove(str(driver_id))
+        except Exception as e:
+            logger.warning(f"DriverGeoIndex: suppression impossible pour {driver_id}: {e}")
+
+    def get_position(self, driver_id) -> Optional[dict]:
+        """Latest indexed position {'lat', 'lon', 'updated_at', ...} or None"""
+        try:
+            entry = self.backend.get(str(driver_id))
+        except Exception:
+            return None
+        if not entry or self._is_stale(entry):
+            return None
+        return entry
+
+    def nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        min_capacity_kg: float = 0,
+        vehicle_type: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[List[Dict]]:
+        """
+        Online drivers within `radius_km`, sorted by distance.
+
+        Returns a list of {'driver_id', 'distance_km', 'latitude', 'longitude',
+        'capacity_kg', 'vehicle_type'} or None if the index could not be queried
+        (callers should then fall back to the database).
+        """
+        try:
+            hits = self.backend.search(float(latitude), float(longitude), float(radius_km))
+        except Exception as e:
+            logger.warning(f"DriverGeoIndex: recherche impossible ({e})")
+            return None
+
+        min_capacity = float(min_capacity_kg or 0)
+        results = []
+        for driver_id, distance, entry in hits:
+            if self._is_stale(entry):
+                continue
+            if entry.get('capacity_kg', 0) < min_capacity:
+                continue
+            if vehicle_type and entry.get('vehicle_type') != vehicle_type:
+                continue
+            results.append({
+                'driver_id': driver_id,
+                'distance_km': round(distance, 3),
+                'latitude': entry['lat'],
+                'longitude': entry['lon'],
+                'capacity_kg': entry.get('capacity_kg'),
+                'vehicle_type': entry.get('vehicle_type'),
+            })
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def rebuild(self):
+        """Reload the index from the database (e.g. after a Redis flush)"""
+        self.backend.clear()
+        return self._load_from_db(self.backend)
+
+    def _load_from_db(self, backend):
+        from .models import Driver
+
+        count = 0
+        try:
+            drivers = Driver.objects.filter(
+                verification_status='verified',
+                is_available=True,
+                current_latitude__isnull=False,
+                current_longitude__isnull=False,
+            ).only('id', 'current_latitude', 'current_longitude', 'vehicle_capacity_kg', 'vehicle_type', 'updated_at')
+            for driver in drivers.iterator():
+                backend.upsert(str(driver.id), float(driver.current_latitude), float(driver.current_longitude), {
+                    'capacity_kg': float(driver.vehicle_capacity_kg or 0),
+                    'vehicle_type': driver.vehicle_type,
+                    'updated_at': driver.updated_at.timestamp() if driver.updated_at else time.time(),
+                })
+                count += 1
+        except Exception as e:
+            logger.warning(f"DriverGeoIndex: chargement depuis la base impossible ({e})")
+        return count
+
+    def clear(self):
+        self.backend.clear()
+
+    def _is_stale(self, entry):
+        updated_at = entry.get('updated_at')
+        if not updated_at or not self.MAX_POSITION_AGE_SECONDS:
+            return False
+        return time.time() - updated_at > self.MAX_POSITION_AGE_SECONDS
+
+
+def nearby_in_queryset(drivers, latitude: float, longitude: float, radius_km: float,
+                       min_capacity_kg: float = 0) -> List[Dict]:
+    """
+    Database fallback for `DriverGeoIndex.nearby` when the index is not shared.
+
+    Filters `drivers` (a Driver queryset) on a bounding box around the point,
+    then on the haversine distance of the stored positions. Returns
+    [{'driver_id', 'distance_km'}, ...] sorted by distance.
+    """
+    latitude, longitude, radius_km = float(latitude), float(longitude), float(radius_km)
+    delta_lat = radius_km / 111.32
+    delta_lon = radius_km / max(111.32 * cos(radians(latitude)), 1e-6)
+    rows = drivers.filter(
+        current_latitude__range=(latitude - delta_lat, latitude + delta_lat),
+        current_longitude__range=(longitude - delta_lon, longitude + delta_lon),
+        vehicle_capacity_kg__gte=float(min_capacity_kg or 0),
+    ).values_list('id', 'current_latitude', 'current_longitude')
+
+    results = []
+    for driver_id, lat, lon in rows:
+        distance = _haversine_km(latitude, longitude, float(lat), float(lon))
+        if distance <= radius_km:
+            results.append({'driver_id': str(driver_id), 'distance_km': round(distance, 3)})
+    results.sort(key=lambda r: r['distance_km'])
+    return results
+
+
+driver_geo_index = DriverGeoIndex()
@@ -2,7 +2,9 @@
 GPS Tracking Serializers
 """
 from rest_framework import serializers
-from .location_models import LocationUpdate, LocationTrackingSession
+from .gps_tracking_service import GPSTrackingService
+from .location_models import ArchivedTrack, LocationUpdate, LocationTrackingSession
+from .track_archive import decode_track
 
 
 class LocationUpdateSerializer(serializers.ModelSerializer):
@@ -51,6 +53,15 @@ class LocationUpdateCreateSerializer(serializers.Serializer):
     timestamp = serializers.DateTimeField(required=False, allow_null=True)
 
 
+class LocationBatchCreateSerializer(serializers.Serializer):
+    """Serializer for a batch of offline-buffered location updates"""
+    points = LocationUpdateCreateSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=GPSTrackingService.MAX_BATCH_POINTS
+    )
+
+
 class TrackingIntervalSerializer(serializers.Serializer):
     """Serializer for tracking interval response"""
     interval_seconds = serializers.IntegerField()
@@ -87,6 +98,45 @@ class TrackingSessionSerializer(serializers.ModelSerializer):
         return obj.battery_consumption
 
 
+class ArchivedTrackSerializer(serializers.ModelSerializer):
+    """
+    Serializer for archived tracks
+    
+    `polyline` and `time_offsets` are the encoded track; pass
+    context={'decode': True} to also get the decoded points.
+    """
+    points = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedTrack
+        fields = [
+            'id',
+            'session',
+            'started_at',
+            'ended_at',
+            'polyline',
+            'time_offsets',
+            'precision',
+            'tolerance_m',
+            'original_points',
+            'stored_points',
+            'total_distance_km',
+            'points',
+        ]
+    
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if not self.context.get('decode'):
+            data.pop('points')
+        return data
+    
+    def get_points(self, obj):
+        return [
+            [lat, lon, timestamp.isoformat()]
+            for lat, lon, timestamp in decode_track(obj)
+        ]
+
+
 class TrackingStatisticsSerializer(serializers.Serializer):
     """Serializer for tracking statistics"""
     total_updates = serializers.IntegerField()
@@ -2,12 +2,21 @@
 GPS Location Tracking Service
 Handles adaptive GPS tracking and location updates
 """
+import itertools
+import logging
 from datetime import timedelta
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Avg
 from geopy.distance import geodesic
 from .location_models import LocationUpdate, LocationTrackingSession
+from .models import Driver
+from .geo_index import driver_geo_index
+from .position_buffer import driver_position_buffer
+from . import partitioning
+from apps.deliveries.tracking_stream import publish_driver_position
 
+logger = logging.getLogger(__name__)
 
 class GPSTrackingService:
     """Service for managing GPS tracking with adaptive intervals"""
@@ -20,6 +29,10 @@ class GPSTrackingService:
     # Movement detection threshold
     MOVEMENT_THRESHOLD_MPS = 1.0  # 1 m/s (~3.6 km/h)
     
+    # Batch ingestion (offline-buffered tracks)
+    MAX_BATCH_POINTS = 1000
+    BULK_BATCH_SIZE = 500
+    
     @staticmethod
     def get_tracking_interval(driver_status, is_moving=False):
         """
@@ -44,6 +57,26 @@ class GPSTrackingService:
         # Default fallback
         return GPSTrackingService.INTERVAL_STOPPED
     
+    @staticmethod
+    def _build_location_update(driver, latitude, longitude, **kwargs):
+        """Build an unsaved LocationUpdate (shared by single and batch ingestion)"""
+        speed = kwargs.get('speed')
+        is_moving = (speed or 0) > GPSTrackingService.MOVEMENT_THRESHOLD_MPS
+
+        return LocationUpdate(
+            driver=driver,
+            latitude=latitude,
+            longitude=longitude,
+            accuracy=kwargs.get('accuracy'),
+            speed=speed,
+            heading=kwargs.get('heading'),
+            altitude=kwargs.get('altitude'),
+            driver_status=driver.availability_status,
+            is_moving=is_moving,
+            battery_level=kwargs.get('battery_level'),
+            timestamp=kwargs.get('timestamp') or timezone.now()
+        )
+    
     @staticmethod
     def update_driver_location(driver, latitude, longitude, **kwargs):
         """
@@ -58,100 +91,243 @@ class GPSTrackingService:
         Returns:
             LocationUpdate: Created location update instance
         """
-        # Determine if driver is moving
-        speed = kwargs.get('speed', 0)
-        is_moving = speed > GPSTrackingService.MOVEMENT_THRESHOLD_MPS
-        
-        # Create location update record
-        location_update = LocationUpdate.objects.create(
-            driver=driver,
-            latitude=latitude,
-            longitude=longitude,
-            accuracy=kwargs.get('accuracy'),
-            speed=speed,
-            heading=kwargs.get('heading'),
-            altitude=kwargs.get('altitude'),
-            driver_status=driver.availability_status,
-            is_moving=is_moving,
-            battery_level=kwargs.get('battery_level'),
-            timestamp=kwargs.get('timestamp', timezone.now())
+        location_update = GPSTrackingService._build_location_update(
+            driver, latitude, longitude, **kwargs
         )
+        location_update.save()
         
-        # Update driver's current location
-        driver.current_latitude = latitude
-        driver.current_longitude = longitude
-        driver.save(update_fields=['current_latitude', 'current_longitude'])
+        # Update driver's current location (written behind, see position_buffer)
+        driver_position_buffer.record(driver, latitude, longitude, location_update.timestamp)
+        driver_geo_index.update_driver(driver, latitude, longitude)
+        publish_driver_position(
+            driver, latitude, longitude, location_update.speed, location_update.timestamp
+        )
         
         # Update tracking session
-        GPSTrackingService._update_tracking_session(driver, location_update)
+        GPSTrackingService._update_tracking_session(driver, [location_update])
         
         return location_update
     
     @staticmethod
-    def _update_tracking_session(driver, location_update):
-        """Update or create tracking session"""
-        # Get or create active session
-        session = LocationTrackingSession.objects.filter(
-            driver=driver,
-            ended_at__isnull=True
-        ).first()
+    def ingest_location_batch(driver, points):
+        """
+        Store a batch of GPS fixes buffered by the app while offline
+        
+        Fixes are ordered by timestamp and written with a single bulk insert.
+        The driver's position and the tracking session are updated once per
+        batch instead of once per point. The driver's position is only moved
+        if the newest fix of the batch is more recent than the last stored
+        one, so a late upload never rewinds a live position.
         
-        if not session:
-            session = LocationTrackingSession.objects.create(
+        Args:
+            driver: Driver instance
+            points: List of validated fixes (dicts with latitude, longitude
+                and optional accuracy, speed, heading, altitude,
+                battery_level, timestamp)
+            
+        Returns:
+            list: Created LocationUpdate instances, oldest first
+        """
+        if not points:
+            return []
+        
+        updates = [
+            GPSTrackingService._build_location_update(driver, **point)
+            for point in points
+        ]
+        # Stable sort: fixes sharing a timestamp keep the client order
+        updates.sort(key=lambda update: update.timestamp)
+        latest = updates[-1]
+        
+        with transaction.atomic():
+            # Bounded on timestamp so only the newest partitions are probed
+            moved = not LocationUpdate.objects.filter(
                 driver=driver,
-                initial_battery_level=location_update.battery_level
+                timestamp__gt=latest.timestamp
+            ).exists()
+            
+            LocationUpdate.objects.bulk_create(
+                updates, batch_size=GPSTrackingService.BULK_BATCH_SIZE
             )
+            
+            if moved:
+                driver_position_buffer.record(
+                    driver, latest.latitude, latest.longitude, latest.timestamp
+                )
+            
+            GPSTrackingService._update_tracking_session(driver, updates)
         
-        # Update session statistics
-        session.total_updates += 1
-        session.final_battery_level = location_update.battery_level
+        if moved:
+            driver_geo_index.update_driver(driver, latest.latitude, latest.longitude)
+            publish_driver_position(
+                driver, latest.latitude, latest.longitude, latest.speed, latest.timestamp
+            )
         
-        # Calculate average accuracy
-        avg_accuracy = LocationUpdate.objects.filter(
-            driver=driver,
-            timestamp__gte=session.started_at
-        ).aggregate(avg_accuracy=Avg('accuracy'))['avg_accuracy']
+        return updates
+    
+    @staticmethod
+    def _update_tracking_session(driver, location_updates):
+        """
+        Update or create tracking session with new location updates (oldest first)
+        
+        Statistics are maintained as running aggregates (accuracy sum/count,
+        last point, cumulative distance), so each update costs O(1) instead
+        of re-reading the whole session. Falls back to a full recomputation
+        when a point arrives older than the last one already counted, or for
+        sessions created before the running aggregates existed.
         
-        session.average_accuracy = avg_accuracy
+        The active session is read and saved under a row lock, so a live
+        ping and a batch upload for the same driver cannot overwrite each
+        other's totals.
+        """
+        with transaction.atomic():
+            session = GPSTrackingService._lock_active_session(driver)
+            if not session:
+                session = LocationTrackingSession.objects.create(
+                    driver=driver,
+                    started_at=min(timezone.now(), location_updates[0].timestamp),
+                    initial_battery_level=location_updates[0].battery_level
+                )
+            
+            # Points recorded before the session started are not part of it
+            location_updates = [
+                update for update in location_updates
+                if update.timestamp >= session.started_at
+            ]
+            if not location_updates:
+                return session
+            
+            legacy = session.last_timestamp is None and session.total_updates > 0
+            out_of_order = (
+                session.last_timestamp is not None
+                and location_updates[0].timestamp < session.last_timestamp
+            )
+            if legacy or out_of_order:
+                # The new points are already stored: rebuild from history
+                return GPSTrackingService.recompute_session_statistics(session)
+            
+            GPSTrackingService._accumulate_session(session, (
+                (update.latitude, update.longitude, update.accuracy,
+                 update.battery_level, update.timestamp)
+                for update in location_updates
+            ))
+            session.save()
+            return session
+    
+    @staticmethod
+    def _lock_active_session(driver):
+        """
+        Active session of the driver, locked until the end of the transaction
         
-        # Calculate total distance
-        session.total_distance_km = GPSTrackingService._calculate_session_distance(
-            driver, session
+        When there is none, the driver row is locked before looking again, so
+        two concurrent updates cannot both open a session.
+        """
+        active = LocationTrackingSession.objects.select_for_update().filter(
+            driver=driver,
+            ended_at__isnull=True
         )
+        session = active.first()
+        if session is None:
+            list(Driver.objects.select_for_update().filter(pk=driver.pk).values_list('pk'))
+            session = active.first()
+        return session
+    
+    @staticmethod
+    def _accumulate_session(session, points):
+        """
+        Fold points into the session's running aggregates
         
-        session.save()
+        Args:
+            session: LocationTrackingSession instance
+            points: Iterable of (latitude, longitude, accuracy, battery_level,
+                timestamp) tuples, ordered by timestamp
+        """
+        for latitude, longitude, accuracy, battery_level, timestamp in points:
+            current_coords = (float(latitude), float(longitude))
+            if session.last_latitude is not None:
+                previous_coords = (session.last_latitude, session.last_longitude)
+                session.total_distance_km += geodesic(previous_coords, current_coords).kilometers
+            session.last_latitude, session.last_longitude = current_coords
+            session.last_timestamp = timestamp
+            
+            if accuracy is not None:
+                session.accuracy_sum += accuracy
+                session.accuracy_count += 1
+            
+            session.total_updates += 1
+            session.final_battery_level = battery_level
+        
+        session.average_accuracy = (
+            session.accuracy_sum / session.accuracy_count
+            if session.accuracy_count else None
+        )
     
     @staticmethod
-    def _calculate_session_distance(driver, session):
-        """Calculate total distance traveled during session"""
+    def recompute_session_statistics(session, save=True):
+        """
+        Rebuild a session's statistics from its location history
+        
+        Used as a fallback by the incremental path and by the
+        `recompute_tracking_sessions` repair command.
+        
+        Args:
+            session: LocationTrackingSession instance
+            save: Persist the recomputed statistics
+            
+        Returns:
+            LocationTrackingSession: The updated session
+        """
         updates = LocationUpdate.objects.filter(
-            driver=driver,
+            driver_id=session.driver_id,
             timestamp__gte=session.started_at
-        ).order_by('timestamp')
+        )
+        if session.ended_at:
+            updates = updates.filter(timestamp__lte=session.ended_at)
         
-        total_distance = 0.0
-        previous_coords = None
+        session.total_updates = 0
+        session.total_distance_km = 0.0
+        session.accuracy_sum = 0.0
+        session.accuracy_count = 0
+        session.last_latitude = session.last_longitude = session.last_timestamp = None
         
-        for update in updates:
-            current_coords = update.coordinates
-            if previous_coords:
-                distance_km = geodesic(previous_coords, current_coords).kilometers
-                total_distance += distance_km
-            previous_coords = current_coords
+        points = updates.order_by('timestamp', 'id').values_list(
+            'latitude', 'longitude', 'accuracy', 'battery_level', 'timestamp'
+        ).iterator(chunk_size=2000)
+        first = next(points, None)
+        if first is not None:
+            session.initial_battery_level = first[3]
+            GPSTrackingService._accumulate_session(session, itertools.chain([first], points))
+        else:
+            session.average_accuracy = None
         
-        return total_distance
+        if save:
+            session.save()
+        return session
     
     @staticmethod
     def end_tracking_session(driver):
         """End current tracking session"""
-        session = LocationTrackingSession.objects.filter(
-            driver=driver,
-            ended_at__isnull=True
-        ).first()
-        
-        if session:
-            session.ended_at = timezone.now()
-            session.save()
+        with transaction.atomic():
+            session = LocationTrackingSession.objects.select_for_update().filter(
+                driver=driver,
+                ended_at__isnull=True
+            ).first()
+            if session:
+                session.ended_at = timezone.now()
+                session.save()
+                
+                # Compact archive of the finished shift (see track_archive.py)
+                session_id = session.id
+                transaction.on_commit(lambda: GPSTrackingService._queue_archive(session_id))
+    
+    @staticmethod
+    def _queue_archive(session_id):
+        """Queue the archive task; the session is already closed, so never raise"""
+        from .tasks import archive_tracking_sessions
+        try:
+            archive_tracking_sessions.delay(session_id)
+        except Exception as e:
+            logger.warning(f"Archive of tracking session {session_id} not queued: {e}")
     
     @staticmethod
     def get_location_history(driver, start_date=None, end_date=None, limit=100):
@@ -187,10 +363,14 @@ class GPSTrackingService:
         """
         cutoff_date = timezone.now() - timedelta(days=days_to_keep)
         
-        # Delete old location updates
-        deleted_count = LocationUpdate.objects.filter(
-            timestamp__lt=cutoff_date
-        ).delete()[0]
+        # Delete old location updates: drop whole partitions when the table
+        # is partitioned (PostgreSQL), plain DELETE otherwise
+        if partitioning.is_partitioned():
+            deleted_count = partitioning.drop_expired_partitions(cutoff_date)
+        else:
+            deleted_count = LocationUpdate.objects.filter(
+                timestamp__lt=cutoff_date
+            ).delete()[0]
         
         # Delete old completed sessions
         LocationTrackingSession.objects.filter(
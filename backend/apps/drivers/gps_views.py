@@ -13,11 +13,13 @@ from .gps_tracking_service import GPSTrackingService
 from .gps_serializers import (
     LocationUpdateSerializer,
     LocationUpdateCreateSerializer,
+    LocationBatchCreateSerializer,
     TrackingIntervalSerializer,
     TrackingSessionSerializer,
     TrackingStatisticsSerializer,
+    ArchivedTrackSerializer,
 )
-from .location_models import LocationUpdate, LocationTrackingSession
+from .location_models import ArchivedTrack, LocationUpdate, LocationTrackingSession
 
 
 class GPSTrackingViewSet(ViewSet):
@@ -94,6 +96,66 @@ class GPSTrackingViewSet(ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @action(detail=False, methods=['post'])
+    def update_location_batch(self, request):
+        """
+        Upload a batch of location updates buffered while offline
+        
+        POST /api/v1/drivers/gps/update-location-batch/
+        
+        Body:
+        {
+            "points": [
+                {"latitude": 5.3599, "longitude": -3.9615, "speed": 5.2,
+                 "accuracy": 8.0, "battery_level": 80, "timestamp": "2024-11-06T10:30:00Z"},
+                ...
+            ]
+        }
+        
+        All points are validated before anything is written: one invalid
+        point rejects the whole batch (errors are indexed like the input).
+        """
+        try:
+            driver = request.user.driver_profile
+        except AttributeError:
+            return Response(
+                {'error': 'Driver profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        serializer = LocationBatchCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            updates = GPSTrackingService.ingest_location_batch(
+                driver,
+                serializer.validated_data['points']
+            )
+            latest = updates[-1]
+            
+            interval = GPSTrackingService.get_tracking_interval(
+                driver.availability_status,
+                latest.is_moving
+            )
+            
+            return Response({
+                'success': True,
+                'count': len(updates),
+                'first_timestamp': updates[0].timestamp,
+                'last_location': LocationUpdateSerializer(latest).data,
+                'next_update_interval_seconds': interval,
+            }, status=status.HTTP_201_CREATED)
+            
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to store location batch: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
     @action(detail=False, methods=['get'])
     def get_interval(self, request):
         """
@@ -109,9 +171,12 @@ class GPSTrackingViewSet(ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Get latest location to determine if moving
+        # Get latest location to determine if moving (last 24h only: an older
+        # fix says nothing about the current movement, and the time bound lets
+        # PostgreSQL prune the older location partitions)
         latest_location = LocationUpdate.objects.filter(
-            driver=driver
+            driver=driver,
+            timestamp__gte=timezone.now() - timedelta(days=1)
         ).first()
         
         is_moving = latest_location.is_moving if latest_location else False
@@ -205,6 +270,42 @@ class GPSTrackingViewSet(ViewSet):
             'sessions': serializer.data,
         })
     
+    @action(detail=False, methods=['get'])
+    def tracks(self, request):
+        """
+        Get archived tracks (whole finished shifts)
+        
+        GET /api/v1/drivers/gps/tracks/?days=30
+        GET /api/v1/drivers/gps/tracks/?session=42&decode=true
+        
+        Tracks are served as an encoded polyline (precision given per track)
+        plus millisecond time offsets encoded the same way (deltas).
+        decode=true adds the decoded [lat, lon, timestamp] points.
+        """
+        try:
+            driver = request.user.driver_profile
+        except AttributeError:
+            return Response(
+                {'error': 'Driver profile not found'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        tracks = ArchivedTrack.objects.filter(driver=driver)
+        
+        session_id = request.query_params.get('session')
+        if session_id:
+            tracks = tracks.filter(session_id=session_id)
+        else:
+            days = int(request.query_params.get('days', 7))
+            tracks = tracks.filter(started_at__gte=timezone.now() - timedelta(days=days))
+        
+        decode = request.query_params.get('decode', '').lower() in ('1', 'true', 'yes')
+        serializer = ArchivedTrackSerializer(tracks, many=True, context={'decode': decode})
+        return Response({
+            'count': len(serializer.data),
+            'tracks': serializer.data,
+        })
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
         """
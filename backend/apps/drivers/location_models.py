@@ -117,6 +117,23 @@ class LocationTrackingSession(models.Model):
         help_text='Distance totale parcourue pendant la session'
     )
     
+    # Running aggregates (incremental statistics, O(1) per location update)
+    accuracy_sum = models.FloatField(
+        default=0.0,
+        help_text='Somme des précisions GPS reçues (mètres)'
+    )
+    accuracy_count = models.IntegerField(
+        default=0,
+        help_text='Nombre de mises à jour avec une précision GPS'
+    )
+    last_latitude = models.FloatField(null=True, blank=True)
+    last_longitude = models.FloatField(null=True, blank=True)
+    last_timestamp = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Horodatage du dernier point pris en compte'
+    )
+    
     # Session metadata
     initial_battery_level = models.IntegerField(null=True, blank=True)
     final_battery_level = models.IntegerField(null=True, blank=True)
@@ -145,3 +162,61 @@ class LocationTrackingSession(models.Model):
         if self.initial_battery_level and self.final_battery_level:
             return self.initial_battery_level - self.final_battery_level
         return None
+
+
+class ArchivedTrack(models.Model):
+    """
+    Compact archive of a finished tracking session (see track_archive.py)
+    
+    Stores the simplified track as an encoded polyline plus delta-encoded
+    timestamp offsets, and outlives the raw LocationUpdate rows purged by
+    retention.
+    """
+    session = models.OneToOneField(
+        LocationTrackingSession,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_track'
+    )
+    driver = models.ForeignKey(
+        Driver,
+        on_delete=models.CASCADE,
+        related_name='archived_tracks'
+    )
+    
+    started_at = models.DateTimeField(
+        db_index=True,
+        help_text='Horodatage du premier point'
+    )
+    ended_at = models.DateTimeField(help_text='Horodatage du dernier point')
+    
+    # Encoded track
+    polyline = models.TextField(
+        blank=True,
+        help_text='Points conservés, polyline encodée (format Google)'
+    )
+    time_offsets = models.TextField(
+        blank=True,
+        help_text='Écarts en millisecondes entre points successifs (encodage polyline)'
+    )
+    precision = models.PositiveSmallIntegerField(default=6)
+    tolerance_m = models.FloatField(help_text='Tolérance de simplification en mètres')
+    
+    # Statistics
+    original_points = models.IntegerField(default=0)
+    stored_points = models.IntegerField(default=0)
+    total_distance_km = models.FloatField(default=0.0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['driver', '-started_at']),
+        ]
+        verbose_name = 'Archived Track'
+        verbose_name_plural = 'Archived Tracks'
+    
+    def __str__(self):
+        return f"{self.driver.user.get_full_name()} - Track {self.started_at}"
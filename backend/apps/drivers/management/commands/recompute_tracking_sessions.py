@@ -0,0 +1,40 @@
+# backend/apps/drivers/management/commands/recompute_tracking_sessions.py
+from django.core.management.base import BaseCommand
+
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.location_models import LocationTrackingSession
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcule les statistiques des sessions de suivi GPS (agrégats incrémentaux, '
+        'distance, précision moyenne) depuis l\'historique des positions'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--driver', help='ID du livreur (défaut: tous)')
+        parser.add_argument('--active-only', action='store_true', help='Uniquement les sessions en cours')
+        parser.add_argument('--dry-run', action='store_true', help='Affiche les écarts sans rien enregistrer')
+
+    def handle(self, *args, **options):
+        sessions = LocationTrackingSession.objects.order_by('pk')
+        if options['driver']:
+            sessions = sessions.filter(driver_id=options['driver'])
+        if options['active_only']:
+            sessions = sessions.filter(ended_at__isnull=True)
+
+        checked = changed = 0
+        for session in sessions.iterator(chunk_size=500):
+            before = (session.total_updates, round(session.total_distance_km, 6))
+            GPSTrackingService.recompute_session_statistics(session, save=not options['dry_run'])
+            after = (session.total_updates, round(session.total_distance_km, 6))
+            checked += 1
+            if before != after:
+                changed += 1
+                self.stdout.write(
+                    f'🔧 Session {session.pk}: {before[0]} → {after[0]} points, '
+                    f'{before[1]:.3f} → {after[1]:.3f} km'
+                )
+
+        verb = 'à corriger' if options['dry_run'] else 'corrigées'
+        self.stdout.write(self.style.SUCCESS(f'\n🎉 {checked} sessions vérifiées, {changed} {verb}'))
@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+def backfill_keys(apps, schema_editor):
+    from apps.deliveries.commune_keys import backfill_driver_zone_commune_keys
+
+    updated = backfill_driver_zone_commune_keys(apps.get_model('drivers', 'DriverZone'))
+    print(f'DriverZone commune keys filled: {updated}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0010_normalize_driverzone_communes_fuzzy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='driverzone',
+            name='commune_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Commune normalisée (normalize_commune_name), maintenue au save()', max_length=100),
+        ),
+        migrations.RunPython(backfill_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0011_driverzone_commune_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='locationtrackingsession',
+            name='accuracy_sum',
+            field=models.FloatField(default=0.0, help_text='Somme des précisions GPS reçues (mètres)'),
+        ),
+        migrations.AddField(
+            model_name='locationtrackingsession',
+            name='accuracy_count',
+            field=models.IntegerField(default=0, help_text='Nombre de mises à jour avec une précision GPS'),
+        ),
+        migrations.AddField(
+            model_name='locationtrackingsession',
+            name='last_latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='locationtrackingsession',
+            name='last_longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='locationtrackingsession',
+            name='last_timestamp',
+            field=models.DateTimeField(blank=True, help_text='Horodatage du dernier point pris en compte', null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def partition_location_updates(apps, schema_editor):
+    from apps.drivers.partitioning import partition_location_updates
+
+    if partition_location_updates(schema_editor.connection):
+        print('drivers_locationupdate partitioned by day')
+
+
+class Migration(migrations.Migration):
+    """
+    PostgreSQL: partitionne drivers_locationupdate par jour (voir apps/drivers/partitioning.py).
+    Les données existantes sont conservées dans la partition legacy (pas de copie).
+    Aucune opération sur les autres bases (SQLite).
+    """
+
+    dependencies = [
+        ('drivers', '0012_trackingsession_running_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_location_updates, migrations.RunPython.noop),
+    ]
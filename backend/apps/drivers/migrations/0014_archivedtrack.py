@@ -0,0 +1,36 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('drivers', '0013_partition_locationupdate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTrack',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(db_index=True, help_text='Horodatage du premier point')),
+                ('ended_at', models.DateTimeField(help_text='Horodatage du dernier point')),
+                ('polyline', models.TextField(blank=True, help_text='Points conservés, polyline encodée (format Google)')),
+                ('time_offsets', models.TextField(blank=True, help_text='Écarts en millisecondes entre points successifs (encodage polyline)')),
+                ('precision', models.PositiveSmallIntegerField(default=6)),
+                ('tolerance_m', models.FloatField(help_text='Tolérance de simplification en mètres')),
+                ('original_points', models.IntegerField(default=0)),
+                ('stored_points', models.IntegerField(default=0)),
+                ('total_distance_km', models.FloatField(default=0.0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('driver', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tracks', to='drivers.driver')),
+                ('session', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_track', to='drivers.locationtrackingsession')),
+            ],
+            options={
+                'verbose_name': 'Archived Track',
+                'verbose_name_plural': 'Archived Tracks',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['driver', '-started_at'], name='drivers_arc_driver__a72d6d_idx')],
+            },
+        ),
+    ]
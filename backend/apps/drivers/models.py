@@ -203,6 +203,7 @@ class DriverZone(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     driver = models.ForeignKey(Driver, on_delete=models.CASCADE, related_name='zones')
     commune = models.CharField(max_length=100)
+    commune_key = models.CharField(max_length=100, blank=True, db_index=True, editable=False, help_text="Commune normalisée (normalize_commune_name), maintenue au save()")
     priority = models.IntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -228,6 +229,7 @@ class DriverZone(models.Model):
         try:
             from apps.core.quartiers_data import get_communes_list
         except Exception:
+            self.update_commune_key()
             return super().save(*args, **kwargs)
 
         raw = (self.commune or '').strip()
@@ -249,4 +251,11 @@ class DriverZone(models.Model):
             })
 
         self.commune = commune_normalized
+        self.update_commune_key()
         return super().save(*args, **kwargs)
+
+    def update_commune_key(self):
+        """Clé de comparaison avec `Delivery.pickup_commune_key` (normalize_commune_name)"""
+        from apps.pricing.calculator import normalize_commune_name
+
+        self.commune_key = normalize_commune_name(self.commune)
@@ -0,0 +1,313 @@
+"""
+Time-partitioned storage for LocationUpdate (PostgreSQL only)
+
+drivers_locationupdate is partitioned by RANGE ("timestamp") with one
+partition per UTC day, so retention drops whole partitions instead of
+running a huge DELETE, and time-bounded history queries only touch the
+partitions they need (partition pruning).
+
+Partitions:
+- drivers_locationupdate_pYYYYMMDD: [day 00:00 UTC, next day 00:00 UTC)
+- drivers_locationupdate_legacy: rows stored before partitioning
+  (migration 0013), [MINVALUE, cutover)
+- drivers_locationupdate_default: fixes falling outside every partition
+  (device clock skew)
+
+Daily partitions are created ahead of time by the `drivers.ensure_gps_partitions`
+task. On other backends (SQLite in development and tests) the table stays a
+regular table and these helpers are no-ops.
+"""
+import logging
+import re
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import connection as default_connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'drivers_locationupdate'
+LEGACY_PARTITION = f'{TABLE}_legacy'
+DEFAULT_PARTITION = f'{TABLE}_default'
+SEQUENCE = f'{TABLE}_pk_seq'
+
+# Daily partitions created ahead of the current day
+DAYS_AHEAD = 7
+
+_BOUND_RE = re.compile(r"FOR VALUES FROM \((.+?)\) TO \((.+?)\)")
+
+
+def partition_name(day):
+    """Name of the daily partition holding `day` (a date)"""
+    return f'{TABLE}_p{day:%Y%m%d}'
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _literal(value):
+    """SQL literal for a partition bound (DDL does not accept query parameters)"""
+    return f"'{value.isoformat(sep=' ')}'"
+
+
+def _parse_bound(value):
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def is_partitioned(connection=None):
+    """True when drivers_locationupdate is a partitioned (PostgreSQL) table"""
+    connection = connection or default_connection
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(connection=None):
+    """
+    List partitions of drivers_locationupdate
+
+    Returns:
+        list: dicts with name, lower, upper (aware datetimes, None for
+            MINVALUE / MAXVALUE) and is_default, ordered by lower bound
+    """
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            """,
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound)
+        partitions.append({
+            'name': name,
+            'lower': _parse_bound(match.group(1)) if match else None,
+            'upper': _parse_bound(match.group(2)) if match else None,
+            'is_default': bound == 'DEFAULT',
+        })
+    partitions.sort(key=lambda p: (
+        p['is_default'], p['lower'] or datetime.min.replace(tzinfo=dt_timezone.utc)
+    ))
+    return partitions
+
+
+def _overlaps(partition, start, end):
+    if partition['is_default']:
+        return False
+    lower, upper = partition['lower'], partition['upper']
+    return (lower is None or lower < end) and (upper is None or upper > start)
+
+
+def _attach_day(cursor, qn, day, has_default):
+    """
+    Create the partition for `day` as a standalone table, move the matching
+    rows out of the default partition, then ATTACH it (lighter lock on the
+    parent than CREATE TABLE ... PARTITION OF)
+    """
+    name = partition_name(day)
+    start, end = _day_start(day), _day_start(day + timedelta(days=1))
+
+    cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS)')
+    if has_default:
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {qn(DEFAULT_PARTITION)}
+                WHERE "timestamp" >= %s AND "timestamp" < %s
+                RETURNING *
+            )
+            INSERT INTO {qn(name)} SELECT * FROM moved
+            """,
+            [start, end]
+        )
+    cursor.execute(
+        f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} '
+        f'FOR VALUES FROM ({_literal(start)}) TO ({_literal(end)})'
+    )
+    return name
+
+
+def ensure_partitions(days_ahead=DAYS_AHEAD, today=None, connection=None):
+    """
+    Create missing daily partitions from today to today + days_ahead
+
+    Days already covered (legacy partition, existing daily partitions) are
+    skipped, so the function is idempotent.
+
+    Returns:
+        list: Names of the partitions created
+    """
+    connection = connection or default_connection
+    if not is_partitioned(connection):
+        return []
+
+    today = today or timezone.now().astimezone(dt_timezone.utc).date()
+    partitions = list_partitions(connection)
+    has_default = any(p['is_default'] for p in partitions)
+    qn = connection.ops.quote_name
+
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(days_ahead + 1):
+            day = today + timedelta(days=offset)
+            start, end = _day_start(day), _day_start(day + timedelta(days=1))
+            if any(_overlaps(p, start, end) for p in partitions):
+                continue
+            created.append(_attach_day(cursor, qn, day, has_default))
+
+    if created:
+        logger.info("Created %d location partitions: %s", len(created), ', '.join(created))
+    return created
+
+
+def drop_expired_partitions(cutoff, connection=None):
+    """
+    Apply retention: drop every partition entirely older than `cutoff`
+
+    A daily partition is dropped once its upper bound is <= cutoff (history
+    is kept up to one extra day). Rows older than cutoff in the legacy and
+    default partitions are deleted; the legacy partition is dropped as a
+    whole once its cutover is past.
+
+    Returns:
+        int: Number of location rows removed
+    """
+    connection = connection or default_connection
+    qn = connection.ops.quote_name
+    removed = 0
+
+    with connection.cursor() as cursor:
+        # DROP TABLE refuses partitions with pending deferred FK checks
+        # (rows written earlier in the same transaction)
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        for partition in list_partitions(connection):
+            name = partition['name']
+            if not partition['is_default'] and partition['upper'] is not None \
+                    and partition['upper'] <= cutoff:
+                cursor.execute(f'SELECT count(*) FROM {qn(name)}')
+                removed += cursor.fetchone()[0]
+                cursor.execute(f'DROP TABLE {qn(name)}')
+                logger.info("Dropped location partition %s", name)
+            elif partition['is_default'] or partition['lower'] is None:
+                cursor.execute(
+                    f'DELETE FROM {qn(name)} WHERE "timestamp" < %s',
+                    [cutoff]
+                )
+                removed += cursor.rowcount
+
+    return removed
+
+
+def partition_location_updates(connection, days_ahead=DAYS_AHEAD):
+    """
+    Convert drivers_locationupdate into a partitioned table (migration 0013)
+
+    The existing table is not copied: it is renamed and attached as the
+    legacy partition covering [MINVALUE, cutover), cutover being the day
+    after the newest stored fix. It is dropped instead when empty. Index
+    names, the driver foreign key and the id sequence are carried over to
+    the partitioned parent, whose primary key becomes (id, timestamp) as
+    required by PostgreSQL.
+
+    Returns:
+        bool: False when nothing was done (other backend, already partitioned)
+    """
+    if connection.vendor != 'postgresql' or is_partitioned(connection):
+        return False
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexname, indexdef FROM pg_indexes "
+            "WHERE tablename = %s AND schemaname = current_schema()",
+            [TABLE]
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, contype, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype IN ('p', 'f')",
+            [TABLE]
+        )
+        constraints = cursor.fetchall()
+        primary_keys = [name for name, kind, _ in constraints if kind == 'p']
+        foreign_keys = [(name, definition) for name, kind, definition in constraints if kind == 'f']
+        cursor.execute(
+            "SELECT attidentity FROM pg_attribute "
+            "WHERE attrelid = to_regclass(%s) AND attname = 'id'",
+            [TABLE]
+        )
+        is_identity = cursor.fetchone()[0] != ''
+
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(LEGACY_PARTITION)}')
+        # The (id, timestamp) primary key of the parent replaces the legacy one
+        for constraint_name in primary_keys:
+            cursor.execute(
+                f'ALTER TABLE {qn(LEGACY_PARTITION)} DROP CONSTRAINT {qn(constraint_name)}'
+            )
+        indexes = [(name, definition) for name, definition in indexes if name not in primary_keys]
+        # Free the index names (schema-wide) for the partitioned parent
+        for index_name, _ in indexes:
+            cursor.execute(
+                f'ALTER INDEX {qn(index_name)} RENAME TO {qn(("lg_" + index_name)[:63])}'
+            )
+        if is_identity:
+            cursor.execute(f'ALTER TABLE {qn(LEGACY_PARTITION)} ALTER COLUMN id DROP IDENTITY')
+        else:
+            cursor.execute(f'ALTER TABLE {qn(LEGACY_PARTITION)} ALTER COLUMN id DROP DEFAULT')
+
+        cursor.execute(f'SELECT max(id), max("timestamp") FROM {qn(LEGACY_PARTITION)}')
+        max_id, max_timestamp = cursor.fetchone()
+
+        cursor.execute(
+            f'CREATE TABLE {qn(TABLE)} (LIKE {qn(LEGACY_PARTITION)}) '
+            f'PARTITION BY RANGE ("timestamp")'
+        )
+        cursor.execute(f'CREATE SEQUENCE {qn(SEQUENCE)} OWNED BY {qn(TABLE)}.id')
+        cursor.execute("SELECT setval(%s, %s, %s)", [SEQUENCE, max_id or 1, max_id is not None])
+        cursor.execute(
+            f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')"
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_pkey")} '
+            f'PRIMARY KEY (id, "timestamp")'
+        )
+        for constraint_name, definition in foreign_keys:
+            cursor.execute(
+                f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(constraint_name)} {definition}'
+            )
+        for index_name, definition in indexes:
+            columns = definition[definition.index(' USING '):]
+            cursor.execute(f'CREATE INDEX {qn(index_name)} ON {qn(TABLE)}{columns}')
+
+        if max_timestamp is not None:
+            newest_day = max_timestamp.astimezone(dt_timezone.utc).date()
+            today = timezone.now().astimezone(dt_timezone.utc).date()
+            cutover = _day_start(max(newest_day, today) + timedelta(days=1))
+            cursor.execute(
+                f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(LEGACY_PARTITION)} '
+                f'FOR VALUES FROM (MINVALUE) TO ({_literal(cutover)})'
+            )
+        else:
+            cursor.execute(f'DROP TABLE {qn(LEGACY_PARTITION)}')
+
+        cursor.execute(
+            f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(TABLE)} DEFAULT'
+        )
+
+    ensure_partitions(days_ahead=days_ahead, connection=connection)
+    return True
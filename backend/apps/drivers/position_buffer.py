@@ -0,0 +1,308 @@
+"""
+Write-behind Buffer for Driver Positions
+Keeps the latest GPS position of each driver out of the hot `drivers` rows:
+pings are recorded in a buffer, served from it immediately, and flushed to
+PostgreSQL as one coalesced bulk UPDATE per interval instead of one UPDATE
+per ping (those contended with the assignment transactions that
+select_for_update the same rows).
+
+Backends (DRIVER_POSITION_BUFFER setting):
+- 'auto' (default): Redis when the project has one (django-redis cache or
+  REDIS_URL, see apps/core/redis_connection.py), direct writes otherwise
+  (development, tests).
+- 'redis': Redis hash shared by every gunicorn worker and Celery process.
+- 'memory': in-process dict, for single-process deployments only (flushed
+  by the pings of the process itself and at exit, not by Celery).
+- 'off': direct writes (previous behaviour).
+
+Guarantees:
+- Staleness: the `drivers.flush_driver_positions` task flushes every
+  DRIVER_POSITION_FLUSH_SECONDS (5 s). If it falls behind, the next ping
+  flushes inline once the oldest buffered position is older than
+  DRIVER_POSITION_MAX_STALENESS_SECONDS (30 s).
+- Crash-safe replay: a flush first moves the pending positions to a
+  separate "flushing" set, which is only deleted after the UPDATE commits.
+  A flush interrupted by a crash or a database error leaves it in place;
+  the next flush replays it before taking newer positions.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class _MemoryBackend:
+    """In-process buffer: driver id -> latest position"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}
+        self._flushing: Dict[str, dict] = {}
+        self._pending_since = None
+        self._flush_lock = threading.Lock()
+
+    def record(self, driver_id, entry):
+        """Store the position, return the time the oldest pending one was buffered"""
+        with self._lock:
+            self._pending[driver_id] = entry
+            if self._pending_since is None:
+                self._pending_since = time.time()
+            return self._pending_since
+
+    def get(self, driver_id):
+        with self._lock:
+            entry = self._pending.get(driver_id) or self._flushing.get(driver_id)
+        return dict(entry) if entry else None
+
+    def take(self):
+        """Positions to write: the unacknowledged batch first, else the pending ones"""
+        with self._lock:
+            if not self._flushing:
+                self._flushing, self._pending = self._pending, {}
+                self._pending_since = None
+            return dict(self._flushing)
+
+    def ack(self):
+        with self._lock:
+            self._flushing = {}
+
+    def flush_lock(self):
+        return self._flush_lock
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._flushing.clear()
+            self._pending_since = None
+
+
+class _RedisBackend:
+    """Redis hashes shared by all processes (survive worker crashes)"""
+
+    PENDING_KEY = 'drivers:positions:pending'
+    FLUSHING_KEY = 'drivers:positions:flushing'
+    SINCE_KEY = 'drivers:positions:pending-since'
+    LOCK_KEY = 'drivers:positions:flush-lock'
+    LOCK_TIMEOUT = 60
+
+    def __init__(self, connection):
+        self.redis = connection
+
+    def record(self, driver_id, entry):
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.hset(self.PENDING_KEY, driver_id, json.dumps(entry))
+        pipe.set(self.SINCE_KEY, time.time(), nx=True)
+        pipe.get(self.SINCE_KEY)
+        since = pipe.execute()[-1]
+        return float(since) if since else None
+
+    def get(self, driver_id):
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hget(self.PENDING_KEY, driver_id)
+        pipe.hget(self.FLUSHING_KEY, driver_id)
+        pending, flushing = pipe.execute()
+        raw = pending or flushing
+        return json.loads(raw) if raw else None
+
+    def take(self):
+        if not self.redis.exists(self.FLUSHING_KEY):
+            # RENAMENX + DEL atomiques : un ping concurrent tombe soit dans le
+            # lot renommé, soit dans un nouveau lot en attente
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.renamenx(self.PENDING_KEY, self.FLUSHING_KEY)
+            pipe.delete(self.SINCE_KEY)
+            renamed, _ = pipe.execute(raise_on_error=False)
+            if isinstance(renamed, Exception):
+                # Aucune position en attente
+                return {}
+        raw = self.redis.hgetall(self.FLUSHING_KEY)
+        return {
+            (key.decode() if isinstance(key, bytes) else key): json.loads(value)
+            for key, value in raw.items()
+        }
+
+    def ack(self):
+        self.redis.delete(self.FLUSHING_KEY)
+
+    def flush_lock(self):
+        return self.redis.lock(self.LOCK_KEY, timeout=self.LOCK_TIMEOUT)
+
+    def clear(self):
+        self.redis.delete(self.PENDING_KEY, self.FLUSHING_KEY, self.SINCE_KEY)
+
+
+class DriverPositionBuffer:
+    """
+    Latest position of each driver, written behind to the `drivers` table.
+
+    Usage:
+        driver_position_buffer.record(driver, lat, lon, timestamp)
+        driver_position_buffer.current_position(driver)  # (lat, lon)
+        driver_position_buffer.flush()  # Celery task, every few seconds
+    """
+
+    FLUSH_INTERVAL_SECONDS = getattr(settings, 'DRIVER_POSITION_FLUSH_SECONDS', 5)
+    MAX_STALENESS_SECONDS = getattr(settings, 'DRIVER_POSITION_MAX_STALENESS_SECONDS', 30)
+    BATCH_SIZE = 500
+
+    def __init__(self, backend=_UNSET):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+
+    @property
+    def backend(self):
+        """Buffer backend, None when positions are written directly"""
+        if self._backend is _UNSET:
+            with self._backend_lock:
+                if self._backend is _UNSET:
+                    self._backend = self._build_backend()
+        return self._backend
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _build_backend(self):
+        mode = getattr(settings, 'DRIVER_POSITION_BUFFER', 'auto')
+        if mode == 'off':
+            return None
+        if mode == 'memory':
+            backend = _MemoryBackend()
+            # Ne pas perdre les dernières positions à l'arrêt du process
+            atexit.register(self.flush)
+            return backend
+
+        from apps.core.redis_connection import shared_redis
+
+        connection = shared_redis()
+        if connection is not None:
+            return _RedisBackend(connection)
+        if mode == 'redis':
+            logger.warning("DriverPositionBuffer: Redis non configuré, écriture directe des positions")
+        return None
+
+    def record(self, driver, latitude, longitude, timestamp=None):
+        """
+        Set the driver's current position.
+
+        The instance is updated in memory; the row is written by the next
+        flush (or right away when the buffer is disabled or unreachable).
+
+        Returns:
+            bool: True if the position was buffered, False if written directly
+        """
+        driver.current_latitude = latitude
+        driver.current_longitude = longitude
+
+        backend = self.backend
+        if backend is not None:
+            timestamp = timestamp or timezone.now()
+            try:
+                since = backend.record(str(driver.id), {
+                    'lat': str(latitude),
+                    'lon': str(longitude),
+                    'ts': timestamp.timestamp(),
+                })
+            except Exception as e:
+                logger.warning(f"DriverPositionBuffer: buffer indisponible pour {driver.id} ({e}), écriture directe")
+            else:
+                if since and time.time() - since > self.MAX_STALENESS_SECONDS:
+                    # Le flush périodique est en retard : garantir la fraîcheur de la base
+                    self.flush()
+                return True
+
+        driver.save(update_fields=['current_latitude', 'current_longitude', 'updated_at'])
+        return False
+
+    def get_position(self, driver_id) -> Optional[dict]:
+        """Buffered position {'lat', 'lon', 'ts'} (floats) not yet flushed, or None"""
+        backend = self.backend
+        if backend is None:
+            return None
+        try:
+            entry = backend.get(str(driver_id))
+        except Exception:
+            return None
+        if not entry:
+            return None
+        return {'lat': float(entry['lat']), 'lon': float(entry['lon']), 'ts': entry['ts']}
+
+    def current_position(self, driver):
+        """
+        Freshest known (latitude, longitude) of a driver instance: the
+        buffered position if any, else the one stored on the row
+        """
+        entry = self.get_position(driver.id)
+        if entry:
+            return entry['lat'], entry['lon']
+        return driver.current_latitude, driver.current_longitude
+
+    def flush(self):
+        """
+        Write buffered positions to the database (one bulk UPDATE per batch).
+
+        Only one flush runs at a time across processes. On failure the
+        positions are kept and replayed by the next flush.
+
+        Returns:
+            int: Number of driver rows written
+        """
+        backend = self.backend
+        if backend is None:
+            return 0
+
+        lock = backend.flush_lock()
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            batch = backend.take()
+            if not batch:
+                return 0
+            self._write(batch)
+            backend.ack()
+            return len(batch)
+        except Exception as e:
+            logger.error(f"DriverPositionBuffer: échec du flush ({e}), positions conservées pour le prochain essai")
+            return 0
+        finally:
+            try:
+                lock.release()
+            except Exception:
+                pass
+
+    def _write(self, batch):
+        from .models import Driver
+
+        drivers = [
+            Driver(
+                id=driver_id,
+                current_latitude=Decimal(entry['lat']),
+                current_longitude=Decimal(entry['lon']),
+                updated_at=datetime.fromtimestamp(entry['ts'], tz=dt_timezone.utc),
+            )
+            # Ordre stable des verrous de lignes entre flushs concurrents
+            for driver_id, entry in sorted(batch.items())
+        ]
+        Driver.objects.bulk_update(
+            drivers,
+            ['current_latitude', 'current_longitude', 'updated_at'],
+            batch_size=self.BATCH_SIZE
+        )
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+
+driver_position_buffer = DriverPositionBuffer()
@@ -1,5 +1,5 @@
 # backend/apps/drivers/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from apps.authentication.models import User
 from .models import Driver
@@ -26,3 +26,26 @@ def create_driver_profile(sender, instance, created, **kwargs):
             logger.info(f"[SIGNAL] Profil Driver créé automatiquement pour {instance.email} (user_id={instance.id})")
         except Exception as e:
             logger.error(f"[SIGNAL] Erreur création profil Driver pour {instance.email} (user_id={instance.id}): {e}")
+
+
+# Champs mis à jour par les endpoints de position : ils alimentent l'index
+# géospatial directement, inutile de le resynchroniser ici.
+_LOCATION_ONLY_FIELDS = {'current_latitude', 'current_longitude', 'updated_at'}
+
+
+@receiver(post_save, sender=Driver)
+def sync_driver_geo_index(sender, instance, update_fields=None, **kwargs):
+    """
+    Maintient l'index géospatial des livreurs en ligne à jour lors des
+    changements de disponibilité, de vérification ou de véhicule.
+    """
+    if update_fields and set(update_fields) <= _LOCATION_ONLY_FIELDS:
+        return
+    from .geo_index import driver_geo_index
+    driver_geo_index.update_driver(instance)
+
+
+@receiver(post_delete, sender=Driver)
+def remove_driver_from_geo_index(sender, instance, **kwargs):
+    from .geo_index import driver_geo_index
+    driver_geo_index.remove_driver(instance.id)
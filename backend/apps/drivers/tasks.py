@@ -3,6 +3,9 @@ Celery Tasks for Driver App
 """
 from celery import shared_task
 from .gps_tracking_service import GPSTrackingService
+from . import partitioning
+from .position_buffer import driver_position_buffer
+from .track_archive import archive_finished_sessions, archive_session
 
 
 @shared_task(name='drivers.cleanup_old_gps_data')
@@ -16,10 +19,65 @@ def cleanup_old_gps_data(days_to_keep=30):
     Returns:
         str: Summary message
     """
+    # Archive finished sessions before their raw locations are purged
+    archive_finished_sessions()
     deleted_count = GPSTrackingService.cleanup_old_locations(days_to_keep=days_to_keep)
     return f"Deleted {deleted_count} old location records (kept last {days_to_keep} days)"
 
 
+@shared_task(name='drivers.archive_tracking_sessions')
+def archive_tracking_sessions(session_id=None):
+    """
+    Archive finished tracking sessions as compact encoded tracks
+    
+    Args:
+        session_id: Archive this session only (default: every finished
+            session without an archive)
+        
+    Returns:
+        str: Summary message
+    """
+    if session_id is None:
+        return f"Archived {archive_finished_sessions()} tracking sessions"
+    
+    from .location_models import LocationTrackingSession
+    
+    session = LocationTrackingSession.objects.filter(
+        id=session_id,
+        ended_at__isnull=False
+    ).first()
+    if not session:
+        return f"Session {session_id} not found or still active"
+    archive = archive_session(session)
+    return f"Archived session {session_id}: {archive.stored_points}/{archive.original_points} points"
+
+
+@shared_task(name='drivers.ensure_gps_partitions')
+def ensure_gps_partitions(days_ahead=partitioning.DAYS_AHEAD):
+    """
+    Create the daily LocationUpdate partitions ahead of time (PostgreSQL)
+    
+    Args:
+        days_ahead: Number of days to create ahead of today (default: 7)
+        
+    Returns:
+        str: Summary message
+    """
+    created = partitioning.ensure_partitions(days_ahead=days_ahead)
+    return f"Created {len(created)} location partitions"
+
+
+@shared_task(name='drivers.flush_driver_positions', ignore_result=True)
+def flush_driver_positions():
+    """
+    Write buffered driver positions to the database (write-behind)
+    
+    Returns:
+        int: Number of driver rows updated
+    """
+    return driver_position_buffer.flush()
+
+
 @shared_task(name='drivers.send_tracking_statistics')
 def send_tracking_statistics():
     """
@@ -0,0 +1,101 @@
+"""
+Tests des communes normalisées persistées (Delivery.*_commune_key, DriverZone.commune_key)
+et du filtrage SQL de available_deliveries.
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.deliveries.models import Delivery
+from apps.drivers.models import Driver, DriverZone
+
+User = get_user_model()
+
+
+class CommuneKeyTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email='zones@test.com',
+            phone='+2250700400000',
+            password='test123',
+            user_type='driver',
+            first_name='Zone',
+            last_name='Driver'
+        )
+        self.user = user
+        self.driver = Driver.objects.get(user=user)
+        self.driver.verification_status = 'verified'
+        self.driver.is_available = True
+        self.driver.save()
+        DriverZone.objects.create(driver=self.driver, commune='Cocody')
+        DriverZone.objects.create(driver=self.driver, commune='Port-Bouët')
+
+    def _delivery(self, pickup_commune, **extra):
+        data = dict(
+            pickup_commune=pickup_commune,
+            delivery_commune='Le Plateau',
+            pickup_latitude=Decimal('5.35'),
+            pickup_longitude=Decimal('-4.00'),
+            delivery_latitude=Decimal('5.32'),
+            delivery_longitude=Decimal('-4.02'),
+            recipient_name='Client',
+            recipient_phone='+2250100000000',
+            package_weight_kg=Decimal('2.0'),
+            payment_method='prepaid',
+            calculated_price=Decimal('1500'),
+        )
+        data.update(extra)
+        return Delivery.objects.create(**data)
+
+    def test_keys_maintained_on_save(self):
+        delivery = self._delivery('PORT‑BOUËT')
+        self.assertEqual(delivery.pickup_commune_key, 'port-bouet')
+        self.assertEqual(delivery.delivery_commune_key, 'plateau')
+
+        delivery.pickup_commune = 'Cocody'
+        delivery.save(update_fields=['pickup_commune'])
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.pickup_commune_key, 'cocody')
+
+        self.assertEqual(
+            sorted(DriverZone.objects.filter(driver=self.driver).values_list('commune_key', flat=True)),
+            ['cocody', 'port-bouet']
+        )
+
+    def test_backfill_command_repairs_raw_updates(self):
+        delivery = self._delivery('Cocody')
+        Delivery.objects.filter(pk=delivery.pk).update(pickup_commune='Yopougon', pickup_commune_key='')
+        DriverZone.objects.filter(driver=self.driver).update(commune_key='')
+
+        call_command('backfill_commune_keys', batch_size=1, stdout=StringIO())
+
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.pickup_commune_key, 'yopougon')
+        self.assertFalse(DriverZone.objects.filter(commune_key='').exists())
+
+    def test_available_deliveries_filters_in_sql(self):
+        from apps.drivers.views import DriverViewSet
+
+        for commune in ['cocody', 'COCODY', 'Port-Bouet', 'Yopougon', 'Abobo']:
+            self._delivery(commune)
+        self._delivery('Cocody', status='assigned')
+
+        request = APIRequestFactory().get('/api/v1/drivers/available_deliveries/')
+        force_authenticate(request, user=self.user)
+        view = DriverViewSet.as_view({'get': 'available_deliveries'})
+
+        # Driver, zones, GROUP BY par commune, liste des livraisons
+        with self.assertNumQueries(4):
+            response = view(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            sorted(d['pickup_commune'] for d in response.data['deliveries']),
+            ['COCODY', 'Port-Bouet', 'cocody']
+        )
+        self.assertEqual(response.data['matched_pending_per_commune'], {'COCODY': 2, 'PORT-BOUET': 1})
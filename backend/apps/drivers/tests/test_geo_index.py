@@ -0,0 +1,134 @@
+"""
+Tests for the live driver geospatial index (apps/drivers/geo_index.py)
+"""
+import random
+import time
+from types import SimpleNamespace
+
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from apps.core.tests.utils import REDIS_URL, redis_available
+from apps.drivers.geo_index import DriverGeoIndex, _GridBackend, _RedisBackend, nearby_in_queryset
+from apps.drivers.models import Driver
+
+
+def make_driver(driver_id, lat, lon, capacity=30, vehicle_type='moto', available=True):
+    return SimpleNamespace(
+        id=driver_id,
+        current_latitude=lat,
+        current_longitude=lon,
+        vehicle_capacity_kg=capacity,
+        vehicle_type=vehicle_type,
+        verification_status='verified',
+        is_available=available,
+    )
+
+
+class DriverGeoIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = DriverGeoIndex()
+        self.index._backend = _GridBackend()
+
+    def test_nearby_sorted_by_distance_and_radius(self):
+        self.index.update_driver(make_driver('far', 5.45, -4.00))
+        self.index.update_driver(make_driver('near', 5.361, -4.008))
+        self.index.update_driver(make_driver('mid', 5.38, -4.01))
+
+        hits = self.index.nearby(5.36, -4.0083, radius_km=5)
+        self.assertEqual([h['driver_id'] for h in hits], ['near', 'mid'])
+        self.assertLess(hits[0]['distance_km'], hits[1]['distance_km'])
+
+    def test_capacity_and_vehicle_filters(self):
+        self.index.update_driver(make_driver('small', 5.36, -4.00, capacity=15))
+        self.index.update_driver(make_driver('van', 5.36, -4.00, capacity=500, vehicle_type='camionnette'))
+
+        hits = self.index.nearby(5.36, -4.00, radius_km=1, min_capacity_kg=50)
+        self.assertEqual([h['driver_id'] for h in hits], ['van'])
+        hits = self.index.nearby(5.36, -4.00, radius_km=1, vehicle_type='moto')
+        self.assertEqual([h['driver_id'] for h in hits], ['small'])
+
+    def test_moving_and_going_offline(self):
+        driver = make_driver('d1', 5.36, -4.00)
+        self.index.update_driver(driver)
+        self.index.update_driver(driver, 5.30, -3.95)
+        self.assertEqual(self.index.nearby(5.36, -4.00, radius_km=1), [])
+        self.assertEqual(len(self.index.nearby(5.30, -3.95, radius_km=1)), 1)
+
+        driver.is_available = False
+        self.index.update_driver(driver)
+        self.assertEqual(self.index.nearby(5.30, -3.95, radius_km=1), [])
+
+    def test_stale_positions_ignored(self):
+        self.index.update_driver(make_driver('d1', 5.36, -4.00))
+        self.index.backend._entries['d1']['updated_at'] = time.time() - self.index.MAX_POSITION_AGE_SECONDS - 1
+        self.assertEqual(self.index.nearby(5.36, -4.00, radius_km=1), [])
+        self.assertIsNone(self.index.get_position('d1'))
+
+    def test_query_time_with_large_fleet(self):
+        rng = random.Random(1)
+        for i in range(2000):
+            self.index.update_driver(make_driver(f'd{i}', rng.uniform(5.15, 5.45), rng.uniform(-4.10, -3.70)))
+
+        runs = 200
+        start = time.perf_counter()
+        for _ in range(runs):
+            self.index.nearby(5.36, -4.00, radius_km=2, min_capacity_kg=10)
+        avg_ms = (time.perf_counter() - start) / runs * 1000
+        # Cible : sub-milliseconde ; marge large pour les machines de CI lentes
+        self.assertLess(avg_ms, 5)
+
+
+class DriverGeoIndexBackendTests(SimpleTestCase):
+    @override_settings(REDIS_URL='', CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_without_redis_the_index_is_process_local(self):
+        index = DriverGeoIndex()
+        with patch.object(DriverGeoIndex, '_load_from_db', return_value=0):
+            self.assertIsInstance(index.backend, _GridBackend)
+        self.assertFalse(index.is_shared)
+
+    @skipUnless(redis_available(), 'Redis requis pour l\'index partagé')
+    @override_settings(REDIS_URL=REDIS_URL, CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_redis_url_gives_a_shared_index(self):
+        index = DriverGeoIndex()
+        self.assertIsInstance(index.backend, _RedisBackend)
+        self.assertTrue(index.is_shared)
+        index.clear()
+        self.addCleanup(index.clear)
+
+        index.update_driver(make_driver('d1', 5.36, -4.00))
+        # Un autre process (autre instance) voit la position
+        self.assertEqual([n['driver_id'] for n in DriverGeoIndex().nearby(5.36, -4.00, radius_km=1)], ['d1'])
+
+
+class NearbyInQuerysetTests(TestCase):
+    def _driver(self, n, lat, lon, capacity=30):
+        user = get_user_model().objects.create_user(
+            email=f'geo{n}@test.com',
+            phone=f'+22507005000{n:02d}',
+            password='test123',
+            user_type='driver',
+            first_name='Geo',
+            last_name=f'Driver{n}'
+        )
+        driver = Driver.objects.get(user=user)
+        driver.verification_status = 'verified'
+        driver.is_available = True
+        driver.current_latitude = lat
+        driver.current_longitude = lon
+        driver.vehicle_capacity_kg = capacity
+        driver.save()
+        return driver
+
+    def test_filters_stored_positions_by_distance_and_capacity(self):
+        near = self._driver(1, 5.361, -4.008)
+        mid = self._driver(2, 5.38, -4.01)
+        self._driver(3, 5.45, -4.00)
+        self._driver(4, 5.362, -4.008, capacity=10)
+
+        hits = nearby_in_queryset(Driver.objects.all(), 5.36, -4.0083, radius_km=5, min_capacity_kg=20)
+        self.assertEqual([h['driver_id'] for h in hits], [str(near.id), str(mid.id)])
+        self.assertLess(hits[0]['distance_km'], hits[1]['distance_km'])
@@ -0,0 +1,133 @@
+"""
+Tests for batched GPS ingestion (GPSTrackingService.ingest_location_batch
+and the update_location_batch endpoint)
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.drivers.gps_serializers import LocationBatchCreateSerializer
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.location_models import LocationTrackingSession, LocationUpdate
+from apps.drivers.models import Driver
+
+User = get_user_model()
+
+
+class GPSBatchIngestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='gps@test.com',
+            phone='+2250700500000',
+            password='test123',
+            user_type='driver',
+            first_name='Gps',
+            last_name='Driver'
+        )
+        self.driver = Driver.objects.get(user=self.user)
+        self.start = timezone.now() - timedelta(minutes=30)
+
+    def _points(self, count, start=None, battery=90):
+        start = start or self.start
+        return [
+            {
+                'latitude': Decimal('5.35') + Decimal(i) / 10000,
+                'longitude': Decimal('-4.00'),
+                'accuracy': 5.0 + i % 3,
+                'speed': 4.0 if i % 2 else 0.0,
+                'battery_level': battery - i // 10,
+                'timestamp': start + timedelta(seconds=10 * i),
+            }
+            for i in range(count)
+        ]
+
+    def test_batch_matches_point_by_point_ingestion(self):
+        points = self._points(25)
+        GPSTrackingService.ingest_location_batch(self.driver, list(reversed(points)))
+        batch_session = LocationTrackingSession.objects.get(driver=self.driver)
+        GPSTrackingService.end_tracking_session(self.driver)
+
+        other = Driver.objects.get(user=User.objects.create_user(
+            email='gps2@test.com', phone='+2250700500001', password='test123',
+            user_type='driver', first_name='Gps', last_name='Single'
+        ))
+        for point in points:
+            GPSTrackingService.update_driver_location(other, **point)
+        single_session = LocationTrackingSession.objects.get(driver=other)
+
+        self.assertEqual(LocationUpdate.objects.filter(driver=self.driver).count(), 25)
+        self.assertEqual(batch_session.total_updates, single_session.total_updates)
+        self.assertAlmostEqual(batch_session.total_distance_km, single_session.total_distance_km, places=6)
+        self.assertAlmostEqual(batch_session.average_accuracy, single_session.average_accuracy, places=6)
+        self.assertEqual(batch_session.initial_battery_level, 90)
+        self.assertEqual(batch_session.final_battery_level, 88)
+
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.current_latitude, points[-1]['latitude'])
+        self.assertEqual(
+            LocationUpdate.objects.filter(driver=self.driver, is_moving=True).count(), 12
+        )
+
+    def test_query_count_does_not_grow_per_point(self):
+        GPSTrackingService.ingest_location_batch(self.driver, self._points(1))
+        points = self._points(200, start=self.start + timedelta(minutes=1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            GPSTrackingService.ingest_location_batch(self.driver, points)
+
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        bulk_size = min(
+            GPSTrackingService.BULK_BATCH_SIZE,
+            connection.ops.bulk_batch_size(
+                [f.name for f in LocationUpdate._meta.concrete_fields], points
+            ) or GPSTrackingService.BULK_BATCH_SIZE,
+        )
+        self.assertEqual(len(inserts), -(-len(points) // bulk_size))
+        # Latest timestamp, driver UPDATE, session lookup/UPDATE, savepoint
+        self.assertLessEqual(len(ctx.captured_queries) - len(inserts), 8)
+
+    def test_late_upload_does_not_rewind_driver_position(self):
+        GPSTrackingService.update_driver_location(
+            self.driver, Decimal('5.40'), Decimal('-3.90'), timestamp=timezone.now()
+        )
+        GPSTrackingService.ingest_location_batch(self.driver, self._points(5))
+
+        self.driver.refresh_from_db()
+        self.assertEqual(self.driver.current_latitude, Decimal('5.40'))
+        self.assertEqual(LocationUpdate.objects.filter(driver=self.driver).count(), 6)
+
+    def test_serializer_rejects_whole_batch(self):
+        points = self._points(3)
+        points[1]['battery_level'] = 150
+        serializer = LocationBatchCreateSerializer(data={'points': points})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('battery_level', serializer.errors['points'][1])
+
+        self.assertFalse(LocationBatchCreateSerializer(data={'points': []}).is_valid())
+        too_many = [{'latitude': '5.3', 'longitude': '-4.0'}] * (GPSTrackingService.MAX_BATCH_POINTS + 1)
+        self.assertFalse(LocationBatchCreateSerializer(data={'points': too_many}).is_valid())
+
+    def test_endpoint_stores_batch(self):
+        from apps.drivers.gps_views import GPSTrackingViewSet
+
+        points = [
+            {**point, 'latitude': str(point['latitude']), 'longitude': str(point['longitude']),
+             'timestamp': point['timestamp'].isoformat()}
+            for point in self._points(10)
+        ]
+        request = APIRequestFactory().post(
+            '/api/v1/drivers/gps/update-location-batch/', {'points': points}, format='json'
+        )
+        force_authenticate(request, user=self.user)
+        response = GPSTrackingViewSet.as_view({'post': 'update_location_batch'})(request)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 10)
+        self.assertEqual(LocationUpdate.objects.filter(driver=self.driver).count(), 10)
+        self.assertIn('next_update_interval_seconds', response.data)
@@ -0,0 +1,102 @@
+"""
+Tests for time-partitioned LocationUpdate storage (apps/drivers/partitioning.py)
+"""
+from datetime import timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.drivers import partitioning
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.location_models import LocationUpdate
+from apps.drivers.models import Driver
+
+User = get_user_model()
+
+
+class LocationRetentionTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email='retention@test.com',
+            phone='+2250700700000',
+            password='test123',
+            user_type='driver',
+            first_name='Retention',
+            last_name='Driver'
+        )
+        self.driver = Driver.objects.get(user=user)
+        self.now = timezone.now()
+
+    def _store(self, days_ago):
+        return LocationUpdate.objects.create(
+            driver=self.driver,
+            latitude=Decimal('5.35'),
+            longitude=Decimal('-4.00'),
+            driver_status='available',
+            timestamp=self.now - timedelta(days=days_ago)
+        )
+
+    def test_cleanup_keeps_recent_history(self):
+        partitioning.ensure_partitions(today=(self.now - timedelta(days=40)).date(), days_ahead=40)
+        for days_ago in (0, 1, 5, 29, 35, 39):
+            self._store(days_ago)
+
+        deleted = GPSTrackingService.cleanup_old_locations(days_to_keep=30)
+
+        self.assertEqual(deleted, 2)
+        self.assertEqual(LocationUpdate.objects.count(), 4)
+        self.assertFalse(LocationUpdate.objects.filter(
+            timestamp__lt=self.now - timedelta(days=31)
+        ).exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning requires PostgreSQL')
+class LocationPartitioningTestCase(LocationRetentionTestCase):
+    def _today(self):
+        return self.now.astimezone(dt_timezone.utc).date()
+
+    def test_table_is_partitioned_ahead(self):
+        self.assertTrue(partitioning.is_partitioned())
+        names = {p['name'] for p in partitioning.list_partitions()}
+        self.assertIn(partitioning.DEFAULT_PARTITION, names)
+        for offset in range(partitioning.DAYS_AHEAD + 1):
+            self.assertIn(partitioning.partition_name(self._today() + timedelta(days=offset)), names)
+
+    def test_ensure_partitions_moves_rows_out_of_default(self):
+        stray = self._store(days_ago=3)
+        day = (stray.timestamp.astimezone(dt_timezone.utc)).date()
+
+        created = partitioning.ensure_partitions(today=day, days_ahead=0)
+        self.assertEqual(created, [partitioning.partition_name(day)])
+        self.assertEqual(partitioning.ensure_partitions(today=day, days_ahead=0), [])
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {partitioning.TABLE} WHERE id = %s', [stray.id])
+            self.assertEqual(cursor.fetchone()[0], partitioning.partition_name(day))
+
+    def test_retention_drops_whole_partitions(self):
+        partitioning.ensure_partitions(today=self._today() - timedelta(days=10), days_ahead=10)
+        for days_ago in (1, 8, 9):
+            self._store(days_ago)
+        expired = partitioning.partition_name(self._today() - timedelta(days=9))
+
+        deleted = GPSTrackingService.cleanup_old_locations(days_to_keep=7)
+
+        self.assertEqual(deleted, 2)
+        self.assertNotIn(expired, {p['name'] for p in partitioning.list_partitions()})
+        self.assertEqual(LocationUpdate.objects.count(), 1)
+
+    def test_history_queries_are_pruned(self):
+        partitioning.ensure_partitions(today=self._today() - timedelta(days=5), days_ahead=5)
+        old_partition = partitioning.partition_name(self._today() - timedelta(days=5))
+
+        plan = GPSTrackingService.get_location_history(
+            self.driver, start_date=self.now - timedelta(days=1), end_date=self.now
+        ).explain()
+
+        self.assertNotIn(old_partition, plan)
+        self.assertIn(partitioning.partition_name(self._today()), plan)
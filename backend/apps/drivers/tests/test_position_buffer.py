@@ -0,0 +1,114 @@
+"""
+Tests for the write-behind driver position buffer (apps/drivers/position_buffer.py)
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.models import Driver
+from apps.drivers.position_buffer import DriverPositionBuffer, _MemoryBackend, _RedisBackend
+
+User = get_user_model()
+
+
+class DriverPositionBufferTestCase(TestCase):
+    def setUp(self):
+        self.drivers = []
+        for i in range(3):
+            user = User.objects.create_user(
+                email=f'buffer{i}@test.com',
+                phone=f'+22507009000{i:02d}',
+                password='test123',
+                user_type='driver',
+                first_name='Buffer',
+                last_name=f'Driver {i}'
+            )
+            self.drivers.append(Driver.objects.get(user=user))
+        self.driver = self.drivers[0]
+        self.buffer = DriverPositionBuffer(backend=_MemoryBackend())
+        patcher = mock.patch('apps.drivers.gps_tracking_service.driver_position_buffer', self.buffer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _stored_position(self, driver):
+        return Driver.objects.values_list('current_latitude', 'current_longitude').get(id=driver.id)
+
+    def test_ping_is_served_before_it_is_written(self):
+        GPSTrackingService.update_driver_location(self.driver, Decimal('5.35000000'), Decimal('-4.00000000'))
+
+        self.assertEqual(self._stored_position(self.driver), (None, None))
+        self.assertEqual(self.buffer.current_position(self.driver), (5.35, -4.0))
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self._stored_position(self.driver), (Decimal('5.35000000'), Decimal('-4.00000000')))
+        self.assertIsNone(self.buffer.get_position(self.driver.id))
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_flush_coalesces_pings_into_one_update(self):
+        for step in range(5):
+            for i, driver in enumerate(self.drivers):
+                self.buffer.record(driver, Decimal(f'5.3{i}00{step}'), Decimal('-4.01'))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.buffer.flush(), 3)
+
+        for i, driver in enumerate(self.drivers):
+            self.assertEqual(self._stored_position(driver)[0], Decimal(f'5.3{i}004'))
+
+    def test_failed_flush_is_replayed(self):
+        self.buffer.record(self.driver, Decimal('5.31'), Decimal('-4.01'))
+        with mock.patch.object(Driver.objects, 'bulk_update', side_effect=RuntimeError('db down')):
+            self.assertEqual(self.buffer.flush(), 0)
+
+        # Still served while unwritten; a newer ping is kept apart from the retried batch
+        self.assertEqual(self.buffer.get_position(self.driver.id)['lat'], 5.31)
+        self.buffer.record(self.driver, Decimal('5.32'), Decimal('-4.02'))
+        self.assertEqual(self.buffer.get_position(self.driver.id)['lat'], 5.32)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self._stored_position(self.driver)[0], Decimal('5.31'))
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self._stored_position(self.driver)[0], Decimal('5.32'))
+
+    def test_overdue_buffer_is_flushed_inline(self):
+        self.buffer.MAX_STALENESS_SECONDS = -1
+
+        self.assertTrue(self.buffer.record(self.driver, Decimal('5.33'), Decimal('-4.03')))
+
+        self.assertEqual(self._stored_position(self.driver)[0], Decimal('5.33'))
+
+    def test_batch_upload_records_newest_fix(self):
+        now = timezone.now()
+        GPSTrackingService.ingest_location_batch(self.driver, [
+            {'latitude': Decimal('5.36'), 'longitude': Decimal('-4.0'), 'timestamp': now},
+            {'latitude': Decimal('5.35'), 'longitude': Decimal('-4.0'), 'timestamp': now - timedelta(minutes=1)},
+        ])
+
+        self.assertEqual(self._stored_position(self.driver), (None, None))
+        self.assertEqual(self.buffer.get_position(self.driver.id)['lat'], 5.36)
+
+    def test_disabled_buffer_writes_directly(self):
+        buffer = DriverPositionBuffer(backend=None)
+
+        self.assertFalse(buffer.record(self.driver, Decimal('5.34'), Decimal('-4.04')))
+
+        self.assertEqual(self._stored_position(self.driver), (Decimal('5.34'), Decimal('-4.04')))
+        self.assertEqual(buffer.flush(), 0)
+
+
+class DriverPositionBufferBackendTests(SimpleTestCase):
+    def test_auto_uses_the_project_redis(self):
+        connection = mock.Mock()
+        with mock.patch('apps.core.redis_connection.shared_redis', return_value=connection):
+            backend = DriverPositionBuffer().backend
+        self.assertIsInstance(backend, _RedisBackend)
+        self.assertIs(backend.redis, connection)
+
+    @override_settings(REDIS_URL='', CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_without_redis_positions_are_written_directly(self):
+        self.assertIsNone(DriverPositionBuffer().backend)
@@ -0,0 +1,176 @@
+"""
+Tests for the GPS track archive (apps/drivers/track_archive.py)
+"""
+import json
+import random
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import Decimal
+from math import cos, radians
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from geopy.distance import geodesic
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.drivers.gps_serializers import LocationUpdateSerializer
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.location_models import ArchivedTrack, LocationTrackingSession, LocationUpdate
+from apps.drivers.models import Driver
+from apps.drivers.tasks import archive_tracking_sessions
+from apps.drivers.track_archive import (
+    archive_session, decode_deltas, decode_track, encode_deltas, simplify_track,
+)
+
+User = get_user_model()
+
+
+def replay(track, when):
+    """Position at `when` by linear interpolation of (lat, lon, time) points"""
+    times = [point[2] for point in track]
+    i = bisect_right(times, when)
+    if i == 0:
+        return track[0][:2]
+    if i == len(track):
+        return track[-1][:2]
+    (lat1, lon1, t1), (lat2, lon2, t2) = track[i - 1], track[i]
+    ratio = (when - t1) / (t2 - t1) if t2 > t1 else 0
+    return lat1 + (lat2 - lat1) * ratio, lon1 + (lon2 - lon1) * ratio
+
+
+def make_shift(start, seed=0):
+    """
+    Two-hour shift, one fix every 5 s: straight legs at ~8 m/s with turns,
+    5-minute stops at each delivery and ~1 m of GPS noise
+    """
+    rng = random.Random(seed)
+    meters_lat = 1 / 111320
+    meters_lon = 1 / (111320 * cos(radians(5.35)))
+    lat, lon, now = 5.35, -4.00, start
+    points = []
+    headings = [(1, 0), (0, 1), (-1, 0), (0, 1), (1, 0), (0, -1)]
+    for leg, (north, east) in enumerate(headings):
+        for _ in range(120):  # 10 minutes driving
+            lat += north * 40 * meters_lat
+            lon += east * 40 * meters_lon
+            now += timedelta(seconds=5)
+            points.append((lat + rng.gauss(0, 1) * meters_lat, lon + rng.gauss(0, 1) * meters_lon, now))
+        for _ in range(60):  # 5 minutes stopped
+            now += timedelta(seconds=5)
+            points.append((lat + rng.gauss(0, 1) * meters_lat, lon + rng.gauss(0, 1) * meters_lon, now))
+    return points
+
+
+class EncodingTests(SimpleTestCase):
+    def test_deltas_round_trip(self):
+        values = [0, 5000, 10000, 10000, 9500, 3_600_000, 28_800_123]
+        self.assertEqual(decode_deltas(encode_deltas(values)), values)
+
+    def test_stops_are_kept_for_replay(self):
+        # Drive 100 m, stop 60 s, drive 100 m: the stop is straight on the
+        # path, plain Douglas–Peucker would drop it
+        lats = [5.35, 5.3505, 5.3509, 5.3509, 5.3509, 5.3513, 5.3518]
+        lons = [-4.0] * 7
+        times = [0, 7, 12, 40, 72, 77, 84]
+        kept = simplify_track(lats, lons, times, tolerance_m=5)
+        self.assertIn(2, kept)
+        self.assertIn(4, kept)
+
+        # Same path at constant speed: only the ends are needed
+        steady = [5.35 + i * 0.0003 for i in range(7)]
+        self.assertEqual(simplify_track(steady, lons, [i * 7 for i in range(7)], tolerance_m=5), [0, 6])
+
+
+class TrackArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='archive@test.com',
+            phone='+2250700800000',
+            password='test123',
+            user_type='driver',
+            first_name='Archive',
+            last_name='Driver'
+        )
+        self.driver = Driver.objects.get(user=self.user)
+        self.shift = make_shift(timezone.now() - timedelta(hours=3))
+        GPSTrackingService.ingest_location_batch(self.driver, [
+            {'latitude': Decimal(f'{lat:.8f}'), 'longitude': Decimal(f'{lon:.8f}'),
+             'accuracy': 4.0, 'speed': 8.0, 'timestamp': when}
+            for lat, lon, when in self.shift
+        ])
+        self.session = LocationTrackingSession.objects.get(driver=self.driver)
+
+    def _end_session(self):
+        with patch('apps.drivers.tasks.archive_tracking_sessions.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                GPSTrackingService.end_tracking_session(self.driver)
+        delay.assert_called_once_with(self.session.id)
+        archive_tracking_sessions(self.session.id)
+        return ArchivedTrack.objects.get(session=self.session)
+
+    def test_end_of_shift_is_archived_within_tolerance(self):
+        archive = self._end_session()
+
+        self.assertEqual(archive.original_points, len(self.shift))
+        self.assertLessEqual(archive.stored_points * 10, archive.original_points)
+
+        track = decode_track(archive)
+        self.assertEqual(len(track), archive.stored_points)
+        self.assertEqual((track[0][2], track[-1][2]), (self.shift[0][2], self.shift[-1][2]))
+        stored = LocationUpdate.objects.filter(driver=self.driver).order_by('timestamp')
+        worst = max(
+            geodesic(replay(track, update.timestamp), update.coordinates).meters
+            for update in stored
+        )
+        # Polyline precision 6 adds at most ~0.1 m
+        self.assertLessEqual(worst, archive.tolerance_m + 0.2)
+
+    def test_session_ends_when_the_broker_is_down(self):
+        with patch('apps.drivers.tasks.archive_tracking_sessions.delay', side_effect=ConnectionError('broker down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                GPSTrackingService.end_tracking_session(self.driver)
+
+        self.session.refresh_from_db()
+        self.assertIsNotNone(self.session.ended_at)
+        self.assertFalse(ArchivedTrack.objects.exists())
+
+    def test_tolerance_is_configurable(self):
+        coarse = archive_session(self.session, tolerance_m=25)
+        coarse_points = coarse.stored_points
+        fine = archive_session(self.session, tolerance_m=2)
+
+        self.assertEqual(ArchivedTrack.objects.count(), 1)
+        self.assertLess(coarse_points, fine.stored_points)
+
+    def test_tracks_endpoint_is_much_smaller_than_raw_history(self):
+        from apps.drivers.gps_views import GPSTrackingViewSet
+
+        self._end_session()
+        request = APIRequestFactory().get('/api/v1/drivers/gps/tracks/', {'days': 1})
+        force_authenticate(request, user=self.user)
+        response = GPSTrackingViewSet.as_view({'get': 'tracks'})(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+        self.assertNotIn('points', response.data['tracks'][0])
+        raw = LocationUpdateSerializer(LocationUpdate.objects.filter(driver=self.driver), many=True).data
+        self.assertLessEqual(len(json.dumps(response.data, default=str)) * 10, len(json.dumps(raw, default=str)))
+
+        request = APIRequestFactory().get(
+            '/api/v1/drivers/gps/tracks/', {'session': self.session.id, 'decode': 'true'}
+        )
+        force_authenticate(request, user=self.user)
+        response = GPSTrackingViewSet.as_view({'get': 'tracks'})(request)
+        track = response.data['tracks'][0]
+        self.assertEqual(len(track['points']), track['stored_points'])
+
+    def test_archive_outlives_purged_sessions(self):
+        archive = self._end_session()
+        LocationTrackingSession.objects.all().delete()
+        LocationUpdate.objects.all().delete()
+
+        archive.refresh_from_db()
+        self.assertIsNone(archive.session_id)
+        self.assertEqual(len(decode_track(archive)), archive.stored_points)
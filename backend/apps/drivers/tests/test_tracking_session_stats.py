@@ -0,0 +1,159 @@
+"""
+Tests for incremental tracking-session statistics
+(GPSTrackingService running aggregates vs full recomputation)
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Avg
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from geopy.distance import geodesic
+
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.location_models import LocationTrackingSession, LocationUpdate
+from apps.drivers.models import Driver
+
+User = get_user_model()
+
+
+class TrackingSessionStatisticsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email='session@test.com',
+            phone='+2250700600000',
+            password='test123',
+            user_type='driver',
+            first_name='Session',
+            last_name='Driver'
+        )
+        self.driver = Driver.objects.get(user=user)
+        self.start = timezone.now() - timedelta(hours=2)
+
+    def _track(self, count, offset=0, seed=0):
+        rng = random.Random(seed)
+        return [
+            {
+                'latitude': Decimal(f'{5.32 + rng.uniform(0, 0.05):.8f}'),
+                'longitude': Decimal(f'{-4.02 + rng.uniform(0, 0.05):.8f}'),
+                'accuracy': rng.choice([None, 4.0, 7.5, 12.0]),
+                'speed': rng.uniform(0, 10),
+                'battery_level': 90 - (offset + i) // 20,
+                'timestamp': self.start + timedelta(seconds=15 * (offset + i)),
+            }
+            for i in range(count)
+        ]
+
+    def _session(self):
+        return LocationTrackingSession.objects.get(driver=self.driver)
+
+    def _legacy_statistics(self, session):
+        """Statistics as the previous implementation computed them (full re-read)"""
+        updates = LocationUpdate.objects.filter(
+            driver=self.driver, timestamp__gte=session.started_at
+        ).order_by('timestamp')
+        distance = 0.0
+        previous = None
+        for update in updates:
+            if previous:
+                distance += geodesic(previous, update.coordinates).kilometers
+            previous = update.coordinates
+        return {
+            'total_updates': updates.count(),
+            'average_accuracy': updates.aggregate(avg=Avg('accuracy'))['avg'],
+            'total_distance_km': distance,
+        }
+
+    def assertSessionAgrees(self, session):
+        legacy = self._legacy_statistics(session)
+        recomputed = GPSTrackingService.recompute_session_statistics(
+            LocationTrackingSession.objects.get(pk=session.pk), save=False
+        )
+        for expected in (legacy, vars(recomputed)):
+            self.assertEqual(session.total_updates, expected['total_updates'])
+            self.assertAlmostEqual(session.average_accuracy, expected['average_accuracy'], places=9)
+            self.assertAlmostEqual(session.total_distance_km, expected['total_distance_km'], places=9)
+
+    def test_incremental_matches_full_recomputation(self):
+        track = self._track(120)
+        for point in track[:60]:
+            GPSTrackingService.update_driver_location(self.driver, **point)
+        GPSTrackingService.ingest_location_batch(self.driver, track[60:100])
+        for point in track[100:]:
+            GPSTrackingService.update_driver_location(self.driver, **point)
+
+        session = self._session()
+        self.assertEqual(session.total_updates, 120)
+        self.assertEqual(session.initial_battery_level, 90)
+        self.assertEqual(session.final_battery_level, track[-1]['battery_level'])
+        self.assertEqual(session.last_timestamp, track[-1]['timestamp'])
+        self.assertSessionAgrees(session)
+
+    def test_update_cost_does_not_grow_with_history(self):
+        GPSTrackingService.ingest_location_batch(self.driver, self._track(500))
+        point = self._track(1, offset=500)[0]
+
+        # INSERT, driver UPDATE, session lookup (locked), session UPDATE,
+        # savepoint + release of the session transaction (nested in the test case)
+        with self.assertNumQueries(6):
+            GPSTrackingService.update_driver_location(self.driver, **point)
+
+    @skipUnless(connection.features.has_select_for_update, 'SELECT ... FOR UPDATE non supporté')
+    def test_active_session_is_locked_while_updated(self):
+        GPSTrackingService.ingest_location_batch(self.driver, self._track(5))
+        point = self._track(1, offset=5)[0]
+
+        with CaptureQueriesContext(connection) as ctx:
+            GPSTrackingService.update_driver_location(self.driver, **point)
+
+        lookups = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'].startswith('SELECT') and LocationTrackingSession._meta.db_table in q['sql']
+        ]
+        self.assertTrue(lookups)
+        self.assertTrue(all('FOR UPDATE' in sql for sql in lookups))
+
+    def test_out_of_order_points_fall_back_to_recomputation(self):
+        track = self._track(40, seed=3)
+        GPSTrackingService.ingest_location_batch(self.driver, track[:10] + track[20:])
+        GPSTrackingService.ingest_location_batch(self.driver, track[10:20])
+
+        session = self._session()
+        self.assertEqual(session.total_updates, 40)
+        self.assertEqual(session.last_timestamp, track[-1]['timestamp'])
+        self.assertSessionAgrees(session)
+
+    def test_sessions_without_running_aggregates_are_rebuilt(self):
+        track = self._track(30, seed=5)
+        GPSTrackingService.ingest_location_batch(self.driver, track[:29])
+        # Session written before the running aggregates existed
+        LocationTrackingSession.objects.filter(driver=self.driver).update(
+            accuracy_sum=0.0, accuracy_count=0, last_latitude=None,
+            last_longitude=None, last_timestamp=None,
+        )
+
+        GPSTrackingService.update_driver_location(self.driver, **track[29])
+        self.assertSessionAgrees(self._session())
+
+    def test_repair_command_recomputes_sessions(self):
+        GPSTrackingService.ingest_location_batch(self.driver, self._track(50, seed=7))
+        GPSTrackingService.end_tracking_session(self.driver)
+        LocationTrackingSession.objects.filter(driver=self.driver).update(
+            total_updates=3, total_distance_km=0.0
+        )
+
+        out = StringIO()
+        call_command('recompute_tracking_sessions', '--dry-run', stdout=out)
+        self.assertEqual(self._session().total_updates, 3)
+
+        call_command('recompute_tracking_sessions', stdout=out)
+        session = self._session()
+        self.assertEqual(session.total_updates, 50)
+        self.assertSessionAgrees(session)
@@ -0,0 +1,237 @@
+"""
+GPS Track Archive
+Turns finished tracking sessions into compact encoded tracks
+
+Each finished LocationTrackingSession is stored as an ArchivedTrack:
+- Douglas–Peucker simplification using the synchronized Euclidean distance
+  (distance between a fix and the position interpolated *at the same time*
+  on the simplified segment), so replaying the archive by linear
+  interpolation stays within `tolerance_m` of every original fix, stops
+  included;
+- kept points encoded as a Google polyline (precision 6, ~0.1 m);
+- per-point timestamps as millisecond deltas, encoded with the same
+  variable-length scheme as polylines.
+
+Raw LocationUpdate rows are still purged by retention (partitions, see
+partitioning.py); archives are kept.
+"""
+import logging
+from datetime import timedelta
+from math import cos
+
+import numpy as np
+import polyline
+from django.conf import settings
+
+from .location_models import ArchivedTrack, LocationTrackingSession, LocationUpdate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOLERANCE_M = getattr(settings, 'GPS_TRACK_ARCHIVE_TOLERANCE_M', 5.0)
+POLYLINE_PRECISION = 6
+
+EARTH_RADIUS_M = 6371000.0
+
+
+# ---------------------------------------------------------------------------
+# Variable-length integer encoding (Google polyline algorithm), for time offsets
+# ---------------------------------------------------------------------------
+
+def _encode_int(value, out):
+    value = ~(value << 1) if value < 0 else value << 1
+    while value >= 0x20:
+        out.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    out.append(chr(value + 63))
+
+
+def _decode_ints(encoded):
+    """Yield the signed integers of an encoded string"""
+    index, length = 0, len(encoded)
+    while index < length:
+        result, shift = 0, 0
+        while True:
+            byte = ord(encoded[index]) - 63
+            index += 1
+            result |= (byte & 0x1f) << shift
+            shift += 5
+            if byte < 0x20:
+                break
+        yield ~(result >> 1) if result & 1 else result >> 1
+
+
+def encode_deltas(values):
+    """Encode a sequence of integers as deltas from the previous value"""
+    out = []
+    previous = 0
+    for value in values:
+        _encode_int(value - previous, out)
+        previous = value
+    return ''.join(out)
+
+
+def decode_deltas(encoded):
+    """Inverse of encode_deltas"""
+    values = []
+    current = 0
+    for delta in _decode_ints(encoded):
+        current += delta
+        values.append(current)
+    return values
+
+
+# ---------------------------------------------------------------------------
+# Simplification
+# ---------------------------------------------------------------------------
+
+def _project(latitudes, longitudes):
+    """Equirectangular projection in meters (accurate at city scale)"""
+    lat = np.radians(np.asarray(latitudes, dtype=float))
+    lon = np.radians(np.asarray(longitudes, dtype=float))
+    scale = cos(float(lat.mean()))
+    return lon * scale * EARTH_RADIUS_M, lat * EARTH_RADIUS_M
+
+
+def simplify_track(latitudes, longitudes, times, tolerance_m=DEFAULT_TOLERANCE_M):
+    """
+    Douglas–Peucker simplification with the synchronized Euclidean distance
+
+    Args:
+        latitudes, longitudes: Point coordinates (degrees)
+        times: Point times (any monotonic number, e.g. epoch seconds)
+        tolerance_m: Maximum replay error in meters
+
+    Returns:
+        list: Indexes of the points to keep (first and last always kept)
+    """
+    count = len(latitudes)
+    if count <= 2:
+        return list(range(count))
+
+    x, y = _project(latitudes, longitudes)
+    t = np.asarray(times, dtype=float)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    # Iterative: an 8-hour shift has thousands of points
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first + 1, last)
+        span = t[last] - t[first]
+        ratio = (t[inner] - t[first]) / span if span > 0 else np.zeros(last - first - 1)
+        expected_x = x[first] + (x[last] - x[first]) * ratio
+        expected_y = y[first] + (y[last] - y[first]) * ratio
+        errors = np.hypot(x[inner] - expected_x, y[inner] - expected_y)
+        worst = int(np.argmax(errors))
+        if errors[worst] > tolerance_m:
+            split = first + 1 + worst
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+
+    return np.flatnonzero(keep).tolist()
+
+
+# ---------------------------------------------------------------------------
+# Archive
+# ---------------------------------------------------------------------------
+
+def _session_points(session):
+    updates = LocationUpdate.objects.filter(
+        driver_id=session.driver_id,
+        timestamp__gte=session.started_at
+    )
+    if session.ended_at:
+        updates = updates.filter(timestamp__lte=session.ended_at)
+    return list(
+        updates.order_by('timestamp', 'id')
+        .values_list('latitude', 'longitude', 'timestamp')
+        .iterator(chunk_size=2000)
+    )
+
+
+def archive_session(session, tolerance_m=None):
+    """
+    Build (or rebuild) the archive of a finished session
+
+    Args:
+        session: Finished LocationTrackingSession
+        tolerance_m: Replay tolerance in meters (default: GPS_TRACK_ARCHIVE_TOLERANCE_M)
+
+    Returns:
+        ArchivedTrack: Empty track when the session has no location history
+    """
+    tolerance_m = DEFAULT_TOLERANCE_M if tolerance_m is None else tolerance_m
+    points = _session_points(session)
+
+    latitudes = [float(p[0]) for p in points]
+    longitudes = [float(p[1]) for p in points]
+    started_at = points[0][2] if points else session.started_at
+    ended_at = points[-1][2] if points else (session.ended_at or session.started_at)
+    offsets_ms = [round((p[2] - started_at).total_seconds() * 1000) for p in points]
+
+    kept = simplify_track(latitudes, longitudes, offsets_ms, tolerance_m)
+
+    archive, _ = ArchivedTrack.objects.update_or_create(
+        session=session,
+        defaults={
+            'driver_id': session.driver_id,
+            'started_at': started_at,
+            'ended_at': ended_at,
+            'polyline': polyline.encode(
+                [(latitudes[i], longitudes[i]) for i in kept], POLYLINE_PRECISION
+            ) if kept else '',
+            'time_offsets': encode_deltas([offsets_ms[i] for i in kept]),
+            'precision': POLYLINE_PRECISION,
+            'tolerance_m': tolerance_m,
+            'original_points': len(points),
+            'stored_points': len(kept),
+            'total_distance_km': session.total_distance_km,
+        }
+    )
+
+    logger.info(
+        "Archived session %s: %d -> %d points (tolerance %.1f m)",
+        session.pk, len(points), len(kept), tolerance_m
+    )
+    return archive
+
+
+def decode_track(archive):
+    """
+    Decode an archived track
+
+    Returns:
+        list: (latitude, longitude, timestamp) tuples
+    """
+    coordinates = polyline.decode(archive.polyline, archive.precision) if archive.polyline else []
+    offsets = decode_deltas(archive.time_offsets)
+    return [
+        (lat, lon, archive.started_at + timedelta(milliseconds=offset))
+        for (lat, lon), offset in zip(coordinates, offsets)
+    ]
+
+
+def archive_finished_sessions(limit=500, tolerance_m=None):
+    """
+    Archive finished sessions that have no archive yet
+
+    Returns:
+        int: Number of sessions archived
+    """
+    sessions = LocationTrackingSession.objects.filter(
+        ended_at__isnull=False,
+        archived_track__isnull=True
+    ).order_by('ended_at')[:limit]
+
+    archived = 0
+    for session in sessions:
+        try:
+            archive_session(session, tolerance_m)
+            archived += 1
+        except Exception as e:
+            logger.error("Failed to archive session %s: %s", session.pk, e)
+    return archived
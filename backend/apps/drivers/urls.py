@@ -20,18 +20,22 @@ driver_detail = DriverViewSet.as_view({
 
 # GPS Tracking ViewSet
 gps_update_location = GPSTrackingViewSet.as_view({'post': 'update_location'})
+gps_update_location_batch = GPSTrackingViewSet.as_view({'post': 'update_location_batch'})
 gps_get_interval = GPSTrackingViewSet.as_view({'get': 'get_interval'})
 gps_history = GPSTrackingViewSet.as_view({'get': 'history'})
 gps_sessions = GPSTrackingViewSet.as_view({'get': 'sessions'})
+gps_tracks = GPSTrackingViewSet.as_view({'get': 'tracks'})
 gps_statistics = GPSTrackingViewSet.as_view({'get': 'statistics'})
 gps_end_session = GPSTrackingViewSet.as_view({'post': 'end_session'})
 
 urlpatterns = [
     # GPS Tracking endpoints
     path('gps/update-location/', gps_update_location, name='gps-update-location'),
+    path('gps/update-location-batch/', gps_update_location_batch, name='gps-update-location-batch'),
     path('gps/interval/', gps_get_interval, name='gps-get-interval'),
     path('gps/history/', gps_history, name='gps-history'),
     path('gps/sessions/', gps_sessions, name='gps-sessions'),
+    path('gps/tracks/', gps_tracks, name='gps-tracks'),
     path('gps/statistics/', gps_statistics, name='gps-statistics'),
     path('gps/end-session/', gps_end_session, name='gps-end-session'),
     
@@ -7,13 +7,15 @@ from rest_framework.response import Response
 from django.db.models import Q, Count, Sum, Avg
 from django.utils import timezone
 from datetime import timedelta
-from decimal import Decimal
 
 from .models import Driver, DriverZone
+from .geo_index import driver_geo_index, nearby_in_queryset
+from .position_buffer import driver_position_buffer
 from .serializers import DriverSerializer
 from .serializers_mobile_money import MobileMoneySerializer, DriverMobileMoneyReadSerializer
 from apps.deliveries.models import Delivery
 from apps.deliveries.serializers import DeliverySerializer
+from apps.deliveries.tracking_stream import publish_driver_position
 from apps.payments.models import DriverEarning
 from apps.pricing.calculator import normalize_commune_name  # Pour normaliser les noms de communes
 from core.permissions import IsDriver, IsAdmin
@@ -135,48 +137,34 @@ class DriverViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Récupérer les zones du livreur
-        driver_zones = DriverZone.objects.filter(driver=driver).values_list('commune', flat=True)
+        # Récupérer les zones du livreur (commune affichée + clé normalisée indexée)
+        zone_rows = list(DriverZone.objects.filter(driver=driver).values_list('commune', 'commune_key'))
+        driver_zones = [commune for commune, _ in zone_rows]
         show_all = request.query_params.get('show_all', 'false').lower() == 'true'
         
-        # Normaliser les zones du driver pour la comparaison
-        normalized_driver_zones = [normalize_commune_name(z) for z in driver_zones]
-        
         # Base query: livraisons non assignées (statut 'pending')
         deliveries = Delivery.objects.filter(status='pending')
         
-        # Filtre zone (sauf si show_all) - Utilise la normalisation pour gérer accents et préfixes
         # Ensure commune_counts is always defined (avoid UnboundLocalError below)
         commune_counts = {}
 
         if driver_zones and not show_all:
-            # Récupérer toutes les livraisons pending puis filtrer en Python
-            # car Django ORM ne peut pas appliquer la normalisation directement
-            all_pending = list(deliveries.select_related('merchant', 'created_by'))
-            
-            # Filtrer les livraisons dont la commune normalisée correspond
-            matched_delivery_ids = []
-            for delivery in all_pending:
-                if delivery.pickup_commune:
-                    normalized_pickup = normalize_commune_name(delivery.pickup_commune)
-                    if normalized_pickup in normalized_driver_zones:
-                        matched_delivery_ids.append(delivery.id)
+            # Filtre zone en SQL sur la commune normalisée (index status + pickup_commune_key),
+            # gère accents et préfixes comme normalize_commune_name
+            zone_keys = {commune: key or normalize_commune_name(commune) for commune, key in zone_rows}
+            deliveries = deliveries.filter(pickup_commune_key__in=set(zone_keys.values()))
             
-            # Recréer le queryset avec les IDs correspondants
-            deliveries = Delivery.objects.filter(id__in=matched_delivery_ids)
+            logger.debug(f"[available_deliveries] driver_zones={driver_zones}, normalized={list(zone_keys.values())}")
             
-            # Debug: log des zones appliquées
-            logger.debug(f"[available_deliveries] driver_zones={list(driver_zones)}, normalized={normalized_driver_zones}")
-            
-            # Count pending deliveries per commune (avec normalisation)
+            # Livraisons en attente par commune du livreur : un seul GROUP BY
             try:
-                commune_counts = {}
-                from apps.deliveries.models import Delivery as _Delivery
-                all_pending_for_count = _Delivery.objects.filter(status='pending')
-                for zone in driver_zones:
-                    normalized_zone = normalize_commune_name(zone)
-                    cnt = sum(1 for d in all_pending_for_count if d.pickup_commune and normalize_commune_name(d.pickup_commune) == normalized_zone)
-                    commune_counts[str(zone)] = cnt
+                pending_per_key = dict(
+                    Delivery.objects.filter(status='pending', pickup_commune_key__in=set(zone_keys.values()))
+                    .values_list('pickup_commune_key')
+                    .annotate(total=Count('id'))
+                    .order_by()
+                )
+                commune_counts = {str(commune): pending_per_key.get(key, 0) for commune, key in zone_keys.items()}
             except Exception:
                 commune_counts = {}
         
@@ -201,10 +189,11 @@ class DriverViewSet(viewsets.ModelViewSet):
         }
         
         serializer = DeliverySerializer(deliveries, many=True)
+        data = serializer.data
         return Response({
-            'count': deliveries.count(),
-            'deliveries': serializer.data,
-            'driver_zones': list(driver_zones) if driver_zones else [],
+            'count': len(data),
+            'deliveries': data,
+            'driver_zones': driver_zones,
             'vehicle_info': vehicle_info,
             'filters_applied': {
                 'zone_filter': bool(driver_zones) and not show_all,
@@ -253,9 +242,10 @@ class DriverViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            driver.current_latitude = float(latitude)
-            driver.current_longitude = float(longitude)
-            driver.save(update_fields=['current_latitude', 'current_longitude', 'updated_at'])
+            # Écriture différée : pas d'UPDATE sur la ligne du livreur à chaque ping
+            driver_position_buffer.record(driver, float(latitude), float(longitude))
+            driver_geo_index.update_driver(driver, driver.current_latitude, driver.current_longitude)
+            publish_driver_position(driver, driver.current_latitude, driver.current_longitude)
             
             return Response({
                 'success': True,
@@ -407,6 +397,9 @@ class DriverViewSet(viewsets.ModelViewSet):
         Query params :
         - commune: Filtre par commune (optionnel)
         - min_rating: Rating minimum (optionnel)
+        - latitude, longitude, radius_km: Livreurs à moins de radius_km (défaut 5)
+          de ce point, via l'index géospatial partagé ou les positions en base (optionnel)
+        - min_capacity_kg: Capacité minimale du véhicule (optionnel, avec latitude/longitude)
         """
         # Base : livreurs vérifiés et disponibles
         drivers = Driver.objects.filter(
@@ -414,6 +407,31 @@ class DriverViewSet(viewsets.ModelViewSet):
             is_available=True
         ).select_related('user')
         
+        # Filtre géographique servi par l'index partagé (Redis). L'index en mémoire
+        # d'un process ne voit pas les positions reçues par les autres : filtre
+        # sur les positions en base dans ce cas.
+        distances = None
+        latitude = request.query_params.get('latitude')
+        longitude = request.query_params.get('longitude')
+        if latitude and longitude:
+            try:
+                search = dict(
+                    latitude=float(latitude),
+                    longitude=float(longitude),
+                    radius_km=float(request.query_params.get('radius_km', 5)),
+                    min_capacity_kg=float(request.query_params.get('min_capacity_kg', 0)),
+                )
+            except ValueError:
+                return Response(
+                    {'error': 'Coordonnées GPS invalides'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            nearby = driver_geo_index.nearby(**search) if driver_geo_index.is_shared else None
+            if nearby is None:
+                nearby = nearby_in_queryset(drivers, **search)
+            distances = {n['driver_id']: n['distance_km'] for n in nearby}
+            drivers = drivers.filter(id__in=list(distances))
+        
         # Filtre par commune
         commune = request.query_params.get('commune')
         if commune:
@@ -431,12 +449,21 @@ class DriverViewSet(viewsets.ModelViewSet):
         drivers = drivers.order_by('-rating', '-successful_deliveries')
         
         serializer = DriverSerializer(drivers, many=True)
+        drivers_data = serializer.data
+        if distances is not None:
+            # Recherche géographique : trier par distance au point demandé
+            drivers_data = sorted(drivers_data, key=lambda d: distances.get(str(d['id']), float('inf')))
+            for item in drivers_data:
+                item['distance_km'] = distances.get(str(item['id']))
+        
         return Response({
-            'count': drivers.count(),
-            'drivers': serializer.data,
+            'count': len(drivers_data),
+            'drivers': drivers_data,
             'filters': {
                 'commune': commune,
-                'min_rating': min_rating
+                'min_rating': min_rating,
+                'latitude': latitude,
+                'longitude': longitude,
             }
         })
     
@@ -511,44 +538,37 @@ class DriverViewSet(viewsets.ModelViewSet):
         GET /api/v1/drivers/my-stats/?period=30
         
         Statistiques du driver connecté.
+        Deux requêtes (profil avec ses gains, livraisons), en cache quelques secondes.
         """
-        try:
-            driver = Driver.objects.get(user=request.user)
-        except Driver.DoesNotExist:
+        from apps.deliveries.stats import cached_stats, driver_stats, driver_stats_profile
+
+        period_days = int(request.query_params.get('period', 30))
+        period_start = timezone.now() - timedelta(days=period_days)
+        driver = driver_stats_profile(request.user, period_start)
+        if driver is None:
             return Response(
                 {'error': 'Profil driver introuvable'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        period_days = int(request.query_params.get('period', 30))
-        period_start = timezone.now() - timedelta(days=period_days)
 
-        # Livraisons
-        deliveries = Delivery.objects.filter(driver=driver)
+        stats = cached_stats(('driver', driver.pk), 'drivers_my_stats', (period_days,),
+                             lambda: driver_stats(driver, period_start))
 
-        # Count deliveries created in the period (new requests)
-        period_created_count = deliveries.filter(created_at__gte=period_start).count()
-
-        # Count deliveries delivered/cancelled during the period based on event timestamps
-        delivered_count = deliveries.filter(status='delivered', delivered_at__gte=period_start).count()
-        cancelled_count = deliveries.filter(status='cancelled', cancelled_at__gte=period_start).count()
-
-        # Current active deliveries (regardless of period)
-        current_count = deliveries.filter(status__in=['in_progress']).count()
-
-        total_deliveries = deliveries.count()
+        # Livraisons : créées sur la période, livrées / annulées sur la période
+        # (date de l'événement), en cours quelle que soit la période
+        deliveries = stats['deliveries']
+        period_created_count = deliveries['period_total']
+        delivered_count = deliveries['delivered']
+        cancelled_count = deliveries['cancelled']
+        current_count = deliveries['in_progress']
+        total_deliveries = deliveries['total_all_time']
 
         # Gains
-        earnings = DriverEarning.objects.filter(driver=driver)
-        period_earnings = earnings.filter(created_at__gte=period_start)
-        
-        total_earned = period_earnings.aggregate(total=Sum('total_earning'))['total'] or Decimal('0')
-        pending_earnings = period_earnings.filter(status='pending').aggregate(
-            total=Sum('total_earning'))['total'] or Decimal('0')
-        approved_earnings = period_earnings.filter(status='approved').aggregate(
-            total=Sum('total_earning'))['total'] or Decimal('0')
-        paid_earnings = period_earnings.filter(status='paid').aggregate(
-            total=Sum('total_earning'))['total'] or Decimal('0')
+        earnings = stats['earnings']
+        total_earned = earnings['total_earned']
+        pending_earnings = earnings['pending']
+        approved_earnings = earnings['approved']
+        paid_earnings = earnings['paid']
         
         # Taux de succès : delivered / (delivered + cancelled) during the period
         denom = delivered_count + cancelled_count
@@ -593,8 +613,10 @@ class DriverViewSet(viewsets.ModelViewSet):
         Query params:
         - period: nombre de jours (défaut: 30)
         """
+        from apps.deliveries.stats import cached_stats, driver_earnings
+
         try:
-            driver = Driver.objects.get(user=request.user)
+            driver = Driver.objects.select_related('user').get(user=request.user)
         except Driver.DoesNotExist:
             return Response(
                 {'error': 'Profil driver introuvable'},
@@ -602,28 +624,16 @@ class DriverViewSet(viewsets.ModelViewSet):
             )
         
         period_days = int(request.query_params.get('period', 30))
-        period_start = timezone.now() - timedelta(days=period_days)
         
-        # Récupérer les gains
-        earnings = DriverEarning.objects.filter(driver=driver)
-        period_earnings = earnings.filter(created_at__gte=period_start)
-        
-        # Agréger par statut
-        total_earned = period_earnings.aggregate(total=Sum('total_earning'))['total'] or Decimal('0')
-        pending_earnings = period_earnings.filter(status='pending').aggregate(
-            total=Sum('total_earning'))['total'] or Decimal('0')
-        approved_earnings = period_earnings.filter(status='approved').aggregate(
-            total=Sum('total_earning'))['total'] or Decimal('0')
-        paid_earnings = period_earnings.filter(status='paid').aggregate(
-            total=Sum('total_earning'))['total'] or Decimal('0')
-        
-        # Gains par jour (derniers 7 jours)
-        last_7_days = timezone.now() - timedelta(days=7)
-        daily_earnings = period_earnings.filter(created_at__gte=last_7_days).extra(
-            select={'day': 'date(created_at)'}
-        ).values('day').annotate(
-            total=Sum('total_earning')
-        ).order_by('day')
+        # Totaux par statut et gains par jour (derniers 7 jours) : une seule requête groupée
+        earnings = cached_stats(('driver', driver.pk), 'drivers_my_earnings', (period_days,),
+                                lambda: driver_earnings(driver, period_days))
+        summary = earnings['summary']
+        total_earned = summary['total_earned']
+        pending_earnings = summary['pending']
+        approved_earnings = summary['approved']
+        paid_earnings = summary['paid']
+        daily_earnings = [{'day': day, 'total': total} for day, total in earnings['daily']]
         
         return Response({
             'driver': {
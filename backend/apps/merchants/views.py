@@ -11,7 +11,8 @@ from .utils import notify_merchant_approved, notify_merchant_rejected, notify_me
 from apps.deliveries.models import Delivery
 from apps.payments.models import Invoice
 from core.permissions import IsAdmin, IsMerchant
-from apps.deliveries.services import compute_delivery_stats
+from apps.deliveries.services import compute_delivery_stats, stats_period_start
+from apps.deliveries.stats import cached_stats, merchant_stats_profile
 
 import logging
 
@@ -223,19 +224,22 @@ class MerchantViewSet(viewsets.ModelViewSet):
         Statistiques du merchant connecté.
         Query params: period (jours, défaut 30)
         """
-        try:
-            merchant = Merchant.objects.get(user=request.user)
-        except Merchant.DoesNotExist:
+        period_days = int(request.query_params.get('period', 30))
+        # Profil et totaux de factures en une requête, compteurs lus dans les agrégats journaliers
+        merchant = merchant_stats_profile(request.user, stats_period_start(period_days, from_rollups=True))
+        if merchant is None:
             return Response(
                 {'error': 'Profil merchant introuvable'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        period_days = int(request.query_params.get('period', 30))
-        # Use central compute_delivery_stats helper
 
         deliveries_qs = Delivery.objects.filter(merchant=merchant)
-        stats = compute_delivery_stats(deliveries_qs, period_days=period_days, merchant=merchant)
+        stats = cached_stats(
+            ('merchant', merchant.pk), 'merchants_my_stats', (period_days,),
+            lambda: compute_delivery_stats(
+                deliveries_qs, period_days=period_days, merchant=merchant, rollup_scope={'merchant_id': merchant.pk}
+            )
+        )
 
         # Format revenue values as strings to preserve existing response shape
         stats['revenue']['period_revenue'] = str(stats['revenue']['period_revenue'])
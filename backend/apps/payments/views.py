@@ -814,7 +814,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
             }
         }
         """
-        from .models import Payment
+        from apps.deliveries.stats import cached_stats, payment_stats
         
         try:
             driver = Driver.objects.get(user=request.user)
@@ -824,39 +824,16 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        now = timezone.now()
-        
-        # Lifetime stats - using DriverEarning (actual driver earnings)
-        all_earnings = DriverEarning.objects.filter(driver=driver)
-        lifetime_earnings = all_earnings.aggregate(Sum('total_earning'))['total_earning__sum'] or Decimal('0')
-        lifetime_deliveries = all_earnings.count()
-        
-        # This month
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        this_month = all_earnings.filter(created_at__gte=month_start)
-        month_earnings = this_month.aggregate(Sum('total_earning'))['total_earning__sum'] or Decimal('0')
-        month_deliveries = this_month.count()
-        
-        # Last month
-        if now.month == 1:
-            last_month_start = now.replace(year=now.year - 1, month=12, day=1, hour=0, minute=0, second=0, microsecond=0)
-        else:
-            last_month_start = now.replace(month=now.month - 1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        last_month = all_earnings.filter(
-            created_at__gte=last_month_start,
-            created_at__lt=month_start
-        )
-        last_month_earnings = last_month.aggregate(Sum('total_earning'))['total_earning__sum'] or Decimal('0')
-        last_month_deliveries = last_month.count()
-        
-        # By payment method - from related deliveries
-        payment_methods = {'orange_money': 0, 'mtn_money': 0, 'moov_money': 0, 'wave': 0, 'cash': 0}
-        for earning in all_earnings.select_related('delivery'):
-            if earning.delivery and earning.delivery.payment_method:
-                method = earning.delivery.payment_method
-                if method in payment_methods:
-                    payment_methods[method] += 1
+        # Gains à vie, du mois, du mois précédent et par moyen de paiement (DriverEarning),
+        # en une requête d'agrégats conditionnels
+        totals = cached_stats(('driver', driver.pk), 'payments_stats', (), lambda: payment_stats(driver))
+        lifetime_earnings = totals['lifetime_earnings']
+        lifetime_deliveries = totals['lifetime_count']
+        month_earnings = totals['month_earnings']
+        month_deliveries = totals['month_count']
+        last_month_earnings = totals['last_month_earnings']
+        last_month_deliveries = totals['last_month_count']
+        payment_methods = totals['payment_methods']
         
         # Calculate average per payment
         average_per_payment = Decimal('0')
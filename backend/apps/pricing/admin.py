@@ -1,6 +1,6 @@
 # pricing/admin.py
 from django.contrib import admin
-from .models import PricingZone, ZonePricingMatrix
+from .models import GeocodeEntry, PricingZone, ZonePricingMatrix
 
 @admin.register(PricingZone)
 class PricingZoneAdmin(admin.ModelAdmin):
@@ -13,3 +13,9 @@ class ZonePricingMatrixAdmin(admin.ModelAdmin):
     list_display = ('origin_zone', 'destination_zone', 'base_rate', 'per_kg_rate', 'per_km_rate', 'max_weight_included', 'effective_from', 'effective_to', 'is_active')
     list_filter = ('effective_from', 'effective_to', 'is_active')
     search_fields = ('origin_zone__zone_name', 'destination_zone__zone_name')
+
+@admin.register(GeocodeEntry)
+class GeocodeEntryAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'query', 'status', 'attempts', 'resolved_at', 'updated_at')
+    list_filter = ('kind', 'status')
+    search_fields = ('query',)
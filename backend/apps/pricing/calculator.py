@@ -1,9 +1,9 @@
 # pricing/calculator.py
 
 from decimal import Decimal
-from datetime import datetime
-from django.db import models
-from .models import PricingZone, ZonePricingMatrix
+from .models import PricingZone
+from .zone_index import zone_index
+from .tariff_table import DEFAULT_TARIFF, tariff_table
 from django.core.exceptions import ValidationError
 from apps.core.location_service import LocationService
 import unicodedata
@@ -12,11 +12,6 @@ import json
 
 logger = logging.getLogger(__name__)
 
-# ⚠️ IMPORTANT: Vous aviez une mauvaise import
-# from backend.apps.drivers import models
-# Changé pour:
-# from django.db import models
-
 
 def normalize_commune_name(name):
     """
@@ -94,24 +89,12 @@ class PricingCalculator:
         """
         try:
             # Cherche la zone avec insensibilité à la casse ET aux accents
-            normalized_input = normalize_commune_name(commune)
-            
-            # Récupérer toutes les communes et chercher par normalisation
-            all_zones = PricingZone.objects.filter(is_active=True)
-            zone = None
-            
-            for z in all_zones:
-                if normalize_commune_name(z.commune) == normalized_input:
-                    zone = z
-                    break
+            # (index en cache par commune normalisée, pas de requête SQL)
+            zone = zone_index.get_by_commune(commune)
             
             if not zone:
                 # REFUSE la commune invalide
-                available_communes = sorted(set(
-                    PricingZone.objects.filter(is_active=True).values_list('commune', flat=True)
-                ))
-                
-                communes_list = ', '.join(available_communes)
+                communes_list = ', '.join(zone_index.communes())
                 
                 raise ValidationError(
                     f"Commune '{commune}' n'existe pas. "
@@ -141,15 +124,10 @@ class PricingCalculator:
         try:
             # Si quartier est fourni, chercher d'abord avec quartier + commune
             if quartier and quartier.strip():
-                normalized_quartier = normalize_commune_name(quartier)
-                normalized_commune = normalize_commune_name(commune)
-                
                 # Chercher une zone avec ce quartier ET cette commune
-                all_zones = PricingZone.objects.filter(is_active=True)
-                for z in all_zones:
-                    if (z.quartier and normalize_commune_name(z.commune) == normalized_commune and 
-                        normalize_commune_name(z.quartier) == normalized_quartier):
-                        return z
+                zone = zone_index.get_by_quartier(quartier, commune)
+                if zone:
+                    return zone
             
             # Fallback: utiliser la commune
             return self.get_zone_from_commune(commune)
@@ -162,28 +140,18 @@ class PricingCalculator:
     
     def get_pricing_matrix(self, origin_zone, destination_zone):
         """
-        Récupère la matrice tarifaire pour deux zones.
-        Vérifie que les dates sont valides (effective_from <= today <= effective_to).
+        Récupère le tarif effectif pour deux zones.
+        Seules les matrices valides aujourd'hui (effective_from <= today <= effective_to)
+        sont compilées dans la table tarifaire (pas de requête SQL par devis).
         
         Args:
             origin_zone (PricingZone): Zone de départ
             destination_zone (PricingZone): Zone d'arrivée
             
         Returns:
-            ZonePricingMatrix: Matrice tarifaire trouvée ou tarif par défaut
+            Tariff: Tarif trouvé ou tarif par défaut
         """
-        today = datetime.now().date()
-        
-        # Cherche la matrice tarifaire valide
-        pricing = ZonePricingMatrix.objects.filter(
-            origin_zone=origin_zone,
-            destination_zone=destination_zone,
-            is_active=True,
-            effective_from__lte=today  # Date d'effet <= aujourd'hui
-        ).filter(
-            # effective_to >= aujourd'hui OU effective_to = NULL (pas de fin)
-            models.Q(effective_to__gte=today) | models.Q(effective_to__isnull=True)
-        ).first()
+        pricing = tariff_table.get(origin_zone.id, destination_zone.id)
         
         if not pricing:
             # Retourne un tarif par défaut si aucune matrice trouvée
@@ -196,16 +164,9 @@ class PricingCalculator:
         Retourne une tarification par défaut quand aucune matrice tarifaire existe.
         
         Returns:
-            DefaultPricing: Objet avec les tarifs par défaut
+            Tariff: Tarifs par défaut (2000 CFA de base, 200 CFA/kg, 100 CFA/km, 5 kg inclus)
         """
-        class DefaultPricing:
-            """Classe simple pour retourner les tarifs par défaut"""
-            base_rate = Decimal('2000')           # Tarif de base : 2000 CFA
-            per_kg_rate = Decimal('200')          # 200 CFA par kg supplémentaire
-            per_km_rate = Decimal('100')          # 100 CFA par km
-            max_weight_included = Decimal('5.0')  # 5 kg inclus dans le tarif de base
-        
-        return DefaultPricing()
+        return DEFAULT_TARIFF
     
     def calculate_weight_surcharge(self, weight_kg, max_included, per_kg_rate):
         """
@@ -304,8 +265,18 @@ class PricingCalculator:
                 # Some logging handlers may not accept 'extra' keys; fall back to simple log
                 logger.exception("calculate_distance failed: using default 10km")
             return Decimal('10')
-    
-    def calculate_price(self, delivery_data):
+
+    def _pair_distances(self, pairs):
+        """
+        Distances (km) d'une liste de couples (départ, arrivée), mêmes sources et
+        même facteur que calculate_distance (LocationService.get_distances).
+
+        Returns:
+            tuple: ({couple: distance_km}, source ou sources séparées par des virgules)
+        """
+        return LocationService.get_distances(pairs)
+
+    def calculate_price(self, delivery_data, zones=None, distance_km=None):
         """
         Calcule le prix TOTAL d'une livraison.
         Prend en compte : zones (quartiers avec fallback communes), poids, volume, distance, surcharges contextuelles.
@@ -325,6 +296,8 @@ class PricingCalculator:
                 - scheduled_pickup_time: datetime (optionnel, pour nuit/weekend)
                 - pickup_coords: tuple (lat, lng) (optionnel, pour distance réelle)
                 - delivery_coords: tuple (lat, lng) (optionnel, pour distance réelle)
+            zones (tuple): (origin_zone, destination_zone) déjà résolues (optionnel, devis en lot)
+            distance_km (Decimal): Distance déjà calculée (optionnel, devis en lot)
         
         Returns:
             dict: Détail complet du calcul avec :
@@ -351,8 +324,11 @@ class PricingCalculator:
         delivery_quartier = delivery_data.get('delivery_quartier')
         
         # Utiliser les quartiers avec fallback sur communes
-        origin_zone = self.get_zone_from_quartier(pickup_quartier, str(pickup_commune))
-        destination_zone = self.get_zone_from_quartier(delivery_quartier, str(delivery_commune))
+        if zones:
+            origin_zone, destination_zone = zones
+        else:
+            origin_zone = self.get_zone_from_quartier(pickup_quartier, str(pickup_commune))
+            destination_zone = self.get_zone_from_quartier(delivery_quartier, str(delivery_commune))
         
         # ═══════════════════════════════════════════════════════════════════
         # ÉTAPE 2 : Récupérer la matrice tarifaire
@@ -364,7 +340,7 @@ class PricingCalculator:
         # ÉTAPE 3 : Tarif de base
         # ═══════════════════════════════════════════════════════════════════
         
-        base_rate = Decimal(str(pricing.base_rate))
+        base_rate = pricing.base_rate
         
         # ═══════════════════════════════════════════════════════════════════
         # ÉTAPE 4 : Surcharge de poids (avec défaut 5kg si non renseigné)
@@ -391,8 +367,8 @@ class PricingCalculator:
         
         weight_surcharge = self.calculate_weight_surcharge(
             weight_kg,
-            Decimal(str(pricing.max_weight_included)),
-            Decimal(str(pricing.per_kg_rate))
+            pricing.max_weight_included,
+            pricing.per_kg_rate
         )
         
         # ═══════════════════════════════════════════════════════════════════
@@ -411,7 +387,7 @@ class PricingCalculator:
         volume_surcharge = Decimal('0')
         if billable_weight > weight_kg:
             extra = billable_weight - weight_kg
-            volume_surcharge = extra * Decimal(str(pricing.per_kg_rate))
+            volume_surcharge = extra * pricing.per_kg_rate
         
         # ═══════════════════════════════════════════════════════════════════
         # ÉTAPE 6 : Surcharge de distance
@@ -457,33 +433,34 @@ class PricingCalculator:
             pickup_source = 'unknown'
             delivery_source = 'unknown'
 
-        # Log chosen coord sources and coords before computing distance
-        try:
-            logger.info(
-                "calculate_price: computing distance",
-                extra={
-                    'pickup_source': pickup_source,
-                    'delivery_source': delivery_source,
-                    'pickup_coords': pickup_coords,
-                    'delivery_coords': delivery_coords,
-                    'origin_zone_id': getattr(origin_zone, 'id', None),
-                    'destination_zone_id': getattr(destination_zone, 'id', None),
-                }
-            )
-        except Exception:
-            # Some logging handlers may not accept extra; fallback to simple log
-            logger.info("calculate_price: computing distance pickup_source=%s delivery_source=%s pickup_coords=%s delivery_coords=%s", pickup_source, delivery_source, pickup_coords, delivery_coords)
+        if distance_km is None:
+            # Log chosen coord sources and coords before computing distance
+            try:
+                logger.info(
+                    "calculate_price: computing distance",
+                    extra={
+                        'pickup_source': pickup_source,
+                        'delivery_source': delivery_source,
+                        'pickup_coords': pickup_coords,
+                        'delivery_coords': delivery_coords,
+                        'origin_zone_id': getattr(origin_zone, 'id', None),
+                        'destination_zone_id': getattr(destination_zone, 'id', None),
+                    }
+                )
+            except Exception:
+                # Some logging handlers may not accept extra; fallback to simple log
+                logger.info("calculate_price: computing distance pickup_source=%s delivery_source=%s pickup_coords=%s delivery_coords=%s", pickup_source, delivery_source, pickup_coords, delivery_coords)
 
-        # Enfin, calculer la distance (LocationService gère le fallback haversine ou valeur par défaut)
-        try:
-            distance_km = self.calculate_distance(pickup_coords, delivery_coords)
-        except Exception:
-            # calculate_distance already logs exceptions; ensure a fallback value
-            distance_km = Decimal('10')
+            # Enfin, calculer la distance (LocationService gère le fallback haversine ou valeur par défaut)
+            try:
+                distance_km = self.calculate_distance(pickup_coords, delivery_coords)
+            except Exception:
+                # calculate_distance already logs exceptions; ensure a fallback value
+                distance_km = Decimal('10')
 
-        logger.info("calculate_price: distance result", extra={'distance_km': float(distance_km)})
+            logger.info("calculate_price: distance result", extra={'distance_km': float(distance_km)})
 
-        distance_surcharge = distance_km * Decimal(str(pricing.per_km_rate))
+        distance_surcharge = distance_km * pricing.per_km_rate
         
         # ═══════════════════════════════════════════════════════════════════
         # ÉTAPE 7 : Calcul du sous-total
@@ -588,3 +565,103 @@ class PricingCalculator:
         }
         
         return result
+    
+    def calculate_prices(self, parcels):
+        """
+        Calcule le prix de nombreux colis en une fois (manifeste e-commerce).
+        
+        Les zones sont résolues une fois par couple commune/quartier, les tarifs
+        viennent de la table tarifaire compilée, et les distances ne sont calculées
+        que pour les couples (départ, arrivée) distincts (`_pair_distances`).
+        Le détail de chaque devis est identique à celui de `calculate_price`.
+        
+        Args:
+            parcels (list): Liste de dicts au format de `calculate_price`
+            
+        Returns:
+            dict: Avec :
+                - quotes: un résultat par colis (même ordre), ou {'error': ...} si invalide
+                - distance_source: 'offline', 'openrouteservice', 'haversine' ou None
+                  (plusieurs sources séparées par des virgules si les lots diffèrent)
+        """
+        resolved_zones = {}
+        
+        def resolve_zone(quartier, commune):
+            key = (quartier or '', str(commune))
+            if key not in resolved_zones:
+                try:
+                    resolved_zones[key] = self.get_zone_from_quartier(quartier, str(commune))
+                except ValidationError as e:
+                    resolved_zones[key] = e
+            zone = resolved_zones[key]
+            if isinstance(zone, ValidationError):
+                raise zone
+            return zone
+        
+        def zone_coords(zone):
+            if getattr(zone, 'default_latitude', None) is not None and getattr(zone, 'default_longitude', None) is not None:
+                return (float(zone.default_latitude), float(zone.default_longitude))
+            return None
+        
+        # 1. Zones et coordonnées de chaque colis (coords client, sinon centroïde de zone)
+        prepared = []
+        for parcel in parcels:
+            try:
+                pickup_commune = parcel.get('pickup_commune')
+                delivery_commune = parcel.get('delivery_commune')
+                if not pickup_commune or not str(pickup_commune).strip():
+                    raise ValidationError("pickup_commune est obligatoire")
+                if not delivery_commune or not str(delivery_commune).strip():
+                    raise ValidationError("delivery_commune est obligatoire")
+                
+                origin_zone = resolve_zone(parcel.get('pickup_quartier'), pickup_commune)
+                destination_zone = resolve_zone(parcel.get('delivery_quartier'), delivery_commune)
+                pickup = parcel.get('pickup_coords') or zone_coords(origin_zone)
+                delivery = parcel.get('delivery_coords') or zone_coords(destination_zone)
+                prepared.append(((origin_zone, destination_zone), pickup, delivery))
+            except ValidationError as e:
+                prepared.append(e)
+        
+        # 2. Distances des seuls couples (départ, arrivée) distincts
+        def point_key(coords):
+            # Coordonnées non arrondies : même distance que calculate_price
+            return (float(coords[0]), float(coords[1]))
+        
+        pairs = {}
+        for item in prepared:
+            if not isinstance(item, ValidationError) and item[1] and item[2]:
+                pairs.setdefault((point_key(item[1]), point_key(item[2])), None)
+        
+        distances = None
+        distance_source = None
+        if pairs:
+            try:
+                distances, distance_source = self._pair_distances(list(pairs))
+            except Exception:
+                logger.exception("calculate_prices: distances indisponibles, calcul colis par colis")
+                distances = None
+        
+        # 3. Prix de chaque colis avec zones et distance déjà résolues
+        quotes = []
+        for parcel, item in zip(parcels, prepared):
+            if isinstance(item, ValidationError):
+                quotes.append({'error': ' '.join(item.messages)})
+                continue
+            
+            zones, pickup, delivery = item
+            distance_km = Decimal('10')  # Même défaut que calculate_distance
+            if distances is not None and pickup and delivery:
+                distance_km = Decimal(str(distances[(point_key(pickup), point_key(delivery))]))
+            elif pickup and delivery:
+                distance_km = self.calculate_distance(pickup, delivery)
+            
+            try:
+                quotes.append(self.calculate_price(parcel, zones=zones, distance_km=distance_km))
+            except (ValidationError, ValueError, ArithmeticError) as e:
+                message = ' '.join(e.messages) if isinstance(e, ValidationError) else str(e)
+                quotes.append({'error': message})
+        
+        return {
+            'quotes': quotes,
+            'distance_source': distance_source,
+        }
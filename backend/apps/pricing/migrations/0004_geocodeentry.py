@@ -0,0 +1,35 @@
+# Generated migration for the persistent geocoding store
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pricing', '0003_add_gps_coordinates_to_zones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('quartier', 'Quartier'), ('address', 'Adresse'), ('reverse', 'Reverse geocoding')], max_length=20)),
+                ('key', models.CharField(help_text='SHA-256 de la requête normalisée', max_length=64)),
+                ('query', models.TextField(help_text='Requête normalisée (minuscules, sans accents)')),
+                ('params', models.JSONField(default=dict, help_text="Paramètres d'origine de la requête Nominatim")),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('found', 'Trouvé'), ('not_found', 'Introuvable'), ('failed', 'Échec')], default='pending', max_length=20)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('retry_after', models.DateTimeField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Géocodage',
+                'verbose_name_plural': 'Géocodages',
+                'db_table': 'geocode_entries',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='unique_geocode_kind_key')],
+            },
+        ),
+    ]
@@ -50,3 +50,48 @@ class ZonePricingMatrix(models.Model):
     
     def __str__(self):
         return f"{self.origin_zone.zone_name} → {self.destination_zone.zone_name}: {self.base_rate} CFA"
+
+
+class GeocodeEntry(models.Model):
+    """
+    Résultat de géocodage Nominatim persistant, indexé par requête normalisée
+
+    Les résultats trouvés n'expirent pas. Les requêtes sans résultat ou en
+    échec sont réessayées après `retry_after`. Une entrée 'pending' signale
+    une résolution en file d'attente (tâche pricing.resolve_geocode) : chaque
+    requête n'est résolue qu'une fois, quel que soit le nombre de demandes.
+    """
+    KIND_CHOICES = [
+        ('quartier', 'Quartier'),
+        ('address', 'Adresse'),
+        ('reverse', 'Reverse geocoding'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'En attente'),
+        ('found', 'Trouvé'),
+        ('not_found', 'Introuvable'),
+        ('failed', 'Échec'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=64, help_text="SHA-256 de la requête normalisée")
+    query = models.TextField(help_text="Requête normalisée (minuscules, sans accents)")
+    params = models.JSONField(default=dict, help_text="Paramètres d'origine de la requête Nominatim")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    retry_after = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'geocode_entries'
+        verbose_name = 'Géocodage'
+        verbose_name_plural = 'Géocodages'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_geocode_kind_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.query} ({self.status})"
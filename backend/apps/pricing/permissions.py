@@ -8,7 +8,7 @@ class PricingViewSetPermissionMixin:
         if self.action == 'calculate':
             # L'endpoint de calcul est accessible sans authentification
             permission_classes = [AllowAny]
-        elif self.action in ['list', 'retrieve', 'with_selection', 'assign']:
+        elif self.action in ['list', 'retrieve', 'with_selection', 'assign', 'calculate_batch']:
             permission_classes = [IsAuthenticated]
         else:
             permission_classes = [IsAdminUser]
@@ -0,0 +1,25 @@
+# pricing/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.core.quartier_locator import quartier_locator
+
+from .models import PricingZone, ZonePricingMatrix
+from .tariff_table import tariff_table
+from .zone_index import zone_index
+
+
+@receiver(post_save, sender=PricingZone)
+@receiver(post_delete, sender=PricingZone)
+def invalidate_zone_index(sender, instance, **kwargs):
+    """Toute modification d'une zone invalide l'index des zones tarifaires (au commit)"""
+    zone_index.invalidate_on_commit()
+    # Les centres des zones alimentent aussi le reverse geocoding local
+    quartier_locator.invalidate_on_commit()
+
+
+@receiver(post_save, sender=ZonePricingMatrix)
+@receiver(post_delete, sender=ZonePricingMatrix)
+def invalidate_tariff_table(sender, instance, **kwargs):
+    """Toute modification d'une matrice tarifaire recompile la table tarifaire (au commit)"""
+    tariff_table.invalidate_on_commit()
@@ -0,0 +1,94 @@
+# pricing/tariff_table.py
+"""
+Table tarifaire compilée : tarif effectif de chaque couple de zones pour la date du jour.
+
+Remplace la requête `ZonePricingMatrix` filtrée par dates exécutée à chaque
+devis. La table est indexée par (origin_zone_id, destination_zone_id) et ne
+contient que des `Tariff` (tuples de Decimal), sans instance de modèle.
+
+Rafraîchissement :
+- signaux post_save / post_delete de `ZonePricingMatrix` (numéro de version, au commit) ;
+- changement de jour : la table est compilée pour une date donnée et reconstruite
+  dès que la date courante change (fenêtres effective_from / effective_to).
+"""
+
+import logging
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import models
+
+from .zone_index import CachedPricingIndex
+
+logger = logging.getLogger(__name__)
+
+
+Tariff = namedtuple('Tariff', ['base_rate', 'per_kg_rate', 'per_km_rate', 'max_weight_included', 'matrix_id'])
+
+# Tarif par défaut quand aucune matrice n'est définie pour un couple de zones
+DEFAULT_TARIFF = Tariff(
+    base_rate=Decimal('2000'),           # Tarif de base : 2000 CFA
+    per_kg_rate=Decimal('200'),          # 200 CFA par kg supplémentaire
+    per_km_rate=Decimal('100'),          # 100 CFA par km
+    max_weight_included=Decimal('5.0'),  # 5 kg inclus dans le tarif de base
+    matrix_id=None,
+)
+
+
+class TariffTable(CachedPricingIndex):
+    """
+    Usage:
+        tariff_table.get(origin_zone.id, destination_zone.id)  # -> Tariff ou None
+    """
+
+    CACHE_KEY = 'pricing:tariff_table'
+    VERSION_KEY = 'pricing:tariff_table:version'
+
+    @staticmethod
+    def _today():
+        # Même référence de date que l'ancien get_pricing_matrix
+        return datetime.now().date()
+
+    def _cache_key(self):
+        return f"{self.CACHE_KEY}:{self._today().isoformat()}"
+
+    def _is_current(self, index):
+        return index.get('effective_date') == self._today()
+
+    def get(self, origin_zone_id, destination_zone_id):
+        return self._get_index()['tariffs'].get((str(origin_zone_id), str(destination_zone_id)))
+
+    def _build(self, version):
+        from .models import ZonePricingMatrix
+
+        today = self._today()
+        tariffs = {}
+        # `.first()` sans tri explicite ordonnait par clé primaire : même règle ici
+        rows = ZonePricingMatrix.objects.filter(
+            is_active=True,
+            effective_from__lte=today
+        ).filter(
+            models.Q(effective_to__gte=today) | models.Q(effective_to__isnull=True)
+        ).order_by('pk').values_list(
+            'id', 'origin_zone_id', 'destination_zone_id',
+            'base_rate', 'per_kg_rate', 'per_km_rate', 'max_weight_included'
+        )
+        for matrix_id, origin_id, destination_id, base, per_kg, per_km, max_weight in rows:
+            tariffs.setdefault((str(origin_id), str(destination_id)), Tariff(
+                base_rate=base,
+                per_kg_rate=per_kg,
+                per_km_rate=per_km,
+                max_weight_included=max_weight,
+                matrix_id=str(matrix_id),
+            ))
+
+        logger.debug(f"TariffTable: {len(tariffs)} couples de zones compilés pour le {today}")
+        return {
+            'version': version,
+            'effective_date': today,
+            'tariffs': tariffs,
+        }
+
+
+tariff_table = TariffTable()
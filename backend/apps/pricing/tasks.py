@@ -0,0 +1,63 @@
+"""
+Celery Tasks for Pricing App
+"""
+import random
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+
+@shared_task(bind=True, name='pricing.resolve_geocode', max_retries=None)
+def resolve_geocode(self, entry_id):
+    """
+    Résout une entrée de géocodage en attente auprès de Nominatim
+
+    Planifiée par GeocodeStore.lookup au premier miss d'une requête. Attend
+    un jeton du limiteur partagé au plus NOMINATIM_WORKER_MAX_WAIT_SECONDS,
+    sinon se replanifie au moment du prochain jeton. Les erreurs Nominatim
+    (réseau, 429, 503) sont réessayées avec un délai croissant, puis l'entrée
+    passe en échec pour une heure après NOMINATIM_MAX_ATTEMPTS essais.
+
+    Args:
+        entry_id: Identifiant de la GeocodeEntry
+
+    Returns:
+        dict: {'entry_id', 'status'}
+    """
+    from apps.core.geocode_store import geocode_store
+    from apps.core.nominatim_service import NominatimRateLimited, NominatimService, NominatimUnavailable
+    from .models import GeocodeEntry
+
+    entry = GeocodeEntry.objects.filter(pk=entry_id, status=geocode_store.PENDING).first()
+    if entry is None:
+        return {'entry_id': entry_id, 'status': None}
+
+    # En mode eager (dev, tests) un retry s'exécuterait immédiatement dans le
+    # process appelant : l'entrée passe en échec pour un court délai à la place
+    eager = bool(self.request.is_eager)
+    max_wait = 0 if eager else float(getattr(settings, 'NOMINATIM_WORKER_MAX_WAIT_SECONDS', 5))
+
+    try:
+        result = NominatimService.resolve(entry.kind, entry.params, max_wait=max_wait)
+    except NominatimRateLimited as exc:
+        if eager:
+            geocode_store.store(entry, geocode_store.FAILED, retry_in=exc.wait)
+            return {'entry_id': entry_id, 'status': entry.status}
+        # Garder l'entrée 'pending' active pendant l'attente (pas de replanification en double)
+        GeocodeEntry.objects.filter(pk=entry.pk).update(updated_at=timezone.now())
+        raise self.retry(exc=exc, countdown=exc.wait + random.uniform(0, 1))
+    except NominatimUnavailable as exc:
+        entry.attempts += 1
+        if eager or entry.attempts >= int(getattr(settings, 'NOMINATIM_MAX_ATTEMPTS', 5)):
+            geocode_store.store(entry, geocode_store.FAILED, retry_in=60 if eager else None)
+            return {'entry_id': entry_id, 'status': entry.status}
+        entry.save(update_fields=['attempts', 'updated_at'])
+        raise self.retry(exc=exc, countdown=30 * (2 ** entry.attempts))
+
+    geocode_store.store(
+        entry,
+        geocode_store.FOUND if result is not None else geocode_store.NOT_FOUND,
+        result
+    )
+    return {'entry_id': entry_id, 'status': entry.status}
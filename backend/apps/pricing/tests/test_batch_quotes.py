@@ -0,0 +1,187 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.core.location_service import LocationService
+from apps.pricing.calculator import PricingCalculator
+from apps.pricing.models import PricingZone, ZonePricingMatrix
+from apps.pricing.tariff_table import tariff_table
+from apps.pricing.views import PricingZoneViewSet
+from apps.pricing.zone_index import zone_index
+
+User = get_user_model()
+
+
+@patch.object(LocationService, 'ORS_API_KEY', '')
+class BatchQuoteTests(TestCase):
+    def setUp(self):
+        zone_index.invalidate()
+        tariff_table.invalidate()
+        self.zones = [
+            PricingZone.objects.create(zone_name='Zone Cocody', commune='Cocody', is_active=True,
+                                       default_latitude=Decimal('5.3599517'), default_longitude=Decimal('-3.9615917')),
+            PricingZone.objects.create(zone_name='Zone Plateau', commune='Plateau', is_active=True,
+                                       default_latitude=Decimal('5.3238'), default_longitude=Decimal('-4.0213')),
+            PricingZone.objects.create(zone_name='Zone Yopougon', commune='Yopougon', is_active=True),
+        ]
+        for origin in self.zones:
+            for destination in self.zones:
+                ZonePricingMatrix.objects.create(
+                    origin_zone=origin, destination_zone=destination, base_rate=Decimal('1200'),
+                    per_kg_rate=Decimal('150'), per_km_rate=Decimal('80'),
+                    effective_from=date.today() - timedelta(days=1),
+                )
+        self.calculator = PricingCalculator()
+
+    def _parcels(self, count, seed=0, coords_every=3):
+        rng = random.Random(seed)
+        parcels = []
+        for i in range(count):
+            parcel = {
+                'pickup_commune': rng.choice(['Cocody', 'PLATEAU', 'Yopougon']),
+                'delivery_commune': rng.choice(['cocody', 'Plateau', 'Yopougon']),
+                'package_weight_kg': Decimal(rng.choice(['1', '4.5', '8', '12'])),
+                'is_fragile': rng.random() < 0.2,
+                'scheduling_type': rng.choice(['immediate', 'scheduled']),
+            }
+            if i % coords_every == 0:
+                parcel['pickup_coords'] = (round(rng.uniform(5.30, 5.40), 5), round(rng.uniform(-4.05, -3.95), 5))
+                parcel['delivery_coords'] = (round(rng.uniform(5.30, 5.40), 5), round(rng.uniform(-4.05, -3.95), 5))
+            parcels.append(parcel)
+        return parcels
+
+    def test_same_quotes_as_single_calculation(self):
+        parcels = self._parcels(60)
+        batch = self.calculator.calculate_prices(parcels)
+
+        self.assertEqual(batch['distance_source'], 'haversine')
+        for parcel, quote in zip(parcels, batch['quotes']):
+            self.assertEqual(quote, self.calculator.calculate_price(parcel))
+
+    def test_invalid_parcel_does_not_fail_batch(self):
+        parcels = self._parcels(3)
+        parcels[1]['delivery_commune'] = 'Atlantis'
+        quotes = self.calculator.calculate_prices(parcels)['quotes']
+
+        self.assertIn('total_price', quotes[0])
+        self.assertIn("Commune 'Atlantis' n'existe pas", quotes[1]['error'])
+        self.assertIn('total_price', quotes[2])
+
+    def test_no_query_per_parcel(self):
+        self.calculator.calculate_prices(self._parcels(2))
+        with self.assertNumQueries(0):
+            self.calculator.calculate_prices(self._parcels(200, seed=1))
+
+    def test_routed_distances_are_fetched_in_chunks_within_the_matrix_limit(self):
+        parcels = self._parcels(120, coords_every=1)
+        calls = []
+
+        def routed_matrix(points):
+            calls.append(len(points))
+            # Distance « routière » reconnaissable : 1 km par unité d'écart d'index
+            return {
+                'distances_km': [[float(abs(i - j)) for j in range(len(points))] for i in range(len(points))],
+                'source': 'openrouteservice',
+            }
+
+        with patch.object(LocationService, 'ORS_API_KEY', 'key'), \
+                patch.object(LocationService, '_get_matrix_ors', side_effect=routed_matrix):
+            batch = self.calculator.calculate_prices(parcels)
+
+        self.assertEqual(batch['distance_source'], 'openrouteservice')
+        self.assertEqual(len(calls), 3)
+        self.assertTrue(all(n <= LocationService.MATRIX_MAX_POINTS for n in calls))
+        # Départ et arrivée consécutifs dans chaque lot
+        self.assertEqual({quote['details']['distance_km'] for quote in batch['quotes']}, {1.0})
+
+    def test_same_quotes_as_single_calculation_with_a_routing_provider(self):
+        parcels = self._parcels(40, seed=2, coords_every=1)
+
+        def routed_matrix(points):
+            # Distance routée propre à chaque couple, quel que soit le lot ; départs
+            # au nord de 5.38 non routables (null), comme une case vide de /matrix
+            return {
+                'distances_km': [
+                    [None if a[0] > 5.38 else round(LocationService.haversine_distance(*a, *b) * 1.5, 2) for b in points]
+                    for a in points
+                ],
+                'source': 'openrouteservice',
+            }
+
+        def routed_directions(*coords):
+            # /directions (rayon d'accroche 1 km) route aussi les départs au nord
+            return round(LocationService.haversine_distance(*coords) * 1.5, 2)
+
+        with patch.object(LocationService, 'ORS_API_KEY', 'key'), \
+                patch.object(LocationService, 'DIRECTIONS_MAX_REQUESTS', len(parcels)), \
+                patch.object(LocationService, '_get_matrix_ors', side_effect=routed_matrix), \
+                patch.object(LocationService, '_get_distance_ors', side_effect=routed_directions) as directions:
+            batch = self.calculator.calculate_prices(parcels)
+            batch_directions = directions.call_count
+            singles = [self.calculator.calculate_price(parcel) for parcel in parcels]
+
+        self.assertEqual(batch['distance_source'], 'openrouteservice')
+        self.assertEqual(batch['quotes'], singles)
+        # /directions seulement pour les cases non routables de la matrice
+        north = [i for i, parcel in enumerate(parcels) if parcel['pickup_coords'][0] > 5.38]
+        self.assertEqual(batch_directions, len(north))
+        self.assertEqual(
+            batch['quotes'][north[0]]['details']['distance_km'],
+            round(LocationService.haversine_distance(*parcels[north[0]]['pickup_coords'],
+                                                     *parcels[north[0]]['delivery_coords']) * 1.5, 2),
+        )
+
+    def _batch_request(self, parcels):
+        user = User.objects.create_user(
+            email='batch@test.com', phone='+2250700200000', password='test123',
+            user_type='admin', first_name='Batch', last_name='Quote'
+        )
+        view = PricingZoneViewSet.as_view({'post': 'calculate_batch'})
+
+        items = []
+        for i, parcel in enumerate(parcels):
+            item = {k: v for k, v in parcel.items() if not k.endswith('_coords')}
+            item['package_weight_kg'] = str(item['package_weight_kg'])
+            item['reference'] = f'CMD-{i}'
+            if 'pickup_coords' in parcel:
+                item['pickup_latitude'], item['pickup_longitude'] = parcel['pickup_coords']
+                item['delivery_latitude'], item['delivery_longitude'] = parcel['delivery_coords']
+            items.append(item)
+        return view, user, items
+
+    def _timed_post(self, view, user, items):
+        start = time.perf_counter()
+        request = APIRequestFactory().post('/api/v1/pricing/zones/calculate-batch/', {'parcels': items}, format='json')
+        force_authenticate(request, user=user)
+        response = view(request)
+        return response, time.perf_counter() - start
+
+    def test_endpoint_prices_500_parcels_under_a_second(self):
+        view, user, items = self._batch_request(self._parcels(500))
+        items.append({'pickup_commune': 'Cocody', 'reference': 'BAD'})
+
+        response, elapsed = self._timed_post(view, user, items)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['priced'], 500)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(response.data['quotes'][7]['reference'], 'CMD-7')
+        self.assertIn('errors', response.data['quotes'][500])
+        self.assertLess(elapsed, 1.0)
+
+    def test_endpoint_prices_a_full_batch_with_coordinates_under_a_second(self):
+        # Chaque colis a ses propres coordonnées : 2 000 points distincts
+        view, user, items = self._batch_request(self._parcels(PricingZoneViewSet.MAX_BATCH_QUOTES, coords_every=1))
+
+        response, elapsed = self._timed_post(view, user, items)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['priced'], PricingZoneViewSet.MAX_BATCH_QUOTES)
+        self.assertEqual(response.data['distance_source'], 'haversine')
+        self.assertLess(elapsed, 1.0)
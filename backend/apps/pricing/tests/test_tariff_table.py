@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from apps.pricing.calculator import PricingCalculator
+from apps.pricing.models import PricingZone, ZonePricingMatrix
+from apps.pricing.tariff_table import DEFAULT_TARIFF, TariffTable, tariff_table
+from apps.pricing.zone_index import zone_index
+
+
+class TariffTableTests(TestCase):
+    def setUp(self):
+        zone_index.invalidate()
+        tariff_table.invalidate()
+        self.today = date.today()
+        self.cocody = PricingZone.objects.create(zone_name='Zone Cocody', commune='Cocody', is_active=True)
+        self.plateau = PricingZone.objects.create(zone_name='Zone Plateau', commune='Plateau', is_active=True)
+        self.calculator = PricingCalculator()
+
+    def _matrix(self, origin, destination, base_rate, **kwargs):
+        fields = {
+            'per_kg_rate': Decimal('150'),
+            'per_km_rate': Decimal('75'),
+            'effective_from': self.today - timedelta(days=10),
+        }
+        fields.update(kwargs)
+        return ZonePricingMatrix.objects.create(
+            origin_zone=origin, destination_zone=destination, base_rate=Decimal(base_rate), **fields
+        )
+
+    def test_only_effective_matrix_is_used(self):
+        self._matrix(self.cocody, self.plateau, '900', effective_to=self.today - timedelta(days=1))
+        self._matrix(self.cocody, self.plateau, '1100', effective_from=self.today + timedelta(days=1))
+        self._matrix(self.cocody, self.plateau, '1200', is_active=False)
+        current = self._matrix(self.cocody, self.plateau, '1500', effective_to=self.today)
+
+        tariff = self.calculator.get_pricing_matrix(self.cocody, self.plateau)
+        self.assertEqual(tariff.base_rate, Decimal('1500'))
+        self.assertEqual(tariff.matrix_id, str(current.id))
+
+    def test_missing_pair_returns_default(self):
+        self.assertIs(self.calculator.get_pricing_matrix(self.plateau, self.cocody), DEFAULT_TARIFF)
+
+    def test_no_query_once_compiled(self):
+        self._matrix(self.cocody, self.plateau, '1500')
+        self.calculator.get_pricing_matrix(self.cocody, self.plateau)
+        with self.assertNumQueries(0):
+            for _ in range(10):
+                self.calculator.get_pricing_matrix(self.cocody, self.plateau)
+                self.calculator.get_pricing_matrix(self.plateau, self.cocody)
+
+    def test_refreshed_on_matrix_change(self):
+        matrix = self._matrix(self.cocody, self.plateau, '1500')
+        self.assertEqual(self.calculator.get_pricing_matrix(self.cocody, self.plateau).base_rate, Decimal('1500'))
+
+        matrix.base_rate = Decimal('1700')
+        matrix.save()
+        self.assertEqual(self.calculator.get_pricing_matrix(self.cocody, self.plateau).base_rate, Decimal('1700'))
+
+        matrix.delete()
+        self.assertIs(self.calculator.get_pricing_matrix(self.cocody, self.plateau), DEFAULT_TARIFF)
+
+    def test_refreshed_at_day_boundary(self):
+        tomorrow = self.today + timedelta(days=1)
+        self._matrix(self.cocody, self.plateau, '1500', effective_to=self.today)
+        self._matrix(self.cocody, self.plateau, '1800', effective_from=tomorrow)
+        self.assertEqual(self.calculator.get_pricing_matrix(self.cocody, self.plateau).base_rate, Decimal('1500'))
+
+        with patch.object(TariffTable, '_today', return_value=tomorrow):
+            self.assertEqual(self.calculator.get_pricing_matrix(self.cocody, self.plateau).base_rate, Decimal('1800'))
+
+    @patch('apps.core.location_service.LocationService.get_distance', return_value=4.0)
+    def test_calculate_price_uses_compiled_tariff(self, _mock_distance):
+        self._matrix(self.cocody, self.plateau, '1000', max_weight_included=Decimal('5.0'))
+        result = self.calculator.calculate_price({
+            'pickup_commune': 'Cocody',
+            'delivery_commune': 'Plateau',
+            'package_weight_kg': 7,
+            'pickup_coords': (5.35, -3.98),
+            'delivery_coords': (5.32, -4.02),
+            'scheduling_type': 'scheduled',
+        })
+        # 1000 + 2 kg x 150 + 4 km x 75 = 1600
+        self.assertEqual(result['breakdown']['subtotal'], 1600.0)
+        self.assertEqual(result['total_price'], 1600.0)
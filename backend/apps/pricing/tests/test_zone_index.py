@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import TestCase
+
+from apps.pricing.calculator import PricingCalculator
+from apps.pricing.models import PricingZone
+from apps.pricing.zone_index import zone_index
+
+
+class PricingZoneIndexTests(TestCase):
+    def setUp(self):
+        zone_index.invalidate()
+        self.cocody = PricingZone.objects.create(zone_name='Zone Cocody', commune='Cocody', is_active=True)
+        self.port_bouet = PricingZone.objects.create(zone_name='Zone Port-Bouët', commune='Port-Bouët', is_active=True)
+        self.riviera = PricingZone.objects.create(
+            zone_name='Riviera 2', commune='Cocody', quartier='Riviera 2', is_active=True
+        )
+        PricingZone.objects.create(zone_name='Zone Inactive', commune='Anyama', is_active=False)
+        self.calculator = PricingCalculator()
+
+    def test_lookup_is_accent_and_case_insensitive(self):
+        self.assertEqual(self.calculator.get_zone_from_commune('PORT-BOUET'), self.port_bouet)
+        self.assertEqual(self.calculator.get_zone_from_commune('port‑bouët'), self.port_bouet)
+
+    def test_no_query_once_index_is_built(self):
+        self.calculator.get_zone_from_commune('Cocody')
+        with self.assertNumQueries(0):
+            for _ in range(4):
+                self.calculator.get_zone_from_quartier('Riviera 2', 'Cocody')
+                self.calculator.get_zone_from_commune('Port-Bouet')
+
+    def test_quartier_with_commune_fallback(self):
+        self.assertEqual(self.calculator.get_zone_from_quartier('riviera 2', 'COCODY'), self.riviera)
+        self.assertEqual(self.calculator.get_zone_from_quartier('Angré', 'Cocody'), self.cocody)
+        self.assertEqual(self.calculator.get_zone_from_quartier('', 'Cocody'), self.cocody)
+
+    def test_unknown_or_inactive_commune_rejected(self):
+        with self.assertRaises(ValidationError) as ctx:
+            self.calculator.get_zone_from_commune('Anyama')
+        self.assertIn('Cocody, Port-Bouët', str(ctx.exception))
+
+    def test_invalidated_on_save_and_delete(self):
+        self.calculator.get_zone_from_commune('Cocody')
+
+        PricingZone.objects.create(zone_name='Zone Yopougon', commune='Yopougon', is_active=True)
+        self.assertEqual(self.calculator.get_zone_from_commune('yopougon').zone_name, 'Zone Yopougon')
+
+        self.port_bouet.is_active = False
+        self.port_bouet.save()
+        with self.assertRaises(ValidationError):
+            self.calculator.get_zone_from_commune('Port-Bouët')
+
+        self.riviera.delete()
+        self.assertEqual(self.calculator.get_zone_from_quartier('Riviera 2', 'Cocody'), self.cocody)
+
+    def test_shared_version_bumped_only_on_commit(self):
+        self.calculator.get_zone_from_commune('Cocody')
+        version = cache.get(zone_index.VERSION_KEY)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PricingZone.objects.create(zone_name='Zone Yopougon', commune='Yopougon', is_active=True)
+            # Avant le commit : copie privée à jour, version et cache partagés intacts
+            self.assertEqual(self.calculator.get_zone_from_commune('Yopougon').zone_name, 'Zone Yopougon')
+            self.assertEqual(cache.get(zone_index.VERSION_KEY), version)
+            self.assertNotIn('yopougon', (cache.get(zone_index.CACHE_KEY) or {}).get('communes', {}))
+
+        self.assertNotEqual(cache.get(zone_index.VERSION_KEY), version)
+        self.assertEqual(self.calculator.get_zone_from_commune('Yopougon').zone_name, 'Zone Yopougon')
@@ -34,6 +34,21 @@ def normalize_commune(name: str) -> str:
     return ascii_str.upper()
 
 
+def _with_coords(validated_data):
+    """Ajoute pickup_coords / delivery_coords (tuples) depuis les latitudes/longitudes validées"""
+    if validated_data.get('pickup_latitude') and validated_data.get('pickup_longitude'):
+        validated_data['pickup_coords'] = (
+            float(validated_data['pickup_latitude']),
+            float(validated_data['pickup_longitude'])
+        )
+    if validated_data.get('delivery_latitude') and validated_data.get('delivery_longitude'):
+        validated_data['delivery_coords'] = (
+            float(validated_data['delivery_latitude']),
+            float(validated_data['delivery_longitude'])
+        )
+    return validated_data
+
+
 # ============================================================================
 # VIEWSET : GESTION DES ZONES TARIFAIRES
 # ============================================================================
@@ -194,23 +209,7 @@ class PricingZoneViewSet(PricingViewSetPermissionMixin, viewsets.ModelViewSet):
             if not serializer.is_valid():
                 logger.error(f"❌ Erreurs validation: {serializer.errors}")
                 return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
-            validated_data = serializer.validated_data
-            pickup_coords = None
-            if validated_data.get('pickup_latitude') and validated_data.get('pickup_longitude'):
-                pickup_coords = (
-                    float(validated_data['pickup_latitude']),
-                    float(validated_data['pickup_longitude'])
-                )
-            delivery_coords = None
-            if validated_data.get('delivery_latitude') and validated_data.get('delivery_longitude'):
-                delivery_coords = (
-                    float(validated_data['delivery_latitude']),
-                    float(validated_data['delivery_longitude'])
-                )
-            if pickup_coords:
-                validated_data['pickup_coords'] = pickup_coords
-            if delivery_coords:
-                validated_data['delivery_coords'] = delivery_coords
+            validated_data = _with_coords(serializer.validated_data)
             calculator = PricingCalculator()
             result = calculator.calculate_price(validated_data)
             return Response(result, status=status.HTTP_200_OK)
@@ -222,6 +221,63 @@ class PricingZoneViewSet(PricingViewSetPermissionMixin, viewsets.ModelViewSet):
             return Response({'error': f'Erreur de calcul: {str(e)}', 'details': traceback.format_exc()}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+    # Nombre maximal de colis par devis en lot
+    MAX_BATCH_QUOTES = 1000
+
+    @action(detail=False, methods=['post'], url_path='calculate-batch', permission_classes=[IsAuthenticated])
+    def calculate_batch(self, request):
+        """
+        Calcule le prix de nombreux colis en une seule requête (manifeste e-commerce).
+
+        Body:
+        {
+            "parcels": [
+                {"reference": "CMD-001", "pickup_commune": "Cocody", "delivery_commune": "Plateau",
+                 "package_weight_kg": 2.5, ...},   // mêmes champs que /calculate/
+                ...
+            ]
+        }
+
+        Chaque devis est renvoyé dans l'ordre d'entrée, avec son index et sa référence ;
+        un colis invalide n'empêche pas le calcul des autres.
+        """
+        parcels = request.data.get('parcels')
+        if not isinstance(parcels, list) or not parcels:
+            return Response({'error': 'Le champ parcels (liste non vide) est requis'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(parcels) > self.MAX_BATCH_QUOTES:
+            return Response(
+                {'error': f'Maximum {self.MAX_BATCH_QUOTES} colis par requête'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        valid_parcels = []
+        valid_indexes = []
+        quotes = [None] * len(parcels)
+        for index, parcel in enumerate(parcels):
+            reference = parcel.get('reference') if isinstance(parcel, dict) else None
+            serializer = CalculatePriceSerializer(data=parcel)
+            if not serializer.is_valid():
+                quotes[index] = {'index': index, 'reference': reference, 'errors': serializer.errors}
+                continue
+            valid_parcels.append(_with_coords(serializer.validated_data))
+            valid_indexes.append(index)
+
+        result = PricingCalculator().calculate_prices(valid_parcels) if valid_parcels else {'quotes': [], 'distance_source': None}
+
+        for index, quote in zip(valid_indexes, result['quotes']):
+            reference = parcels[index].get('reference')
+            quotes[index] = {'index': index, 'reference': reference, **quote}
+
+        priced = [q for q in quotes if 'total_price' in q]
+        return Response({
+            'count': len(quotes),
+            'priced': len(priced),
+            'failed': len(quotes) - len(priced),
+            'total_price': float(sum(q['total_price'] for q in priced)),
+            'distance_source': result['distance_source'],
+            'quotes': quotes,
+        }, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], url_path='with-selection')
     def with_selection(self, request):
         """
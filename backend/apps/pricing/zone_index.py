@@ -0,0 +1,194 @@
+# pricing/zone_index.py
+"""
+Index des zones tarifaires par commune / quartier normalisés.
+
+Évite de charger toutes les `PricingZone` actives et de normaliser chaque nom
+à chaque devis : l'index est construit une fois, partagé via le cache Django
+(Redis en production) et conservé en mémoire dans chaque process.
+
+Invalidation : les signaux post_save / post_delete de `PricingZone` font
+évoluer un numéro de version dans le cache au commit de la transaction ;
+chaque process compare sa copie locale à cette version au plus toutes les
+`VERSION_CHECK_INTERVAL` secondes. Le process qui a modifié la zone
+reconstruit tout de suite une copie privée (voir `invalidate_on_commit`).
+"""
+
+import logging
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+class CachedPricingIndex:
+    """
+    Base des index de tarification : copie locale par process + copie partagée
+    dans le cache Django, invalidées par un numéro de version.
+
+    Les sous-classes définissent CACHE_KEY / VERSION_KEY et `_build(version)`,
+    qui renvoie un dict contenant au moins la clé 'version'.
+    """
+
+    CACHE_KEY = None
+    VERSION_KEY = None
+    CACHE_TIMEOUT = 60 * 60 * 24  # Filet de sécurité si une invalidation est manquée
+    VERSION_CHECK_INTERVAL = 5  # secondes
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = None
+        self._local_version = None
+        self._checked_at = 0.0
+        # Copie locale construite avant le commit d'une modification : jamais publiée
+        self._private = False
+
+    def invalidate(self):
+        """Force la reconstruction dans tous les process"""
+        with self._lock:
+            self._local = None
+            self._local_version = None
+            self._private = False
+        try:
+            cache.delete(self._cache_key())
+            cache.set(self.VERSION_KEY, time.time_ns(), None)
+        except Exception as e:
+            logger.warning(f"{type(self).__name__}: invalidation du cache impossible ({e})")
+
+    def invalidate_on_commit(self):
+        """
+        Appelé par les signaux post_save / post_delete.
+
+        La version partagée n'évolue qu'au commit : avant, un autre process
+        reconstruirait l'index depuis les anciennes lignes et le publierait sous
+        la nouvelle version, pour toute la durée du cache. En attendant, ce
+        process reconstruit une copie privée (il voit ses propres écritures)
+        tant qu'il est dans une transaction, sans l'écrire dans le cache partagé.
+        """
+        with self._lock:
+            self._local = None
+            self._local_version = None
+            self._private = True
+        transaction.on_commit(self.invalidate)
+
+    def _is_current(self, index):
+        """Permet aux sous-classes de périmer un index (ex: changement de jour)"""
+        return True
+
+    def _cache_key(self):
+        return self.CACHE_KEY
+
+    def _get_index(self):
+        now = time.monotonic()
+        local = self._local
+        if local is not None and now - self._checked_at < self.VERSION_CHECK_INTERVAL and self._is_current(local):
+            return local
+
+        with self._lock:
+            version = self._current_version()
+            if self._private:
+                if connection.in_atomic_block:
+                    if self._local is None or not self._is_current(self._local):
+                        self._local = self._build(version)
+                        self._local_version = version
+                    self._checked_at = now
+                    return self._local
+                # Hors transaction (commit, rollback ou autre thread) : lignes validées
+                self._private = False
+                self._local = None
+
+            if self._local is None or version != self._local_version or not self._is_current(self._local):
+                index = None
+                try:
+                    cached = cache.get(self._cache_key())
+                    if cached and cached.get('version') == version and self._is_current(cached):
+                        index = cached
+                except Exception as e:
+                    logger.warning(f"{type(self).__name__}: lecture du cache impossible ({e})")
+
+                if index is None:
+                    index = self._build(version)
+                    try:
+                        cache.set(self._cache_key(), index, self.CACHE_TIMEOUT)
+                    except Exception as e:
+                        logger.warning(f"{type(self).__name__}: écriture du cache impossible ({e})")
+
+                self._local = index
+                self._local_version = version
+            self._checked_at = now
+            return self._local
+
+    def _current_version(self):
+        try:
+            version = cache.get(self.VERSION_KEY)
+            if version is None:
+                version = time.time_ns()
+                cache.add(self.VERSION_KEY, version, None)
+                version = cache.get(self.VERSION_KEY, version)
+            return version
+        except Exception:
+            return self._local_version
+
+    def _build(self, version):
+        raise NotImplementedError
+
+
+class PricingZoneIndex(CachedPricingIndex):
+    """
+    Usage:
+        zone_index.get_by_commune('Port-Bouët')          # -> PricingZone ou None
+        zone_index.get_by_quartier('Riviera 2', 'Cocody')  # -> PricingZone ou None
+    """
+
+    CACHE_KEY = 'pricing:zone_index'
+    VERSION_KEY = 'pricing:zone_index:version'
+
+    def get_by_commune(self, commune):
+        from .calculator import normalize_commune_name
+
+        return self._get_index()['communes'].get(normalize_commune_name(commune))
+
+    def get_by_quartier(self, quartier, commune):
+        from .calculator import normalize_commune_name
+
+        if not quartier or not str(quartier).strip():
+            return None
+        key = self._quartier_key(normalize_commune_name(commune), normalize_commune_name(quartier))
+        return self._get_index()['quartiers'].get(key)
+
+    def communes(self):
+        """Noms des communes actives (triés), pour les messages d'erreur"""
+        return self._get_index()['communes_list']
+
+    def _build(self, version):
+        from .calculator import normalize_commune_name
+        from .models import PricingZone
+
+        communes = {}
+        quartiers = {}
+        names = set()
+        # Même ordre de parcours que l'ancienne recherche linéaire : la première zone gagne
+        for zone in PricingZone.objects.filter(is_active=True):
+            normalized_commune = normalize_commune_name(zone.commune)
+            communes.setdefault(normalized_commune, zone)
+            names.add(zone.commune)
+            if zone.quartier:
+                key = self._quartier_key(normalized_commune, normalize_commune_name(zone.quartier))
+                quartiers.setdefault(key, zone)
+
+        logger.debug(f"PricingZoneIndex: {len(communes)} communes, {len(quartiers)} quartiers indexés")
+        return {
+            'version': version,
+            'communes': communes,
+            'quartiers': quartiers,
+            'communes_list': sorted(names),
+        }
+
+    @staticmethod
+    def _quartier_key(normalized_commune, normalized_quartier):
+        return f"{normalized_commune}|{normalized_quartier}"
+
+
+zone_index = PricingZoneIndex()
@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Suivi temps réel des livraisons (SSE) servi directement en ASGI, le reste par
+# Django. Import après get_asgi_application() : les apps doivent être chargées.
+from apps.deliveries.tracking_stream import TrackingStreamApp  # noqa: E402
+
+application = TrackingStreamApp(django_application)
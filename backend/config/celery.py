@@ -28,10 +28,24 @@ app.conf.beat_schedule = {
         'task': 'payments.tasks.process_daily_payouts',
         'schedule': crontab(hour=23, minute=59),  # 23h59 chaque jour
     },
+    'flush-driver-positions': {
+        'task': 'drivers.flush_driver_positions',
+        # Positions GPS en tampon écrites en base toutes les 5 s (par défaut)
+        'schedule': float(getattr(settings, 'DRIVER_POSITION_FLUSH_SECONDS', 5)),
+        'options': {'expires': 30},
+    },
+    'ensure-gps-partitions': {
+        'task': 'drivers.ensure_gps_partitions',
+        'schedule': crontab(hour=1, minute=30),  # Partitions GPS des 7 prochains jours
+    },
     'cleanup-old-gps-data': {
         'task': 'drivers.cleanup_old_gps_data',
         'schedule': crontab(hour=2, minute=0),  # 2h du matin chaque jour
     },
+    'reconcile-delivery-rollups': {
+        'task': 'deliveries.reconcile_delivery_rollups',
+        'schedule': crontab(hour=3, minute=0),  # Agrégats du dashboard recalculés chaque nuit
+    },
     'send-tracking-statistics': {
         'task': 'drivers.send_tracking_statistics',
         'schedule': crontab(hour=6, minute=0),  # 6h du matin chaque jour
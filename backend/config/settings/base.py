@@ -287,6 +287,33 @@ FIREBASE_DATABASE_URL = config('FIREBASE_DATABASE_URL', default='')
 # Google Maps
 GOOGLE_MAPS_API_KEY = config('GOOGLE_MAPS_API_KEY', default='')
 
+# Optimisation de flotte (VRP) : budget de résolution OR-Tools en secondes
+FLEET_VRP_TIME_LIMIT_SECONDS = config('FLEET_VRP_TIME_LIMIT_SECONDS', default=10, cast=float)
+
+# Routing hors ligne : graphe .npz construit par `manage.py build_routing_graph <extrait.osm>`
+# (vide = itinéraires et distances via OSRM / OpenRouteService uniquement)
+OFFLINE_ROUTING_GRAPH = config('OFFLINE_ROUTING_GRAPH', default='')
+# Matrices hors ligne : un Dijkstra Python par point (~50 ms sur une ville) ;
+# au-delà de ce nombre de points, /table d'OSRM ou /matrix d'ORS
+OFFLINE_ROUTING_MATRIX_MAX_POINTS = config('OFFLINE_ROUTING_MATRIX_MAX_POINTS', default=8, cast=int)
+
+# Nominatim : débit commun à tous les process (token bucket Redis), 1 req/s max
+# selon la politique d'utilisation d'OpenStreetMap
+NOMINATIM_RATE_PER_SECOND = config('NOMINATIM_RATE_PER_SECOND', default=1.0, cast=float)
+NOMINATIM_BURST = config('NOMINATIM_BURST', default=1, cast=int)
+# Requêtes sans résultat réessayées après ce délai (les résultats trouvés n'expirent pas)
+NOMINATIM_NOT_FOUND_RETRY_HOURS = config('NOMINATIM_NOT_FOUND_RETRY_HOURS', default=168, cast=float)
+# Reverse geocoding : positions alignées sur une grille de ce pas (une entrée par cellule)
+NOMINATIM_REVERSE_GRID_METERS = config('NOMINATIM_REVERSE_GRID_METERS', default=30, cast=float)
+
+# Reverse geocoding local (centroïdes des quartiers et des zones tarifaires) :
+# au-delà de ce rayon autour du centroïde le plus proche, Nominatim / ORS
+REVERSE_GEOCODE_LOCAL_RADIUS_METERS = config('REVERSE_GEOCODE_LOCAL_RADIUS_METERS', default=1500, cast=float)
+
+# Écrans « mes statistiques » (merchant, particulier, livreur) : durée du cache,
+# invalidé à chaque modification d'une livraison, d'un gain ou d'une facture
+USER_STATS_CACHE_SECONDS = config('USER_STATS_CACHE_SECONDS', default=60, cast=int)
+
 # Sentry (monitoring erreurs)
 SENTRY_DSN = config('SENTRY_DSN', default='')
 
@@ -464,6 +491,9 @@ def _clean_url(url: str) -> str:
 
 # Read raw redis url (used by other services too) - CLEAN IT!
 RAW_REDIS_URL = _clean_url(config('REDIS_URL', default='redis://localhost:6379/0'))
+# Redis explicitement configuré : structures partagées entre process (apps/core/redis_connection.py).
+# Vide en local : index, tampons et limiteurs restent propres au process.
+REDIS_URL = _clean_url(config('REDIS_URL', default=''))
 
 # Normalize: if broker/result-specific env vars are set, prefer them
 _env_broker = _clean_url(os.environ.get('CELERY_BROKER_URL') or os.environ.get('BROKER_URL') or '')
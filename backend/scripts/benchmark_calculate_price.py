@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Micro-benchmark de PricingCalculator.calculate_price : recherche SQL historique vs tables compilées.
+
+Usage:
+  python scripts/benchmark_calculate_price.py
+  python scripts/benchmark_calculate_price.py --quotes 2000 --zones 13
+
+Crée une base de test jetable (jamais la base réelle), y insère des zones et
+une matrice tarifaire complète, puis mesure le débit de devis :
+- "legacy" : parcours de toutes les zones + requête ZonePricingMatrix par devis
+  (ancienne implémentation, reproduite ci-dessous) ;
+- "compiled" : index des zones + table tarifaire compilée.
+La distance est calculée en haversine (pas d'appel réseau).
+"""
+import os
+import sys
+import random
+import argparse
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+
+from django.db import connection, models
+from django.core.exceptions import ValidationError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from apps.core.location_service import LocationService
+from apps.pricing.calculator import PricingCalculator, normalize_commune_name
+from apps.pricing.models import PricingZone, ZonePricingMatrix
+
+
+COMMUNES = [
+    'Abobo', 'Adjamé', 'Attécoubé', 'Cocody', 'Koumassi', 'Marcory', 'Plateau',
+    'Port-Bouët', 'Treichville', 'Yopougon', 'Bingerville', 'Songon', 'Anyama',
+]
+
+
+class LegacyPricingCalculator(PricingCalculator):
+    """Recherche de zones et de matrice telle qu'avant les tables compilées."""
+
+    def get_zone_from_commune(self, commune):
+        normalized_input = normalize_commune_name(commune)
+        for z in PricingZone.objects.filter(is_active=True):
+            if normalize_commune_name(z.commune) == normalized_input:
+                return z
+        raise ValidationError(f"Commune '{commune}' n'existe pas.")
+
+    def get_zone_from_quartier(self, quartier, commune):
+        if quartier and quartier.strip():
+            normalized_quartier = normalize_commune_name(quartier)
+            normalized_commune = normalize_commune_name(commune)
+            for z in PricingZone.objects.filter(is_active=True):
+                if (z.quartier and normalize_commune_name(z.commune) == normalized_commune and
+                        normalize_commune_name(z.quartier) == normalized_quartier):
+                    return z
+        return self.get_zone_from_commune(commune)
+
+    def get_pricing_matrix(self, origin_zone, destination_zone):
+        today = datetime.now().date()
+        pricing = ZonePricingMatrix.objects.filter(
+            origin_zone=origin_zone,
+            destination_zone=destination_zone,
+            is_active=True,
+            effective_from__lte=today
+        ).filter(
+            models.Q(effective_to__gte=today) | models.Q(effective_to__isnull=True)
+        ).first()
+        return pricing or self.get_default_pricing()
+
+
+def populate(zone_count):
+    today = datetime.now().date()
+    zones = [
+        PricingZone.objects.create(
+            zone_name=f'Zone {name}', commune=name, is_active=True,
+            default_latitude=Decimal('5.30') + Decimal(i) / 100,
+            default_longitude=Decimal('-4.00') + Decimal(i) / 100,
+        )
+        for i, name in enumerate(COMMUNES[:zone_count])
+    ]
+    for origin in zones:
+        for destination in zones:
+            ZonePricingMatrix.objects.create(
+                origin_zone=origin, destination_zone=destination,
+                base_rate=Decimal('1000') if origin == destination else Decimal('1500'),
+                per_kg_rate=Decimal('200'), per_km_rate=Decimal('100'),
+                effective_from=today - timedelta(days=30),
+            )
+    return [z.commune for z in zones]
+
+
+def make_quotes(communes, count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'pickup_commune': rng.choice(communes).upper(),
+            'delivery_commune': rng.choice(communes),
+            'package_weight_kg': rng.choice([1, 3, 5, 8, 12]),
+            'is_fragile': rng.random() < 0.2,
+            'scheduling_type': rng.choice(['immediate', 'scheduled']),
+        }
+        for _ in range(count)
+    ]
+
+
+def run(calculator, quotes):
+    start = time.perf_counter()
+    totals = [calculator.calculate_price(q)['total_price'] for q in quotes]
+    return time.perf_counter() - start, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark calculate_price')
+    parser.add_argument('--quotes', type=int, default=1000, help='Number of quotes per run')
+    parser.add_argument('--zones', type=int, default=len(COMMUNES), help='Number of pricing zones')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        communes = populate(min(args.zones, len(COMMUNES)))
+        quotes = make_quotes(communes, args.quotes)
+
+        with mock.patch.object(LocationService, 'ORS_API_KEY', ''):
+            legacy_t, legacy_totals = run(LegacyPricingCalculator(), quotes)
+            compiled_calculator = PricingCalculator()
+            compiled_calculator.calculate_price(quotes[0])  # compilation des tables
+            compiled_t, compiled_totals = run(compiled_calculator, quotes)
+
+        print(f"{'path':>10} | {'quotes/s':>10} | {'µs/quote':>9}")
+        print('-' * 36)
+        for label, elapsed in (('legacy', legacy_t), ('compiled', compiled_t)):
+            print(f"{label:>10} | {len(quotes) / elapsed:>10.0f} | {elapsed / len(quotes) * 1e6:>9.1f}")
+        print(f"speedup: {legacy_t / compiled_t:.1f}x | same totals: {legacy_totals == compiled_totals}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
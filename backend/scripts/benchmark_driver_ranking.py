@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark du classement des livreurs : ancienne boucle geodesic vs moteur NumPy.
+
+Usage:
+  python scripts/benchmark_driver_ranking.py
+  python scripts/benchmark_driver_ranking.py --sizes 100,1000,10000 --repeat 5
+
+Les candidats sont générés aléatoirement dans une bbox d'Abidjan ; aucune base
+de données n'est nécessaire (on mesure uniquement le coût du classement).
+"""
+import os
+import sys
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from geopy.distance import geodesic
+
+from apps.deliveries.ranking import DriverRankingEngine
+
+
+PICKUP = (5.3600, -4.0083)
+
+
+def make_rows(count, bbox=(5.15, -4.10, 5.45, -3.70), seed=0):
+    rng = random.Random(seed)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    rows = []
+    for i in range(count):
+        rows.append((
+            i,
+            rng.uniform(min_lat, max_lat),
+            rng.uniform(min_lon, max_lon),
+            rng.randint(0, 3),
+            round(rng.uniform(3.0, 5.0), 2),
+            rng.randint(0, 500),
+        ))
+    return rows
+
+
+def legacy_loop(rows, pickup):
+    """Reproduit l'ancienne implémentation de `_find_best_driver` (étapes 4-5)."""
+    items = []
+    for driver_id, lat, lon, load, rating, successful in rows:
+        distance_km = None
+        if pickup and lat is not None and lon is not None:
+            distance_km = geodesic((float(lat), float(lon)), pickup).km
+        items.append({
+            'driver': driver_id,
+            'distance_km': distance_km,
+            'active_deliveries_count': load,
+            'rating': rating,
+            'successful_deliveries': successful,
+        })
+    items.sort(key=lambda item: (
+        item['distance_km'] if item['distance_km'] is not None else float('inf'),
+        item['active_deliveries_count'],
+        -float(item['rating']),
+        -int(item['successful_deliveries']),
+    ))
+    return items[0]['driver'] if items else None
+
+
+def vectorized(rows, pickup):
+    ranked = DriverRankingEngine.from_rows(rows).top_k(pickup, k=1)
+    return ranked[0][0] if ranked else None
+
+
+def best_of(func, rows, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(rows, PICKUP)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark driver ranking')
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma-separated fleet sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size (best time kept)')
+    args = parser.parse_args()
+
+    print(f"{'drivers':>8} | {'loop (ms)':>10} | {'numpy (ms)':>10} | {'speedup':>8} | same best")
+    print('-' * 60)
+    for size in [int(s) for s in args.sizes.split(',')]:
+        rows = make_rows(size)
+        loop_t, loop_best = best_of(legacy_loop, rows, args.repeat)
+        vec_t, vec_best = best_of(vectorized, rows, args.repeat)
+        print(
+            f"{size:>8} | {loop_t * 1000:>10.2f} | {vec_t * 1000:>10.2f} | "
+            f"{loop_t / vec_t:>7.1f}x | {loop_best == vec_best}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Benchmark de l'optimiseur de flotte (PDPTW OR-Tools) sur des instances synthétiques d'Abidjan.
+
+Usage:
+  python scripts/benchmark_fleet_vrp.py
+  python scripts/benchmark_fleet_vrp.py --instances 5x20,10x50,20x100 --budgets 1,5
+
+Les points sont tirés comme dans scripts/generate_fake_deliveries.py (bbox
+d'Abidjan) ; aucune base de données ni API de routage n'est nécessaire
+(matrice haversine locale). La référence est l'affectation gloutonne actuelle :
+chaque livraison au livreur le plus proche, traitée d'un bout à l'autre.
+"""
+import os
+import sys
+import random
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from generate_fake_deliveries import ABIDJAN_BBOX, random_point_in_bbox
+from apps.core.location_service import LocationService
+from apps.deliveries.vrp import solve_pickup_delivery
+
+
+def make_instance(n_drivers, n_orders, seed=0):
+    random.seed(seed)
+    vehicles = []
+    for i in range(n_drivers):
+        lat, lon = random_point_in_bbox(ABIDJAN_BBOX)
+        vehicles.append({
+            'id': f'driver-{i}',
+            'latitude': lat,
+            'longitude': lon,
+            'capacity_kg': random.choice([30, 30, 50, 150]),
+            'vehicle_type': 'moto',
+        })
+    orders = []
+    for i in range(n_orders):
+        scheduled = random.random() < 0.3
+        ready = random.choice([30, 60, 90, 120]) if scheduled else 0
+        orders.append({
+            'id': f'order-{i}',
+            'pickup': random_point_in_bbox(ABIDJAN_BBOX),
+            'dropoff': random_point_in_bbox(ABIDJAN_BBOX),
+            'weight_kg': round(random.uniform(0.5, 12), 1),
+            'ready_min': ready,
+            'due_min': ready + 30 if scheduled else None,
+        })
+    return vehicles, orders
+
+
+def greedy_baseline(vehicles, orders):
+    """Livreur le plus proche pour chaque livraison, ramassage puis livraison immédiate."""
+    positions = {v['id']: (v['latitude'], v['longitude']) for v in vehicles}
+    capacities = {v['id']: v['capacity_kg'] for v in vehicles}
+    total_km = 0.0
+    unassigned = 0
+    for order in orders:
+        candidates = [v for v in positions if capacities[v] >= order['weight_kg']]
+        if not candidates:
+            unassigned += 1
+            continue
+        best = min(candidates, key=lambda v: LocationService.haversine_distance(*positions[v], *order['pickup']))
+        total_km += LocationService.haversine_distance(*positions[best], *order['pickup'])
+        total_km += LocationService.haversine_distance(*order['pickup'], *order['dropoff'])
+        positions[best] = order['dropoff']
+    return total_km, unassigned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark fleet VRP')
+    parser.add_argument('--instances', default='5x20,10x50,20x100', help='Comma-separated DRIVERSxORDERS')
+    parser.add_argument('--budgets', default='1,5', help='Comma-separated solver time limits (seconds)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    budgets = [float(b) for b in args.budgets.split(',')]
+
+    print(f"{'instance':>10} | {'solver':>12} | {'time (s)':>8} | {'total km':>9} | {'unassigned':>10}")
+    print('-' * 62)
+    for spec in args.instances.split(','):
+        n_drivers, n_orders = (int(x) for x in spec.split('x'))
+        vehicles, orders = make_instance(n_drivers, n_orders, seed=args.seed)
+
+        start = time.perf_counter()
+        greedy_km, greedy_unassigned = greedy_baseline(vehicles, orders)
+        elapsed = time.perf_counter() - start
+        print(f"{spec:>10} | {'greedy':>12} | {elapsed:>8.2f} | {greedy_km:>9.1f} | {greedy_unassigned:>10}")
+
+        for budget in budgets:
+            start = time.perf_counter()
+            result = solve_pickup_delivery(vehicles, orders, time_limit_seconds=budget, use_api=False)
+            elapsed = time.perf_counter() - start
+            total_km = sum(r['distance_km'] for r in result['routes'])
+            label = f'or-tools {budget:g}s'
+            print(f"{spec:>10} | {label:>12} | {elapsed:>8.2f} | {total_km:>9.1f} | {len(result['unassigned']):>10}")
+
+
+if __name__ == '__main__':
+    main()
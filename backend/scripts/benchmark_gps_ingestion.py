@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Benchmark d'ingestion GPS : point par point vs lot (traces bufferisées hors ligne).
+
+Usage:
+  python scripts/benchmark_gps_ingestion.py
+  python scripts/benchmark_gps_ingestion.py --points 2000 --batch-size 200
+
+Crée une base de test jetable (jamais la base réelle) et un livreur, puis
+mesure le débit en points/seconde :
+- "single" : GPSTrackingService.update_driver_location pour chaque point
+  (INSERT + Driver.save + recalcul de la session à chaque point) ;
+- "batch"  : GPSTrackingService.ingest_location_batch par lots de --batch-size
+  (un bulk_create, une mise à jour du livreur et de la session par lot).
+Chaque mode démarre avec une session de suivi neuve.
+"""
+import os
+import sys
+import argparse
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from apps.authentication.models import User
+from apps.drivers.gps_tracking_service import GPSTrackingService
+from apps.drivers.location_models import LocationTrackingSession, LocationUpdate
+from apps.drivers.models import Driver
+
+
+def make_track(count, seed=0):
+    """Trace réaliste : marche aléatoire autour du Plateau, un point toutes les 5 s"""
+    rng = random.Random(seed)
+    start = timezone.now() - timedelta(seconds=5 * count)
+    lat, lon = 5.3238, -4.0213
+    points = []
+    for i in range(count):
+        lat += rng.uniform(-0.0002, 0.0002)
+        lon += rng.uniform(-0.0002, 0.0002)
+        points.append({
+            'latitude': Decimal(f'{lat:.8f}'),
+            'longitude': Decimal(f'{lon:.8f}'),
+            'accuracy': rng.uniform(3, 20),
+            'speed': rng.choice([0.0, 0.5, 4.0, 8.0]),
+            'heading': rng.uniform(0, 360),
+            'battery_level': max(5, 95 - i // 100),
+            'timestamp': start + timedelta(seconds=5 * i),
+        })
+    return points
+
+
+def reset(driver):
+    LocationUpdate.objects.filter(driver=driver).delete()
+    LocationTrackingSession.objects.filter(driver=driver).delete()
+
+
+def run_single(driver, points):
+    start = time.perf_counter()
+    for point in points:
+        GPSTrackingService.update_driver_location(driver, **point)
+    return time.perf_counter() - start
+
+
+def run_batch(driver, points, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(points), batch_size):
+        GPSTrackingService.ingest_location_batch(driver, points[i:i + batch_size])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GPS ingestion')
+    parser.add_argument('--points', type=int, default=1000, help='Number of GPS fixes per run')
+    parser.add_argument('--batch-size', type=int, default=GPSTrackingService.MAX_BATCH_POINTS,
+                        help='Fixes per batch upload')
+    args = parser.parse_args()
+    batch_size = max(1, min(args.batch_size, GPSTrackingService.MAX_BATCH_POINTS))
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = User.objects.create_user(
+            email='bench-gps@example.com', phone='+2250700999999', password='bench',
+            user_type='driver', first_name='Bench', last_name='Gps',
+        )
+        driver = Driver.objects.get(user=user)
+        points = make_track(args.points)
+
+        single_t = run_single(driver, points)
+        single_session = LocationTrackingSession.objects.get(driver=driver)
+        reset(driver)
+        batch_t = run_batch(driver, points, batch_size)
+        batch_session = LocationTrackingSession.objects.get(driver=driver)
+
+        print(f"{'mode':>8} | {'points/s':>10} | {'µs/point':>9}")
+        print('-' * 34)
+        for label, elapsed in (('single', single_t), ('batch', batch_t)):
+            print(f"{label:>8} | {len(points) / elapsed:>10.0f} | {elapsed / len(points) * 1e6:>9.1f}")
+        same = (
+            single_session.total_updates == batch_session.total_updates
+            and abs(single_session.total_distance_km - batch_session.total_distance_km) < 1e-6
+        )
+        print(f"batch size: {batch_size} | speedup: {single_t / batch_t:.1f}x | same session stats: {same}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Benchmark du routing hors ligne : construction, chargement, itinéraires, matrices.
+
+Usage:
+  python scripts/benchmark_offline_routing.py
+  python scripts/benchmark_offline_routing.py --grid 250 --queries 500
+  python scripts/benchmark_offline_routing.py --extract abidjan.osm.bz2
+
+Sans --extract, génère un extrait OSM synthétique de la taille d'une ville
+(quadrillage --grid × --grid de rues irrégulières : tronçons manquants, sens
+uniques, axes principaux, nœuds de géométrie) dans un dossier temporaire.
+Mesure :
+- la construction du graphe (lecture OSM, composante connexe, landmarks)
+  et la taille / le temps de chargement du fichier .npz ;
+- --queries itinéraires aléatoires : A* + landmarks contre Dijkstra simple
+  (nœuds visités, p50 / p95 en ms), résultats identiques vérifiés ;
+- une matrice de --matrix-points points.
+"""
+import os
+import sys
+import argparse
+import heapq
+import random
+import statistics
+import tempfile
+import time
+from math import inf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+
+from apps.core.offline_routing import OfflineRoutingGraph
+
+ORIGIN = (5.25, -4.10)
+STEP = 0.0015  # ~165 m
+
+
+def write_synthetic_extract(path, size, seed):
+    """Extrait OSM XML d'une ville en quadrillage irrégulier"""
+    rng = random.Random(seed)
+    next_id = [10 ** 7]
+
+    def new_id():
+        next_id[0] += 1
+        return next_id[0]
+
+    with open(path, 'w', encoding='utf-8') as output:
+        output.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n')
+        grid = {}
+        for row in range(size):
+            for col in range(size):
+                lat = ORIGIN[0] + row * STEP + rng.uniform(-0.0003, 0.0003)
+                lon = ORIGIN[1] + col * STEP + rng.uniform(-0.0003, 0.0003)
+                grid[row, col] = (row * size + col + 1, lat, lon)
+                output.write(f'<node id="{row * size + col + 1}" lat="{lat:.7f}" lon="{lon:.7f}"/>\n')
+
+        way_id = 0
+        for horizontal in (True, False):
+            for line in range(size):
+                highway = 'primary' if line % 20 == 0 else 'secondary' if line % 5 == 0 else 'residential'
+                oneway = highway == 'residential' and rng.random() < 0.15
+                refs = []
+                for position in range(size):
+                    key = (line, position) if horizontal else (position, line)
+                    # Tronçons manquants : la voie est coupée en plusieurs ways
+                    if refs and highway == 'residential' and rng.random() < 0.08:
+                        way_id += 1
+                        write_way(output, way_id, refs, highway, oneway)
+                        refs = []
+                    node, lat, lon = grid[key]
+                    if refs:
+                        # Nœud de géométrie entre deux intersections
+                        _, prev_lat, prev_lon = previous
+                        shape = new_id()
+                        output.write(
+                            f'<node id="{shape}" lat="{(lat + prev_lat) / 2 + rng.uniform(-0.0002, 0.0002):.7f}" '
+                            f'lon="{(lon + prev_lon) / 2 + rng.uniform(-0.0002, 0.0002):.7f}"/>\n'
+                        )
+                        refs.append(shape)
+                    refs.append(node)
+                    previous = grid[key]
+                way_id += 1
+                write_way(output, way_id, refs, highway, oneway)
+        output.write('</osm>\n')
+
+
+def write_way(output, way_id, refs, highway, oneway):
+    if len(refs) < 2:
+        return
+    output.write(f'<way id="{way_id}">')
+    output.write(''.join(f'<nd ref="{ref}"/>' for ref in refs))
+    output.write(f'<tag k="highway" v="{highway}"/>')
+    if oneway:
+        output.write('<tag k="oneway" v="yes"/>')
+    output.write('</way>\n')
+
+
+def dijkstra_settled(graph, source, target):
+    """Dijkstra simple (référence) : temps et nœuds visités"""
+    indptr, targets, weights = graph._indptr, graph._target, graph._time
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    settled = 0
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        settled += 1
+        if u == target:
+            return d, settled
+        for e in range(indptr[u], indptr[u + 1]):
+            v, nd = targets[e], d + weights[e]
+            if nd < dist.get(v, inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return inf, settled
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline routing graph')
+    parser.add_argument('--extract', help='Extrait OSM réel (sinon extrait synthétique)')
+    parser.add_argument('--grid', type=int, default=200, help='Côté du quadrillage synthétique')
+    parser.add_argument('--landmarks', type=int, default=8)
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--matrix-points', type=int, default=25)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        extract = args.extract
+        if not extract:
+            extract = os.path.join(tmpdir, 'synthetic.osm')
+            started = time.perf_counter()
+            write_synthetic_extract(extract, args.grid, args.seed)
+            print(f"Extrait synthétique {args.grid}×{args.grid} : "
+                  f"{os.path.getsize(extract) / 2 ** 20:.0f} Mo ({time.perf_counter() - started:.1f}s)")
+
+        started = time.perf_counter()
+        graph = OfflineRoutingGraph.from_osm(extract, landmark_count=args.landmarks)
+        build_s = time.perf_counter() - started
+        path = os.path.join(tmpdir, 'graph.npz')
+        graph.save(path)
+        started = time.perf_counter()
+        graph = OfflineRoutingGraph.load(path)
+        load_s = time.perf_counter() - started
+        print(f"Graphe : {graph.node_count} intersections, {len(graph.target)} arcs | construction {build_s:.1f}s | "
+              f"fichier {os.path.getsize(path) / 2 ** 20:.1f} Mo, chargement {load_s * 1000:.0f} ms")
+
+        rng = random.Random(args.seed)
+        lat_min, lat_max = float(graph.node_lat.min()), float(graph.node_lat.max())
+        lon_min, lon_max = float(graph.node_lon.min()), float(graph.node_lon.max())
+        alt_ms, dijkstra_ms, route_ms, dijkstra_visits = [], [], [], []
+        for _ in range(args.queries):
+            source = graph.nearest(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max))[0]
+            target = graph.nearest(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max))[0]
+
+            started = time.perf_counter()
+            edges = graph.shortest_path(source, target)
+            alt_ms.append((time.perf_counter() - started) * 1000)
+            alt_time = sum(graph._time[e] for e in edges)
+
+            started = time.perf_counter()
+            reference, settled = dijkstra_settled(graph, source, target)
+            dijkstra_ms.append((time.perf_counter() - started) * 1000)
+            dijkstra_visits.append(settled)
+            if abs(alt_time - reference) > 1e-3:
+                print(f"ÉCART {source}->{target}: ALT {alt_time:.3f}s, Dijkstra {reference:.3f}s")
+
+            started = time.perf_counter()
+            graph.route(float(graph.node_lat[source]), float(graph.node_lon[source]),
+                        float(graph.node_lat[target]), float(graph.node_lon[target]))
+            route_ms.append((time.perf_counter() - started) * 1000)
+
+        print(f"Itinéraires ({args.queries}) | Dijkstra p50 {percentile(dijkstra_ms, 50):6.1f} ms p95 "
+              f"{percentile(dijkstra_ms, 95):6.1f} ms ({statistics.mean(dijkstra_visits):.0f} nœuds visités en moyenne)")
+        print(f"                   | A*+landmarks p50 {percentile(alt_ms, 50):6.1f} ms p95 {percentile(alt_ms, 95):6.1f} ms | "
+              f"route() complète (rattachement + polyline) p50 {percentile(route_ms, 50):6.1f} ms "
+              f"p95 {percentile(route_ms, 95):6.1f} ms")
+
+        points = [(rng.uniform(lat_min, lat_max), rng.uniform(lon_min, lon_max)) for _ in range(args.matrix_points)]
+        started = time.perf_counter()
+        graph.matrix(points)
+        print(f"Matrice {args.matrix_points}×{args.matrix_points} : {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
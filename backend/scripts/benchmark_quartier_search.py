@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Benchmark de la recherche des quartiers : parcours linéaire vs index (trie + trigrammes).
+
+Usage:
+  python scripts/benchmark_quartier_search.py
+  python scripts/benchmark_quartier_search.py --typos 2000 --seed 3
+
+Rejoue l'autocomplete des apps : chaque nom de quartier est tapé lettre par
+lettre (une requête par frappe à partir de 2 caractères), sans accents une
+fois sur deux. S'y ajoutent --typos saisies avec une faute (lettre omise,
+doublée ou remplacée). Pour l'ancienne recherche (sous-chaîne sensible aux
+accents, copie de la version précédente) et pour l'index, affiche la latence
+par requête (p50 / p95, en µs) et la part des saisies dont le quartier visé
+arrive dans les 5 premiers résultats.
+"""
+import os
+import sys
+import argparse
+import random
+import statistics
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+django.setup()
+
+from apps.core.geocode_store import normalize_query
+from apps.core.quartier_index import QuartierIndex
+from apps.core.quartiers_data import QUARTIERS_ABIDJAN_COMPLET, QUARTIERS_GPS
+
+
+def legacy_search(query, limit=15):
+    """Ancienne search_quartiers : parcours complet, sous-chaîne en minuscules"""
+    if len(query) < 2:
+        return []
+    query_lower = query.lower().strip()
+    results_with_gps, results_without_gps = [], []
+    for commune, quartiers in QUARTIERS_ABIDJAN_COMPLET.items():
+        commune_gps = QUARTIERS_GPS.get(commune, {})
+        for nom in quartiers:
+            if query_lower in nom.lower():
+                coords = commune_gps.get(nom)
+                (results_with_gps if coords else results_without_gps).append({'nom': nom, 'commune': commune})
+    return (results_with_gps + results_without_gps)[:limit]
+
+
+def strip_accents(text):
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def with_typo(name, rng):
+    position = rng.randrange(1, len(name))
+    operation = rng.choice(('drop', 'double', 'replace'))
+    if operation == 'drop':
+        return name[:position] + name[position + 1:]
+    if operation == 'double':
+        return name[:position] + name[position] + name[position:]
+    return name[:position] + rng.choice('aeiourstn') + name[position + 1:]
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1]
+
+
+def run(label, search, queries, repeats):
+    latencies, hits = [], 0
+    for query, expected in queries:
+        started = time.perf_counter()
+        for _ in range(repeats):
+            results = search(query)
+        latencies.append((time.perf_counter() - started) / repeats * 1e6)
+        hits += expected in results
+    print(f"  {label:<32} p50 {percentile(latencies, 50):7.1f} µs  p95 {percentile(latencies, 95):7.1f} µs  "
+          f"quartier visé dans le top 5 : {hits / len(queries):6.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark quartier search index')
+    parser.add_argument('--typos', type=int, default=1000, help='Saisies avec une faute de frappe')
+    parser.add_argument('--repeats', type=int, default=5, help='Exécutions par requête (latence moyenne)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    index = QuartierIndex.from_gazetteer()
+    print(f"Index : {len(index.entries)} quartiers, construit en {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    names = [(commune, nom) for commune, noms in QUARTIERS_ABIDJAN_COMPLET.items() for nom in noms]
+    keystrokes = []
+    for commune, nom in names:
+        typed = strip_accents(nom) if rng.random() < 0.5 else nom
+        keystrokes += [(typed[:n], nom) for n in range(2, len(typed) + 1)]
+    typos = []
+    for _ in range(args.typos):
+        commune, nom = rng.choice([item for item in names if len(item[1]) >= 5])
+        typos.append((with_typo(strip_accents(nom), rng), nom))
+
+    def legacy(query):
+        return [r['nom'] for r in legacy_search(query, 5)]
+
+    def indexed_uncached(query):
+        ranked = index._search_ids.__wrapped__(normalize_query(query), '', index.MIN_SIMILARITY, 5)
+        return [index.entries[entry_id].nom for entry_id, _, _ in ranked[:5]]
+
+    def indexed_cached(query):
+        return [m.entry.nom for m in index.search(query, 5)]
+
+    for label, queries in ((f"Frappes successives ({len(keystrokes)})", keystrokes), (f"Fautes de frappe ({len(typos)})", typos)):
+        print(label)
+        run('parcours linéaire (ancien)', legacy, queries, args.repeats)
+        run('index, sans cache de requêtes', indexed_uncached, queries, args.repeats)
+        run('index (search)', indexed_cached, queries, args.repeats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""Benchmark du cache des itinéraires : clés exactes vs grille + LRU local.
+
+Usage:
+  python scripts/benchmark_route_cache.py
+  python scripts/benchmark_route_cache.py --requests 5000 --provider-ms 250
+  python scripts/benchmark_route_cache.py --redis redis://localhost:6379/15
+
+Rejoue une charge réaliste de LocationService.get_route : --pairs trajets
+(points de collecte -> destinations dans Abidjan) demandés --requests fois,
+chaque extrémité bruitée comme un GPS (--jitter-m mètres). Le provider
+(OSRM) est simulé sans appel réseau : chaque appel ajoute --provider-ms à
+la latence mesurée de la requête. Les requêtes sont réparties en tourniquet
+sur --workers workers (un LRU local chacun, cache partagé commun).
+Deux modes, avec le même tirage :
+- "exact" : clés sur 5 décimales, cache partagé seul (ancien comportement) ;
+- "grid"  : extrémités alignées sur --grid-m mètres, LRU local devant le cache.
+Affiche les appels provider, le taux de hit et la latence p50 / p95 / p99
+de get_route. Avec --redis le cache partagé est Redis (base vidée).
+"""
+import os
+import sys
+import argparse
+import logging
+import random
+import statistics
+import time
+from math import cos, radians
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark LocationService.get_route caching')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--pairs', type=int, default=150, help='Trajets distincts demandés')
+    parser.add_argument('--jitter-m', type=float, default=15.0, help='Bruit GPS sur chaque extrémité')
+    parser.add_argument('--grid-m', type=float, default=50.0, help='Pas de la grille du mode "grid"')
+    parser.add_argument('--provider-ms', type=float, default=150.0, help='Latence simulée du provider')
+    parser.add_argument('--workers', type=int, default=4, help='Workers simulés (LRU locaux)')
+    parser.add_argument('--redis', default=None, help='URL Redis pour le cache partagé')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+
+import django
+from django.conf import settings
+
+django.setup()
+if ARGS.redis:
+    settings.CACHES = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': ARGS.redis}}
+else:
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    }}
+
+from django.core.cache import cache
+
+from apps.core.location_service import LocationService
+from apps.core.route_cache import RouteCache, encode_polyline
+
+
+def make_workload(args):
+    """Liste de (start_lat, start_lon, end_lat, end_lon) bruités autour de --pairs trajets"""
+    rng = random.Random(args.seed)
+    pairs = [
+        ((rng.uniform(5.28, 5.42), rng.uniform(-4.08, -3.93)), (rng.uniform(5.28, 5.42), rng.uniform(-4.08, -3.93)))
+        for _ in range(args.pairs)
+    ]
+
+    def jitter(lat, lon):
+        dlat = rng.gauss(0, args.jitter_m) / 111320
+        dlon = rng.gauss(0, args.jitter_m) / (111320 * cos(radians(lat)))
+        return lat + dlat, lon + dlon
+
+    workload = []
+    for _ in range(args.requests):
+        # Quelques trajets très demandés (grands marchands), une longue traîne
+        start, end = pairs[min(int(rng.paretovariate(1.2)) - 1, args.pairs - 1)]
+        workload.append((*jitter(*start), *jitter(*end)))
+    return workload
+
+
+def fake_provider(args, calls):
+    def provider(cls, start_lat, start_lon, end_lat, end_lon, context=None):
+        calls.append(1)
+        points = [(start_lat + (end_lat - start_lat) * i / 60, start_lon + (end_lon - start_lon) * i / 60) for i in range(61)]
+        return {
+            'distance_km': round(LocationService.haversine_distance(start_lat, start_lon, end_lat, end_lon) * 1.3, 2),
+            'duration_min': 20.0,
+            'polyline_points': points,
+            'geometry': encode_polyline(points),
+            'steps': [{'instruction': f'Rue {i}', 'distance_m': 100, 'duration_s': 20, 'maneuver': 'turn', 'modifier': 'left'} for i in range(12)],
+            'source': 'osrm',
+        }
+    return classmethod(provider)
+
+
+def run(mode, args, workload):
+    cache.clear()
+    workers = []
+    for _ in range(args.workers):
+        worker = RouteCache()
+        worker.GRID_METERS = 0 if mode == 'exact' else args.grid_m
+        worker.LOCAL_SIZE = 0 if mode == 'exact' else 2048
+        workers.append(worker)
+
+    calls, latencies = [], []
+    with mock.patch.object(LocationService, '_get_route_osrm', fake_provider(args, calls)):
+        for i, (start_lat, start_lon, end_lat, end_lon) in enumerate(workload):
+            with mock.patch('apps.core.location_service.route_cache', workers[i % len(workers)]):
+                calls_before = len(calls)
+                started = time.perf_counter()
+                LocationService.get_route(start_lat, start_lon, end_lat, end_lon)
+                elapsed = (time.perf_counter() - started) * 1000
+            latencies.append(elapsed + (len(calls) - calls_before) * args.provider_ms)
+
+    stats = [worker.stats()['process'] for worker in workers]
+    hits_local = sum(worker['hits_local'] for worker in stats)
+    hits_shared = sum(worker['hits_shared'] for worker in stats)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'calls': len(calls),
+        'hit_rate': (hits_local + hits_shared) / len(workload),
+        'hits_local': hits_local,
+        'hits_shared': hits_shared,
+        'p50': quantiles[49], 'p95': quantiles[94], 'p99': quantiles[98],
+    }
+
+
+def main():
+    logging.getLogger('apps.core').setLevel(logging.WARNING)
+    workload = make_workload(ARGS)
+    backend = f'Redis ({ARGS.redis})' if ARGS.redis else 'LocMemCache'
+    print(f"{ARGS.requests} requêtes, {ARGS.pairs} trajets, bruit GPS {ARGS.jitter_m:.0f} m, "
+          f"provider simulé {ARGS.provider_ms:.0f} ms, {ARGS.workers} workers, cache partagé {backend}")
+    results = {}
+    for mode in ('exact', 'grid'):
+        result = results[mode] = run(mode, ARGS, workload)
+        print(f"{mode:>5} | appels provider {result['calls']:>5} | hit rate {result['hit_rate']:6.1%} "
+              f"(local {result['hits_local']}, partagé {result['hits_shared']}) | "
+              f"p50 {result['p50']:7.2f} ms  p95 {result['p95']:7.2f} ms  p99 {result['p99']:7.2f} ms")
+    exact, grid = results['exact'], results['grid']
+    print(f"Appels provider : -{1 - grid['calls'] / max(exact['calls'], 1):.0%} | "
+          f"p95 : {exact['p95']:.1f} ms -> {grid['p95']:.1f} ms")
+    cache.clear()
+
+
+if __name__ == '__main__':
+    main()
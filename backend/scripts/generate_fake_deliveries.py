@@ -12,11 +12,15 @@ import random
 import argparse
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-import django
-django.setup()
 
-from apps.deliveries.models import Delivery
+# Bbox d'Abidjan utilisée par défaut (min_lat, min_lon, max_lat, max_lon)
+ABIDJAN_BBOX = (5.15, -4.10, 5.45, -3.70)
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
 
 
 def random_point_in_bbox(bbox):
@@ -28,6 +32,8 @@ def random_point_in_bbox(bbox):
 
 
 def create_fake_delivery(bbox, index=0):
+    from apps.deliveries.models import Delivery
+
     pickup_lat, pickup_lon = random_point_in_bbox(bbox)
     delivery_lat, delivery_lon = random_point_in_bbox(bbox)
     d = Delivery.objects.create(
@@ -54,8 +60,9 @@ def main():
     parser = argparse.ArgumentParser(description='Generate fake deliveries for testing')
     parser.add_argument('--count', type=int, default=50, help='Number of deliveries to create')
     parser.add_argument('--bbox', help='BBox min_lat,min_lon,max_lat,max_lon',
-                        default='5.15,-4.10,5.45,-3.70')
+                        default=','.join(str(v) for v in ABIDJAN_BBOX))
     args = parser.parse_args()
+    setup_django()
 
     bbox_vals = tuple(map(float, args.bbox.split(',')))
 
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Test de charge du suivi temps réel (SSE) : connexions tenues par nœud.
+
+Usage:
+  python scripts/loadtest_tracking_stream.py
+  python scripts/loadtest_tracking_stream.py --stages 1000,2000,5000 --deliveries 500
+  python scripts/loadtest_tracking_stream.py --redis redis://localhost:6379/15
+
+Crée une base de test jetable (jamais la base réelle), des livraisons
+assignées (un livreur chacune) et démarre UN nœud uvicorn en process sur
+config.asgi. Pour chaque palier de --stages, ouvre des abonnés SSE jusqu'au
+nombre demandé (répartis sur les livraisons), puis publie --rounds vagues
+de pings (un par livreur) et mesure :
+- les connexions acceptées et le temps d'ouverture ;
+- la latence ping -> réception par tous les abonnés (p50 / p95 / p99) ;
+- la mémoire du process (RSS) par connexion ouverte, clients inclus
+  (borne haute du coût côté serveur).
+Avec --redis les pings passent par Redis pub/sub comme entre plusieurs
+nœuds ; sinon par la diffusion en mémoire du process.
+Le test s'arrête au premier palier en échec (connexions refusées ou p99
+au-delà de --max-p99-ms).
+"""
+import os
+import sys
+import argparse
+import asyncio
+import json
+import resource
+import statistics
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Load test delivery tracking streams')
+    parser.add_argument('--stages', default='500,1000,2000,4000',
+                        help='Nombres de connexions simultanées à atteindre, par palier')
+    parser.add_argument('--deliveries', type=int, default=200, help='Livraisons suivies')
+    parser.add_argument('--rounds', type=int, default=10, help='Vagues de pings par palier')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--redis', default=None, help='URL Redis : diffusion via pub/sub')
+    parser.add_argument('--max-p99-ms', type=float, default=1000.0)
+    return parser.parse_args()
+
+
+ARGS = parse_args()
+if ARGS.redis:
+    os.environ['REDIS_URL'] = ARGS.redis
+
+import django
+from django.conf import settings
+
+django.setup()
+if ARGS.redis:
+    settings.CACHES = {'default': {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': ARGS.redis}}
+
+import uvicorn
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.authentication.models import User
+from apps.deliveries import tracking_stream
+from apps.deliveries.models import Delivery
+from apps.merchants.models import Merchant
+
+
+def rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def create_fixtures(count):
+    merchant_user = User.objects.create_user(
+        email='load-merchant@test.com', phone='+2250798000000', password='pw',
+        user_type='merchant', first_name='Load', last_name='Merchant'
+    )
+    merchant, _ = Merchant.objects.get_or_create(user=merchant_user, defaults={'business_name': 'Load Shop'})
+    drivers, deliveries = [], []
+    for i in range(count):
+        driver_user = User.objects.create_user(
+            email=f'load-driver{i}@test.com', phone=f'+22507990{i:05d}', password='pw',
+            user_type='driver', first_name='Load', last_name=f'Driver {i}'
+        )
+        driver = driver_user.driver_profile
+        drivers.append(driver)
+        deliveries.append(Delivery.objects.create(
+            merchant=merchant, driver=driver,
+            pickup_commune='Cocody', pickup_latitude=Decimal('5.36'), pickup_longitude=Decimal('-3.98'),
+            delivery_address='Rue 12', delivery_commune='Plateau',
+            delivery_latitude=Decimal('5.32'), delivery_longitude=Decimal('-4.02'),
+            package_weight_kg=1.0, calculated_price=1000, payment_method='prepaid',
+            recipient_name='Client', recipient_phone='0780000000', status='assigned',
+        ))
+    return str(AccessToken.for_user(merchant_user)), drivers, deliveries
+
+
+class Subscriber:
+    def __init__(self, on_position):
+        self.on_position = on_position
+        self.reader = self.writer = None
+
+    async def connect(self, port, path, token):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', port)
+        self.writer.write(
+            f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n'
+            f'Accept: text/event-stream\r\n\r\n'.encode()
+        )
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if b' 200 ' not in status_line:
+            raise ConnectionError(status_line.decode().strip())
+        while (await self.reader.readline()) not in (b'\r\n', b''):
+            pass
+        asyncio.ensure_future(self.listen())
+
+    async def listen(self):
+        event = None
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    return
+                if line.startswith(b'event: '):
+                    event = line[7:].strip()
+                elif line.startswith(b'data: ') and event == b'position':
+                    self.on_position(json.loads(line[6:]))
+        except (ConnectionError, asyncio.CancelledError):
+            return
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+
+
+async def run(args, token, drivers, deliveries):
+    server = uvicorn.Server(uvicorn.Config(
+        'config.asgi:application', host='127.0.0.1', port=args.port,
+        log_level='warning', lifespan='off', backlog=4096, timeout_keep_alive=300,
+    ))
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    latencies, received = [], {}
+    wave = {'id': None, 'expected': 0, 'done': None}
+
+    def on_position(data):
+        if data.get('wave') != wave['id']:
+            return
+        sent = datetime.fromisoformat(data['timestamp']).timestamp()
+        latencies.append(time.time() - sent)
+        received[wave['id']] = received.get(wave['id'], 0) + 1
+        if received[wave['id']] == wave['expected']:
+            wave['done'].set()
+
+    def publish_wave(wave_id):
+        for driver in drivers:
+            payload = {
+                'driver_id': str(driver.id), 'latitude': 5.34, 'longitude': -4.0,
+                'speed': 6.0, 'timestamp': datetime.now().astimezone(), 'wave': wave_id,
+            }
+            tracking_stream.publish(tracking_stream.driver_channel(driver.id), 'position', payload)
+
+    subscribers, results = [], []
+    baseline = rss_mb()
+    for target in [int(value) for value in args.stages.split(',')]:
+        started, failures = time.perf_counter(), 0
+        batch = []
+        while len(subscribers) + len(batch) < target:
+            delivery = deliveries[(len(subscribers) + len(batch)) % len(deliveries)]
+            subscriber = Subscriber(on_position)
+            batch.append((subscriber, subscriber.connect(args.port, f'/api/v1/deliveries/{delivery.id}/stream/', token)))
+        for i in range(0, len(batch), 200):
+            chunk = batch[i:i + 200]
+            outcomes = await asyncio.gather(*(coroutine for _, coroutine in chunk), return_exceptions=True)
+            for (subscriber, _), outcome in zip(chunk, outcomes):
+                if isinstance(outcome, Exception):
+                    failures += 1
+                    subscriber.close()
+                else:
+                    subscribers.append(subscriber)
+        open_seconds = time.perf_counter() - started
+        await asyncio.sleep(0.5)
+
+        latencies.clear()
+        timeouts = 0
+        for round_id in range(args.rounds):
+            wave_id = f'{target}-{round_id}'
+            wave.update(id=wave_id, expected=len(subscribers), done=asyncio.Event())
+            await asyncio.get_running_loop().run_in_executor(None, publish_wave, wave_id)
+            try:
+                await asyncio.wait_for(wave['done'].wait(), 10)
+            except asyncio.TimeoutError:
+                timeouts += 1
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+        result = {
+            'connections': len(subscribers),
+            'failed': failures,
+            'open_s': open_seconds,
+            'p50_ms': quantiles[49] * 1000,
+            'p95_ms': quantiles[94] * 1000,
+            'p99_ms': quantiles[98] * 1000,
+            'timeouts': timeouts,
+            'kb_per_conn': (rss_mb() - baseline) * 1024 / max(len(subscribers), 1),
+            'server_side': tracking_stream.tracking_hub.connections,
+        }
+        results.append(result)
+        print(
+            f"{result['connections']:>6} conn ({result['server_side']} côté serveur, {failures} refusées) | "
+            f"ouverture {open_seconds:6.2f}s | latence p50 {result['p50_ms']:7.1f} ms "
+            f"p95 {result['p95_ms']:7.1f} ms p99 {result['p99_ms']:7.1f} ms | "
+            f"{result['kb_per_conn']:5.1f} Ko/conn | vagues incomplètes {timeouts}",
+            flush=True
+        )
+        if failures or timeouts or result['p99_ms'] > args.max_p99_ms:
+            break
+
+    for subscriber in subscribers:
+        subscriber.close()
+    server.should_exit = True
+    await serving
+    return results
+
+
+def main():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    stages = [int(value) for value in ARGS.stages.split(',')]
+    # Chaque connexion compte deux descripteurs (client + serveur) dans ce process
+    if max(stages) * 2 + 100 > hard:
+        print(f"Limite de descripteurs insuffisante ({hard}) pour {max(stages)} connexions")
+        return
+    tracking_stream.MAX_CONNECTIONS = max(stages) + 1
+    tracking_stream.HEARTBEAT_SECONDS = 60
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    test_db = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=False)
+    try:
+        token, drivers, deliveries = create_fixtures(ARGS.deliveries)
+        mode = f'Redis pub/sub ({ARGS.redis})' if ARGS.redis else 'diffusion en mémoire'
+        print(f"Base de test: {test_db} | {ARGS.deliveries} livraisons | {mode} | 1 nœud uvicorn, 1 process")
+        # Serveur et abonnés partagent la boucle : le débit mesuré est celui d'un seul cœur
+        asyncio.run(run(ARGS, token, drivers, deliveries))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -4,14 +4,15 @@
 echo "🚀 Démarrage de Django (sans Celery)"
 
 # Démarrer Gunicorn avec configuration optimisée pour 512MB RAM
-exec gunicorn config.wsgi:application \
+# Workers Uvicorn (ASGI) : nécessaires aux flux de suivi temps réel (config/asgi.py)
+exec gunicorn config.asgi:application \
     --bind 0.0.0.0:$PORT \
-    --workers 1 \
-    --threads 4 \
-    --worker-class gthread \
+    --workers ${WEB_CONCURRENCY:-1} \
+    --worker-class uvicorn.workers.UvicornWorker \
     --max-requests 1000 \
     --max-requests-jitter 50 \
     --timeout 120 \
+    --forwarded-allow-ips '*' \
     --log-level info \
     --access-logfile - \
     --error-logfile -
@@ -47,14 +47,20 @@ if ! kill -0 $BEAT_PID 2>/dev/null; then
 fi
 echo "✅ Beat (PID: $BEAT_PID)"
 
-# Gunicorn
-echo "🌐 Gunicorn..."
-exec gunicorn config.wsgi:application \
+# Gunicorn avec workers Uvicorn (ASGI) : l'API Django plus les flux de suivi
+# temps réel (SSE, voir config/asgi.py), qui ne mobilisent pas un thread par
+# abonné. En ASGI, les vues synchrones d'un worker passent l'une après l'autre
+# (thread_sensitive) : augmenter WEB_CONCURRENCY si la mémoire le permet, pour
+# qu'une requête longue ne bloque pas toute l'API (1 par défaut, dimensionné
+# pour 512 Mo avec Celery sur la même machine).
+echo "🌐 Gunicorn (workers Uvicorn)..."
+exec gunicorn config.asgi:application \
     --bind 0.0.0.0:$PORT \
-    --workers 1 \
-    --threads 2 \
-    --worker-class gthread \
+    --workers ${WEB_CONCURRENCY:-1} \
+    --worker-class uvicorn.workers.UvicornWorker \
     --max-requests 1000 \
+    --max-requests-jitter 100 \
     --timeout 120 \
+    --forwarded-allow-ips '*' \
     --access-logfile - \
     --error-logfile -